@@ -0,0 +1,68 @@
+# benchmarks/bench_batched_inference.py
+"""
+Measures detection throughput (images/sec) of pretag_images_and_generate_coco at several batch sizes.
+
+Usage:
+    python benchmarks/bench_batched_inference.py --image_dir my_pipeline_outputs/frames
+    python benchmarks/bench_batched_inference.py --batch_sizes 1 4 8 16   # synthetic 720p frames
+
+Each batch size writes its own COCO file, which is compared against the batch_size=1 output.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "src"))
+
+from bench_frame_extraction import make_synthetic_video  # noqa: E402
+from config import DEFAULT_MODEL_NAME  # noqa: E402
+from frame_extractor import extract_frames  # noqa: E402
+from object_detector import load_model, pretag_images_and_generate_coco  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark batched YOLO inference.")
+    parser.add_argument("--image_dir", type=str, default=None, help="Frames to run on (default: 64 synthetic 720p frames).")
+    parser.add_argument("--model_name", type=str, default=DEFAULT_MODEL_NAME)
+    parser.add_argument("--batch_sizes", nargs="+", type=int, default=[1, 2, 4, 8, 16])
+    parser.add_argument("--repeats", type=int, default=2, help="Timed runs per batch size, the best one is reported.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        image_dir = args.image_dir
+        if image_dir is None:
+            image_dir = os.path.join(work_dir, "frames")
+            extract_frames(make_synthetic_video(os.path.join(work_dir, "synthetic.mp4"), num_frames=640),
+                           image_dir, frame_step=10)
+
+        model = load_model(args.model_name)
+        # Warm-up so lazy initialisation isn't billed to the first batch size
+        pretag_images_and_generate_coco(image_dir, os.path.join(work_dir, "warmup.json"), args.model_name,
+                                        model=model, batch_size=1)
+
+        rows, reference = [], None
+        for batch_size in args.batch_sizes:
+            coco_path = os.path.join(work_dir, f"coco_bs{batch_size}.json")
+            best = float("inf")
+            for _ in range(args.repeats):
+                start = time.perf_counter()
+                result = pretag_images_and_generate_coco(image_dir, coco_path, args.model_name,
+                                                         model=model, batch_size=batch_size)
+                best = min(best, time.perf_counter() - start)
+            with open(coco_path) as f:
+                coco = json.load(f)
+            if reference is None:
+                reference = coco
+            images = result["metrics"]["images_processed"]
+            rows.append((batch_size, images, best, images / best, coco == reference))
+
+        print(f"\n{'batch':>5} {'images':>7} {'seconds':>8} {'img/s':>8} {'speedup':>8}  same COCO as first")
+        for batch_size, images, elapsed, ips, same in rows:
+            print(f"{batch_size:>5} {images:>7} {elapsed:8.2f} {ips:8.1f} {ips / rows[0][3]:7.2f}x  {same}")
+
+
+if __name__ == "__main__":
+    main()
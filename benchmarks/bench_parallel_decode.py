@@ -0,0 +1,66 @@
+# benchmarks/bench_parallel_decode.py
+"""
+Measures how segment-parallel decoding (parallel_decode.extract_frames_parallel) scales with the
+number of decode processes on one video.
+
+Usage:
+    python benchmarks/bench_parallel_decode.py --video_path input/long_video.mp4 --frame_step 30
+    python benchmarks/bench_parallel_decode.py --max_workers 8   # synthetic 720p clip, 1..8 processes
+
+The single-capture "grab" extraction is the baseline. Every worker count writes its frames to
+its own directory, which is compared byte-for-byte against the baseline, so a speedup is only
+reported for runs that produce the same frames and drop metrics. Scaling is bounded by the
+physical cores (printed below): beyond that, processes only add seek and start-up overhead.
+"""
+import argparse
+import filecmp
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "src"))
+
+from bench_frame_extraction import make_synthetic_video  # noqa: E402
+from frame_extractor import extract_frames  # noqa: E402
+from parallel_decode import extract_frames_parallel, keyframe_positions  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark segment-parallel decoding from 1 to N processes.")
+    parser.add_argument("--video_path", type=str, default=None, help="Video to benchmark (default: synthetic 720p clip).")
+    parser.add_argument("--num_frames", type=int, default=1800, help="Length of the synthetic clip.")
+    parser.add_argument("--frame_step", type=int, default=5)
+    parser.add_argument("--max_workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        video_path = args.video_path or make_synthetic_video(os.path.join(work_dir, "synthetic.mp4"), args.num_frames)
+        keyframes = keyframe_positions(video_path)
+        print(f"video: {video_path}  frame_step: {args.frame_step}  cores: {os.cpu_count()}  "
+              f"keyframes: {len(keyframes) if keyframes else 'unknown'}")
+
+        base_dir = os.path.join(work_dir, "sequential")
+        start = time.perf_counter()
+        base_metrics = extract_frames(video_path, base_dir, args.frame_step, sampling_mode="grab")
+        base_time = time.perf_counter() - start
+        names = sorted(os.listdir(base_dir))
+
+        print(f"\n{'workers':<8} {'used':<5} {'seconds':>8} {'speedup':>8} {'efficiency':>11}  identical")
+        print(f"{'seq':<8} {1:<5} {base_time:8.2f} {1.0:7.1f}x {1.0:10.0%}  True")
+        for workers in range(1, args.max_workers + 1):
+            out_dir = os.path.join(work_dir, f"workers_{workers}")
+            start = time.perf_counter()
+            metrics = extract_frames_parallel(video_path, out_dir, args.frame_step, workers=workers)
+            elapsed = time.perf_counter() - start
+            match, mismatch, errors = filecmp.cmpfiles(base_dir, out_dir, names, shallow=False)
+            identical = (not mismatch and not errors and sorted(os.listdir(out_dir)) == names
+                         and all(metrics[k] == base_metrics[k] for k in
+                                 ("total_frames_in_video", "frames_extracted", "frames_dropped", "frame_drop_ratio")))
+            speedup = base_time / elapsed
+            print(f"{workers:<8} {metrics['decode_workers']:<5} {elapsed:8.2f} {speedup:7.1f}x "
+                  f"{speedup / metrics['decode_workers']:10.0%}  {identical}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+# benchmarks/bench_run_history.py
+"""
+Times the run-history trend queries on a store filled with synthetic runs.
+
+Usage:
+    python benchmarks/bench_run_history.py --runs 300000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "src"))
+
+from run_history import RunHistory  # noqa: E402
+
+CLASSES = ["person", "car", "dog", "bicycle", "truck", "bird", "cat", "bus", "horse", "sheep", "cow", "kite"]
+MODELS = ["yolov8n.pt", "yolov8s.pt", "yolov8m.pt"]
+OPERATIONS = ["decode", "retrieve", "encode", "disk_write", "image_read", "inference", "postprocess", "serialize"]
+
+
+def synthetic_runs(count: int, days: int, seed: int = 0):
+    rng = random.Random(seed)
+    end = time.time()
+    for i in range(count):
+        started_at = end - days * 86400 * (1 - i / count)
+        images = rng.randint(50, 500)
+        wall_s = images / rng.uniform(5, 40)
+        classes = {cls: rng.randint(1, 60) for cls in rng.sample(CLASSES, rng.randint(2, 6))}
+        metrics = {
+            "frame_extraction_metrics": {"total_frames_in_video": images * 30, "frames_extracted": images},
+            "object_detection_metrics": {"images_processed": images, "total_detections": sum(classes.values()),
+                                         "class_distribution": classes},
+            "pipeline_stage_times": {"frame_extraction_s": wall_s * 0.3, "object_detection_s": wall_s * 0.7},
+            "operation_timings": {op: {"count": images, "total_s": wall_s / 10, "p50_ms": 1.0, "p95_ms": 2.0,
+                                       "p99_ms": 3.0} for op in OPERATIONS}
+        }
+        params = {"model_name": rng.choice(MODELS), "mode": "sequential", "frame_step": 30,
+                  "sampling_mode": "auto", "batch_size": 8, "wall_s": wall_s}
+        yield f"/videos/{i % 5000}.mp4", metrics, params, started_at
+
+
+def _timed(label: str, function):
+    start = time.perf_counter()
+    result = function()
+    print(f"{label:<36} {1000 * (time.perf_counter() - start):9.1f} ms", file=sys.stderr)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the run-history trend queries.")
+    parser.add_argument("--runs", type=int, default=300000, help="Synthetic runs to store.")
+    parser.add_argument("--days", type=int, default=365, help="Time span the runs are spread over.")
+    parser.add_argument("--history", type=str, default=None, help="Store file (default: a temporary file).")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        path = args.history or os.path.join(work_dir, "runs.sqlite")
+        with RunHistory(path) as history:
+            if history.run_count() < args.runs:
+                runs = list(synthetic_runs(args.runs - history.run_count(), args.days))
+                _timed(f"insert {len(runs)} runs", lambda: history.record_many(runs))
+            print(f"store size {os.path.getsize(path) / 1e6:.1f} MB, {history.run_count()} runs", file=sys.stderr)
+            _timed("throughput per day", lambda: history.throughput_over_time("day"))
+            _timed("throughput per week, one model", lambda: history.throughput_over_time("week", MODELS[0]))
+            _timed("throughput per day, last 30 days", lambda: history.throughput_over_time(
+                "day", since=time.time() - 30 * 86400))
+            _timed("regressions by model", lambda: history.model_regressions(window=500))
+            _timed("class drift 7 vs 30 days", lambda: history.class_drift(7, 30))
+            _timed("class drift 30 vs 180 days", lambda: history.class_drift(30, 180))
+
+
+if __name__ == "__main__":
+    main()
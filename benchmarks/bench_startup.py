@@ -0,0 +1,61 @@
+# benchmarks/bench_startup.py
+"""
+Measures CLI start-up cost: module import time and how long --help / --validate_only take.
+
+Usage:
+    python benchmarks/bench_startup.py --video_path input/timelapse_test.mp4
+    python benchmarks/bench_startup.py            # generates a small synthetic clip first
+
+Every command runs in a fresh interpreter (that is what a CI/cron trigger pays) and the median
+of --repeats runs is reported. "import ultralytics" is listed for reference: it is the cost
+the pipeline only pays once the detection stage actually loads the model.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "src")
+sys.path.insert(0, SRC_DIR)
+
+from bench_frame_extraction import make_synthetic_video  # noqa: E402
+
+
+def _median_seconds(cmd, repeats: int) -> float:
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        subprocess.run(cmd, cwd=SRC_DIR, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark pipeline CLI start-up time.")
+    parser.add_argument("--video_path", type=str, default=None, help="Video to validate (default: synthetic clip).")
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        video_path = args.video_path or make_synthetic_video(os.path.join(work_dir, "synthetic.mp4"), 60, (640, 360))
+        commands = {
+            "python (empty)": [sys.executable, "-c", "pass"],
+            "import main_pipeline": [sys.executable, "-c", "import main_pipeline"],
+            "main_pipeline --help": [sys.executable, "main_pipeline.py", "--help"],
+            "main_pipeline --validate_only": [sys.executable, "main_pipeline.py", "--video_path", video_path,
+                                              "--validate_only"],
+            "import ultralytics (reference)": [sys.executable, "-c", "import ultralytics"],
+        }
+        print(f"{'command':<34} {'median s':>9}  (of {args.repeats} runs)")
+        for name, cmd in commands.items():
+            try:
+                print(f"{name:<34} {_median_seconds(cmd, args.repeats):9.3f}")
+            except subprocess.CalledProcessError as e:
+                print(f"{name:<34} {'failed':>9}  (exit code {e.returncode})")
+
+
+if __name__ == "__main__":
+    main()
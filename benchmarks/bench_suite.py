@@ -0,0 +1,205 @@
+# benchmarks/bench_suite.py
+"""
+Reproducible offline benchmark of frame extraction + detection on generated videos.
+
+Usage:
+    python benchmarks/bench_suite.py --output bench_results.json
+    python benchmarks/bench_suite.py --preset full --save_baseline benchmarks/baseline.json
+    python benchmarks/bench_suite.py --baseline benchmarks/baseline.json     # exit code 1 on regression
+    python benchmarks/bench_suite.py --detector real --model_name yolov8n.pt --preset quick
+
+Videos are written locally with cv2.VideoWriter at several resolutions, lengths and motion
+levels ("static" footage, a "low" slow pan, "high" motion with fast moving blocks). Each case
+runs extract_frames followed by pretag_images_and_generate_coco in a fresh process (so peak RSS
+is per case), with the deterministic stub detector (configurable latency and boxes per image)
+and/or the real model. Results are JSON: frames/sec per stage, stage seconds, peak RSS and the
+per-operation latencies from instrumentation.TIMINGS. With --baseline, throughput drops or RSS
+growth beyond --tolerance are flagged as regressions.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any, List
+
+import cv2
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, os.pardir, "src"))
+
+from frame_extractor import extract_frames  # noqa: E402
+from object_detector import pretag_images_and_generate_coco, load_model  # noqa: E402
+from instrumentation import TIMINGS  # noqa: E402
+from stub_detector import StubDetector  # noqa: E402
+
+RESOLUTIONS = {"360p": (640, 360), "720p": (1280, 720), "1080p": (1920, 1080)}
+PRESETS = {
+    # (resolution, frames, motion)
+    "quick": [("360p", 150, "low"), ("720p", 150, "high")],
+    "default": [(res, 300, motion) for res in ("360p", "720p") for motion in ("static", "low", "high")],
+    "full": [(res, frames, motion) for res in RESOLUTIONS for frames in (300, 1800)
+             for motion in ("static", "low", "high")],
+}
+# metric -> True if higher is better
+COMPARED_METRICS = {"extract_fps": True, "detect_fps": True, "peak_rss_mb": False}
+
+
+def make_video(path: str, size, num_frames: int, motion: str, fps: int = 30) -> str:
+    """Writes a deterministic test clip; motion is 'static', 'low' (slow pan) or 'high' (fast pan + moving blocks)."""
+    width, height = size
+    rng = np.random.default_rng(0)
+    background = cv2.resize(rng.integers(0, 255, (height // 8, width // 8, 3), dtype=np.uint8), (width, height),
+                            interpolation=cv2.INTER_NEAREST)
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+    for i in range(num_frames):
+        if motion == "static":
+            frame = background.copy()
+        elif motion == "low":
+            frame = np.roll(background, i, axis=1)
+        else:
+            frame = np.roll(background, i * 16, axis=1)
+            for j in range(4):
+                x = (i * (20 + 7 * j)) % (width - width // 8)
+                y = (height // 5) * (j + 1) - height // 10
+                cv2.rectangle(frame, (x, y), (x + width // 8, y + height // 10), (40 * j, 255 - 40 * j, 128), -1)
+        cv2.putText(frame, str(i), (20, 50), cv2.FONT_HERSHEY_SIMPLEX, 1.5, (255, 255, 255), 3)
+        writer.write(frame)
+    writer.release()
+    return path
+
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024 # bytes on macOS, KiB on Linux
+
+
+def run_case(case: Dict[str, Any], video_path: str, work_dir: str, args: Dict[str, Any]) -> Dict[str, Any]:
+    """Runs one case (in its own process) and returns its measurements."""
+    TIMINGS.enabled = True
+    TIMINGS.reset()
+    if case["detector"] == "stub":
+        model = StubDetector(args["stub_boxes"], args["stub_batch_latency_ms"], args["stub_image_latency_ms"])
+    else:
+        model = load_model(args["model_name"])
+
+    frames_dir = os.path.join(work_dir, "frames")
+    start = time.perf_counter()
+    frame_metrics = extract_frames(video_path, frames_dir, case["frame_step"], sampling_mode="auto")
+    extract_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    detection = pretag_images_and_generate_coco(frames_dir, os.path.join(work_dir, "detections.json"),
+                                                args["model_name"], model=model, batch_size=args["batch_size"])
+    detect_s = time.perf_counter() - start
+
+    images = detection["metrics"]["images_processed"]
+    return {
+        **case,
+        "extract_s": extract_s,
+        "extract_fps": frame_metrics["total_frames_in_video"] / extract_s if extract_s > 0 else 0.0,
+        "frames_extracted": frame_metrics["frames_extracted"],
+        "sampling_mode": frame_metrics["sampling_mode"],
+        "detect_s": detect_s,
+        "detect_fps": images / detect_s if detect_s > 0 else 0.0,
+        "detections": detection["metrics"]["total_detections"],
+        "total_s": extract_s + detect_s,
+        "peak_rss_mb": _peak_rss_mb(),
+        "operation_timings": TIMINGS.summary()
+    }
+
+
+def compare_to_baseline(results: List[Dict[str, Any]], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Returns a message per metric that got worse than the baseline by more than tolerance (a fraction)."""
+    baseline_cases = {case["name"]: case for case in baseline.get("cases", [])}
+    regressions = []
+    for case in results:
+        previous = baseline_cases.get(case["name"])
+        if previous is None:
+            continue
+        for metric, higher_is_better in COMPARED_METRICS.items():
+            old, new = previous.get(metric), case.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            if (-change if higher_is_better else change) > tolerance:
+                regressions.append(f"{case['name']}: {metric} {old:.2f} -> {new:.2f} ({change:+.1%})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark suite on synthetic videos.")
+    parser.add_argument("--preset", choices=PRESETS, default="default")
+    parser.add_argument("--detector", choices=["stub", "real", "both"], default="stub")
+    parser.add_argument("--model_name", type=str, default="yolov8n.pt", help="Model for --detector real/both.")
+    parser.add_argument("--frame_step", type=int, default=10)
+    parser.add_argument("--batch_size", type=int, default=8)
+    parser.add_argument("--stub_boxes", type=int, default=5, help="Boxes per image returned by the stub detector.")
+    parser.add_argument("--stub_batch_latency_ms", type=float, default=5.0, help="Stub latency per forward pass.")
+    parser.add_argument("--stub_image_latency_ms", type=float, default=2.0, help="Stub latency per image.")
+    parser.add_argument("--output", type=str, default=None, help="Write the results JSON here (default: stdout).")
+    parser.add_argument("--baseline", type=str, default=None, help="Results JSON to compare against.")
+    parser.add_argument("--save_baseline", type=str, default=None, help="Also store the results as a baseline.")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="Allowed relative slowdown/RSS growth.")
+    args = parser.parse_args()
+
+    detectors = ["stub", "real"] if args.detector == "both" else [args.detector]
+    settings = {k: getattr(args, k) for k in ("model_name", "batch_size", "stub_boxes", "stub_batch_latency_ms",
+                                              "stub_image_latency_ms")}
+    results = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        for resolution, num_frames, motion in PRESETS[args.preset]:
+            video_path = os.path.join(work_dir, f"{resolution}_{num_frames}_{motion}.mp4")
+            make_video(video_path, RESOLUTIONS[resolution], num_frames, motion)
+            for detector in detectors:
+                case = {"name": f"{resolution}-{num_frames}f-{motion}-{detector}", "resolution": resolution,
+                        "num_frames": num_frames, "motion": motion, "detector": detector,
+                        "frame_step": args.frame_step}
+                case_dir = os.path.join(work_dir, case["name"])
+                # a fresh process per case, so ru_maxrss is the peak of this case alone
+                with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+                    result = pool.submit(run_case, case, video_path, case_dir, settings).result()
+                results.append(result)
+                print(f"{case['name']:<28} extract {result['extract_fps']:8.1f} fps  detect {result['detect_fps']:7.1f} "
+                      f"img/s  peak RSS {result['peak_rss_mb']:7.1f} MB", file=sys.stderr)
+
+    report = {
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "opencv": cv2.__version__,
+            "numpy": np.__version__
+        },
+        "settings": {**settings, "preset": args.preset, "frame_step": args.frame_step},
+        "cases": results
+    }
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare_to_baseline(results, json.load(f), args.tolerance)
+        report["regressions"] = regressions
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    else:
+        print(output)
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            f.write(output)
+
+    for regression in regressions:
+        print(f"REGRESSION {regression}", file=sys.stderr)
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
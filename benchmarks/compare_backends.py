@@ -0,0 +1,210 @@
+# benchmarks/compare_backends.py
+"""
+Accuracy vs speed of the inference backends on a fixed frame set, against the PyTorch path.
+
+Usage:
+    python benchmarks/compare_backends.py --video input.mp4 --frame_step 15 --model_name yolov8n.pt
+    python benchmarks/compare_backends.py --frames_dir output/frames --backends torch onnx-int8 --min_map50 0.9
+
+Every backend runs pretag_images_and_generate_coco over the same frames (extracted once from
+--video, or an existing --frames_dir), so the detections go through exactly the production code.
+The first backend (torch by default) is the reference: the detections of every other backend
+are scored against it as if they were ground truth (precision/recall/F1 of same-class boxes
+matched at --match_iou, mean IoU and confidence difference of the matches, and mAP@0.5). Speed
+is images/s over the whole set and the p50/p95 latency of a forward pass. Exit code 1 if a
+backend scores below --min_map50, so a quantized model is only accepted with the numbers to
+back it.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from typing import Dict, Any, List, Tuple
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "src"))
+
+from frame_extractor import extract_frames  # noqa: E402
+from object_detector import load_model, pretag_images_and_generate_coco  # noqa: E402
+from inference_backends import BACKENDS, backend_model_path  # noqa: E402
+from instrumentation import TIMINGS  # noqa: E402
+
+
+def load_detections(coco_path: str) -> Dict[str, List[Tuple[str, np.ndarray, float]]]:
+    """file_name -> [(class name, xywh bbox, score)] of a COCO file written by the pipeline."""
+    with open(coco_path) as f:
+        coco = json.load(f)
+    categories = {category["id"]: category["name"] for category in coco["categories"]}
+    file_names = {image["id"]: image["file_name"] for image in coco["images"]}
+    detections = {file_name: [] for file_name in file_names.values()}
+    for annotation in coco["annotations"]:
+        detections[file_names[annotation["image_id"]]].append(
+            (categories[annotation["category_id"]], np.array(annotation["bbox"], dtype=np.float64),
+             annotation["score"]))
+    return detections
+
+
+def _iou(box: np.ndarray, boxes: np.ndarray) -> np.ndarray:
+    """IoU of one xywh box with (N, 4) xywh boxes."""
+    x1, y1 = np.maximum(box[0], boxes[:, 0]), np.maximum(box[1], boxes[:, 1])
+    x2 = np.minimum(box[0] + box[2], boxes[:, 0] + boxes[:, 2])
+    y2 = np.minimum(box[1] + box[3], boxes[:, 1] + boxes[:, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    union = box[2] * box[3] + boxes[:, 2] * boxes[:, 3] - inter
+    return np.where(union > 0, inter / np.where(union > 0, union, 1), 0.0)
+
+
+def score_against_reference(reference: Dict[str, list], candidate: Dict[str, list], match_iou: float = 0.5) -> Dict[str, Any]:
+    """
+    Scores candidate detections with the reference detections as ground truth.
+
+    Boxes are matched greedily per image and class, highest candidate score first, to the
+    unmatched reference box with the highest IoU (at least match_iou).
+    """
+    tp, fp, fn = 0, 0, 0
+    ious, conf_deltas = [], []
+    per_class = defaultdict(lambda: {"scores": [], "hits": [], "positives": 0}) # for AP
+    for file_name in reference.keys() | candidate.keys():
+        ref_by_class, cand_by_class = defaultdict(list), defaultdict(list)
+        for cls, bbox, score in reference.get(file_name, []):
+            ref_by_class[cls].append((bbox, score))
+        for cls, bbox, score in candidate.get(file_name, []):
+            cand_by_class[cls].append((bbox, score))
+        for cls in ref_by_class.keys() | cand_by_class.keys():
+            refs, cands = ref_by_class.get(cls, []), sorted(cand_by_class.get(cls, []), key=lambda c: -c[1])
+            per_class[cls]["positives"] += len(refs)
+            ref_boxes = np.array([bbox for bbox, _ in refs]).reshape(-1, 4)
+            matched = np.zeros(len(refs), dtype=bool)
+            for bbox, score in cands:
+                overlaps = _iou(bbox, ref_boxes) if len(refs) else np.zeros(0)
+                overlaps[matched] = -1
+                best = int(overlaps.argmax()) if len(refs) else -1
+                hit = best >= 0 and overlaps[best] >= match_iou
+                per_class[cls]["scores"].append(score)
+                per_class[cls]["hits"].append(hit)
+                if hit:
+                    matched[best] = True
+                    tp += 1
+                    ious.append(overlaps[best])
+                    conf_deltas.append(abs(score - refs[best][1]))
+                else:
+                    fp += 1
+            fn += int((~matched).sum())
+
+    aps = []
+    for stats in per_class.values():
+        if not stats["positives"]:
+            continue
+        order = np.argsort(-np.array(stats["scores"]), kind='stable')
+        hits = np.array(stats["hits"], dtype=np.float64)[order]
+        recall = np.cumsum(hits) / stats["positives"]
+        precision = np.cumsum(hits) / np.arange(1, len(hits) + 1)
+        # COCO-style 101-point interpolated AP
+        envelope = np.maximum.accumulate(precision[::-1])[::-1] if len(precision) else precision
+        points = np.linspace(0, 1, 101)
+        idx = np.searchsorted(recall, points, side='left')
+        aps.append(float(np.mean([envelope[i] if i < len(envelope) else 0.0 for i in idx])))
+
+    precision = tp / (tp + fp) if tp + fp else 1.0
+    recall = tp / (tp + fn) if tp + fn else 1.0
+    return {
+        "matched": tp,
+        "extra": fp,
+        "missed": fn,
+        "precision": precision,
+        "recall": recall,
+        "f1": 2 * precision * recall / (precision + recall) if precision + recall else 0.0,
+        "mean_iou": float(np.mean(ious)) if ious else None,
+        "mean_conf_delta": float(np.mean(conf_deltas)) if conf_deltas else None,
+        "map50": float(np.mean(aps)) if aps else 1.0
+    }
+
+
+def run_backend(backend: str, model_name: str, frames_dir: str, output_path: str, batch_size: int) -> Dict[str, Any]:
+    model_path = backend_model_path(model_name, backend)
+    model = load_model(model_name, backend)
+    first_frame = os.path.join(frames_dir, sorted(os.listdir(frames_dir))[0])
+    model(first_frame, verbose=False) # warm-up (lazy init, allocator, thread pools)
+
+    TIMINGS.enabled = True
+    TIMINGS.reset()
+    start = time.perf_counter()
+    result = pretag_images_and_generate_coco(frames_dir, output_path, model_name, model=model, batch_size=batch_size)
+    wall_s = time.perf_counter() - start
+    inference = TIMINGS.summary().get("inference", {})
+    images = result["metrics"]["images_processed"]
+    return {
+        "backend": backend,
+        "model_path": model_path,
+        "model_mb": os.path.getsize(model_path) / 1e6 if os.path.isfile(model_path) else None,
+        "images": images,
+        "detections": result["metrics"]["total_detections"],
+        "wall_s": wall_s,
+        "images_per_s": images / wall_s if wall_s > 0 else 0.0,
+        "inference_p50_ms": inference.get("p50_ms"),
+        "inference_p95_ms": inference.get("p95_ms")
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare inference backends against the PyTorch path.")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--video", type=str, help="Video the fixed frame set is extracted from.")
+    source.add_argument("--frames_dir", type=str, help="Directory with an already extracted frame set.")
+    parser.add_argument("--frame_step", type=int, default=15, help="--video: keep every Nth frame.")
+    parser.add_argument("--model_name", type=str, default="yolov8n.pt")
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=list(BACKENDS),
+                        help="Backends to run; the first one is the reference.")
+    parser.add_argument("--batch_size", type=int, default=1)
+    parser.add_argument("--match_iou", type=float, default=0.5, help="IoU for a box to match the reference box.")
+    parser.add_argument("--min_map50", type=float, default=None,
+                        help="Exit with 1 if a backend's mAP@0.5 against the reference is lower.")
+    parser.add_argument("--output", type=str, default=None, help="Write the results JSON here (default: stdout).")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        frames_dir = args.frames_dir
+        if args.video:
+            frames_dir = os.path.join(work_dir, "frames")
+            extract_frames(args.video, frames_dir, args.frame_step)
+
+        results, detections = [], {}
+        for backend in args.backends:
+            coco_path = os.path.join(work_dir, f"detections_{backend}.json")
+            results.append(run_backend(backend, args.model_name, frames_dir, coco_path, args.batch_size))
+            detections[backend] = load_detections(coco_path)
+
+    reference = args.backends[0]
+    failed = []
+    for row in results:
+        row.update(score_against_reference(detections[reference], detections[row["backend"]], args.match_iou))
+        row["speedup"] = row["images_per_s"] / results[0]["images_per_s"] if results[0]["images_per_s"] else None
+        if args.min_map50 is not None and row["map50"] < args.min_map50:
+            failed.append(row["backend"])
+
+    print(f"| Backend | Images/s | Speedup | p50 (ms) | p95 (ms) | Model (MB) | mAP@0.5 vs {reference} | F1 | Mean IoU |",
+          file=sys.stderr)
+    print("|---|---|---|---|---|---|---|---|---|", file=sys.stderr)
+    for row in results:
+        print(f"| {row['backend']} | {row['images_per_s']:.2f} | {row['speedup']:.2f}x | {row['inference_p50_ms'] or 0:.1f} "
+              f"| {row['inference_p95_ms'] or 0:.1f} | {row['model_mb'] or 0:.1f} | {row['map50']:.3f} | {row['f1']:.3f} "
+              f"| {row['mean_iou'] if row['mean_iou'] is not None else float('nan'):.3f} |", file=sys.stderr)
+
+    output = json.dumps({"model_name": args.model_name, "reference": reference, "match_iou": args.match_iou,
+                         "backends": results}, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    else:
+        print(output)
+    for backend in failed:
+        print(f"REJECTED {backend}: mAP@0.5 vs {reference} below {args.min_map50}", file=sys.stderr)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+# benchmarks/load_test_async.py
+"""
+Load test of the async pipeline API: aggregate throughput with N concurrent pre-tagging jobs.
+
+Usage:
+    python benchmarks/load_test_async.py --jobs 1 2 4 8
+    python benchmarks/load_test_async.py --jobs 1 4 16 --inference_concurrency 2 --detector real --model_name yolov8n.pt
+
+For every N in --jobs, N synthetic videos (bench_suite.make_video) are pre-tagged concurrently
+with async_pipeline.run_many_async on one event loop, all sharing one InferencePool of
+--inference_concurrency models. Reported per N: aggregate images/s and frames decoded/s, p50/p95
+job latency, mean time a job waited for a free model, and the worst event-loop lag seen by a
+1 ms ticker running next to the jobs (how responsive the loop stayed). The default detector is
+the stub from stub_detector.py, whose latency sleeps like a GIL-releasing forward pass.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from typing import Dict, Any, List
+
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, os.pardir, "src"))
+
+from async_pipeline import InferencePool, run_many_async  # noqa: E402
+from object_detector import load_model  # noqa: E402
+from bench_suite import RESOLUTIONS, make_video  # noqa: E402
+from stub_detector import StubDetector  # noqa: E402
+
+
+async def _loop_lag(stop: asyncio.Event, lags: List[float], interval_s: float = 0.001):
+    """Records how late a periodic 1 ms sleep wakes up: time the loop was busy with something else."""
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval_s)
+        lags.append(time.perf_counter() - start - interval_s)
+
+
+async def run_load(video_paths: List[str], output_root: str, pool: InferencePool, **pipeline_kwargs) -> Dict[str, Any]:
+    stop, lags = asyncio.Event(), []
+    ticker = asyncio.ensure_future(_loop_lag(stop, lags))
+    start = time.perf_counter()
+    results = await run_many_async(video_paths, output_root, pool, report=False, **pipeline_kwargs)
+    wall_s = time.perf_counter() - start
+    stop.set()
+    await ticker
+
+    ok = [result for result in results if result["status"] == "ok"]
+    images = sum(r["metrics"]["object_detection_metrics"]["images_processed"] for r in ok)
+    frames = sum(r["metrics"]["frame_extraction_metrics"].get("total_frames_in_video", 0) for r in ok)
+    latencies = [r["wall_s"] for r in ok]
+    return {
+        "jobs": len(video_paths),
+        "jobs_failed": len(results) - len(ok),
+        "wall_s": wall_s,
+        "images_per_s": images / wall_s if wall_s > 0 else 0.0,
+        "frames_decoded_per_s": frames / wall_s if wall_s > 0 else 0.0,
+        "job_latency_p50_s": float(np.percentile(latencies, 50)) if latencies else None,
+        "job_latency_p95_s": float(np.percentile(latencies, 95)) if latencies else None,
+        "inference_wait_mean_s": float(np.mean([r["metrics"]["pipeline_stage_times"]["inference_wait_s"] for r in ok]))
+                                 if ok else None,
+        "max_inference_in_flight": pool.max_in_flight,
+        "loop_lag_p99_ms": float(np.percentile(lags, 99)) * 1000 if lags else None,
+        "loop_lag_max_ms": max(lags) * 1000 if lags else None
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Aggregate throughput of N concurrent async pre-tagging jobs.")
+    parser.add_argument("--jobs", type=int, nargs="+", default=[1, 2, 4, 8], help="Concurrent job counts to test.")
+    parser.add_argument("--inference_concurrency", type=int, default=1, help="Models in the shared InferencePool.")
+    parser.add_argument("--resolution", choices=RESOLUTIONS, default="360p")
+    parser.add_argument("--frames", type=int, default=300, help="Frames per synthetic video.")
+    parser.add_argument("--frame_step", type=int, default=5)
+    parser.add_argument("--batch_size", type=int, default=8)
+    parser.add_argument("--detector", choices=["stub", "real"], default="stub")
+    parser.add_argument("--model_name", type=str, default="yolov8n.pt", help="Model for --detector real.")
+    parser.add_argument("--stub_batch_latency_ms", type=float, default=5.0, help="Stub latency per forward pass.")
+    parser.add_argument("--stub_image_latency_ms", type=float, default=2.0, help="Stub latency per image.")
+    parser.add_argument("--output", type=str, default=None, help="Write the results JSON here (default: stdout).")
+    args = parser.parse_args()
+
+    if args.detector == "stub":
+        models = [StubDetector(batch_latency_ms=args.stub_batch_latency_ms, image_latency_ms=args.stub_image_latency_ms)
+                  for _ in range(args.inference_concurrency)]
+    else:
+        models = [load_model(args.model_name) for _ in range(args.inference_concurrency)]
+
+    rows = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        videos = [make_video(os.path.join(work_dir, f"video_{i}.mp4"), RESOLUTIONS[args.resolution], args.frames,
+                             "low") for i in range(max(args.jobs))]
+        for jobs in args.jobs:
+            pool = InferencePool(models) # fresh counters per run, same models
+            row = asyncio.run(run_load(videos[:jobs], os.path.join(work_dir, f"jobs_{jobs}"), pool,
+                                       frame_step=args.frame_step, batch_size=args.batch_size, save_frames=False))
+            pool.close()
+            rows.append(row)
+            print(f"{jobs:>4} jobs  {row['images_per_s']:8.1f} img/s  {row['frames_decoded_per_s']:8.1f} decoded fps  "
+                  f"p50 {row['job_latency_p50_s']:6.2f} s  p95 {row['job_latency_p95_s']:6.2f} s  "
+                  f"wait {row['inference_wait_mean_s']:6.2f} s  loop lag max {row['loop_lag_max_ms']:6.1f} ms",
+                  file=sys.stderr)
+
+    output = json.dumps({"settings": vars(args), "runs": rows}, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+# benchmarks/stub_detector.py
+"""
+Deterministic stand-in for an ultralytics YOLO model, so the pipeline can be benchmarked offline
+without model weights and with a controlled inference cost. The unit tests use it too (see
+unit_tests/conftest.py), so it only depends on OpenCV and NumPy.
+"""
+import time
+import zlib
+from typing import Any, Dict, List
+
+import cv2
+import numpy as np
+
+
+class StubBoxes:
+    def __init__(self, data: np.ndarray):
+        self.data = data
+
+
+class StubResults:
+    """The part of an ultralytics Results the pipeline reads: orig_shape, boxes.data and speed."""
+
+    def __init__(self, orig_shape, data: np.ndarray, speed: Dict[str, float]):
+        self.orig_shape = orig_shape
+        self.boxes = StubBoxes(data)
+        self.speed = speed
+
+
+class StubDetector:
+    """
+    Callable like YOLO (a path, a BGR array or a list of either) returning boxes derived from the pixels.
+
+    Each call sleeps batch_latency_ms plus image_latency_ms per image to mimic a forward pass,
+    and every image gets boxes_per_image boxes whose positions, scores and classes are seeded
+    from the image content: the same frame always gives the same detections. calls counts the
+    forward passes.
+    """
+
+    def __init__(self, boxes_per_image: int = 5, batch_latency_ms: float = 0.0, image_latency_ms: float = 0.0,
+                 num_classes: int = 80):
+        self.boxes_per_image = boxes_per_image
+        self.batch_latency_ms = batch_latency_ms
+        self.image_latency_ms = image_latency_ms
+        self.names = {i: f"class_{i}" for i in range(num_classes)}
+        self.overrides: Dict[str, Any] = {"stub": [boxes_per_image, batch_latency_ms, image_latency_ms, num_classes]}
+        self.calls = 0
+
+    def __call__(self, source, verbose: bool = False, **kwargs) -> List[StubResults]:
+        self.calls += 1
+        sources = source if isinstance(source, list) else [source]
+        images = [cv2.imread(s) if isinstance(s, str) else s for s in sources]
+        latency_s = (self.batch_latency_ms + self.image_latency_ms * len(images)) / 1000
+        if latency_s > 0:
+            time.sleep(latency_s)
+        per_image_ms = latency_s * 1000 / len(images)
+        return [self._predict(image, per_image_ms) for image in images]
+
+    def _predict(self, image: np.ndarray, inference_ms: float = 0.0) -> StubResults:
+        if image is None:
+            raise ValueError("could not read image")
+        height, width = image.shape[:2]
+        rng = np.random.default_rng(zlib.crc32(np.ascontiguousarray(image[::16, ::16]).data))
+        n = self.boxes_per_image
+        xy = rng.uniform(0, 1, size=(n, 2)) * [width * 0.8, height * 0.8]
+        wh = rng.uniform(0.05, 0.2, size=(n, 2)) * [width, height]
+        data = np.column_stack([xy, xy + wh, rng.uniform(0.25, 1.0, n),
+                                rng.integers(0, len(self.names), n)]).astype(np.float32)
+        return StubResults((height, width), data, {"preprocess": 0.0, "inference": inference_ms, "postprocess": 0.0})
@@ -0,0 +1,282 @@
+# src/async_pipeline.py
+import asyncio
+import contextvars
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Dict, Any, Callable, List, Optional
+
+from object_detector import load_model
+from pipeline_executor import run_streamed
+from pipeline_config import PipelineConfig
+from main_pipeline import probe_video_input, _run_params
+from batch_pipeline import unique_videos, video_output_dirs
+from detection_cache import DetectionCache
+from run_manifest import RunManifest, DetectionJournal
+from instrumentation import OperationTimings, use_timings
+from metrics_exporter import live_run
+from reporter import generate_markdown_report
+from config import (
+    DEFAULT_FRAME_OUTPUT_DIR,
+    DEFAULT_COCO_OUTPUT_PATH,
+    DEFAULT_REPORT_OUTPUT_PATH,
+    DEFAULT_MANIFEST_PATH,
+    DEFAULT_JOURNAL_PATH,
+    DEFAULT_BATCH_SIZE,
+    DEFAULT_BACKEND,
+    DEFAULT_INFERENCE_CONCURRENCY
+)
+
+# Set up basic logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+_default_executor: Optional[ThreadPoolExecutor] = None # decode/write threads of jobs started without an executor
+
+
+def _job_executor() -> ThreadPoolExecutor:
+    global _default_executor
+    if _default_executor is None:
+        _default_executor = ThreadPoolExecutor(thread_name_prefix="pretag-job")
+    return _default_executor
+
+
+class InferencePool:
+    """
+    The models every async job shares, and with them the global limit on concurrent inference.
+
+    Holds one loaded model per allowed concurrent forward pass (ultralytics models aren't safe to
+    share between threads) and runs the passes on its own threads. A job waits for a free model
+    without blocking the event loop; a model only goes back to the pool once its forward pass
+    has really finished, even if the job waiting for it was cancelled meanwhile.
+    """
+
+    def __init__(self, models: List[Any]):
+        if not models:
+            raise ValueError("InferencePool needs at least one model")
+        self.models = list(models)
+        self.names = self.models[0].names
+        self.executor = ThreadPoolExecutor(max_workers=len(self.models), thread_name_prefix="inference")
+        self._free: Optional[asyncio.Queue] = None # created on the running loop
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    @classmethod
+    def load(cls, model_name: str, size: int = DEFAULT_INFERENCE_CONCURRENCY, backend: str = DEFAULT_BACKEND,
+             threads: Optional[int] = None) -> "InferencePool":
+        """Loads size copies of the model (see object_detector.load_model); blocking, call it before serving."""
+        return cls([load_model(model_name, backend, threads=threads) for _ in range(max(1, size))])
+
+    @property
+    def size(self) -> int:
+        return len(self.models)
+
+    async def run(self, function: Callable[..., Any], *args) -> Any:
+        """Waits for a free model and runs function(model, *args) on an inference thread."""
+        if self._free is None:
+            self._free = asyncio.Queue()
+            for model in self.models:
+                self._free.put_nowait(model)
+        free = self._free
+        model = await free.get()
+        loop = asyncio.get_running_loop()
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+        def release(_):
+            self.in_flight -= 1
+            free.put_nowait(model)
+
+        future = self.executor.submit(function, model, *args)
+        future.add_done_callback(lambda f: loop.call_soon_threadsafe(release, f))
+        return await asyncio.wrap_future(future)
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+
+
+class _PooledModel:
+    """
+    Called like a model by a job's streamed stage (pipeline_executor.run_streamed) on its executor
+    thread, and runs every forward pass on a free model of the InferencePool instead.
+
+    Adds the time spent waiting for a model and inside forward passes to stage_times. Everything
+    else (names, ckpt_path, ...) comes from the pool's first model, e.g. for the detection cache's
+    model fingerprint.
+    """
+
+    def __init__(self, pool: InferencePool, loop: asyncio.AbstractEventLoop, stage_times: Dict[str, float]):
+        self.pool = pool
+        self.loop = loop
+        self.stage_times = stage_times
+
+    def __getattr__(self, name):
+        return getattr(self.pool.models[0], name)
+
+    def __call__(self, source, **kwargs) -> List[Any]:
+        context = contextvars.copy_context() # the forward pass records into the job's timings
+        future = asyncio.run_coroutine_threadsafe(
+            self.pool.run(self._forward, context, source, kwargs, time.perf_counter()), self.loop)
+        return future.result()
+
+    def _forward(self, model: Any, context: contextvars.Context, source, kwargs: Dict[str, Any],
+                 queued_at: float) -> List[Any]:
+        inference_start = time.perf_counter()
+        self.stage_times["inference_wait_s"] += inference_start - queued_at
+        try:
+            return context.run(model, source, **kwargs)
+        finally:
+            self.stage_times["inference_s"] += time.perf_counter() - inference_start
+
+
+async def run_pipeline_async(video_path: str, output_base_dir: str, inference_pool: InferencePool,
+                             config: Optional[PipelineConfig] = None, report: bool = True,
+                             executor: Optional[Executor] = None, **settings) -> Dict[str, Any]:
+    """
+    Pre-tags one video without blocking the event loop, for services running many jobs at once.
+
+    Runs the streamed stage of run_pipeline(stream_frames=True) (pipeline_executor.run_streamed,
+    with the frame store, detection cache and resume journal of config) on `executor`. Its forward
+    passes go through inference_pool, which bounds how many run at the same time across all jobs
+    sharing it. Every job records its operation timings in its own OperationTimings and labels
+    its live metrics with its own run. Cancelling the task stops the job after the batch in
+    progress: the decoder is closed and the partial COCO file removed (saved frames and the
+    journal stay), then CancelledError is raised as usual.
+
+    Args:
+        video_path (str): Path to the input video file.
+        output_base_dir (str): Base directory for this job's outputs (frames/, detections.json, pipeline_report.md).
+        inference_pool (InferencePool): Shared models and inference concurrency limit; config's
+                                        model_name and backend only key the detection cache.
+        config (Optional[PipelineConfig]): Settings of the job, PipelineConfig() if None. The
+                                           overlapped, decode_workers and resource settings don't apply.
+        report (bool): Also write pipeline_report.md.
+        executor (Optional[Executor]): Runs the job's stage, a thread pool shared by such jobs if None.
+        **settings: Settings changed from config, e.g. frame_step=10.
+
+    Returns:
+        Dict[str, Any]: "video_path", "output_dir", "status" ("ok" or "failed"), "error" (None or the
+                        message), "wall_s", "images_per_s", "outputs" (paths of what was written) and
+                        "metrics" (frame extraction, object detection, stage times; None on failure).
+                        Errors are reported here instead of raised.
+    """
+    config = (config or PipelineConfig()).replace(**settings)
+    config = config.replace(batch_size=config.batch_size or DEFAULT_BATCH_SIZE)
+    executor = executor or _job_executor()
+    start_time = time.perf_counter()
+    frames_output_dir = os.path.join(output_base_dir, DEFAULT_FRAME_OUTPUT_DIR)
+    outputs = {"coco": os.path.join(output_base_dir, DEFAULT_COCO_OUTPUT_PATH),
+               "frames_dir": frames_output_dir if config.save_frames else None,
+               "report": os.path.join(output_base_dir, DEFAULT_REPORT_OUTPUT_PATH) if report else None}
+    stage_times = {"inference_s": 0.0, "inference_wait_s": 0.0}
+    timings = OperationTimings(enabled=config.instrumentation) # this job's samples only
+    model = _PooledModel(inference_pool, asyncio.get_running_loop(), stage_times)
+    stop = threading.Event()
+
+    def run_job() -> Dict[str, Any]:
+        probe = probe_video_input(video_path)
+        if probe is None:
+            raise ValueError(f"input video failed validation: {video_path}")
+        cache, journal = None, None
+        try:
+            os.makedirs(output_base_dir, exist_ok=True)
+            if config.detection_cache:
+                cache = DetectionCache(config.detection_cache, config.cache_max_mb)
+            manifest = RunManifest.open(os.path.join(output_base_dir, DEFAULT_MANIFEST_PATH),
+                                        _run_params(video_path, config), config.resume)
+            journal = DetectionJournal(os.path.join(output_base_dir, DEFAULT_JOURNAL_PATH), manifest)
+            original_size = (probe.width, probe.height) \
+                if config.inference_size and probe.width > 0 and probe.height > 0 else None
+            result = run_streamed(video_path, outputs["frames_dir"], outputs["coco"], config, model=model,
+                                  cache=cache, journal=journal, probe=probe, original_size=original_size, stop=stop)
+            manifest.update("frame_extraction", status="complete", metrics=result["frame_extraction_metrics"])
+            metrics = {
+                "video_metrics": probe.as_dict(),
+                "frame_extraction_metrics": result["frame_extraction_metrics"],
+                "object_detection_metrics": result["detection_result"]["metrics"],
+                "pipeline_stage_times": {**result["pipeline_stage_times"], **stage_times}
+            }
+            if config.instrumentation:
+                metrics["operation_timings"] = timings.summary()
+            if report:
+                generate_markdown_report(metrics, outputs["report"])
+            return metrics
+        finally:
+            probe.release()
+            if journal is not None:
+                journal.close()
+            if cache is not None:
+                cache.close()
+
+    def run_in_job_context() -> Dict[str, Any]:
+        with live_run(), use_timings(timings):
+            return run_job()
+
+    future = executor.submit(contextvars.copy_context().run, run_in_job_context)
+    job = asyncio.wrap_future(future)
+    try:
+        metrics = await asyncio.shield(job)
+    except asyncio.CancelledError:
+        stop.set()
+        future.cancel() # if it hasn't started yet
+        # the stage in progress can't be interrupted; it stops and cleans up before the next frame
+        await asyncio.wait([job])
+        logging.info(f"Pre-tagging of {video_path} cancelled.")
+        raise
+    except Exception as e:
+        logging.error(f"Pre-tagging of {video_path} failed: {e}")
+        return {"video_path": video_path, "output_dir": output_base_dir, "status": "failed", "error": str(e),
+                "wall_s": time.perf_counter() - start_time, "images_per_s": 0.0,
+                "outputs": {**outputs, "coco": None, "report": None}, "metrics": None}
+
+    wall_s = time.perf_counter() - start_time
+    images = metrics["object_detection_metrics"].get("images_processed", 0)
+    return {"video_path": video_path, "output_dir": output_base_dir, "status": "ok", "error": None,
+            "wall_s": wall_s, "images_per_s": images / wall_s if wall_s > 0 else 0.0,
+            "outputs": outputs, "metrics": metrics}
+
+
+async def run_many_async(video_paths: List[str], output_root: str, inference_pool: InferencePool,
+                         max_jobs: Optional[int] = None, **pipeline_kwargs) -> List[Dict[str, Any]]:
+    """
+    Runs run_pipeline_async for many videos concurrently, each in <output_root>/<video name>.
+
+    Args:
+        video_paths (List[str]): Videos to pre-tag, repeats are pre-tagged once.
+        output_root (str): Base directory of the per-video outputs (see batch_pipeline.video_output_dirs).
+        inference_pool (InferencePool): Shared by all jobs, bounds concurrent inference.
+        max_jobs (Optional[int]): Videos decoded at the same time, all of them if None.
+        **pipeline_kwargs: Passed on to run_pipeline_async (config, settings, report, executor).
+
+    Returns:
+        List[Dict[str, Any]]: One result per distinct video, in input order; a job cancelled on its own (the
+                              others keep running) gets status "cancelled".
+    """
+    video_paths = unique_videos(video_paths) # two jobs of one video would write into the same directory
+    output_dirs = video_output_dirs(video_paths, output_root)
+    job_slots = asyncio.Semaphore(max_jobs) if max_jobs else None
+
+    async def job(video_path: str) -> Dict[str, Any]:
+        if job_slots is None:
+            return await run_pipeline_async(video_path, output_dirs[video_path], inference_pool, **pipeline_kwargs)
+        async with job_slots:
+            return await run_pipeline_async(video_path, output_dirs[video_path], inference_pool, **pipeline_kwargs)
+
+    tasks = [asyncio.ensure_future(job(video_path)) for video_path in video_paths]
+    try:
+        if tasks:
+            await asyncio.wait(tasks)
+    except asyncio.CancelledError:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+    results = []
+    for video_path, task in zip(video_paths, tasks):
+        if task.cancelled():
+            results.append({"video_path": video_path, "output_dir": output_dirs[video_path], "status": "cancelled",
+                            "error": None, "wall_s": 0.0, "images_per_s": 0.0, "outputs": None, "metrics": None})
+        else:
+            results.append(task.result())
+    return results
@@ -0,0 +1,247 @@
+# src/batch_pipeline.py
+import argparse
+import glob
+import json
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, Any, List, Optional
+
+from main_pipeline import add_pipeline_arguments, pipeline_config_from_args, run_pipeline
+from pipeline_config import PipelineConfig
+from reporter import generate_batch_report
+from resource_governor import parse_cpu_set, plan_resources
+from config import (
+    DEFAULT_BATCH_WORKERS,
+    DEFAULT_BATCH_REPORT_PATH,
+    DEFAULT_BATCH_SUMMARY_PATH,
+    VIDEO_EXTENSIONS
+)
+
+# Set up basic logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# The warm model of this worker process, loaded once by _init_worker
+_worker_model = None
+
+
+def discover_videos(source: str) -> List[str]:
+    """
+    Resolves the batch input to a sorted list of video paths.
+
+    Args:
+        source (str): One of
+            - a directory: every file in it with an extension from VIDEO_EXTENSIONS,
+            - a glob pattern (e.g. 'input/*/cam_*.mp4'),
+            - a manifest file (.txt/.lst): one video path per line, relative paths are resolved
+              against the manifest's folder, blank lines and lines starting with '#' are ignored.
+
+    Returns:
+        List[str]: Video paths, in a stable order, each once (see unique_videos).
+    """
+    if os.path.isdir(source):
+        return sorted(os.path.join(source, f) for f in os.listdir(source) if f.lower().endswith(VIDEO_EXTENSIONS))
+
+    if os.path.isfile(source) and not source.lower().endswith(VIDEO_EXTENSIONS):
+        manifest_dir = os.path.dirname(os.path.abspath(source))
+        with open(source) as f:
+            lines = [line.strip() for line in f]
+        return unique_videos([line if os.path.isabs(line) else os.path.join(manifest_dir, line)
+                              for line in lines if line and not line.startswith('#')])
+
+    return sorted(glob.glob(source, recursive=True))
+
+
+def unique_videos(video_paths: List[str]) -> List[str]:
+    """Drops repeated video paths, keeping the first of each in order: a video listed twice is processed once."""
+    unique = list(dict.fromkeys(video_paths))
+    if len(unique) < len(video_paths):
+        logging.warning(f"Skipping {len(video_paths) - len(unique)} video(s) listed more than once.")
+    return unique
+
+
+def video_output_dirs(video_paths: List[str], output_root: str) -> Dict[str, str]:
+    """
+    Maps each video to <output_root>/<video name>, adding a suffix when two different videos share a name.
+
+    A repeated path keeps the directory of its first occurrence, so it never takes a suffix of its own.
+    """
+    output_dirs, used = {}, set()
+    for video_path in video_paths:
+        if video_path in output_dirs:
+            continue
+        stem = os.path.splitext(os.path.basename(video_path))[0]
+        name, suffix = stem, 2
+        while name in used:
+            name = f"{stem}_{suffix}"
+            suffix += 1
+        used.add(name)
+        output_dirs[video_path] = os.path.join(output_root, name)
+    return output_dirs
+
+
+def _init_worker(model_name: str, backend: str, workers: int, worker_counter, cpus: Optional[List[int]], pin: bool):
+    """
+    Process pool initializer: loads the model once per worker so every video it gets reuses it.
+
+    N workers each defaulting to every core would oversubscribe the CPU, so every worker takes its
+    own slice of cpus (numbered by worker_counter) and sizes its threads to it, pinned to it if pin.
+    """
+    global _worker_model
+    from object_detector import load_model
+    from resource_governor import plan_resources, apply_resource_plan
+
+    with worker_counter.get_lock():
+        index = worker_counter.value
+        worker_counter.value += 1
+    plan = plan_resources(cpus, processes=workers, process_index=index, pin=pin)
+    apply_resource_plan(plan, backend)
+    _worker_model = load_model(model_name, backend, threads=plan.torch_threads)
+
+
+def _process_video(video_path: str, output_dir: str, config: PipelineConfig) -> Dict[str, Any]:
+    """Runs the single-video pipeline in a worker with its warm model and returns a summary row."""
+    os.makedirs(output_dir, exist_ok=True)
+    start_time = time.time()
+    try:
+        metrics = run_pipeline(video_path, output_dir, config, model=_worker_model)
+        error = None if metrics is not None else "pipeline aborted, see the worker log"
+    except Exception as e:
+        metrics, error = None, str(e)
+    wall_s = time.time() - start_time
+
+    images = (metrics or {}).get("object_detection_metrics", {}).get("images_processed", 0)
+    return {
+        "video_path": video_path,
+        "output_dir": output_dir,
+        "status": "ok" if error is None else "failed",
+        "error": error,
+        "wall_s": wall_s,
+        "images_per_s": images / wall_s if wall_s > 0 else 0.0,
+        "pid": os.getpid(),
+        "metrics": metrics
+    }
+
+
+def run_batch(video_paths: List[str], output_root: str, workers: int = DEFAULT_BATCH_WORKERS,
+              config: Optional[PipelineConfig] = None, **settings) -> Dict[str, Any]:
+    """
+    Pre-tags many videos with a pool of worker processes that each keep their model loaded.
+
+    Every video gets today's single-video layout under <output_root>/<video name>/ (frames/,
+    detections.json, pipeline_report.md, pipeline_metrics_log.csv). The run also writes an
+    aggregated batch_report.md and batch_summary.json to output_root.
+
+    Args:
+        video_paths (List[str]): Videos to process (see discover_videos), repeats are processed once.
+        output_root (str): Base directory for all per-video outputs and the batch report.
+        workers (int): Number of worker processes.
+        config (Optional[PipelineConfig]): Settings of every video's run, the defaults if None.
+        **settings: Settings changed from config (frame_step, model_name, ...).
+
+    Returns:
+        Dict[str, Any]: The batch summary ("videos": per-video rows, "totals": aggregated throughput).
+    """
+    os.makedirs(output_root, exist_ok=True)
+    config = (config or PipelineConfig()).replace(**settings)
+    model_name = config.model_name
+    video_paths = unique_videos(video_paths) # two runs of one video would write into the same directory
+    workers = max(1, min(workers, len(video_paths)))
+    # With the resource governor on, workers are pinned to their slice of the CPUs and plan their
+    # runs within it; the CPU list itself is only split here, not handed to every run
+    cpus = parse_cpu_set(config.cpu_set) if config.cpu_set else None
+    pin = cpus is not None or bool(config.resources)
+    if config.cpu_set:
+        config = config.replace(cpu_set=None, resources=config.resources or "auto")
+    torch_threads = plan_resources(cpus, processes=workers).torch_threads
+    output_dirs = video_output_dirs(video_paths, output_root)
+
+    logging.info(f"Processing {len(video_paths)} videos with {workers} worker(s), {torch_threads} torch thread(s) each"
+                 f"{', pinned to their CPUs' if pin else ''}.")
+    start_time = time.time()
+    rows = []
+    if video_paths:
+        # spawn: forking a process that already has torch/OpenMP thread pools is not safe
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_worker,
+                                 initargs=(model_name, config.backend, workers,
+                                           context.Value('i', 0), cpus, pin)) as pool:
+            futures = {pool.submit(_process_video, video_path, output_dirs[video_path], config): video_path
+                       for video_path in video_paths}
+            for future in as_completed(futures):
+                try:
+                    row = future.result()
+                except Exception as e: # the worker process itself died
+                    row = {"video_path": futures[future], "output_dir": output_dirs[futures[future]],
+                           "status": "failed", "error": str(e), "wall_s": 0.0, "images_per_s": 0.0,
+                           "pid": None, "metrics": None}
+                logging.info(f"[{len(rows) + 1}/{len(video_paths)}] {row['video_path']}: {row['status']} "
+                             f"in {row['wall_s']:.2f} seconds")
+                rows.append(row)
+    wall_s = time.time() - start_time
+
+    order = {video_path: i for i, video_path in enumerate(video_paths)}
+    rows.sort(key=lambda row: order[row["video_path"]])
+    total_images = sum((row["metrics"] or {}).get("object_detection_metrics", {}).get("images_processed", 0)
+                       for row in rows)
+    total_frames = sum((row["metrics"] or {}).get("frame_extraction_metrics", {}).get("total_frames_in_video", 0)
+                       for row in rows)
+    succeeded = sum(row["status"] == "ok" for row in rows)
+    summary = {
+        "videos": rows,
+        "totals": {
+            "videos": len(rows),
+            "videos_succeeded": succeeded,
+            "videos_failed": len(rows) - succeeded,
+            "workers": workers,
+            "model_name": model_name,
+            "wall_s": wall_s,
+            "total_frames_in_videos": total_frames,
+            "images_processed": total_images,
+            "images_per_s": total_images / wall_s if wall_s > 0 else 0.0,
+            "videos_per_hour": len(rows) / wall_s * 3600 if wall_s > 0 else 0.0
+        }
+    }
+
+    with open(os.path.join(output_root, DEFAULT_BATCH_SUMMARY_PATH), 'w') as f:
+        json.dump(summary, f, indent=2)
+    generate_batch_report(summary, os.path.join(output_root, DEFAULT_BATCH_REPORT_PATH))
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Run the MLOps video pre-tagging pipeline over many videos with a pool of warm workers."
+    )
+    parser.add_argument(
+        "--videos",
+        type=str,
+        required=True,
+        help="Directory of videos, glob pattern (quote it) or manifest file with one video path per line."
+    )
+    parser.add_argument(
+        "--output_dir",
+        type=str,
+        default="output",
+        help="Base directory, every video gets its own <output_dir>/<video name>/ plus an aggregated batch report."
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=DEFAULT_BATCH_WORKERS,
+        help=f"Number of worker processes, each loads the model once (default: {DEFAULT_BATCH_WORKERS})."
+    )
+    add_pipeline_arguments(parser)
+
+    args = parser.parse_args()
+
+    videos = discover_videos(args.videos)
+    if not videos:
+        parser.error(f"No videos found for '{args.videos}'")
+
+    summary = run_batch(videos, args.output_dir, args.workers, pipeline_config_from_args(args))
+    totals = summary["totals"]
+    logging.info(f"Batch finished: {totals['videos_succeeded']}/{totals['videos']} videos in {totals['wall_s']:.2f} seconds "
+                 f"({totals['images_per_s']:.1f} images/s).")
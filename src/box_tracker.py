@@ -0,0 +1,194 @@
+# src/box_tracker.py
+import logging
+from typing import Any, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from detection_cache import CachedResults
+from instrumentation import TIMINGS
+from config import DEFAULT_KEYFRAME_INTERVAL, DEFAULT_MIN_TRACK_CONFIDENCE
+
+# Set up basic logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+_POINTS_PER_BOX = 16 # corners tracked per box
+_MIN_POINTS = 3 # a box with fewer well-tracked points is lost
+_MAX_FB_ERROR = 1.0 # px a point may end up away from where it started after tracking forward and back
+_MATCH_IOU = 0.3 # IoU for a new detection to take over the id of a tracked box
+_LK_PARAMS = dict(winSize=(21, 21), maxLevel=3,
+                  criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 30, 0.01))
+
+
+def box_iou(boxes_a: np.ndarray, boxes_b: np.ndarray) -> np.ndarray:
+    """(N, M) IoU matrix of two sets of [x1, y1, x2, y2] boxes."""
+    x1 = np.maximum(boxes_a[:, None, 0], boxes_b[None, :, 0])
+    y1 = np.maximum(boxes_a[:, None, 1], boxes_b[None, :, 1])
+    x2 = np.minimum(boxes_a[:, None, 2], boxes_b[None, :, 2])
+    y2 = np.minimum(boxes_a[:, None, 3], boxes_b[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (boxes_a[:, 2] - boxes_a[:, 0]) * (boxes_a[:, 3] - boxes_a[:, 1])
+    area_b = (boxes_b[:, 2] - boxes_b[:, 0]) * (boxes_b[:, 3] - boxes_b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - inter
+    return np.where(union > 0, inter / np.where(union > 0, union, 1), 0.0)
+
+
+def _box_points(gray: np.ndarray, box: np.ndarray) -> np.ndarray:
+    """Points to track inside a box: its strongest corners, or a regular grid on flat content."""
+    height, width = gray.shape
+    x1, y1 = int(max(0, box[0])), int(max(0, box[1]))
+    x2, y2 = int(min(width, np.ceil(box[2]))), int(min(height, np.ceil(box[3])))
+    if x2 - x1 < 2 or y2 - y1 < 2:
+        return np.empty((0, 2), dtype=np.float32)
+    corners = cv2.goodFeaturesToTrack(gray[y1:y2, x1:x2], _POINTS_PER_BOX, 0.01, 3)
+    if corners is not None and len(corners) >= _MIN_POINTS:
+        return corners.reshape(-1, 2) + np.array([x1, y1], dtype=np.float32)
+    xs = np.linspace(x1, x2 - 1, 4, dtype=np.float32)
+    ys = np.linspace(y1, y2 - 1, 4, dtype=np.float32)
+    return np.stack(np.meshgrid(xs, ys), axis=-1).reshape(-1, 2)
+
+
+def propagate_boxes(prev_gray: np.ndarray, gray: np.ndarray, boxes: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Moves [x1, y1, x2, y2] boxes from prev_gray to gray with pyramidal Lucas-Kanade optical flow.
+
+    Points inside every box are tracked forward and back; the ones that return to within
+    _MAX_FB_ERROR px of where they started are trusted. A box moves by the median displacement
+    of its trusted points and scales by the median change of their spread around the centre.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: The moved (N, 4) boxes, clipped to the frame, and an (N,)
+        confidence per box: the share of its points that were tracked, 0 for a lost box (too few
+        points, or moved out of the frame).
+    """
+    height, width = gray.shape
+    moved = boxes.astype(np.float64).copy()
+    confidence = np.zeros(len(boxes))
+    points = [_box_points(prev_gray, box) for box in boxes]
+    if not sum(len(p) for p in points):
+        return moved, confidence
+    start = np.concatenate(points).reshape(-1, 1, 2)
+    forward, status, _ = cv2.calcOpticalFlowPyrLK(prev_gray, gray, start, None, **_LK_PARAMS)
+    back, back_status, _ = cv2.calcOpticalFlowPyrLK(gray, prev_gray, forward, None, **_LK_PARAMS)
+    fb_error = np.linalg.norm((back - start).reshape(-1, 2), axis=1)
+    good = (status.ravel() == 1) & (back_status.ravel() == 1) & (fb_error < _MAX_FB_ERROR)
+    start, forward = start.reshape(-1, 2), forward.reshape(-1, 2)
+
+    offset = 0
+    for i, box_points in enumerate(points):
+        idx = slice(offset, offset + len(box_points))
+        offset += len(box_points)
+        box_good = good[idx]
+        if box_good.sum() < _MIN_POINTS:
+            continue
+        old, new = start[idx][box_good], forward[idx][box_good]
+        shift = np.median(new - old, axis=0)
+        old_spread = np.median(np.linalg.norm(old - np.median(old, axis=0), axis=1))
+        new_spread = np.median(np.linalg.norm(new - np.median(new, axis=0), axis=1))
+        scale = float(np.clip(new_spread / old_spread, 0.8, 1.25)) if old_spread > 1e-3 else 1.0
+        center = (boxes[i, :2] + boxes[i, 2:4]) / 2 + shift
+        half = (boxes[i, 2:4] - boxes[i, :2]) / 2 * scale
+        if not (0 <= center[0] < width and 0 <= center[1] < height):
+            continue # left the frame
+        moved[i] = np.clip(np.concatenate([center - half, center + half]), 0, [width, height, width, height])
+        confidence[i] = box_good.mean()
+    return moved, confidence
+
+
+class TrackingModel:
+    """
+    Drop-in wrapper around a YOLO model that only runs it on keyframes and tracks the boxes in between.
+
+    Frames must arrive in video order (one video per wrapper). The wrapped model runs on every
+    keyframe_interval-th frame; on the frames in between, the last boxes are moved with
+    propagate_boxes and returned as CachedResults with propagated=True, their confidence scaled by
+    how well they were tracked. A box's tracking confidence multiplies up over the frames since
+    its keyframe, and the detector runs early as soon as one drops below min_track_confidence
+    (occlusion, fast motion, a cut). Detections on a keyframe take over the track id of the
+    tracked box they overlap most (IoU association), so every result carries track_ids as well.
+
+    Called like the model; everything else (names, ...) is passed through to the wrapped model.
+    """
+
+    def __init__(self, model: Any, keyframe_interval: int = DEFAULT_KEYFRAME_INTERVAL,
+                 min_track_confidence: float = DEFAULT_MIN_TRACK_CONFIDENCE):
+        if keyframe_interval < 1:
+            raise ValueError(f"keyframe_interval must be >= 1, got {keyframe_interval}")
+        self.model = model
+        self.keyframe_interval = keyframe_interval
+        self.min_track_confidence = min_track_confidence
+        self.frames_inferred = 0
+        self.frames_propagated = 0
+        self.early_redetections = 0
+        self.next_track_id = 1
+        self._reset()
+
+    def __getattr__(self, name):
+        return getattr(self.model, name)
+
+    def _reset(self):
+        """Forgets the tracks, so the next frame is a keyframe."""
+        self._prev_gray: Optional[np.ndarray] = None
+        self._data = np.empty((0, 6)) # [x1, y1, x2, y2, keyframe conf, cls] per track
+        self._track_ids = np.empty(0, dtype=np.int64)
+        self._track_confidence = np.empty(0)
+        self._since_keyframe = 0
+
+    def __call__(self, source, **kwargs) -> List[Any]:
+        sources = source if isinstance(source, list) else [source]
+        try:
+            return [self._track(s, **kwargs) for s in sources]
+        except Exception:
+            self._reset() # the caller may retry these frames, don't track from a half-processed batch
+            raise
+
+    def _track(self, source: Any, **kwargs) -> CachedResults:
+        image = cv2.imread(source) if isinstance(source, str) else source
+        if image is None:
+            raise ValueError(f"Could not read image {source}")
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+
+        if (self._prev_gray is not None and self._prev_gray.shape == gray.shape
+                and self._since_keyframe < self.keyframe_interval):
+            with TIMINGS.timer("track"):
+                boxes, step_confidence = propagate_boxes(self._prev_gray, gray, self._data[:, :4])
+            track_confidence = self._track_confidence * step_confidence
+            if not len(track_confidence) or track_confidence.min() >= self.min_track_confidence:
+                self._prev_gray = gray
+                self._data[:, :4] = boxes
+                self._track_confidence = track_confidence
+                self._since_keyframe += 1
+                self.frames_propagated += 1
+                data = self._data.copy()
+                data[:, 4] *= track_confidence
+                return CachedResults(image.shape[:2], data.astype(np.float32), track_ids=self._track_ids.copy(),
+                                     propagated=True)
+            self.early_redetections += 1
+
+        results = self.model(image, **kwargs)[0]
+        self.frames_inferred += 1
+        data = results.boxes.data
+        data = np.asarray(data.cpu().numpy() if hasattr(data, 'cpu') else data, dtype=np.float64).reshape(-1, 6)
+        track_ids = self._associate(data)
+        self._prev_gray = gray
+        self._data, self._track_ids = data.copy(), track_ids
+        self._track_confidence = np.ones(len(data))
+        self._since_keyframe = 1
+        return CachedResults(results.orig_shape, data.astype(np.float32), track_ids=track_ids.copy(), propagated=False)
+
+    def _associate(self, data: np.ndarray) -> np.ndarray:
+        """Track ids for new detections: greedily, highest IoU first, the id of a same-class tracked box, else a new id."""
+        track_ids = np.zeros(len(data), dtype=np.int64)
+        if len(data) and len(self._data):
+            iou = box_iou(data[:, :4], self._data[:, :4])
+            iou[data[:, 5, None] != self._data[None, :, 5]] = 0
+            for flat in np.argsort(-iou, axis=None, kind='stable'):
+                i, j = np.unravel_index(flat, iou.shape)
+                if iou[i, j] < _MATCH_IOU:
+                    break
+                if track_ids[i] == 0 and self._track_ids[j] not in track_ids:
+                    track_ids[i] = self._track_ids[j]
+        for i in np.flatnonzero(track_ids == 0):
+            track_ids[i] = self.next_track_id
+            self.next_track_id += 1
+        return track_ids
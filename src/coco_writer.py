@@ -0,0 +1,125 @@
+# src/coco_writer.py
+import json
+import logging
+import os
+import shutil
+from typing import Dict, Any, List, Optional
+
+import numpy as np
+
+# Set up basic logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+class StreamingCocoWriter:
+    """
+    Writes a COCO JSON file incrementally instead of holding the whole dataset in memory.
+
+    Images are appended to the output file as they arrive; annotations are appended to a spool
+    file next to it and copied in after the last image, and categories are written last (they are
+    only known once every frame has been seen). Memory use is therefore constant in the video
+    length. Everything is written to <output_path>.partial and renamed over output_path on
+    close(), so readers never see a half-written file.
+
+    With compact=False the file is byte-for-byte what json.dump(coco, f, indent=2) produces;
+    compact=True drops all whitespace.
+    """
+
+    def __init__(self, output_path: str, compact: bool = False):
+        self.output_path = output_path
+        self.compact = compact
+        self.partial_path = output_path + ".partial"
+        self.spool_path = output_path + ".annotations.partial"
+        self.images_written = 0
+        self.annotations_written = 0
+        self._file = open(self.partial_path, 'w')
+        self._spool = open(self.spool_path, 'w')
+        self._file.write('{"images":[' if compact else '{\n  "images": [')
+
+    def _element(self, obj: Dict[str, Any], first: bool) -> str:
+        if self.compact:
+            return ('' if first else ',') + json.dumps(obj, separators=(',', ':'))
+        # Same layout as json.dump(indent=2): one level for the dict, one for the list
+        return ('\n' if first else ',\n') + '\n'.join('    ' + line for line in json.dumps(obj, indent=2).split('\n'))
+
+    def _close_list(self, count: int) -> str:
+        return ']' if self.compact or count == 0 else '\n  ]'
+
+    def add_image(self, image: Dict[str, Any]):
+        self._file.write(self._element(image, self.images_written == 0))
+        self.images_written += 1
+
+    def add_annotation(self, annotation: Dict[str, Any]):
+        self._spool.write(self._element(annotation, self.annotations_written == 0))
+        self.annotations_written += 1
+
+    def add_annotations(self, image_id: int, first_id: int, category_ids: np.ndarray, bboxes: np.ndarray,
+                        areas: np.ndarray, confidences: np.ndarray, track_ids: Optional[np.ndarray] = None,
+                        propagated: Optional[bool] = None):
+        """
+        Appends the detections of one image given as columns, ids first_id, first_id + 1, ...
+
+        The annotation dicts are only built here, right before serialization. "track_id" and
+        "propagated" are only added when given (keyframe detection with box propagation).
+
+        Args:
+            image_id (int): COCO id of the image all detections belong to.
+            first_id (int): Annotation id of the first detection.
+            category_ids (np.ndarray): (N,) COCO category ids.
+            bboxes (np.ndarray): (N, 4) [x, y, width, height] boxes.
+            areas (np.ndarray): (N,) box areas.
+            confidences (np.ndarray): (N,) detection confidences.
+            track_ids (Optional[np.ndarray]): (N,) ids of the tracked objects.
+            propagated (Optional[bool]): Whether the boxes were tracked from a keyframe instead of detected.
+        """
+        extra: Dict[str, Any] = {} if propagated is None else {"propagated": propagated}
+        track_ids = track_ids.tolist() if track_ids is not None else [None] * len(bboxes)
+        for ann_id, category_id, bbox, area, confidence, track_id in zip(
+                range(first_id, first_id + len(bboxes)), category_ids.tolist(), bboxes.tolist(),
+                areas.tolist(), confidences.tolist(), track_ids):
+            annotation = {
+                "id": ann_id,
+                "image_id": image_id,
+                "category_id": category_id,
+                "bbox": bbox,
+                "area": area,
+                "iscrowd": 0, # Assuming individual objects
+                "segmentation": [], # Not generating segmentation in this basic pipeline
+                "confidence": confidence
+            }
+            if track_id is not None:
+                annotation["track_id"] = track_id
+            self.add_annotation({**annotation, **extra})
+
+    def close(self, categories: List[Dict[str, Any]]):
+        """Appends the annotations and categories, then atomically moves the file to output_path."""
+        try:
+            self._file.write(self._close_list(self.images_written))
+            self._file.write(',"annotations":[' if self.compact else ',\n  "annotations": [')
+            self._spool.close()
+            with open(self.spool_path) as spool:
+                shutil.copyfileobj(spool, self._file)
+            self._file.write(self._close_list(self.annotations_written))
+
+            self._file.write(',"categories":[' if self.compact else ',\n  "categories": [')
+            for i, category in enumerate(categories):
+                self._file.write(self._element(category, i == 0))
+            self._file.write(self._close_list(len(categories)))
+            self._file.write('}' if self.compact else '\n}')
+            self._file.close()
+            os.replace(self.partial_path, self.output_path)
+        except Exception:
+            self.abort()
+            raise
+        finally:
+            if os.path.exists(self.spool_path):
+                os.remove(self.spool_path)
+
+    def abort(self):
+        """Closes and removes the partial files without producing output_path."""
+        for f in (self._file, self._spool):
+            if not f.closed:
+                f.close()
+        for path in (self.partial_path, self.spool_path):
+            if os.path.exists(path):
+                os.remove(path)
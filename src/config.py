@@ -6,10 +6,60 @@ DEFAULT_COCO_OUTPUT_PATH = 'detections.json'
 # Additions - for outputs - md file and csv logging
 DEFAULT_REPORT_OUTPUT_PATH = 'pipeline_report.md' #Markdown report name
 DEFAULT_CSV_LOG_PATH = 'pipeline_metrics_log.csv' #CSV log name
+DEFAULT_BATCH_REPORT_PATH = 'batch_report.md' # Aggregated report of a multi-video batch run
+DEFAULT_BATCH_SUMMARY_PATH = 'batch_summary.json' # Per-video rows + totals of a batch run
+DEFAULT_MANIFEST_PATH = 'run_manifest.json' # Parameters and per-stage progress of a run, used by --resume
+DEFAULT_JOURNAL_PATH = 'detections.journal.jsonl' # Checkpointed per-frame detections of an unfinished run
+DEFAULT_METRICS_INTERVAL = 5.0 # Seconds between live metrics samples (frames/sec gauges, textfile rewrites)
+DEFAULT_INSTRUMENTATION = True # Per-operation latency percentiles (decode, encode, inference, ...) in the report and CSV
 
 # Frame extraction settings
 DEFAULT_FRAME_STEP = 30 # Save every Nth frame
+DEFAULT_SAMPLING_MODE = 'auto' # How skipped frames are stepped over: 'auto', 'read', 'grab' or 'seek'
+DEFAULT_FRAME_FORMAT = 'jpg' # Saved frame format: 'jpg', 'png', 'webp' or 'npy' (raw)
+DEFAULT_ENCODE_THREADS = 2 # Threads encoding/writing saved frames off the decode loop
+DEFAULT_FRAME_STORE = 'files' # How saved frames are stored: 'files' (one image each) or 'tar' (packed shards + offset index)
+DEFAULT_FRAME_SHARD_MB = 256 # 'tar' frame store: size at which a new shard file is started
+DEFAULT_SCENE_THRESHOLD = 0.02 # 'scene' sampling: share of the frame (downscaled) that must change to keep a frame
+DEFAULT_SCENE_MIN_INTERVAL = 5 # 'scene' sampling: frames between compared frames (and between kept frames)
+DEFAULT_SCENE_MAX_INTERVAL = 300 # 'scene' sampling: keep at least one frame this often, even without change
+DEFAULT_INFERENCE_SIZE = None # Long side (px) kept frames are downscaled to at decode time for detection, None = source resolution
+DEFAULT_DECODE_WORKERS = 1 # Processes decoding keyframe-aligned segments of one video in parallel (1 = single capture)
 
 # Object detection model settings
 DEFAULT_MODEL_NAME = 'yolov8n.pt'
 #DEFAULT_MODEL_NAME = 'yolov8s.pt'
+DEFAULT_BATCH_SIZE = 8 # Frames per YOLO forward pass
+DEFAULT_BACKEND = 'torch' # What runs the model: 'torch' (ultralytics), 'onnx' (ONNX Runtime) or 'onnx-int8'
+DEFAULT_COCO_COMPACT = False # True writes the COCO JSON without indentation (much smaller for long videos)
+DEFAULT_CACHE_MAX_MB = 1024 # Size limit of the on-disk detection cache, least recently used entries are evicted
+DEFAULT_KEYFRAME_INTERVAL = 1 # Run the detector on every Nth sampled frame and track boxes in between (1 = detect every frame)
+DEFAULT_MIN_TRACK_CONFIDENCE = 0.5 # Re-detect before the next keyframe once a tracked box's confidence drops below this
+DEFAULT_CHECKPOINT_EVERY = 25 # Frames between two detection checkpoints of a resumable run
+
+# Overlapped (producer/consumer) execution settings
+DEFAULT_INFERENCE_WORKERS = 1 # Inference threads, each with its own model instance
+DEFAULT_QUEUE_SIZE = 32 # Max decoded frames waiting for inference (bounds memory on long videos)
+
+# Async (asyncio) API settings
+DEFAULT_INFERENCE_CONCURRENCY = 1 # Forward passes in flight across all async jobs sharing an InferencePool (one model each)
+
+# Live stream / pipe input settings
+DEFAULT_STREAM_BUFFER_SIZE = 64 # Decoded frames held between the stream reader and the detector
+DEFAULT_STREAM_BUFFER_POLICY = 'drop' # Full buffer: 'drop' the oldest frame (live feeds) or 'block' the reader (pipes)
+DEFAULT_SHARD_FRAMES = 1000 # Frames per rolling COCO shard of a stream
+DEFAULT_SHARD_SECONDS = 300.0 # Stream seconds per rolling COCO shard (whichever limit is reached first)
+DEFAULT_SHARD_INDEX_PATH = 'shards.jsonl' # One line per finished shard of a stream run
+DEFAULT_STREAM_SUMMARY_PATH = 'stream_summary.json' # Running totals of a stream run, rewritten after every shard
+
+# Daemon (spool-directory job queue) settings
+DEFAULT_SPOOL_POLL_INTERVAL = 1.0 # Seconds between two looks at the spool's incoming/ directory when it is empty
+DEFAULT_DAEMON_STATS_PATH = 'daemon_stats.json' # Job counts and latency percentiles, rewritten in the spool after every job
+
+# CPU resource governor settings
+DEFAULT_RESOURCE_PROFILES_PATH = 'resource_profiles.json' # Calibrated resource plans (--resources tune), reused by later runs
+DEFAULT_CALIBRATION_FRAMES = 24 # Sampled frames decoded, encoded and detected per calibration setting
+
+# Multi-video batch mode settings
+DEFAULT_BATCH_WORKERS = 2 # Worker processes, each keeps one model loaded
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv', '.webm', '.m4v') # Picked up when --videos is a directory
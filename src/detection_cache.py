@@ -0,0 +1,239 @@
+# src/detection_cache.py
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Any, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from config import DEFAULT_CACHE_MAX_MB
+
+# Set up basic logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+_EVICT_EVERY = 64 # puts between two size checks
+
+
+class CachedBoxes:
+    def __init__(self, data: np.ndarray):
+        self.data = data
+
+
+class CachedResults:
+    """
+    The part of an ultralytics Results the pipeline reads (orig_shape, boxes.data), restored from the cache.
+
+    Also what box_tracker.TrackingModel returns: track_ids holds one id per box and propagated is
+    True when the boxes were tracked from the last keyframe instead of detected.
+    """
+
+    def __init__(self, orig_shape: Tuple[int, int], data: np.ndarray, track_ids: Optional[np.ndarray] = None,
+                 propagated: Optional[bool] = None):
+        self.orig_shape = orig_shape
+        self.boxes = CachedBoxes(data)
+        self.track_ids = track_ids
+        self.propagated = propagated
+
+
+def frame_hash(frame: np.ndarray) -> str:
+    """Hash of the frame pixels (and shape/dtype, so a reshaped buffer doesn't collide)."""
+    h = hashlib.blake2b(digest_size=16)
+    h.update(f"{frame.shape}{frame.dtype}".encode())
+    h.update(np.ascontiguousarray(frame).data)
+    return h.hexdigest()
+
+
+def model_fingerprint(model: Any, model_name: str) -> str:
+    """
+    Identifies the weights and inference settings a detection came from.
+
+    Hashes the weights file when there is one (the checkpoint the model was loaded from), else the
+    in-memory parameters (e.g. a model built from a .yaml), plus the model's inference overrides
+    (conf, iou, imgsz, ...).
+    """
+    h = hashlib.blake2b(digest_size=16)
+    h.update(model_name.encode())
+    weights = getattr(model, 'ckpt_path', None) or model_name
+    if isinstance(weights, str) and os.path.isfile(weights):
+        with open(weights, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                h.update(chunk)
+    elif hasattr(getattr(model, 'model', None), 'state_dict'):
+        for name, tensor in model.model.state_dict().items():
+            h.update(name.encode())
+            h.update(tensor.detach().cpu().numpy().tobytes())
+    else:
+        h.update(type(model).__qualname__.encode())
+    overrides = getattr(model, 'overrides', None) or {}
+    h.update(json.dumps(overrides, sort_keys=True, default=str).encode())
+    return h.hexdigest()
+
+
+class DetectionCache:
+    """
+    Persistent detection cache in a SQLite file, keyed by frame hash + model fingerprint.
+
+    Values are the raw detections ([x1, y1, x2, y2, conf, cls] rows as float32) and the original
+    image shape, so a hit gives exactly what the model returned. The file is shared safely by
+    several threads (one connection each) and worker processes (WAL journal, busy timeout).
+    When it grows beyond max_mb the least recently used entries are evicted.
+    """
+
+    def __init__(self, path: str, max_mb: float = DEFAULT_CACHE_MAX_MB):
+        self.path = path
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._puts_since_check = 0
+        self.hits = 0
+        self.misses = 0
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        conn = self._conn()
+        with conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS detections ("
+                         "key TEXT PRIMARY KEY, height INTEGER, width INTEGER, data BLOB, "
+                         "size INTEGER, last_used REAL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS detections_last_used ON detections (last_used)")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=60)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get_many(self, keys: List[str]) -> Dict[str, CachedResults]:
+        """Returns the cached results for the keys that are present and marks them as recently used."""
+        if not keys:
+            return {}
+        conn = self._conn()
+        placeholders = ",".join("?" * len(keys))
+        rows = conn.execute(f"SELECT key, height, width, data FROM detections WHERE key IN ({placeholders})",
+                            keys).fetchall()
+        if rows:
+            now = time.time()
+            with conn:
+                conn.executemany("UPDATE detections SET last_used = ? WHERE key = ?", [(now, row[0]) for row in rows])
+        return {key: CachedResults((height, width), np.frombuffer(data, dtype=np.float32).reshape(-1, 6))
+                for key, height, width, data in rows}
+
+    def put_many(self, items: List[Tuple[str, Any]]):
+        """Stores (key, ultralytics Results) pairs."""
+        if not items:
+            return
+        now = time.time()
+        rows = []
+        for key, results in items:
+            data = results.boxes.data
+            data = data.cpu().numpy() if hasattr(data, 'cpu') else np.asarray(data)
+            blob = np.ascontiguousarray(data, dtype=np.float32).tobytes()
+            height, width = results.orig_shape
+            rows.append((key, int(height), int(width), blob, len(blob) + len(key), now))
+        conn = self._conn()
+        with conn:
+            conn.executemany("INSERT OR REPLACE INTO detections VALUES (?, ?, ?, ?, ?, ?)", rows)
+        with self._lock:
+            self._puts_since_check += len(rows)
+            check = self._puts_since_check >= _EVICT_EVERY
+            if check:
+                self._puts_since_check = 0
+        if check:
+            self.evict()
+
+    def evict(self):
+        """Drops least recently used entries until the cache is back under 90% of max_mb."""
+        conn = self._conn()
+        with conn:
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM detections").fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            target = total - int(self.max_bytes * 0.9)
+            freed, evicted = 0, 0
+            while freed < target:
+                rows = conn.execute("SELECT key, size FROM detections ORDER BY last_used LIMIT 256").fetchall()
+                if not rows:
+                    break
+                for key, size in rows:
+                    if freed >= target:
+                        break
+                    conn.execute("DELETE FROM detections WHERE key = ?", (key,))
+                    freed += size
+                    evicted += 1
+        logging.info(f"Detection cache over {self.max_bytes / 1024 / 1024:.0f} MB, evicted {evicted} entries.")
+
+    def record(self, hits: int, misses: int):
+        with self._lock:
+            self.hits += hits
+            self.misses += misses
+
+    def counters(self) -> Tuple[int, int]:
+        """(hits, misses) so far, pass to metrics() to get the numbers of one run."""
+        with self._lock:
+            return self.hits, self.misses
+
+    def metrics(self, since: Tuple[int, int] = (0, 0)) -> Dict[str, Any]:
+        hits, misses = self.counters()
+        hits, misses = hits - since[0], misses - since[1]
+        return {
+            "cache_hits": hits,
+            "cache_misses": misses,
+            "cache_hit_ratio": hits / (hits + misses) if hits + misses > 0 else 0.0
+        }
+
+    def wrap(self, model: Any, model_name: str) -> "CachedModel":
+        return CachedModel(model, self, model_fingerprint(model, model_name))
+
+    def close(self):
+        """Closes this thread's connection."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+class CachedModel:
+    """
+    Drop-in wrapper around a YOLO model that answers from a DetectionCache and only runs the misses.
+
+    Called like the model (a source or a list of sources, path or BGR array) and returns one
+    Results per source; everything else (names, ...) is passed through to the wrapped model.
+    """
+
+    def __init__(self, model: Any, cache: DetectionCache, fingerprint: str):
+        self.model = model
+        self.cache = cache
+        self.fingerprint = fingerprint
+
+    def __getattr__(self, name):
+        return getattr(self.model, name)
+
+    def __call__(self, source, **kwargs) -> List[Any]:
+        sources = source if isinstance(source, list) else [source]
+        images = []
+        for s in sources:
+            image = cv2.imread(s) if isinstance(s, str) else s
+            if image is None:
+                raise ValueError(f"Could not read image {s}")
+            images.append(image)
+
+        keys = [f"{self.fingerprint}:{frame_hash(image)}" for image in images]
+        cached = self.cache.get_many(keys)
+        missing = [i for i, key in enumerate(keys) if key not in cached]
+        self.cache.record(hits=len(keys) - len(missing), misses=len(missing))
+
+        results: List[Any] = [cached.get(key) for key in keys]
+        if missing:
+            predicted = self.model([images[i] for i in missing], **kwargs)
+            for i, frame_results in zip(missing, predicted):
+                results[i] = frame_results
+            self.cache.put_many([(keys[i], results[i]) for i in missing])
+        return results
+
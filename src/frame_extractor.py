@@ -1,92 +1,529 @@
 # src/frame_extractor.py
 import cv2
+import math
 import os
 import logging
+import numpy as np
 from tqdm import tqdm
-from typing import Dict, Any
+from typing import Dict, Any, Iterator, Optional, Tuple
+
+from frame_writer import FRAME_FORMATS
+from frame_store import open_frame_writer
+from video_probe import VideoProbe
+from pipeline_config import PipelineConfig
+from instrumentation import TIMINGS
+from metrics_exporter import LIVE
+from config import (
+    DEFAULT_SAMPLING_MODE,
+    DEFAULT_FRAME_FORMAT,
+    DEFAULT_ENCODE_THREADS,
+    DEFAULT_FRAME_STORE,
+    DEFAULT_SCENE_THRESHOLD,
+    DEFAULT_SCENE_MIN_INTERVAL,
+    DEFAULT_SCENE_MAX_INTERVAL,
+    DEFAULT_INFERENCE_SIZE
+)
 
 # Set up basic logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-def extract_frames(video_path: str, output_dir: str, frame_step: int = 30) -> Dict[str, Any]:
+# "read"  -> legacy behaviour, cap.read() (decode + convert) on every frame
+# "grab"  -> cap.grab() on every frame, cap.retrieve() only on the kept ones
+# "seek"  -> jump straight to each kept frame with CAP_PROP_POS_FRAMES
+# "auto"  -> pick "seek" or "grab" from frame_step and the GOP size of the video
+# "scene" -> adaptive: keep a frame only when the content changed (frame_step is then only the baseline)
+SAMPLING_MODES = ("auto", "read", "grab", "seek", "scene")
+
+_SCENE_THUMBNAIL_SIZE = 32 # frames are compared as 32x32 grayscale thumbnails
+_SCENE_PIXEL_MARGIN = 12 # thumbnail brightness change (0-255) below which a cell counts as unchanged (codec noise)
+
+
+def probe_gop_size(video_path: str, max_packets: int = 600) -> Optional[int]:
     """
-    This function Extracts frames from the video file
+    Estimates the keyframe interval (GOP size) of a video without decoding it.
+
+    The capture is opened in raw packet mode (CAP_PROP_FORMAT = -1) so grab() only
+    demuxes, and the keyframe flag of each packet is read back through
+    CAP_PROP_LRF_HAS_KEY_FRAME (FFmpeg backend only).
+
+    Args:
+        video_path (str): Path to the input video file.
+        max_packets (int): Upper bound on the number of packets inspected.
+
+    Returns:
+        Optional[int]: Largest distance seen between two keyframes, or None if it
+                       could not be determined (backend/OpenCV build without support,
+                       or fewer than two keyframes within max_packets).
+    """
+    if not hasattr(cv2, "CAP_PROP_LRF_HAS_KEY_FRAME"):
+        return None
+
+    cap = cv2.VideoCapture(video_path, cv2.CAP_FFMPEG)
+    try:
+        if not cap.isOpened() or not cap.set(cv2.CAP_PROP_FORMAT, -1):
+            return None
+        keyframes = []
+        for packet_idx in range(max_packets):
+            if not cap.grab():
+                break
+            if cap.get(cv2.CAP_PROP_LRF_HAS_KEY_FRAME):
+                keyframes.append(packet_idx)
+    finally:
+        cap.release()
+
+    if len(keyframes) < 2:
+        return None
+    # Use the largest gap so a short GOP at the start of the clip doesn't make seeking look cheaper than it is
+    return max(b - a for a, b in zip(keyframes, keyframes[1:]))
+
+
+def choose_sampling_mode(frame_step: int, gop_size: Optional[int]) -> str:
+    """
+    Picks the cheapest way to visit every frame_step-th frame.
+
+    Seeking lands on the keyframe before the target and decodes forward from there, so it
+    only pays off once consecutive kept frames are further apart than one GOP. Otherwise
+    grabbing (decode without colour conversion/copy) through the skipped frames is cheaper.
+
+    Args:
+        frame_step (int): Interval at which frames are extracted.
+        gop_size (Optional[int]): Keyframe interval from probe_gop_size, None if unknown.
+
+    Returns:
+        str: "seek" or "grab".
+    """
+    if gop_size is not None and frame_step > gop_size:
+        return "seek"
+    return "grab"
+
+
+def _sample_sequential(cap, frame_step: int, start_idx: int, iterations: Optional[int],
+                       use_grab: bool, counters: Dict[str, int],
+                       progress: bool = False) -> Iterator[Tuple[int, Any]]:
+    """
+    Walks the capture frame by frame and yields (frame_idx, frame) for every kept frame.
+
+    Mirrors the original extraction loop exactly: a failed read counts as dropped and does
+    not advance frame_idx. With iterations=None the loop runs until the first failed read
+    (used when the container does not report a frame count).
+    """
+    frame_idx = start_idx
+    if iterations is None:
+        steps = iter(int, 1) # endless, stops on the first failed read
+    elif progress:
+        steps = tqdm(range(iterations), desc="Extracting Frames") # Using tqdm for a progress bar
+    else:
+        steps = range(iterations)
+    for _ in steps:
+        with TIMINGS.timer("decode"):
+            if use_grab:
+                success = cap.grab()
+                frame = None
+            else:
+                success, frame = cap.read()
+        if not success:
+            counters["frames_dropped"] += 1
+            if iterations is None:
+                break # End of video or error
+            continue # Skip bad frames
+
+        counters["frames_read"] += 1
+        if frame_idx % frame_step == 0:
+            if use_grab:
+                with TIMINGS.timer("retrieve"):
+                    success, frame = cap.retrieve()
+                if not success:
+                    # grab() succeeded so the frame counts as read, it just can't be kept
+                    logging.warning(f"Could not retrieve grabbed frame {frame_idx}.")
+                    frame_idx += 1
+                    continue
+            counters["frames_retrieved"] += 1
+            yield frame_idx, frame
+        frame_idx += 1
+
+
+def landed_on_frame(cap, frame_idx: int, fps: float) -> bool:
+    """
+    Whether the frame cap just decoded really is frame_idx.
+
+    After a seek, CAP_PROP_POS_FRAMES reports the requested position (FFmpeg backend), not the
+    decoded one, so the decoded frame's timestamp is compared with frame_idx / fps instead (within
+    half a frame). Without a frame rate only the position can be checked.
+    """
+    if fps <= 0:
+        return int(cap.get(cv2.CAP_PROP_POS_FRAMES)) == frame_idx + 1
+    return abs(cap.get(cv2.CAP_PROP_POS_MSEC) - frame_idx * 1000.0 / fps) < 500.0 / fps
+
+
+def _sample_by_seek(cap, total_frames_in_video: int, frame_step: int, fps: float,
+                    counters: Dict[str, int]) -> Iterator[Tuple[int, Any]]:
+    """
+    Seeks straight to every kept frame instead of walking through the skipped ones.
+
+    Produces the same frames as the sequential loop: as soon as a seek doesn't land on the
+    requested frame or a read fails (typically a frame count that overestimates the real
+    stream length), it falls back to grabbing sequentially from the last frame known to be good.
+    The frames jumped over are never decoded, so drops among them are not counted: they are
+    reported as frames_skipped_unchecked instead of frames_read. The frames after the last kept
+    one are grabbed, so trailing unreadable frames are still counted as dropped.
+    """
+    next_pos = 0 # position of the capture after the last successful read
+    for target in tqdm(range(0, total_frames_in_video, frame_step), desc="Extracting Frames (seek)"):
+        with TIMINGS.timer("seek"):
+            if target != next_pos:
+                cap.set(cv2.CAP_PROP_POS_FRAMES, target)
+            success, frame = cap.read()
+        if not success or not landed_on_frame(cap, target, fps):
+            logging.warning(f"Seek to frame {target} failed, continuing sequentially from frame {next_pos}.")
+            cap.set(cv2.CAP_PROP_POS_FRAMES, next_pos)
+            break
+        counters["frames_skipped_unchecked"] += target - next_pos
+        counters["frames_read"] += 1
+        counters["frames_retrieved"] += 1
+        next_pos = target + 1
+        yield target, frame
+
+    # Tail (or everything after a failed seek): same semantics as the sequential loop
+    yield from _sample_sequential(cap, frame_step, next_pos, total_frames_in_video - next_pos,
+                                  use_grab=True, counters=counters)
+
+
+def frame_signature(frame: np.ndarray, size: int = _SCENE_THUMBNAIL_SIZE) -> np.ndarray:
+    """
+    Downscaled grayscale thumbnail (size x size, int16) used to compare frames cheaply.
+
+    INTER_AREA averages every cell over its block of pixels, which also averages out most of
+    the codec noise.
+    """
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    return cv2.resize(gray, (size, size), interpolation=cv2.INTER_AREA).astype(np.int16)
+
+
+def scene_change(signature: np.ndarray, reference: np.ndarray) -> float:
+    """Share of the frame (0..1) whose thumbnail brightness changed by more than the noise margin."""
+    return np.count_nonzero(np.abs(signature - reference) > _SCENE_PIXEL_MARGIN) / signature.size
+
+
+def _sample_by_scene(cap, iterations: Optional[int], counters: Dict[str, int], threshold: float,
+                     min_interval: int, max_interval: int, progress: bool = False) -> Iterator[Tuple[int, Any]]:
+    """
+    Keeps frames whose content changed by at least threshold since the last kept frame.
+
+    Every min_interval-th frame after the last kept one is decoded and its frame_signature compared
+    with the kept frame's (scene_change, the share of the frame that changed); the others are
+    only grabbed. Comparing against the last kept frame rather than the previous candidate also
+    catches slow changes that build up over time. A frame
+    is kept when the change reaches threshold, or unconditionally max_interval frames after the
+    last kept one so static footage still gets sampled. The first frame is always kept.
+
+    Drop accounting is the same as in _sample_sequential.
+    """
+    frame_idx = 0
+    last_kept, last_signature = None, None
+    if iterations is None:
+        steps = iter(int, 1) # endless, stops on the first failed read
+    elif progress:
+        steps = tqdm(range(iterations), desc="Extracting Frames (scene)")
+    else:
+        steps = range(iterations)
+    for _ in steps:
+        with TIMINGS.timer("decode"):
+            success = cap.grab()
+        if not success:
+            counters["frames_dropped"] += 1
+            if iterations is None:
+                break # End of video or error
+            continue # Skip bad frames
+
+        counters["frames_read"] += 1
+        since_kept = frame_idx - last_kept if last_kept is not None else None
+        if since_kept is None or since_kept % min_interval == 0 or since_kept >= max_interval:
+            with TIMINGS.timer("retrieve"):
+                success, frame = cap.retrieve()
+            if not success:
+                logging.warning(f"Could not retrieve grabbed frame {frame_idx}.")
+                frame_idx += 1
+                continue
+            counters["frames_retrieved"] += 1
+            with TIMINGS.timer("scene_signature"):
+                signature = frame_signature(frame)
+            change = scene_change(signature, last_signature) if last_signature is not None else 1.0
+            if change >= threshold or since_kept >= max_interval:
+                if since_kept is not None and change < threshold:
+                    counters["scene_forced_keeps"] += 1
+                last_kept, last_signature = frame_idx, signature
+                yield frame_idx, frame
+        frame_idx += 1
+
+
+def fit_inference_size(frame: np.ndarray, inference_size: Optional[int]) -> np.ndarray:
+    """
+    Downscales a frame so its long side is at most inference_size pixels, keeping the aspect ratio.
+
+    INTER_AREA averages the dropped pixels instead of skipping them (no aliasing on 4K sources).
+    Smaller frames, and every frame if inference_size is None, are returned unchanged.
+    """
+    height, width = frame.shape[:2]
+    if not inference_size or max(height, width) <= inference_size:
+        return frame
+    scale = inference_size / max(height, width)
+    with TIMINGS.timer("resize"):
+        return cv2.resize(frame, (max(1, round(width * scale)), max(1, round(height * scale))),
+                          interpolation=cv2.INTER_AREA)
+
+
+def frame_file_name(saved_idx: int, frame_format: str = DEFAULT_FRAME_FORMAT) -> str:
+    """File name of the saved_idx-th kept frame, shared by the extractor and the COCO output."""
+    return f"frame_{saved_idx:05d}{FRAME_FORMATS[frame_format][0]}"
+
+
+def frame_sort_key(file_name: str) -> Tuple[int, str]:
+    """
+    Sort key putting frame files in frame order: by the number in their name, then by name.
+
+    frame_file_name pads to 5 digits only, so from frame_100000 on a plain string sort would put
+    frames out of order (frame_100000 < frame_10001).
+    """
+    digits = "".join(c for c in os.path.splitext(file_name)[0].rpartition("_")[2] if c.isdigit())
+    return (int(digits) if digits else -1, file_name)
+
+
+def iter_frames(video_path: str, config: Optional[PipelineConfig] = None,
+                output_dir: Optional[str] = None,
+                metrics: Optional[Dict[str, Any]] = None,
+                probe: Optional[VideoProbe] = None,
+                **settings) -> Iterator[Tuple[int, float, Any]]:
+    """
+    Decodes the video and yields every kept frame as it is decoded.
 
     Paramter/arguments:
         video_path: Path to the input video file.
-        output_dir: folder where extracted frames will be saved.
-        frame_step: Interval at which frames are extracted (e.g., 30 for every 30th frame).
+        config: Settings of the run, PipelineConfig() if None.
+        output_dir: If given, every kept frame is also written there as frame_XXXXX.<format> (optional side output).
+        metrics: If given, filled with the extraction metrics (see extract_frames) once the video is exhausted.
+        probe: The VideoProbe of video_path if it was already opened (e.g. by input validation); its
+               capture and properties are reused instead of opening the file again.
+        **settings: Settings changed from config, e.g. frame_step=10.
 
-    Returns:
-        Dict[str, Any]: A dictionary containing extraction metrics
-                        1.total_frames_in_video,
-                        2.frames_extracted
-                        3.frames_dropped
-                        4.frame_drop_ratio.
+    The settings used from config (see PipelineConfig):
+        frame_step: Interval at which frames are extracted (e.g., 30 for every 30th frame). In "scene"
+                    mode only the baseline the saved inferences are counted against.
+        sampling_mode: How skipped frames are stepped over, one of SAMPLING_MODES
+                       ("auto" picks between "grab" and "seek" from frame_step and the GOP size,
+                       "scene" keeps frames on content change instead of every frame_step-th).
+        scene_threshold: "scene" mode: share of the frame (0..1) that must change to keep a frame.
+        scene_min_interval: "scene" mode: frames between two compared (decoded) frames, and minimum gap between kept frames.
+        scene_max_interval: "scene" mode: a frame is kept at least this often, even without change.
+        frame_format, frame_quality, encode_threads, frame_store: How frames saved in output_dir are
+                     encoded and stored (frame_writer.FrameWriter, frame_store.FRAME_STORES).
+        inference_size: Kept frames are downscaled once, right after decoding, so their long side is at
+                        most this many pixels (fit_inference_size); None keeps the source resolution.
+        full_resolution_frames: With inference_size, still save the frames in output_dir at the source
+                                resolution (e.g. for labelers); only the yielded frames are downscaled.
+
+    Yields:
+        Tuple[int, float, np.ndarray]: (frame_index in the video, timestamp in seconds, BGR frame,
+        downscaled to inference_size).
+        The n-th yielded frame is the one saved as frame_file_name(n, frame_format).
     """
+    config = (config or PipelineConfig()).replace(**settings)
+    frame_step, sampling_mode, inference_size = config.frame_step, config.sampling_mode, config.inference_size
+    scene_threshold, scene_min_interval, scene_max_interval = \
+        config.scene_threshold, config.scene_min_interval, config.scene_max_interval
 
     # exceptionhandling for file not available or wrong path
     if not os.path.exists(video_path):
         logging.error(f"Video file not found: {video_path}")
         raise FileNotFoundError(f"Video file not found: {video_path}")
 
-    os.makedirs(output_dir, exist_ok=True)
+    if sampling_mode not in SAMPLING_MODES:
+        raise ValueError(f"Unknown sampling mode '{sampling_mode}', expected one of {SAMPLING_MODES}")
+    if sampling_mode == "scene" and not 1 <= scene_min_interval <= scene_max_interval:
+        raise ValueError(f"Need 1 <= scene_min_interval <= scene_max_interval, "
+                         f"got {scene_min_interval} and {scene_max_interval}")
 
-    cap = cv2.VideoCapture(video_path)
-    if not cap.isOpened():
-        logging.error(f"Could not open video file: {video_path}")
-        raise IOError(f"Could not open video file: {video_path}")
+    if probe is None:
+        try:
+            probe = VideoProbe.open(video_path)
+        except IOError:
+            logging.error(f"Could not open video file: {video_path}")
+            raise
+    cap = probe.capture()
 
-    total_frames_in_video = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    total_frames_in_video = probe.frame_count
+    fps = probe.fps
     logging.info(f"Total frames in video: {total_frames_in_video}")
 
-    frame_idx, saved_idx, dropped_frames = 0, 0, 0
+    if sampling_mode == "auto":
+        gop_size = probe_gop_size(video_path)
+        sampling_mode = choose_sampling_mode(frame_step, gop_size)
+        logging.info(f"GOP size: {gop_size if gop_size is not None else 'unknown'}, "
+                     f"frame step: {frame_step} -> sampling mode '{sampling_mode}'")
+    if sampling_mode == "seek" and total_frames_in_video <= 0:
+        logging.warning("Seeking needs a frame count, falling back to 'grab'.")
+        sampling_mode = "grab"
 
-    logging.info(f"Extracting frames from '{video_path}' to '{output_dir}'...")
+    counters = {"frames_read": 0, "frames_dropped": 0, "frames_retrieved": 0, "scene_forced_keeps": 0,
+                "frames_skipped_unchecked": 0}
+    saved_idx = 0
+    if output_dir is not None:
+        logging.info(f"Extracting frames from '{video_path}' to '{output_dir}'...")
+    else:
+        logging.info(f"Streaming frames from '{video_path}'...")
 
-    # Using tqdm for a progress bar
-    # Check if total_frames_in_video is valid before using in tqdm
-    if total_frames_in_video > 0:
-        for _ in tqdm(range(total_frames_in_video), desc="Extracting Frames"):
-            success, frame = cap.read()
-            if not success:
-                dropped_frames += 1
-                continue # Skip bad frames
-
-            if frame_idx % frame_step == 0:
-                frame_filename = os.path.join(output_dir, f"frame_{saved_idx:05d}.jpg")
-                cv2.imwrite(frame_filename, frame)
-                saved_idx += 1
-            frame_idx += 1
+    # Check if total_frames_in_video is valid before using it for the loop / progress bar
+    if sampling_mode == "scene":
+        sampled = _sample_by_scene(cap, total_frames_in_video if total_frames_in_video > 0 else None, counters,
+                                   scene_threshold, scene_min_interval, scene_max_interval,
+                                   progress=total_frames_in_video > 0)
+    elif sampling_mode == "seek":
+        sampled = _sample_by_seek(cap, total_frames_in_video, frame_step, fps, counters)
+    elif total_frames_in_video > 0:
+        sampled = _sample_sequential(cap, frame_step, 0, total_frames_in_video,
+                                     sampling_mode == "grab", counters, progress=True)
     else:
         logging.warning("Could not determine total frames in video. Processing until end.")
-        while True:
-            success, frame = cap.read()
-            if not success:
-                dropped_frames += 1
-                break # End of video or error
+        sampled = _sample_sequential(cap, frame_step, 0, None, sampling_mode == "grab", counters)
 
-            if frame_idx % frame_step == 0:
-                frame_filename = os.path.join(output_dir, f"frame_{saved_idx:05d}.jpg")
-                cv2.imwrite(frame_filename, frame)
-                saved_idx += 1
-            frame_idx += 1
-            total_frames_in_video += 1 # Increment as we process if CAP_PROP_FRAME_COUNT was 0
+    # Frames are encoded and written off the decode loop
+    writer = open_frame_writer(output_dir, config.frame_store, config.frame_format, config.frame_quality,
+                               config.encode_threads) if output_dir is not None else None
+    write_metrics: Dict[str, Any] = {}
+    source_size, inference_frame_size = None, None
+    # Read only when live metrics are scraped (metrics_exporter), nothing is pushed from the loop
+    live = LIVE.scope()
+    try:
+        live.register("pretag_frames_decoded_total", "counter", "Frames read from the video.",
+                      lambda: counters["frames_read"])
+        live.register("pretag_frames_dropped_total", "counter", "Frames that could not be read.",
+                      lambda: counters["frames_dropped"])
+        live.register("pretag_frames_kept_total", "counter", "Sampled frames handed on to detection.", lambda: saved_idx)
+        live.register("pretag_video_frames", "gauge", "Frame count of the video being processed.",
+                      lambda: total_frames_in_video)
+        if writer is not None:
+            live.register("pretag_queue_depth", "gauge", "Items waiting in a pipeline queue.", lambda: writer.pending,
+                          queue="encode")
+        for frame_idx, frame in sampled:
+            inference_frame = fit_inference_size(frame, inference_size)
+            if source_size is None:
+                source_size = [frame.shape[1], frame.shape[0]]
+                inference_frame_size = [inference_frame.shape[1], inference_frame.shape[0]]
+            if writer is not None:
+                writer.submit(frame_file_name(saved_idx, config.frame_format),
+                              frame if config.full_resolution_frames else inference_frame)
+            saved_idx += 1
+            yield frame_idx, (frame_idx / fps if fps > 0 else 0.0), inference_frame
+        if writer is not None:
+            write_metrics = writer.close()
+    finally:
+        live.close()
+        cap.release()
+        if writer is not None:
+            writer.shutdown() # no-op after close(), waits for queued frames if we stopped early
 
+    if total_frames_in_video <= 0:
+        # Count what we processed if CAP_PROP_FRAME_COUNT was 0
+        total_frames_in_video = counters["frames_read"]
 
-    cap.release()
+    dropped_frames = counters["frames_dropped"]
     logging.info(f"Finished frame extraction.")
-    logging.info(f"Saved {saved_idx} frames to {output_dir}/")
+    if output_dir is not None:
+        logging.info(f"Saved {saved_idx} frames to {output_dir}/")
     logging.info(f"Dropped {dropped_frames} frames.")
 
     frame_drop_ratio = dropped_frames / total_frames_in_video if total_frames_in_video > 0 else 0
 
-    return {
-        "total_frames_in_video": total_frames_in_video,
-        "frames_extracted": saved_idx,
-        "frames_dropped": dropped_frames,
-        "frame_drop_ratio": frame_drop_ratio
-    }
+    if metrics is not None:
+        metrics.update({
+            "total_frames_in_video": total_frames_in_video,
+            "frames_extracted": saved_idx,
+            "frames_dropped": dropped_frames,
+            "frame_drop_ratio": frame_drop_ratio,
+            "sampling_mode": sampling_mode,
+            "frames_retrieved": counters["frames_retrieved"],
+            **write_metrics
+        })
+        if sampling_mode == "seek":
+            # seeked over without decoding: frames_dropped can't include drops among them
+            metrics["frames_skipped_unchecked"] = counters["frames_skipped_unchecked"]
+        if inference_size:
+            metrics.update({
+                "inference_size": inference_size,
+                "source_frame_size": source_size, # [width, height]
+                "inference_frame_size": inference_frame_size,
+                "saved_resolution": "full" if config.full_resolution_frames else "inference"
+            })
+        if sampling_mode == "scene":
+            # What fixed-step sampling would have sent through the detector
+            fixed_step_frames = math.ceil(total_frames_in_video / frame_step) if total_frames_in_video > 0 else 0
+            metrics.update({
+                "scene_threshold": scene_threshold,
+                "scene_min_interval": scene_min_interval,
+                "scene_max_interval": scene_max_interval,
+                "scene_forced_keeps": counters["scene_forced_keeps"],
+                "fixed_step_frames": fixed_step_frames,
+                "inferences_saved": fixed_step_frames - saved_idx,
+                "inferences_saved_ratio": (fixed_step_frames - saved_idx) / fixed_step_frames if fixed_step_frames else 0.0
+            })
+
+
+def extract_frames(video_path: str, output_dir: str, frame_step: int = 30,
+                   sampling_mode: str = DEFAULT_SAMPLING_MODE, frame_format: str = DEFAULT_FRAME_FORMAT,
+                   frame_quality: Optional[int] = None,
+                   encode_threads: int = DEFAULT_ENCODE_THREADS,
+                   scene_threshold: float = DEFAULT_SCENE_THRESHOLD,
+                   scene_min_interval: int = DEFAULT_SCENE_MIN_INTERVAL,
+                   scene_max_interval: int = DEFAULT_SCENE_MAX_INTERVAL,
+                   probe: Optional[VideoProbe] = None,
+                   inference_size: Optional[int] = DEFAULT_INFERENCE_SIZE,
+                   full_resolution_frames: bool = False,
+                   frame_store: str = DEFAULT_FRAME_STORE) -> Dict[str, Any]:
+    """
+    This function Extracts frames from the video file
+
+    Paramter/arguments:
+        video_path: Path to the input video file.
+        output_dir: folder where extracted frames will be saved.
+        frame_step: Interval at which frames are extracted (e.g., 30 for every 30th frame).
+        sampling_mode: How skipped frames are stepped over, one of SAMPLING_MODES
+                       ("auto" picks between "grab" and "seek" from frame_step and the GOP size).
+        frame_format: Saved frame format, one of frame_writer.FRAME_FORMATS ('jpg', 'png', 'webp', 'npy').
+        frame_quality: JPEG/WebP quality or PNG compression level, format default if None.
+        encode_threads: Threads encoding and writing frames in the background.
+        scene_threshold, scene_min_interval, scene_max_interval: "scene" sampling settings (see iter_frames).
+        probe: Already opened VideoProbe of video_path to reuse (see iter_frames).
+        inference_size: Save the frames downscaled to this long side (see iter_frames), None for the source resolution.
+        full_resolution_frames: Save them at the source resolution anyway; the detector then downscales
+                                them to inference_size when it reads them.
+        frame_store: "files" (one image per frame) or "tar" (packed shards, see frame_store.PackedFrameWriter).
+
+    Returns:
+        Dict[str, Any]: A dictionary containing extraction metrics
+                        1.total_frames_in_video,
+                        2.frames_extracted
+                        3.frames_dropped
+                        4.frame_drop_ratio
+                        5.sampling_mode (the mode actually used)
+                        6.frames_retrieved (frames converted and handed back by OpenCV)
+                          ("seek" mode also frames_skipped_unchecked: frames jumped over without
+                          decoding, unreadable ones among them are not in frames_dropped)
+                        7.frame_format, encode_threads, frames_written, bytes_written, encode_s, encode_fps
+                          (plus frame_store, frame_shards for the "tar" store).
+                        8."scene" mode only: fixed_step_frames, inferences_saved, inferences_saved_ratio, ...
+                        9.inference_size only: source_frame_size, inference_frame_size, saved_resolution.
+    """
+    metrics: Dict[str, Any] = {}
+    # nothing consumes the yielded frames here, so don't downscale frames that are saved at full resolution
+    for _ in iter_frames(video_path, output_dir=output_dir, metrics=metrics, probe=probe,
+                         frame_step=frame_step, sampling_mode=sampling_mode, frame_format=frame_format,
+                         frame_quality=frame_quality, encode_threads=encode_threads,
+                         scene_threshold=scene_threshold, scene_min_interval=scene_min_interval,
+                         scene_max_interval=scene_max_interval,
+                         inference_size=None if full_resolution_frames else inference_size, frame_store=frame_store):
+        pass
+    if inference_size and full_resolution_frames:
+        metrics.update({"inference_size": inference_size, "saved_resolution": "full"})
+    return metrics
 
 '''
 if __name__ == "__main__":
@@ -0,0 +1,317 @@
+# src/frame_sources.py
+import collections
+import logging
+import os
+import sys
+import threading
+import time
+from typing import Any, BinaryIO, Dict, Iterator, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from frame_extractor import fit_inference_size
+from metrics_exporter import LIVE
+from config import DEFAULT_STREAM_BUFFER_SIZE, DEFAULT_STREAM_BUFFER_POLICY, DEFAULT_INFERENCE_SIZE
+
+# Set up basic logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# "drop"  -> a full buffer discards its oldest frame (live feeds: keep up with the present, lose frames under load)
+# "block" -> a full buffer stops the reader until there is room (pipes/files: lossless, the writer is slowed down)
+BUFFER_POLICIES = ("drop", "block")
+
+STREAM_URL_SCHEMES = ("rtsp://", "rtsps://", "rtmp://", "http://", "https://", "udp://", "tcp://", "srt://")
+
+
+def parse_frame_size(size: str) -> Tuple[int, int]:
+    """'640x480' -> (640, 480)."""
+    try:
+        width, height = (int(v) for v in size.lower().split('x'))
+    except ValueError:
+        raise ValueError(f"Expected a frame size like 640x480, got '{size}'")
+    if width <= 0 or height <= 0:
+        raise ValueError(f"Frame size must be positive, got '{size}'")
+    return width, height
+
+
+class FrameSource:
+    """
+    A possibly unbounded sequence of BGR frames: a video file, a stream URL, a named pipe or stdin.
+
+    read() returns the next frame or None at the end of the input; skip() steps over one frame
+    as cheaply as the source allows. unbounded is True when the length isn't known up front (live
+    feeds, pipes), so callers must not wait for the end. timestamp(n) is the stream time of the
+    n-th frame: n / fps when the rate is known, else wall-clock seconds since the source was opened.
+    width and height are the source resolution, 0 until known.
+    """
+    name = "source"
+    fps = 0.0
+    frame_count = 0
+    width = height = 0
+    unbounded = True
+
+    def __init__(self):
+        self._opened_at = time.monotonic()
+
+    def read(self) -> Optional[np.ndarray]:
+        raise NotImplementedError
+
+    def skip(self) -> bool:
+        return self.read() is not None
+
+    def timestamp(self, frame_idx: int) -> float:
+        return frame_idx / self.fps if self.fps > 0 else time.monotonic() - self._opened_at
+
+    def close(self):
+        pass
+
+    def describe(self) -> Dict[str, Any]:
+        return {"source": self.name, "kind": type(self).__name__, "fps": self.fps, "unbounded": self.unbounded,
+                "source_frame_size": [self.width, self.height]}
+
+
+class CaptureSource(FrameSource):
+    """Anything cv2.VideoCapture opens: files, stream URLs (rtsp://, http://, ...) and pipes of an encoded stream."""
+
+    def __init__(self, spec: str):
+        super().__init__()
+        if not spec.startswith(STREAM_URL_SCHEMES) and not os.path.exists(spec):
+            raise FileNotFoundError(f"Video source not found: {spec}")
+        self.name = spec
+        self._cap = cv2.VideoCapture(spec)
+        if not self._cap.isOpened():
+            self._cap.release()
+            raise IOError(f"Could not open video source: {spec}")
+        self.fps = self._cap.get(cv2.CAP_PROP_FPS) or 0.0
+        self.frame_count = max(0, int(self._cap.get(cv2.CAP_PROP_FRAME_COUNT)))
+        self.width = int(self._cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.height = int(self._cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        self.unbounded = self.frame_count == 0
+
+    def read(self) -> Optional[np.ndarray]:
+        ret, frame = self._cap.read()
+        if not ret:
+            return None
+        if not self.width:
+            self.height, self.width = frame.shape[:2] # not reported up front by some streams
+        return frame
+
+    def skip(self) -> bool:
+        return self._cap.grab()
+
+    def close(self):
+        self._cap.release()
+
+
+class RawFrameSource(FrameSource):
+    """
+    Headerless bgr24 frames of a known size read from a binary stream, e.g.
+    `ffmpeg -i <feed> -f rawvideo -pix_fmt bgr24 -` piped into stdin or written to a named pipe.
+
+    A truncated last frame (the writer stopped mid-frame) ends the source and is discarded.
+    """
+
+    def __init__(self, stream: BinaryIO, width: int, height: int, fps: Optional[float] = None, name: str = "-"):
+        super().__init__()
+        self.name = name
+        self.fps = fps or 0.0
+        self.width, self.height = width, height
+        self._stream = stream
+        self._frame_bytes = width * height * 3
+        self._scratch = bytearray(self._frame_bytes) # skipped frames are read into the same buffer
+
+    def _read_into(self, buffer) -> bool:
+        view, filled = memoryview(buffer), 0
+        while filled < self._frame_bytes:
+            n = self._stream.readinto(view[filled:])
+            if not n:
+                if filled:
+                    logging.warning(f"{self.name}: dropped a truncated last frame ({filled}/{self._frame_bytes} bytes)")
+                return False
+            filled += n
+        return True
+
+    def read(self) -> Optional[np.ndarray]:
+        frame = np.empty((self.height, self.width, 3), dtype=np.uint8)
+        return frame if self._read_into(frame.data.cast('B')) else None
+
+    def skip(self) -> bool:
+        return self._read_into(self._scratch)
+
+    def close(self):
+        if self._stream is not sys.stdin.buffer:
+            self._stream.close()
+
+
+def open_frame_source(spec: str, raw_size: Optional[Tuple[int, int]] = None,
+                      fps: Optional[float] = None) -> FrameSource:
+    """
+    Opens a frame source.
+
+    Args:
+        spec (str): '-' for stdin, a path (video file or named pipe) or a stream URL.
+        raw_size (Optional[Tuple[int, int]]): (width, height) of raw bgr24 frames; required for stdin.
+            With a path, the file/pipe is read as raw frames instead of through OpenCV.
+        fps (Optional[float]): Frame rate of raw input (for timestamps), or to override what OpenCV reports.
+
+    Raises:
+        ValueError: stdin without raw_size.
+        FileNotFoundError / IOError: the path doesn't exist or OpenCV can't open the source.
+    """
+    if spec == "-":
+        if raw_size is None:
+            raise ValueError("Reading frames from stdin needs their size (raw bgr24 frames), e.g. 640x480")
+        return RawFrameSource(sys.stdin.buffer, *raw_size, fps=fps, name="stdin")
+    if raw_size is not None:
+        return RawFrameSource(open(spec, 'rb'), *raw_size, fps=fps, name=spec) # blocks until a pipe has a writer
+    source = CaptureSource(spec)
+    if fps:
+        source.fps = fps
+    return source
+
+
+class FrameRingBuffer:
+    """
+    Bounded FIFO between a source's reader thread and the consumer, so memory stays constant on endless inputs.
+
+    When it is full, put() either discards the oldest queued item ("drop") or waits for room
+    ("block"), see BUFFER_POLICIES. close() ends the stream: get() then drains what is left and
+    returns None, and a blocked put() returns without queueing.
+    """
+
+    def __init__(self, capacity: int = DEFAULT_STREAM_BUFFER_SIZE, policy: str = DEFAULT_STREAM_BUFFER_POLICY):
+        if capacity < 1:
+            raise ValueError(f"Buffer capacity must be >= 1, got {capacity}")
+        if policy not in BUFFER_POLICIES:
+            raise ValueError(f"Unknown buffer policy '{policy}', expected one of {BUFFER_POLICIES}")
+        self.capacity = capacity
+        self.policy = policy
+        self.dropped = 0
+        self.max_depth = 0
+        self._items = collections.deque()
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def put(self, item: Any):
+        with self._cond:
+            if self.policy == "block":
+                while len(self._items) >= self.capacity and not self._closed:
+                    self._cond.wait()
+            if self._closed:
+                return
+            if len(self._items) >= self.capacity:
+                self._items.popleft()
+                self.dropped += 1
+            self._items.append(item)
+            self.max_depth = max(self.max_depth, len(self._items))
+            self._cond.notify_all()
+
+    def get(self) -> Optional[Any]:
+        """Next item, waiting for one; None once the buffer is closed and empty."""
+        with self._cond:
+            while not self._items and not self._closed:
+                self._cond.wait()
+            if not self._items:
+                return None
+            item = self._items.popleft()
+            self._cond.notify_all()
+            return item
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+
+def buffered_frames(source: FrameSource, frame_step: int = 1,
+                    buffer: Optional[FrameRingBuffer] = None,
+                    inference_size: Optional[int] = DEFAULT_INFERENCE_SIZE,
+                    stop_event: Optional[threading.Event] = None,
+                    max_frames: Optional[int] = None,
+                    counters: Optional[Dict[str, int]] = None) -> Iterator[Tuple[int, float, np.ndarray]]:
+    """
+    Reads source on a background thread and yields every frame_step-th frame through a FrameRingBuffer.
+
+    The reader never waits for the consumer under the "drop" policy, so a live feed is read at
+    its own pace and a slow detector only loses (the oldest) frames. Frames are downscaled to
+    inference_size before they are queued, so the buffer holds inference-sized frames only.
+
+    Args:
+        source (FrameSource): Input; closed when the generator finishes.
+        frame_step (int): Keep every Nth frame read.
+        buffer (Optional[FrameRingBuffer]): Buffer to use (default: DEFAULT_STREAM_BUFFER_SIZE, drop policy).
+        inference_size (Optional[int]): Long side kept frames are downscaled to (fit_inference_size).
+        stop_event (Optional[threading.Event]): Set to stop reading; queued frames are still yielded.
+        max_frames (Optional[int]): Stop after reading this many frames (None: until the input ends).
+        counters (Optional[Dict[str, int]]): Filled with frames_read, frames_kept, buffer_drops and
+            buffer_max_depth as the stream goes (safe to read while it runs).
+
+    Yields:
+        Tuple[int, float, np.ndarray]: (frame index in the input, FrameSource.timestamp, BGR frame).
+    """
+    if frame_step < 1:
+        raise ValueError(f"frame_step must be >= 1, got {frame_step}")
+    buffer = buffer if buffer is not None else FrameRingBuffer() # an empty buffer is falsy
+    counters = counters if counters is not None else {}
+    counters.update(frames_read=0, frames_kept=0, buffer_drops=0, buffer_max_depth=0)
+    stop_event = stop_event or threading.Event()
+    reader_stop = threading.Event() # the consumer went away
+    errors = []
+
+    def read_loop():
+        frame_idx = 0
+        try:
+            while not (stop_event.is_set() or reader_stop.is_set()):
+                if max_frames is not None and frame_idx >= max_frames:
+                    break
+                if frame_idx % frame_step:
+                    if not source.skip():
+                        break
+                    frame_idx += 1
+                    counters["frames_read"] = frame_idx
+                    continue
+                frame = source.read()
+                if frame is None:
+                    break
+                timestamp = source.timestamp(frame_idx)
+                buffer.put((frame_idx, timestamp, fit_inference_size(frame, inference_size)))
+                frame_idx += 1
+                counters["frames_read"] = frame_idx
+                counters["frames_kept"] += 1
+        except Exception as e:
+            logging.error(f"Reading {source.name} failed: {e}")
+            errors.append(e)
+        finally:
+            buffer.close()
+
+    live = LIVE.scope()
+    live.register("pretag_queue_depth", "gauge", "Items waiting in a pipeline queue.", lambda: len(buffer),
+                  queue="stream_buffer")
+    live.register("pretag_frames_decoded_total", "counter", "Frames read from the video.",
+                  lambda: counters["frames_read"])
+    live.register("pretag_stream_buffer_drops_total", "counter", "Frames discarded by a full stream buffer.",
+                  lambda: buffer.dropped)
+    reader = threading.Thread(target=read_loop, name="frame-source-reader", daemon=True)
+    reader.start()
+    try:
+        while True:
+            item = buffer.get()
+            counters.update(buffer_drops=buffer.dropped, buffer_max_depth=buffer.max_depth)
+            if item is None:
+                break
+            yield item
+    finally:
+        live.close()
+        reader_stop.set()
+        buffer.close()
+        reader.join(timeout=5.0) # a read blocked on an idle pipe can't be interrupted; the thread is a daemon
+        if reader.is_alive():
+            logging.warning(f"Reader of {source.name} is still blocked in a read, leaving it behind.")
+        else:
+            source.close()
+    if errors:
+        raise errors[0]
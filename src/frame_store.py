@@ -0,0 +1,288 @@
+# src/frame_store.py
+import argparse
+import collections
+import contextvars
+import io
+import json
+import logging
+import os
+import tarfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from frame_writer import FrameWriter, FRAME_FORMATS, encode_frame
+from instrumentation import TIMINGS
+from config import DEFAULT_FRAME_FORMAT, DEFAULT_ENCODE_THREADS, DEFAULT_FRAME_STORE, DEFAULT_FRAME_SHARD_MB
+
+# Set up basic logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# "files" -> one image file per frame in frames/ (frame_writer.FrameWriter)
+# "tar"   -> frames packed into frames_XXXXXX.tar shards plus an offset index (PackedFrameWriter / PackedFrameStore)
+FRAME_STORES = ("files", "tar")
+
+STORE_INDEX_NAME = "index.json"
+_SHARD_NAME = "frames_{:06d}.tar"
+_TAR_BLOCK = tarfile.BLOCKSIZE
+
+
+def is_packed_store(path: str) -> bool:
+    """Whether path is a directory written by PackedFrameWriter (an index or at least one shard)."""
+    return os.path.isfile(os.path.join(path, STORE_INDEX_NAME)) or os.path.isfile(os.path.join(path, _SHARD_NAME.format(0)))
+
+
+def open_frame_writer(output_dir: str, frame_store: str = DEFAULT_FRAME_STORE, frame_format: str = DEFAULT_FRAME_FORMAT,
+                      quality: Optional[int] = None, encode_threads: int = DEFAULT_ENCODE_THREADS):
+    """The frame writer of a frame store: FrameWriter for "files", PackedFrameWriter for "tar"."""
+    if frame_store not in FRAME_STORES:
+        raise ValueError(f"Unknown frame store '{frame_store}', expected one of {FRAME_STORES}")
+    if frame_store == "tar":
+        return PackedFrameWriter(output_dir, frame_format, quality, encode_threads)
+    return FrameWriter(output_dir, frame_format, quality, encode_threads)
+
+
+class PackedFrameWriter:
+    """
+    Drop-in for FrameWriter that appends frames to a few large tar shards instead of one file each.
+
+    Frames are encoded on a thread pool like FrameWriter, but appended to the current shard
+    (frames_000000.tar, ...) in submit order, each as a regular tar member named like the file it
+    replaces; a new shard is started once one reaches shard_mb. close() writes index.json with the
+    shard, byte offset and size of every frame, so PackedFrameStore can read any frame with a single
+    read. Shards are plain tar files (`tar -xf` restores the frame files), and without an index
+    (a crashed run) PackedFrameStore rebuilds one from the tar headers.
+    """
+
+    def __init__(self, output_dir: str, frame_format: str = DEFAULT_FRAME_FORMAT, quality: Optional[int] = None,
+                 encode_threads: int = DEFAULT_ENCODE_THREADS, shard_mb: float = DEFAULT_FRAME_SHARD_MB,
+                 max_pending: Optional[int] = None):
+        if frame_format not in FRAME_FORMATS:
+            raise ValueError(f"Unknown frame format '{frame_format}', expected one of {tuple(FRAME_FORMATS)}")
+        os.makedirs(output_dir, exist_ok=True)
+        for name in os.listdir(output_dir): # a re-extraction replaces the whole store
+            if name == STORE_INDEX_NAME or (name.startswith("frames_") and name.endswith(".tar")):
+                os.remove(os.path.join(output_dir, name))
+        self.output_dir = output_dir
+        self.frame_format = frame_format
+        self.quality = quality
+        self.encode_threads = max(1, encode_threads)
+        self.shard_bytes = int(shard_mb * 1024 * 1024)
+        self.max_pending = max_pending or self.encode_threads * 4
+        self._pool = ThreadPoolExecutor(max_workers=self.encode_threads, thread_name_prefix="frame-packer")
+        self._pending = collections.deque() # (file_name, future of the encoded bytes), in submit order
+        self._tar: Optional[tarfile.TarFile] = None
+        self._shards: List[str] = []
+        self._frames: List[Tuple[str, int, int, int]] = [] # (name, shard, data offset, size)
+        self._closed = False
+        self.frames_written = 0
+        self.bytes_written = 0
+        self.encode_s = 0.0
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def _encode(self, frame: np.ndarray) -> Tuple[bytes, float]:
+        start_time = time.perf_counter()
+        data = encode_frame(frame, self.frame_format, self.quality)
+        elapsed = time.perf_counter() - start_time
+        TIMINGS.record("encode", elapsed)
+        return data, elapsed
+
+    def submit(self, file_name: str, frame: np.ndarray):
+        """Queues frame to be stored as file_name. Blocks while max_pending frames are being encoded."""
+        if self._closed:
+            raise IOError(f"Frame store {self.output_dir} is closed")
+        # in the caller's context, so the encode timings go to its run
+        self._pending.append((file_name, self._pool.submit(contextvars.copy_context().run, self._encode, frame)))
+        self._drain(block=len(self._pending) > self.max_pending)
+
+    def _drain(self, block: bool = False):
+        """Appends the encoded frames at the head of the queue; with block, waits for at least the first one."""
+        while self._pending and (block or self._pending[0][1].done()):
+            file_name, future = self._pending.popleft()
+            data, encode_s = future.result() # re-raises an encode error
+            self._append(file_name, data)
+            self.encode_s += encode_s
+            block = False
+
+    def _append(self, file_name: str, data: bytes):
+        with TIMINGS.timer("disk_write"):
+            if self._tar is None or self._tar.offset >= self.shard_bytes:
+                self._next_shard()
+            info = tarfile.TarInfo(file_name)
+            info.size = len(data)
+            info.mtime = int(time.time())
+            self._tar.addfile(info, io.BytesIO(data))
+            # the member's data ends, padded to a whole block, where the tar now stands
+            offset = self._tar.offset - (len(data) + _TAR_BLOCK - 1) // _TAR_BLOCK * _TAR_BLOCK
+        self._frames.append((file_name, len(self._shards) - 1, offset, len(data)))
+        self.frames_written += 1
+        self.bytes_written += len(data)
+
+    def _next_shard(self):
+        if self._tar is not None:
+            self._tar.close()
+        name = _SHARD_NAME.format(len(self._shards))
+        self._tar = tarfile.open(os.path.join(self.output_dir, name), 'w', format=tarfile.GNU_FORMAT)
+        self._shards.append(name)
+
+    def shutdown(self):
+        """Stops without writing the index, for cleanup paths (PackedFrameStore rebuilds it). Safe to call more than once."""
+        self._closed = True
+        self._pool.shutdown(wait=True)
+        if self._tar is not None:
+            self._tar.close()
+            self._tar = None
+
+    def close(self) -> Dict[str, Any]:
+        """Appends every queued frame, writes the index and returns the write metrics; re-raises the first error."""
+        try:
+            while self._pending:
+                self._drain(block=True)
+        finally:
+            self.shutdown()
+        index = {"frame_format": self.frame_format, "shards": self._shards, "frames": self._frames}
+        tmp_path = os.path.join(self.output_dir, STORE_INDEX_NAME + ".tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump(index, f, separators=(',', ':'))
+        os.replace(tmp_path, os.path.join(self.output_dir, STORE_INDEX_NAME))
+        return self.metrics()
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "frame_format": self.frame_format,
+            "frame_store": "tar",
+            "frame_shards": len(self._shards),
+            "encode_threads": self.encode_threads,
+            "frames_written": self.frames_written,
+            "bytes_written": self.bytes_written,
+            "encode_s": self.encode_s, # encode time summed over threads
+            "encode_fps": self.frames_written / self.encode_s if self.encode_s > 0 else 0.0 # per encode thread
+        }
+
+
+def decode_frame(data: bytes, frame_format: str) -> Optional[np.ndarray]:
+    """Inverse of frame_writer.encode_frame: the BGR frame, None if the bytes can't be decoded."""
+    if frame_format == "npy":
+        return np.load(io.BytesIO(data))
+    return cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+
+
+class PackedFrameStore:
+    """
+    Random access to the frames of a PackedFrameWriter store, by position or by file name.
+
+    Every read is a single os.pread at the indexed offset, so any frame is as cheap to reach as the
+    first one and readers in several threads don't share a file position. Iterating yields
+    (file_name, frame) in stored order, which is the order the detector sees saved frames in.
+    """
+
+    def __init__(self, store_dir: str):
+        self.store_dir = store_dir
+        index_path = os.path.join(store_dir, STORE_INDEX_NAME)
+        if os.path.isfile(index_path):
+            with open(index_path) as f:
+                index = json.load(f)
+        else:
+            index = self._rebuild_index(store_dir)
+        self.frame_format = index["frame_format"]
+        self.shards = index["shards"]
+        self._frames = index["frames"]
+        self._positions = {frame[0]: i for i, frame in enumerate(self._frames)}
+        self._fds: Dict[int, int] = {}
+
+    @staticmethod
+    def _rebuild_index(store_dir: str) -> Dict[str, Any]:
+        """Index of an unfinished store, read from the shards' tar headers (a truncated last frame is dropped)."""
+        shards = sorted(name for name in os.listdir(store_dir) if name.startswith("frames_") and name.endswith(".tar"))
+        if not shards:
+            raise FileNotFoundError(f"No frame store in {store_dir}")
+        frames = []
+        for shard, name in enumerate(shards):
+            path = os.path.join(store_dir, name)
+            size = os.path.getsize(path)
+            try:
+                with tarfile.open(path, 'r') as tar:
+                    for member in tar:
+                        if member.isfile() and member.offset_data + member.size <= size:
+                            frames.append([member.name, shard, member.offset_data, member.size])
+            except tarfile.ReadError as e:
+                logging.warning(f"Frame shard {path} ends early ({e}), keeping the frames before that.")
+        extension = os.path.splitext(frames[0][0])[1] if frames else FRAME_FORMATS[DEFAULT_FRAME_FORMAT][0]
+        frame_format = next(fmt for fmt, spec in FRAME_FORMATS.items() if spec[0] == extension)
+        logging.warning(f"{store_dir} has no {STORE_INDEX_NAME} (unfinished run), rebuilt it from {len(shards)} shard(s).")
+        return {"frame_format": frame_format, "shards": shards, "frames": frames}
+
+    def __len__(self) -> int:
+        return len(self._frames)
+
+    @property
+    def names(self) -> List[str]:
+        return [frame[0] for frame in self._frames]
+
+    def index_of(self, file_name: str) -> int:
+        return self._positions[file_name]
+
+    def read_bytes(self, position: int) -> bytes:
+        """The encoded bytes of the position-th frame, exactly as a frame file would hold them."""
+        _, shard, offset, size = self._frames[position]
+        fd = self._fds.get(shard)
+        if fd is None:
+            fd = self._fds[shard] = os.open(os.path.join(self.store_dir, self.shards[shard]), os.O_RDONLY)
+        with TIMINGS.timer("image_read"):
+            return os.pread(fd, size, offset)
+
+    def __getitem__(self, position: int) -> Optional[np.ndarray]:
+        return decode_frame(self.read_bytes(position), self.frame_format)
+
+    def __iter__(self) -> Iterator[Tuple[str, Optional[np.ndarray]]]:
+        for position, frame in enumerate(self._frames):
+            yield frame[0], self[position]
+
+    def close(self):
+        for fd in self._fds.values():
+            os.close(fd)
+        self._fds = {}
+
+    def __enter__(self) -> "PackedFrameStore":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def export_frames(store_dir: str, output_dir: str, positions: Optional[List[int]] = None) -> int:
+    """Writes frames of a store back out as individual files (unchanged bytes) and returns how many."""
+    os.makedirs(output_dir, exist_ok=True)
+    with PackedFrameStore(store_dir) as store:
+        names = store.names
+        for position in (range(len(store)) if positions is None else positions):
+            with open(os.path.join(output_dir, names[position]), 'wb') as f:
+                f.write(store.read_bytes(position))
+        return len(store) if positions is None else len(positions)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect or export a packed frame store (--frame_store tar).")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    info_parser = subparsers.add_parser("info", help="Print the frame count, shards and format of a store as JSON.")
+    info_parser.add_argument("store_dir", type=str)
+    export_parser = subparsers.add_parser("export", help="Write frames of a store out as individual image files.")
+    export_parser.add_argument("store_dir", type=str)
+    export_parser.add_argument("output_dir", type=str)
+    export_parser.add_argument("--frames", type=int, nargs="+", default=None,
+                               help="Positions of the frames to export (default: all).")
+    args = parser.parse_args()
+
+    if args.command == "info":
+        with PackedFrameStore(args.store_dir) as store:
+            print(json.dumps({"frames": len(store), "frame_format": store.frame_format, "shards": store.shards,
+                              "bytes": sum(os.path.getsize(os.path.join(args.store_dir, s)) for s in store.shards)}))
+    else:
+        count = export_frames(args.store_dir, args.output_dir, args.frames)
+        logging.info(f"Exported {count} frame(s) to {args.output_dir}")
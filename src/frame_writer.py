@@ -0,0 +1,146 @@
+# src/frame_writer.py
+import contextvars
+import io
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Optional
+
+import cv2
+import numpy as np
+
+from instrumentation import TIMINGS
+from config import DEFAULT_FRAME_FORMAT, DEFAULT_ENCODE_THREADS
+
+# Set up basic logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# format -> (file extension, OpenCV quality flag, default quality, valid range)
+# "quality" is the JPEG/WebP quality or the PNG compression level; npy frames are stored raw
+FRAME_FORMATS = {
+    "jpg": (".jpg", cv2.IMWRITE_JPEG_QUALITY, 95, (0, 100)),
+    "png": (".png", cv2.IMWRITE_PNG_COMPRESSION, 1, (0, 9)),
+    "webp": (".webp", cv2.IMWRITE_WEBP_QUALITY, 90, (1, 100)),
+    "npy": (".npy", None, None, None),
+}
+
+
+def encode_frame(frame: np.ndarray, frame_format: str = DEFAULT_FRAME_FORMAT, quality: Optional[int] = None) -> bytes:
+    """
+    Encodes one BGR frame to the bytes of a frame file.
+
+    Args:
+        frame (np.ndarray): BGR frame as returned by cv2.VideoCapture.read().
+        frame_format (str): One of FRAME_FORMATS.
+        quality (Optional[int]): JPEG/WebP quality or PNG compression level, format default if None.
+
+    Returns:
+        bytes: The encoded file content.
+    """
+    extension, quality_flag, default_quality, _ = FRAME_FORMATS[frame_format]
+    if quality_flag is None:
+        buffer = io.BytesIO()
+        np.save(buffer, frame)
+        return buffer.getvalue()
+    ok, encoded = cv2.imencode(extension, frame, [quality_flag, default_quality if quality is None else quality])
+    if not ok:
+        raise IOError(f"OpenCV could not encode frame as {frame_format}")
+    return encoded.tobytes()
+
+
+class FrameWriter:
+    """
+    Persists frames on a bounded thread pool so the decode loop doesn't wait for every encode + write.
+
+    OpenCV releases the GIL while encoding, so the encodes run in parallel with decoding on other
+    cores. At most max_pending frames are queued; submit() blocks beyond that, which bounds memory
+    when the disk or encoder can't keep up. The first encode/write error is re-raised by the next
+    submit() or by close().
+    """
+
+    def __init__(self, output_dir: str, frame_format: str = DEFAULT_FRAME_FORMAT, quality: Optional[int] = None,
+                 encode_threads: int = DEFAULT_ENCODE_THREADS, max_pending: Optional[int] = None):
+        if frame_format not in FRAME_FORMATS:
+            raise ValueError(f"Unknown frame format '{frame_format}', expected one of {tuple(FRAME_FORMATS)}")
+        valid_range = FRAME_FORMATS[frame_format][3]
+        if quality is not None and valid_range is not None and not valid_range[0] <= quality <= valid_range[1]:
+            raise ValueError(f"Quality {quality} out of range {valid_range} for {frame_format}")
+
+        os.makedirs(output_dir, exist_ok=True)
+        self.output_dir = output_dir
+        self.frame_format = frame_format
+        self.quality = quality
+        self.encode_threads = max(1, encode_threads)
+        self._pool = ThreadPoolExecutor(max_workers=self.encode_threads, thread_name_prefix="frame-writer")
+        self._slots = threading.BoundedSemaphore(max_pending or self.encode_threads * 4)
+        self._lock = threading.Lock()
+        self._error: Optional[BaseException] = None
+        self.pending = 0 # frames submitted but not written yet
+        self.frames_written = 0
+        self.bytes_written = 0
+        self.encode_s = 0.0 # summed over threads
+
+    def submit(self, file_name: str, frame: np.ndarray):
+        """Queues frame to be written as <output_dir>/<file_name>. Blocks while max_pending frames are queued."""
+        self._raise_error()
+        self._slots.acquire()
+        with self._lock:
+            self.pending += 1
+        try:
+            # in the caller's context, so the encode and write timings go to its run
+            self._pool.submit(contextvars.copy_context().run, self._write, file_name, frame)
+        except Exception:
+            with self._lock:
+                self.pending -= 1
+            self._slots.release()
+            raise
+
+    def _write(self, file_name: str, frame: np.ndarray):
+        try:
+            start_time = time.perf_counter()
+            data = encode_frame(frame, self.frame_format, self.quality)
+            encoded_time = time.perf_counter()
+            with open(os.path.join(self.output_dir, file_name), 'wb') as f:
+                f.write(data)
+            elapsed = time.perf_counter() - start_time
+            TIMINGS.record("encode", encoded_time - start_time)
+            TIMINGS.record("disk_write", start_time + elapsed - encoded_time)
+            with self._lock:
+                self.frames_written += 1
+                self.bytes_written += len(data)
+                self.encode_s += elapsed
+        except BaseException as e:
+            logging.error(f"Failed to write frame {file_name}: {e}")
+            with self._lock:
+                if self._error is None:
+                    self._error = e
+        finally:
+            with self._lock:
+                self.pending -= 1
+            self._slots.release()
+
+    def _raise_error(self):
+        if self._error is not None:
+            raise IOError(f"Writing frames to {self.output_dir} failed: {self._error}") from self._error
+
+    def shutdown(self):
+        """Waits for every queued frame without raising, for cleanup paths. Safe to call more than once."""
+        self._pool.shutdown(wait=True)
+
+    def close(self) -> Dict[str, Any]:
+        """Waits for every queued frame, re-raises the first write error and returns the encode metrics."""
+        self.shutdown()
+        self._raise_error()
+        return self.metrics()
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "frame_format": self.frame_format,
+            "encode_threads": self.encode_threads,
+            "frames_written": self.frames_written,
+            "bytes_written": self.bytes_written,
+            "encode_s": self.encode_s, # encode + write time summed over threads
+            "encode_fps": self.frames_written / self.encode_s if self.encode_s > 0 else 0.0 # per encode thread
+        }
@@ -0,0 +1,257 @@
+# src/inference_backends.py
+import ast
+import logging
+import os
+import time
+from typing import Dict, Any, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from instrumentation import TIMINGS
+
+# Set up basic logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# backend -> what runs the model: "torch" is ultralytics' own PyTorch path, "onnx" an exported ONNX
+# model on ONNX Runtime, "onnx-int8" the same model with dynamically quantized (INT8) weights
+BACKENDS = ("torch", "onnx", "onnx-int8")
+# ONNX Runtime execution providers, in order of preference (OpenVINO only with onnxruntime-openvino)
+PREFERRED_PROVIDERS = ("OpenVINOExecutionProvider", "CPUExecutionProvider")
+
+
+class DetectorBoxes:
+    def __init__(self, data: np.ndarray):
+        self.data = data
+
+
+class DetectorResults:
+    """The part of an ultralytics Results the pipeline reads: orig_shape, boxes.data and speed (ms per phase)."""
+
+    def __init__(self, orig_shape: Tuple[int, int], data: np.ndarray, speed: Dict[str, float]):
+        self.orig_shape = orig_shape
+        self.boxes = DetectorBoxes(data)
+        self.speed = speed
+
+
+def letterbox(image: np.ndarray, new_shape: Tuple[int, int], auto: bool = False, stride: int = 32) -> np.ndarray:
+    """
+    Resizes (keeping the aspect ratio) and pads an image to new_shape (height, width) like ultralytics' LetterBox.
+
+    auto=True only pads up to the next multiple of stride, for models taking any input size.
+    """
+    shape = image.shape[:2]
+    r = min(new_shape[0] / shape[0], new_shape[1] / shape[1])
+    new_unpad = round(shape[1] * r), round(shape[0] * r)
+    dw, dh = new_shape[1] - new_unpad[0], new_shape[0] - new_unpad[1]
+    if auto:
+        dw, dh = dw % stride, dh % stride
+    dw, dh = dw / 2, dh / 2
+    if shape[::-1] != new_unpad:
+        image = cv2.resize(image, new_unpad, interpolation=cv2.INTER_LINEAR)
+    top, bottom = round(dh - 0.1), round(dh + 0.1)
+    left, right = round(dw - 0.1), round(dw + 0.1)
+    return cv2.copyMakeBorder(image, top, bottom, left, right, cv2.BORDER_CONSTANT, value=(114, 114, 114))
+
+
+def nms(boxes: np.ndarray, scores: np.ndarray, iou_threshold: float) -> np.ndarray:
+    """Greedy non-maximum suppression of xyxy boxes, same result as torchvision.ops.nms; indices by descending score."""
+    order = np.argsort(-scores, kind='stable')
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    keep = []
+    while len(order):
+        i = order[0]
+        keep.append(i)
+        rest = order[1:]
+        w = np.clip(np.minimum(boxes[i, 2], boxes[rest, 2]) - np.maximum(boxes[i, 0], boxes[rest, 0]), 0, None)
+        h = np.clip(np.minimum(boxes[i, 3], boxes[rest, 3]) - np.maximum(boxes[i, 1], boxes[rest, 1]), 0, None)
+        inter = w * h
+        iou = inter / (areas[i] + areas[rest] - inter)
+        order = rest[iou <= iou_threshold]
+    return np.array(keep, dtype=np.int64)
+
+
+def postprocess(prediction: np.ndarray, input_shape: Tuple[int, int], orig_shape: Tuple[int, int],
+                conf: float, iou: float, max_det: int, max_wh: int = 7680) -> np.ndarray:
+    """
+    Turns one image's raw YOLOv8 head output ((4 + classes, anchors): cx, cy, w, h, class scores) into boxes.
+
+    Best class per anchor, confidence filter, per-class NMS, then the boxes are mapped from the
+    letterboxed input back to the original image, as ultralytics does.
+
+    Returns:
+        np.ndarray: (N, 6) float32 [x1, y1, x2, y2, conf, cls] rows, highest confidence first.
+    """
+    x = prediction.T
+    scores_all = x[:, 4:]
+    cls = scores_all.argmax(1)
+    scores = scores_all[np.arange(len(x)), cls]
+    keep = scores > conf
+    x, cls, scores = x[keep], cls[keep], scores[keep]
+    if not len(x):
+        return np.zeros((0, 6), dtype=np.float32)
+    boxes = np.empty((len(x), 4), dtype=np.float32)
+    boxes[:, :2] = x[:, :2] - x[:, 2:4] / 2
+    boxes[:, 2:] = x[:, :2] + x[:, 2:4] / 2
+    if len(x) > 30000:
+        top = np.argsort(-scores, kind='stable')[:30000]
+        boxes, cls, scores = boxes[top], cls[top], scores[top]
+    kept = nms(boxes + (cls[:, None] * max_wh).astype(np.float32), scores, iou)[:max_det]
+    boxes, cls, scores = boxes[kept], cls[kept], scores[kept]
+
+    # letterboxed input -> original image coordinates
+    gain = min(input_shape[0] / orig_shape[0], input_shape[1] / orig_shape[1])
+    new_h, new_w = round(orig_shape[0] * gain), round(orig_shape[1] * gain)
+    pad_x, pad_y = round((input_shape[1] - new_w) / 2 - 0.1), round((input_shape[0] - new_h) / 2 - 0.1)
+    boxes[:, [0, 2]] = ((boxes[:, [0, 2]] - pad_x) / (new_w / orig_shape[1])).clip(0, orig_shape[1])
+    boxes[:, [1, 3]] = ((boxes[:, [1, 3]] - pad_y) / (new_h / orig_shape[0])).clip(0, orig_shape[0])
+    return np.column_stack([boxes, scores, cls]).astype(np.float32)
+
+
+class OnnxDetector:
+    """
+    YOLOv8 detector running an exported ONNX model on ONNX Runtime, callable like ultralytics.YOLO.
+
+    Takes a path, a BGR array or a list of either and returns one DetectorResults per image, so
+    object_detector's batching, caching and COCO code work unchanged. Pre- and postprocessing
+    (letterbox, NMS, rescaling) are numpy ports of ultralytics', with its predict defaults
+    (conf 0.25, iou 0.7, max_det 300). Neither ultralytics nor torch is imported.
+    """
+
+    def __init__(self, session: Any, names: Dict[int, str], imgsz: Tuple[int, int] = (640, 640), stride: int = 32,
+                 conf: float = 0.25, iou: float = 0.7, max_det: int = 300, path: Optional[str] = None):
+        self.session = session
+        self.names = names
+        self.imgsz = imgsz
+        self.stride = stride
+        self.conf = conf
+        self.iou = iou
+        self.max_det = max_det
+        self.ckpt_path = path # hashed into detection_cache.model_fingerprint
+        model_input = session.get_inputs()[0]
+        self.input_name = model_input.name
+        # symbolic (str/None) dims were exported with dynamic=True
+        self.dynamic_batch = not isinstance(model_input.shape[0], int)
+        self.dynamic_size = not all(isinstance(dim, int) for dim in model_input.shape[2:])
+        if not self.dynamic_size:
+            self.imgsz = tuple(model_input.shape[2:])
+        self.overrides = {"backend": "onnxruntime", "imgsz": list(self.imgsz), "conf": conf, "iou": iou,
+                          "max_det": max_det}
+
+    @classmethod
+    def load(cls, path: str, threads: Optional[int] = None, **kwargs) -> "OnnxDetector":
+        """
+        Opens an ONNX model exported by ultralytics (class names, input size and stride come from its metadata).
+
+        Args:
+            path (str): The .onnx file.
+            threads (Optional[int]): ONNX Runtime intra-op threads, its default (all cores) if None.
+            **kwargs: conf, iou, max_det overrides.
+        """
+        try:
+            import onnxruntime as ort
+        except ImportError as e:
+            raise ImportError("The onnx backends need onnxruntime (pip install onnxruntime)") from e
+        options = ort.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        available = ort.get_available_providers()
+        providers = [provider for provider in PREFERRED_PROVIDERS if provider in available] or available
+        session = ort.InferenceSession(path, options, providers=providers)
+        metadata = session.get_modelmeta().custom_metadata_map
+        names = ast.literal_eval(metadata["names"]) if "names" in metadata else {}
+        imgsz = tuple(ast.literal_eval(metadata["imgsz"])) if "imgsz" in metadata else (640, 640)
+        stride = int(metadata.get("stride", 32))
+        logging.info(f"ONNX Runtime session for {path} on {session.get_providers()[0]}")
+        return cls(session, names, imgsz, stride, path=path, **kwargs)
+
+    def __call__(self, source, verbose: bool = False, **kwargs) -> List[DetectorResults]:
+        sources = source if isinstance(source, list) else [source]
+        images = []
+        for s in sources:
+            image = cv2.imread(s) if isinstance(s, str) else s
+            if image is None:
+                raise ValueError(f"Could not read image {s}")
+            images.append(image)
+        same_shapes = len({image.shape for image in images}) == 1
+        if self.dynamic_batch and same_shapes:
+            return self._predict(images, auto=self.dynamic_size)
+        return [results for image in images for results in self._predict([image], auto=self.dynamic_size)]
+
+    def _predict(self, images: List[np.ndarray], auto: bool) -> List[DetectorResults]:
+        start = time.perf_counter()
+        batch = np.stack([letterbox(image, self.imgsz, auto, self.stride) for image in images])
+        batch = np.ascontiguousarray(batch[..., ::-1].transpose(0, 3, 1, 2), dtype=np.float32) / 255 # BGR HWC -> RGB CHW
+        preprocess_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        with TIMINGS.timer("backend_run"):
+            prediction = self.session.run(None, {self.input_name: batch})[0]
+        inference_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        data = [postprocess(prediction[i], batch.shape[2:], image.shape[:2], self.conf, self.iou, self.max_det)
+                for i, image in enumerate(images)]
+        postprocess_s = time.perf_counter() - start
+        n = len(images)
+        speed = {"preprocess": 1000 * preprocess_s / n, "inference": 1000 * inference_s / n,
+                 "postprocess": 1000 * postprocess_s / n}
+        return [DetectorResults(image.shape[:2], boxes, speed) for image, boxes in zip(images, data)]
+
+
+def export_onnx(model_name: str, imgsz: int = 640, dynamic: bool = True) -> str:
+    """
+    Exports ultralytics weights to ONNX next to them (<stem>.onnx) and returns its path.
+
+    An existing export newer than the weights is reused. dynamic=True keeps the batch and image
+    size symbolic, so same-shape frames are batched and letterboxed like the PyTorch path does.
+    """
+    onnx_path = f"{os.path.splitext(model_name)[0]}.onnx"
+    if os.path.isfile(onnx_path) and (not os.path.isfile(model_name)
+                                      or os.path.getmtime(onnx_path) >= os.path.getmtime(model_name)):
+        return onnx_path
+    from ultralytics import YOLO
+    logging.info(f"Exporting {model_name} to ONNX ({onnx_path})")
+    exported = YOLO(model_name).export(format="onnx", imgsz=imgsz, dynamic=dynamic)
+    if os.path.abspath(exported) != os.path.abspath(onnx_path):
+        os.replace(exported, onnx_path)
+    return onnx_path
+
+
+def quantize_int8(onnx_path: str) -> str:
+    """
+    Writes a dynamically quantized copy (<stem>.int8.onnx) of an ONNX model and returns its path.
+
+    Weights are stored as UINT8 (Conv/MatMul run as ConvInteger/MatMulInteger), activations are
+    quantized on the fly, so no calibration frames are needed. An existing copy newer than the
+    model is reused. The class names and input size metadata are carried over.
+    """
+    int8_path = f"{os.path.splitext(onnx_path)[0]}.int8.onnx"
+    if os.path.isfile(int8_path) and os.path.getmtime(int8_path) >= os.path.getmtime(onnx_path):
+        return int8_path
+    try:
+        import onnx
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+    except ImportError as e:
+        raise ImportError("INT8 quantization needs onnx and onnxruntime (pip install onnx onnxruntime)") from e
+    logging.info(f"Quantizing {onnx_path} to INT8 ({int8_path})")
+    quantize_dynamic(onnx_path, int8_path, weight_type=QuantType.QUInt8)
+    source, quantized = onnx.load(onnx_path), onnx.load(int8_path)
+    if not quantized.metadata_props:
+        for prop in source.metadata_props:
+            quantized.metadata_props.add(key=prop.key, value=prop.value)
+        onnx.save(quantized, int8_path)
+    return int8_path
+
+
+def backend_model_path(model_name: str, backend: str) -> str:
+    """
+    The model file a backend runs: the weights for "torch", an ONNX export for "onnx" (model_name
+    itself if it already is a .onnx file) and its INT8 copy for "onnx-int8", created if missing.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend '{backend}', expected one of {BACKENDS}")
+    if backend == "torch":
+        return model_name
+    onnx_path = model_name if model_name.lower().endswith(".onnx") else export_onnx(model_name)
+    return quantize_int8(onnx_path) if backend == "onnx-int8" else onnx_path
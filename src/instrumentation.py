@@ -0,0 +1,141 @@
+# src/instrumentation.py
+import threading
+import time
+from array import array
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar, Token
+from typing import Dict, Any, List, Optional
+
+import numpy as np
+
+_NULL_TIMER = nullcontext()
+
+
+class _Timer:
+    __slots__ = ("_timings", "_name", "_start")
+
+    def __init__(self, timings: "OperationTimings", name: str):
+        self._timings = timings
+        self._name = name
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._timings.record(self._name, time.perf_counter() - self._start)
+        return False
+
+
+class OperationTimings:
+    """
+    Per-operation latency samples (decode, encode, inference, ...) on the monotonic perf_counter clock.
+
+    Every sample is kept (8 bytes each in an array), so the percentiles are exact. Recording is
+    a perf_counter() pair plus an array append; when disabled, timer() returns a shared no-op
+    context manager and record() returns immediately. Safe to use from several threads.
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._samples: Dict[str, array] = {}
+        self._lock = threading.Lock()
+
+    def timer(self, name: str):
+        """Context manager recording the time spent inside it as one sample of `name`."""
+        return _Timer(self, name) if self.enabled else _NULL_TIMER
+
+    def record(self, name: str, seconds: float):
+        if not self.enabled:
+            return
+        samples = self._samples.get(name)
+        if samples is None:
+            with self._lock:
+                samples = self._samples.setdefault(name, array('d'))
+        samples.append(seconds)
+
+    def reset(self):
+        with self._lock:
+            self._samples = {}
+
+    def export(self) -> Dict[str, List[float]]:
+        """Raw samples, e.g. to send back from a worker process and merge() there."""
+        with self._lock:
+            return {name: samples.tolist() for name, samples in self._samples.items()}
+
+    def merge(self, samples: Dict[str, List[float]]):
+        if not self.enabled:
+            return
+        for name, values in samples.items():
+            with self._lock:
+                self._samples.setdefault(name, array('d')).extend(values)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """{operation: {count, total_s, mean_ms, p50_ms, p95_ms, p99_ms, max_ms}}, in first-recorded order."""
+        with self._lock:
+            items = list(self._samples.items())
+        summary = {}
+        for name, samples in items:
+            if not samples:
+                continue
+            values = np.array(samples, dtype=np.float64) # one C-level copy, appends can't interleave
+            p50, p95, p99 = np.percentile(values, [50, 95, 99]) * 1000
+            summary[name] = {
+                "count": len(values),
+                "total_s": float(values.sum()),
+                "mean_ms": float(values.mean() * 1000),
+                "p50_ms": float(p50),
+                "p95_ms": float(p95),
+                "p99_ms": float(p99),
+                "max_ms": float(values.max() * 1000)
+            }
+        return summary
+
+
+# The timings of the run in progress in this context, see start_timings
+_ACTIVE: ContextVar[Optional[OperationTimings]] = ContextVar("operation_timings", default=None)
+
+
+class ActiveTimings:
+    """
+    Stands in for the OperationTimings of the run in progress: those passed to start_timings() /
+    use_timings() in this context, else a process-wide instance.
+
+    Runs sharing a process (async jobs, daemon jobs) so keep their samples apart. A run's worker
+    threads record into its timings when they are started with contextvars.copy_context().run.
+    """
+
+    def __init__(self, default: OperationTimings):
+        object.__setattr__(self, "_default", default)
+
+    def current(self) -> OperationTimings:
+        timings = _ACTIVE.get()
+        return self._default if timings is None else timings
+
+    def __getattr__(self, name):
+        return getattr(self.current(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self.current(), name, value)
+
+
+def start_timings(timings: OperationTimings) -> Token:
+    """Makes TIMINGS record into timings in this context (and the threads started from it); undo with end_timings."""
+    return _ACTIVE.set(timings)
+
+
+def end_timings(token: Token):
+    _ACTIVE.reset(token)
+
+
+@contextmanager
+def use_timings(timings: OperationTimings):
+    token = start_timings(timings)
+    try:
+        yield timings
+    finally:
+        end_timings(token)
+
+
+# What the pipeline modules record into; run_pipeline and run_pipeline_async give every run its own timings
+TIMINGS = ActiveTimings(OperationTimings())
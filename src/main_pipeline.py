@@ -5,19 +5,54 @@ import logging
 import time # For timing stages
 import json # For potential future JSON logging
 import csv # For CSV logging
-import cv2
+from typing import Dict, Any, Optional
 
 # Import functions from our refactored modules
-from frame_extractor import extract_frames
-from object_detector import pretag_images_and_generate_coco
+from frame_extractor import extract_frames, SAMPLING_MODES
+from frame_writer import FRAME_FORMATS
+from frame_store import FRAME_STORES, STORE_INDEX_NAME, PackedFrameStore, is_packed_store
+from object_detector import pretag_images_and_generate_coco, load_model
+from inference_backends import BACKENDS
+from pipeline_executor import run_overlapped, run_streamed
+from pipeline_config import PipelineConfig
+from parallel_decode import extract_frames_parallel
+from detection_cache import DetectionCache
+from run_manifest import RunManifest, DetectionJournal, file_fingerprint
 from reporter import generate_markdown_report
+from run_history import RunHistory
+from video_probe import VideoProbe
+from instrumentation import OperationTimings, start_timings, end_timings
+from metrics_exporter import LIVE, MetricsExporter, start_run, end_run
+from resource_governor import (RESOURCE_MODES, resolve_resource_plan, apply_resource_plan, current_resource_settings,
+                               restore_resource_settings)
 from config import (
     DEFAULT_FRAME_OUTPUT_DIR,
     DEFAULT_COCO_OUTPUT_PATH,
     DEFAULT_FRAME_STEP,
+    DEFAULT_SAMPLING_MODE,
+    DEFAULT_FRAME_FORMAT,
+    DEFAULT_ENCODE_THREADS,
+    DEFAULT_FRAME_STORE,
+    DEFAULT_SCENE_THRESHOLD,
+    DEFAULT_SCENE_MIN_INTERVAL,
+    DEFAULT_SCENE_MAX_INTERVAL,
+    DEFAULT_DECODE_WORKERS,
+    DEFAULT_INFERENCE_SIZE,
     DEFAULT_MODEL_NAME,
+    DEFAULT_BATCH_SIZE,
+    DEFAULT_KEYFRAME_INTERVAL,
+    DEFAULT_MIN_TRACK_CONFIDENCE,
+    DEFAULT_BACKEND,
+    DEFAULT_CACHE_MAX_MB,
+    DEFAULT_INFERENCE_WORKERS,
+    DEFAULT_QUEUE_SIZE,
     DEFAULT_REPORT_OUTPUT_PATH, # New
-    DEFAULT_CSV_LOG_PATH # New
+    DEFAULT_CSV_LOG_PATH, # New
+    DEFAULT_MANIFEST_PATH,
+    DEFAULT_JOURNAL_PATH,
+    DEFAULT_METRICS_INTERVAL,
+    DEFAULT_SPOOL_POLL_INTERVAL,
+    DEFAULT_RESOURCE_PROFILES_PATH
 )
 
 # Set up comprehensive logging
@@ -26,112 +61,369 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(
 
 #code to perform input file check
 
-def validate_video_input(video_path: str) -> bool:
+def probe_video_input(video_path: str) -> Optional[VideoProbe]:
     """
-    Performs basic validation on the input video file.
+    Performs basic validation on the input video file and returns its properties.
 
     Checks:
     1. If the file exists.
     2. If OpenCV can open it and determine its frame count (basic format check).
 
+    The video is opened once; the returned VideoProbe keeps that capture for the extraction stage.
+
     Args:
         video_path (str): Path to the input video file.
 
     Returns:
-        bool: True if validation passes, False otherwise.
+        Optional[VideoProbe]: Frame count, fps, resolution and codec, or None if validation fails.
     """
     #bonus validating input file
 
     if not os.path.exists(video_path):
         logging.error(f"Validation Error: Input video file not found at '{video_path}'")
-        return False
+        return None
 
-    cap = cv2.VideoCapture(video_path)
-    if not cap.isOpened():
+    try:
+        probe = VideoProbe.open(video_path)
+    except IOError:
         logging.error(f"Validation Error: Could not open video file '{video_path}'. "
                       "It might be corrupted or in an unsupported format.")
-        cap.release()
-        return False
+        return None
 
     # Check if the video has a valid frame count (more than 0 frames)
     # Some corrupted or invalid files might open but have 0 frames.
-    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-    if frame_count <= 0:
-        logging.error(f"Validation Error: Video '{video_path}' has 0 or invalid frame count ({frame_count}). "
-                      "It might be empty or severely corrupted.")
-        cap.release()
-        return False
+    if probe.frame_count <= 0:
+        logging.error(f"Validation Error: Video '{video_path}' has 0 or invalid frame count ({probe.frame_count}). "
+                      "It might be empty or severely corrupted; live streams and pipes go through stream_pipeline.py.")
+        probe.release()
+        return None
 
-    cap.release()
-    logging.info(f"Input video '{video_path}' passed basic validation.")
-    return True
+    logging.info(f"Input video '{video_path}' passed basic validation: {probe.frame_count} frames, "
+                 f"{probe.width}x{probe.height} @ {probe.fps:.2f} fps, codec {probe.codec}.")
+    return probe
 
 
+def validate_video_input(video_path: str) -> bool:
+    """
+    Performs basic validation on the input video file (see probe_video_input).
 
+    Args:
+        video_path (str): Path to the input video file.
 
-def run_pipeline(video_path: str, output_base_dir: str, frame_step: int, model_name: str):
+    Returns:
+        bool: True if validation passes, False otherwise.
+    """
+    probe = probe_video_input(video_path)
+    if probe is None:
+        return False
+    probe.release()
+    return True
+
+
+def _log_frame_metrics(frame_metrics: dict):
+    logging.info(f"Successfully extracted {frame_metrics.get('frames_extracted', 0)} frames.")
+    logging.info(f"Frame drop ratio: {frame_metrics.get('frame_drop_ratio', 0):.2%}")
+    if "inferences_saved" in frame_metrics:
+        logging.info(f"Scene sampling kept {frame_metrics['frames_extracted']} frames vs {frame_metrics['fixed_step_frames']} "
+                     f"with a fixed step: {frame_metrics['inferences_saved']} inferences saved.")
+
+
+def _log_detection_metrics(detection_metrics: dict):
+    logging.info(f"Successfully detected {detection_metrics.get('total_detections', 0)} objects and generated COCO file.")
+    logging.info(f"Average detections per frame: {detection_metrics.get('detections_per_frame_avg', 0):.2f}")
+    logging.info(f"Class distribution: {detection_metrics.get('class_distribution', {})}")
+
+
+def _run_params(video_path: str, config: PipelineConfig) -> Dict[str, Any]:
+    """What the outputs of a run depend on; a run is only resumed when these are unchanged."""
+    return {
+        "video": file_fingerprint(video_path),
+        "frame_step": config.frame_step,
+        "scene_sampling": config.scene_settings, # None for fixed-step sampling
+        "frame_format": config.frame_format,
+        "frame_quality": config.frame_quality,
+        "frame_store": config.frame_store,
+        "model_name": config.model_name,
+        "backend": config.backend,
+        "inference_size": config.inference_size,
+        "full_resolution_frames": config.full_resolution_frames,
+        # None when every frame is detected
+        "keyframe_tracking": {"keyframe_interval": config.keyframe_interval,
+                              "min_track_confidence": config.min_track_confidence}
+                             if config.keyframe_interval > 1 else None,
+        "model_weights": file_fingerprint(config.model_name) if os.path.isfile(config.model_name) else None
+    }
+
+
+def _frames_present(frames_output_dir: str, frame_metrics: Dict[str, Any]) -> bool:
+    """Whether the frames a completed extraction stage wrote are all still on disk."""
+    if not os.path.isdir(frames_output_dir):
+        return False
+    if is_packed_store(frames_output_dir):
+        if not os.path.isfile(os.path.join(frames_output_dir, STORE_INDEX_NAME)):
+            return False # the extraction didn't finish writing the store
+        with PackedFrameStore(frames_output_dir) as store:
+            saved = len(store)
+        return saved >= frame_metrics.get("frames_extracted", 0)
+    saved = sum(f.startswith("frame_") for f in os.listdir(frames_output_dir))
+    return saved >= frame_metrics.get("frames_extracted", 0)
+
+
+def run_pipeline(video_path: str, output_base_dir: str, config: Optional[PipelineConfig] = None, model=None,
+                 **settings) -> Optional[Dict[str, Any]]:
     """
     Runs the end-to-end video processing and object detection pipeline.
 
     Args:
         video_path (str): Path to the input video file.
         output_base_dir (str): Base directory for all outputs (frames, COCO file).
-        frame_step (int): Interval for frame extraction.
-        model_name (str): Name or path of the object detection model.
+        config (Optional[PipelineConfig]): Settings of the run (see PipelineConfig), the defaults if None.
+        model: Already loaded YOLO model to reuse (e.g. a warm model in a batch worker),
+               loaded from config.model_name if not given.
+        **settings: Settings changed from config, e.g. frame_step=10 or stream_frames=True.
+
+    Returns:
+        Optional[Dict[str, Any]]: All collected metrics, or None if a critical stage failed.
     """
+    run_started = time.time()
+    config = (config or PipelineConfig()).replace(**settings)
+    tune_batch_size = config.batch_size is None
+    config = config.replace(stream_frames=config.stream_frames or not config.save_frames,
+                            batch_size=config.batch_size or DEFAULT_BATCH_SIZE)
     logging.info("Starting MLOps Video Pre-tagging Pipeline...")
     logging.info(f"Input Video: {video_path}")
     logging.info(f"Output Base Directory: {output_base_dir}")
-    logging.info(f"Frame Step: {frame_step}")
-    logging.info(f"Detection Model: {model_name}")
+    logging.info(f"Frame Step: {config.frame_step}")
+    logging.info(f"Sampling Mode: {config.sampling_mode}")
+    if config.sampling_mode == "scene":
+        logging.info(f"Scene Sampling: threshold {config.scene_threshold}, "
+                     f"interval {config.scene_min_interval}-{config.scene_max_interval} frames")
+    logging.info(f"Stream Frames: {config.stream_frames} (save frames: {config.save_frames})")
+    if config.save_frames:
+        quality = config.frame_quality if config.frame_quality is not None else 'default'
+        logging.info(f"Frame Format: {config.frame_format} (quality: {quality}, "
+                     f"{config.encode_threads} encode thread(s), {config.frame_store} store)")
+    logging.info(f"Detection Model: {config.model_name} ({config.backend} backend)")
+    logging.info(f"Batch Size: {config.batch_size}")
+    if config.inference_size:
+        logging.info(f"Inference Size: {config.inference_size} px long side (frames saved at "
+                     f"{'full' if config.full_resolution_frames else 'inference'} resolution)")
+    if config.keyframe_interval > 1:
+        logging.info(f"Keyframe Detection: every {config.keyframe_interval} frame(s), boxes tracked in between "
+                     f"(re-detect below {config.min_track_confidence} tracking confidence)")
+        if config.overlapped and config.inference_workers > 1:
+            logging.warning("Box tracking needs the frames in order, using a single inference worker.")
+            config = config.replace(inference_workers=1)
+    if config.detection_cache:
+        logging.info(f"Detection Cache: {config.detection_cache} (max {config.cache_max_mb} MB)")
+    if config.decode_workers > 1:
+        if config.frame_store != "files":
+            logging.warning("Segment-parallel decoding writes frame files, decoding with a single capture "
+                            f"for the '{config.frame_store}' frame store.")
+            config = config.replace(decode_workers=1)
+        elif config.stream_frames or config.overlapped or config.sampling_mode == "scene":
+            logging.warning("Segment-parallel decoding only applies to sequential, non-scene extraction to disk, "
+                            "decoding with a single capture.")
+            config = config.replace(decode_workers=1)
+        else:
+            logging.info(f"Decode Workers: {config.decode_workers}")
+    if config.overlapped:
+        logging.info(f"Overlapped Execution: {config.inference_workers} inference worker(s), "
+                     f"queue of {config.queue_size} frames")
 
     # --- CALL TO VALIDATE VIDEO INPUT ---
-    if not validate_video_input(video_path):
+    probe = probe_video_input(video_path)
+    if probe is None:
         logging.error("Pipeline aborted due to input video validation failure.")
         return # Exit if a critical stage fails
     # --- END CALL ---
 
     pipeline_stage_times = {}
-    all_metrics = {}
-
-    # Stage 1: Frame Extraction
-    start_time = time.time()
-    frames_output_dir = os.path.join(output_base_dir, DEFAULT_FRAME_OUTPUT_DIR)
+    all_metrics = {"video_metrics": probe.as_dict()}
+    # a daemon or service runs many pipelines in one process: whatever way a run ends, nothing may leak
+    cache, journal = None, None
+    run_token = start_run() # labels the stages' live metrics, see metrics_exporter
+    timings = OperationTimings(enabled=config.instrumentation)
+    timings_token = start_timings(timings) # this run's samples only, even with other runs in the process
+    previous_resources = None
     try:
-        frame_metrics = extract_frames(video_path, frames_output_dir, frame_step)
-        #print(frame_metrics)
-        all_metrics["frame_extraction_metrics"] = frame_metrics
-        logging.info(f"Successfully extracted {frame_metrics.get('frames_extracted', 0)} frames.")
-        logging.info(f"Frame drop ratio: {frame_metrics.get('frame_drop_ratio', 0):.2%}")
-    except Exception as e:
-        logging.error(f"Frame extraction failed: {e}")
-        return # Exit if a critical stage fails
-    pipeline_stage_times['frame_extraction_s'] = time.time() - start_time
-    logging.info(f"Frame Extraction completed in {pipeline_stage_times['frame_extraction_s']:.2f} seconds.")
-
-    # Stage 2: Object Detection and COCO Annotation Generation
-    start_time = time.time()
-    coco_output_path = os.path.join(output_base_dir, DEFAULT_COCO_OUTPUT_PATH)
-    try:
-        detection_result = pretag_images_and_generate_coco(frames_output_dir, coco_output_path, model_name)
-        detection_metrics = detection_result["metrics"]
-        all_metrics["object_detection_metrics"] = detection_metrics
-        logging.info(f"Successfully detected {detection_metrics.get('total_detections', 0)} objects and generated COCO file.")
-        logging.info(f"Average detections per frame: {detection_metrics.get('detections_per_frame_avg', 0):.2f}")
-        logging.info(f"Class distribution: {detection_metrics.get('class_distribution', {})}")
-    except Exception as e:
-        logging.error(f"Object detection and COCO generation failed: {e}")
-        return # Exit if a critical stage fails
-    pipeline_stage_times['object_detection_s'] = time.time() - start_time
-    logging.info(f"Object Detection completed in {pipeline_stage_times['object_detection_s']:.2f} seconds.")
+        if config.resources or config.cpu_set:
+            previous_resources = current_resource_settings(config.backend) # calibration changes them as well
+            calibration_started = time.time()
+            resource_plan, model = resolve_resource_plan(config.resources or "auto", probe, video_path, model,
+                                                         config.model_name, config.backend, cpu_set=config.cpu_set,
+                                                         overlapped=config.overlapped,
+                                                         inference_workers=config.inference_workers,
+                                                         encode_threads=config.encode_threads,
+                                                         decode_workers=config.decode_workers,
+                                                         frame_step=config.frame_step,
+                                                         inference_size=config.inference_size,
+                                                         frame_format=config.frame_format,
+                                                         profiles_path=config.resource_profiles)
+            apply_resource_plan(resource_plan, config.backend)
+            if model is None and config.backend != "torch":
+                model = load_model(config.model_name, config.backend, threads=resource_plan.torch_threads)
+            config = config.replace(encode_threads=resource_plan.encode_threads,
+                                    decode_workers=resource_plan.decode_workers,
+                                    inference_workers=resource_plan.inference_workers)
+            if tune_batch_size and resource_plan.batch_size:
+                config = config.replace(batch_size=resource_plan.batch_size)
+                logging.info(f"Batch Size: {config.batch_size} (calibrated)")
+            all_metrics["resource_plan"] = {
+                **resource_plan.as_dict(),
+                "calibration_s": time.time() - calibration_started if resource_plan.source == "tuned" else None
+            }
+        # boxes of downscaled frames are written in source-resolution coordinates
+        original_size = (probe.width, probe.height) \
+            if config.inference_size and probe.width > 0 and probe.height > 0 else None
+
+        frames_output_dir = os.path.join(output_base_dir, DEFAULT_FRAME_OUTPUT_DIR)
+        coco_output_path = os.path.join(output_base_dir, DEFAULT_COCO_OUTPUT_PATH)
+        if config.detection_cache:
+            cache = DetectionCache(config.detection_cache, config.cache_max_mb)
+
+        os.makedirs(output_base_dir, exist_ok=True)
+        manifest = RunManifest.open(os.path.join(output_base_dir, DEFAULT_MANIFEST_PATH),
+                                    _run_params(video_path, config), config.resume)
+        journal_path = os.path.join(output_base_dir, DEFAULT_JOURNAL_PATH)
+        resume_metrics = {"frame_extraction_reused": False, "detection_reused": False, "frames_restored": 0}
+
+        if (manifest.is_complete("frame_extraction") and manifest.is_complete("object_detection")
+                and os.path.exists(coco_output_path)):
+            # Nothing left to do, the previous run finished
+            logging.info("Frame extraction and object detection already complete, reusing the previous results.")
+            all_metrics["frame_extraction_metrics"] = manifest.stage("frame_extraction")["metrics"]
+            all_metrics["object_detection_metrics"] = manifest.stage("object_detection")["metrics"]
+            pipeline_stage_times.update(frame_extraction_s=0.0, object_detection_s=0.0)
+            resume_metrics.update(frame_extraction_reused=True, detection_reused=True,
+                                  frames_restored=all_metrics["object_detection_metrics"].get("images_processed", 0))
+        elif config.overlapped:
+            # Stages 1 + 2 concurrently: decode thread -> bounded queue -> inference workers -> writer
+            try:
+                journal = DetectionJournal(journal_path, manifest)
+                overlapped_result = run_overlapped(video_path, frames_output_dir if config.save_frames else None,
+                                                   coco_output_path, config, model=model, cache=cache,
+                                                   journal=journal, probe=probe, original_size=original_size)
+            except Exception as e:
+                logging.error(f"Overlapped pipeline execution failed: {e}")
+                return # Exit if a critical stage fails
+            manifest.update("frame_extraction", status="complete", metrics=overlapped_result["frame_extraction_metrics"])
+            pipeline_stage_times.update(overlapped_result["pipeline_stage_times"])
+            all_metrics["frame_extraction_metrics"] = overlapped_result["frame_extraction_metrics"]
+            all_metrics["object_detection_metrics"] = overlapped_result["detection_result"]["metrics"]
+            all_metrics["pipeline_stage_stats"] = overlapped_result["pipeline_stage_stats"]
+            _log_frame_metrics(all_metrics["frame_extraction_metrics"])
+            _log_detection_metrics(all_metrics["object_detection_metrics"])
+            for stage, stats in overlapped_result["pipeline_stage_stats"].items():
+                logging.info(f"  {stage}: {stats}")
+        elif config.stream_frames:
+            # Stages 1 + 2 interleaved: frames go straight from the decoder to the detector as arrays,
+            # the JPEGs in frames/ (if any) are only a side output. File names match the on-disk path.
+            try:
+                journal = DetectionJournal(journal_path, manifest)
+                streamed_result = run_streamed(video_path, frames_output_dir if config.save_frames else None,
+                                               coco_output_path, config, model=model, cache=cache, journal=journal,
+                                               probe=probe, original_size=original_size)
+            except Exception as e:
+                logging.error(f"Streaming frame extraction / object detection failed: {e}")
+                return # Exit if a critical stage fails
+            frame_metrics = streamed_result["frame_extraction_metrics"]
+            manifest.update("frame_extraction", status="complete", metrics=frame_metrics)
+            pipeline_stage_times.update(streamed_result["pipeline_stage_times"])
+            all_metrics["frame_extraction_metrics"] = frame_metrics
+            all_metrics["object_detection_metrics"] = streamed_result["detection_result"]["metrics"]
+            _log_frame_metrics(frame_metrics)
+            _log_detection_metrics(all_metrics["object_detection_metrics"])
+            logging.info(f"Frame Extraction (streamed) took {pipeline_stage_times['frame_extraction_s']:.2f} seconds, "
+                         f"Object Detection {pipeline_stage_times['object_detection_s']:.2f} seconds.")
+        else:
+            # Stage 1: Frame Extraction
+            start_time = time.time()
+            previous = manifest.stage("frame_extraction")
+            if manifest.is_complete("frame_extraction") and _frames_present(frames_output_dir, previous["metrics"]):
+                logging.info(f"Frame extraction already complete, reusing the frames in '{frames_output_dir}'.")
+                all_metrics["frame_extraction_metrics"] = previous["metrics"]
+                resume_metrics["frame_extraction_reused"] = True
+            else:
+                try:
+                    manifest.update("frame_extraction", status="in_progress")
+                    if config.decode_workers > 1:
+                        frame_metrics = extract_frames_parallel(video_path, frames_output_dir, config.frame_step,
+                                                                config.decode_workers, config.frame_format,
+                                                                config.frame_quality, config.encode_threads,
+                                                                probe=probe, inference_size=config.inference_size,
+                                                                full_resolution_frames=config.full_resolution_frames)
+                    else:
+                        frame_metrics = extract_frames(video_path, frames_output_dir, config.frame_step,
+                                                       config.sampling_mode, config.frame_format,
+                                                       config.frame_quality, config.encode_threads, probe=probe,
+                                                       inference_size=config.inference_size,
+                                                       full_resolution_frames=config.full_resolution_frames,
+                                                       frame_store=config.frame_store, **(config.scene_settings or {}))
+                    #print(frame_metrics)
+                    all_metrics["frame_extraction_metrics"] = frame_metrics
+                    _log_frame_metrics(frame_metrics)
+                    manifest.update("frame_extraction", status="complete", metrics=frame_metrics)
+                except Exception as e:
+                    logging.error(f"Frame extraction failed: {e}")
+                    return # Exit if a critical stage fails
+            pipeline_stage_times['frame_extraction_s'] = time.time() - start_time
+            logging.info(f"Frame Extraction completed in {pipeline_stage_times['frame_extraction_s']:.2f} seconds.")
+
+            # Stage 2: Object Detection and COCO Annotation Generation
+            start_time = time.time()
+            try:
+                journal = DetectionJournal(journal_path, manifest)
+                detection_result = pretag_images_and_generate_coco(
+                    frames_output_dir, coco_output_path, config.model_name, model=model,
+                    batch_size=config.batch_size, compact=config.compact_coco, cache=cache, journal=journal,
+                    backend=config.backend,
+                    # full-resolution frames are downscaled as they are read
+                    inference_size=config.inference_size if config.full_resolution_frames else None,
+                    original_size=original_size, keyframe_interval=config.keyframe_interval,
+                    min_track_confidence=config.min_track_confidence)
+                detection_metrics = detection_result["metrics"]
+                all_metrics["object_detection_metrics"] = detection_metrics
+                _log_detection_metrics(detection_metrics)
+            except Exception as e:
+                logging.error(f"Object detection and COCO generation failed: {e}")
+                return # Exit if a critical stage fails
+            pipeline_stage_times['object_detection_s'] = time.time() - start_time
+            logging.info(f"Object Detection completed in {pipeline_stage_times['object_detection_s']:.2f} seconds.")
+    finally:
+        probe.release() # still open if no stage decoded the video (e.g. a finished run was reused)
+        if journal is not None:
+            journal.close() # keeps the journal and its last commit for --resume
+        if cache is not None:
+            cache.close()
+        end_run(run_token)
+        end_timings(timings_token)
+        if previous_resources is not None:
+            restore_resource_settings(previous_resources) # the next run in this process starts from the same state
 
     # Aggregate all pipeline timings
     all_metrics["pipeline_stage_times"] = pipeline_stage_times
+    if config.instrumentation:
+        all_metrics["operation_timings"] = timings.summary()
+    if manifest.resumed:
+        if journal is not None:
+            resume_metrics["frames_restored"] = journal.records_replayed
+        images = all_metrics["object_detection_metrics"].get("images_processed", 0)
+        resume_metrics["detection_reuse_ratio"] = resume_metrics["frames_restored"] / images if images else 0.0
+        all_metrics["resume_metrics"] = resume_metrics
+        logging.info(f"Resumed run: frame extraction {'reused' if resume_metrics['frame_extraction_reused'] else 'redone'}, "
+                     f"{resume_metrics['frames_restored']}/{images} detected frames restored from the checkpoint.")
+    if cache is not None:
+        od_metrics = all_metrics["object_detection_metrics"]
+        logging.info(f"Detection cache: {od_metrics.get('cache_hits', 0)} hits, {od_metrics.get('cache_misses', 0)} misses")
 
     logging.info("Pipeline execution finished.")
     logging.info("--- Pipeline Stage Timings ---")
     for stage, duration in pipeline_stage_times.items():
         logging.info(f"  {stage.replace('_', ' ').title()}: {duration:.2f} seconds")
+    for operation, stats in all_metrics.get("operation_timings", {}).items():
+        logging.info(f"  {operation}: {stats['count']} x, {stats['total_s']:.2f} s total, p50 {stats['p50_ms']:.2f} ms, "
+                     f"p95 {stats['p95_ms']:.2f} ms, p99 {stats['p99_ms']:.2f} ms")
 
     # Generate the Markdown report
     report_output_path = os.path.join(output_base_dir, DEFAULT_REPORT_OUTPUT_PATH)
@@ -149,6 +441,7 @@ def run_pipeline(video_path: str, output_base_dir: str, frame_step: int, model_n
         log_entry_flat = {
             "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
             "video_path": video_path,
+            **{f"video_{k}": v for k, v in all_metrics.get("video_metrics", {}).items()},
             **{f"time_{k.replace('_s','')}": v for k, v in all_metrics.get("pipeline_stage_times", {}).items()},
             **{f"fe_{k}": v for k, v in all_metrics.get("frame_extraction_metrics", {}).items()},
             "od_class_distribution": json.dumps(all_metrics.get("object_detection_metrics", {}).get("class_distribution", {})),
@@ -156,6 +449,11 @@ def run_pipeline(video_path: str, output_base_dir: str, frame_step: int, model_n
                 f"od_{k}": v
                 for k, v in all_metrics.get("object_detection_metrics", {}).items()
                 if k != "class_distribution"
+            },
+            **{
+                f"op_{operation}_{k}": v
+                for operation, stats in all_metrics.get("operation_timings", {}).items()
+                for k, v in stats.items() if k in ("count", "total_s", "p50_ms", "p95_ms", "p99_ms")
             }
         }
         file_exists = os.path.exists(csv_log_path)
@@ -169,6 +467,268 @@ def run_pipeline(video_path: str, output_base_dir: str, frame_step: int, model_n
     except Exception as e:
         logging.warning(f"Could not log metrics to CSV: {e}")
 
+    if config.run_history:
+        try:
+            with RunHistory(config.run_history) as history:
+                model_label = config.model_name if config.backend == "torch" else f"{config.model_name} ({config.backend})"
+                run_id = history.record(video_path, all_metrics, {
+                    # the backends are compared as separate models in the trend reports
+                    "model_name": model_label,
+                    "mode": "overlapped" if config.overlapped else "streamed" if config.stream_frames else "sequential",
+                    "frame_step": config.frame_step,
+                    "sampling_mode": config.sampling_mode,
+                    "batch_size": config.batch_size,
+                    "wall_s": time.time() - run_started
+                }, started_at=run_started)
+            logging.info(f"Run recorded in the run history {config.run_history} (run {run_id})")
+        except Exception as e:
+            logging.warning(f"Could not record the run in the run history: {e}")
+
+    return all_metrics
+
+
+def add_pipeline_arguments(parser: argparse.ArgumentParser):
+    """Adds the per-video pipeline options (everything except input/output paths) to parser."""
+    parser.add_argument(
+        "--frame_step",
+        type=int,
+        default=DEFAULT_FRAME_STEP,
+        help=f"Interval at which frames are extracted (default: {DEFAULT_FRAME_STEP})."
+    )
+    parser.add_argument(
+        "--sampling_mode",
+        type=str,
+        choices=SAMPLING_MODES,
+        default=DEFAULT_SAMPLING_MODE,
+        help=f"How skipped frames are stepped over: 'read' decodes every frame, 'grab' only decodes kept frames fully, "
+             f"'seek' jumps between keyframes, 'auto' picks from frame step and GOP size, 'scene' keeps frames only "
+             f"when the content changes (frame step is then just the baseline) (default: {DEFAULT_SAMPLING_MODE})."
+    )
+    parser.add_argument(
+        "--scene_threshold",
+        type=float,
+        default=DEFAULT_SCENE_THRESHOLD,
+        help=f"--sampling_mode scene: share (0-1) of the frame that must change to keep a frame "
+             f"(default: {DEFAULT_SCENE_THRESHOLD})."
+    )
+    parser.add_argument(
+        "--scene_min_interval",
+        type=int,
+        default=DEFAULT_SCENE_MIN_INTERVAL,
+        help=f"--sampling_mode scene: frames between two compared frames, i.e. the densest sampling (default: {DEFAULT_SCENE_MIN_INTERVAL})."
+    )
+    parser.add_argument(
+        "--scene_max_interval",
+        type=int,
+        default=DEFAULT_SCENE_MAX_INTERVAL,
+        help=f"--sampling_mode scene: keep a frame at least every N frames, even on static footage (default: {DEFAULT_SCENE_MAX_INTERVAL})."
+    )
+    parser.add_argument(
+        "--decode_workers",
+        type=int,
+        default=DEFAULT_DECODE_WORKERS,
+        help=f"Processes decoding keyframe-aligned segments of the video in parallel when extracting frames to disk "
+             f"(sequential, non-scene runs only) (default: {DEFAULT_DECODE_WORKERS})."
+    )
+    parser.add_argument(
+        "--inference_size",
+        type=int,
+        default=DEFAULT_INFERENCE_SIZE,
+        help="Downscale kept frames at decode time so their long side is at most N pixels and detect at that size; "
+             "COCO boxes and image sizes stay in source-resolution coordinates (default: source resolution)."
+    )
+    parser.add_argument(
+        "--full_resolution_frames",
+        action="store_true",
+        help="With --inference_size, still save the frames at the source resolution (e.g. for labelers)."
+    )
+    parser.add_argument(
+        "--stream_frames",
+        action="store_true",
+        help="Stream decoded frames to the detector in memory instead of re-reading JPEGs from disk."
+    )
+    parser.add_argument(
+        "--no_save_frames",
+        action="store_true",
+        help="Don't write extracted frames to <output_dir>/frames (implies --stream_frames)."
+    )
+    parser.add_argument(
+        "--frame_format",
+        type=str,
+        choices=tuple(FRAME_FORMATS),
+        default=DEFAULT_FRAME_FORMAT,
+        help=f"Format of the saved frames, 'npy' stores raw arrays (default: {DEFAULT_FRAME_FORMAT})."
+    )
+    parser.add_argument(
+        "--frame_store",
+        type=str,
+        choices=FRAME_STORES,
+        default=DEFAULT_FRAME_STORE,
+        help="How saved frames are stored: 'files' (one image per frame) or 'tar' (a few large tar shards plus an "
+             f"offset index, for network filesystems and artifact uploads) (default: {DEFAULT_FRAME_STORE})."
+    )
+    parser.add_argument(
+        "--frame_quality",
+        type=int,
+        default=None,
+        help="JPEG/WebP quality (0-100) or PNG compression level (0-9) of the saved frames (default: format default)."
+    )
+    parser.add_argument(
+        "--encode_threads",
+        type=int,
+        default=DEFAULT_ENCODE_THREADS,
+        help=f"Threads encoding and writing saved frames in the background (default: {DEFAULT_ENCODE_THREADS})."
+    )
+    parser.add_argument(
+        "--overlapped",
+        action="store_true",
+        help="Run frame decoding and detection concurrently through a bounded queue."
+    )
+    parser.add_argument(
+        "--inference_workers",
+        type=int,
+        default=DEFAULT_INFERENCE_WORKERS,
+        help=f"Inference threads in --overlapped mode, each loads its own model (default: {DEFAULT_INFERENCE_WORKERS})."
+    )
+    parser.add_argument(
+        "--queue_size",
+        type=int,
+        default=DEFAULT_QUEUE_SIZE,
+        help=f"Max decoded frames waiting for inference in --overlapped mode (default: {DEFAULT_QUEUE_SIZE})."
+    )
+    parser.add_argument(
+        "--model_name",
+        type=str,
+        default=DEFAULT_MODEL_NAME,
+        help=f"Name or path of the object detection model (default: {DEFAULT_MODEL_NAME})."
+    )
+    parser.add_argument(
+        "--backend",
+        type=str,
+        choices=BACKENDS,
+        default=DEFAULT_BACKEND,
+        help=f"What runs the model: 'torch' (ultralytics/PyTorch), 'onnx' (ONNX Runtime on an ONNX export, created "
+             f"next to the weights) or 'onnx-int8' (the export with dynamically quantized INT8 weights). A .onnx "
+             f"--model_name always runs on ONNX Runtime (default: {DEFAULT_BACKEND})."
+    )
+    parser.add_argument(
+        "--resources",
+        type=str,
+        default=None,
+        choices=RESOURCE_MODES,
+        help="Let the pipeline size its OpenCV/torch threads and encode/decode/inference pools to its CPUs "
+             "instead of every library using every core: 'auto' (fixed split) or 'tune' (calibrated on the "
+             "video once per video size/model/CPU count, then reused from --resource_profiles)."
+    )
+    parser.add_argument(
+        "--cpu_set",
+        type=str,
+        default=None,
+        help="Pin the run to these CPUs and plan its threads for them, e.g. 0-7 or 0-3,8-11 "
+             "(for several pipelines on one box; implies --resources auto)."
+    )
+    parser.add_argument(
+        "--resource_profiles",
+        type=str,
+        default=DEFAULT_RESOURCE_PROFILES_PATH,
+        help=f"JSON file the calibrated plans of --resources tune are stored in and reused from "
+             f"(default: {DEFAULT_RESOURCE_PROFILES_PATH})."
+    )
+    parser.add_argument(
+        "--batch_size",
+        type=int,
+        default=None,
+        help=f"Number of frames sent through the detection model in one forward pass (default: {DEFAULT_BATCH_SIZE}, "
+             f"or the calibrated one with --resources tune)."
+    )
+    parser.add_argument(
+        "--keyframe_interval",
+        type=int,
+        default=DEFAULT_KEYFRAME_INTERVAL,
+        help=f"Run the detector on every Nth sampled frame and track its boxes through the frames in between; "
+             f"propagated annotations are marked in the COCO output (default: {DEFAULT_KEYFRAME_INTERVAL}, detect every frame)."
+    )
+    parser.add_argument(
+        "--min_track_confidence",
+        type=float,
+        default=DEFAULT_MIN_TRACK_CONFIDENCE,
+        help=f"--keyframe_interval: re-detect early once a tracked box's confidence drops below this "
+             f"(default: {DEFAULT_MIN_TRACK_CONFIDENCE})."
+    )
+    parser.add_argument(
+        "--compact_coco",
+        action="store_true",
+        help="Write the COCO JSON without indentation (smaller file, same content)."
+    )
+    parser.add_argument(
+        "--detection_cache",
+        type=str,
+        default=None,
+        help="SQLite file caching detections by frame content + model, reused across runs (default: no cache)."
+    )
+    parser.add_argument(
+        "--cache_max_mb",
+        type=float,
+        default=DEFAULT_CACHE_MAX_MB,
+        help=f"Size limit of the detection cache, least recently used entries are evicted (default: {DEFAULT_CACHE_MAX_MB})."
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Continue an interrupted run in the output directory: skip finished stages and resume detection "
+             "from the last checkpoint (only if video, frame step, frame format and model are unchanged)."
+    )
+    parser.add_argument(
+        "--no_instrumentation",
+        action="store_true",
+        help="Don't time individual operations (decode, encode, inference, ...); the report and CSV then only "
+             "have the stage totals."
+    )
+    parser.add_argument(
+        "--run_history",
+        type=str,
+        default=None,
+        help="SQLite file every run is appended to (throughput, stage timings, class counts), for trend reports "
+             "with `reporter.py --run_history` (default: not recorded)."
+    )
+
+
+def pipeline_config_from_args(args: argparse.Namespace) -> PipelineConfig:
+    """Builds the PipelineConfig of the options added by add_pipeline_arguments."""
+    return PipelineConfig(**{
+        "frame_step": args.frame_step,
+        "model_name": args.model_name,
+        "backend": args.backend,
+        "sampling_mode": args.sampling_mode,
+        "stream_frames": args.stream_frames,
+        "save_frames": not args.no_save_frames,
+        "batch_size": args.batch_size,
+        "resources": args.resources,
+        "cpu_set": args.cpu_set,
+        "resource_profiles": args.resource_profiles,
+        "keyframe_interval": args.keyframe_interval,
+        "min_track_confidence": args.min_track_confidence,
+        "overlapped": args.overlapped,
+        "inference_workers": args.inference_workers,
+        "queue_size": args.queue_size,
+        "frame_format": args.frame_format,
+        "frame_store": args.frame_store,
+        "frame_quality": args.frame_quality,
+        "encode_threads": args.encode_threads,
+        "compact_coco": args.compact_coco,
+        "detection_cache": args.detection_cache,
+        "cache_max_mb": args.cache_max_mb,
+        "resume": args.resume,
+        "scene_threshold": args.scene_threshold,
+        "scene_min_interval": args.scene_min_interval,
+        "scene_max_interval": args.scene_max_interval,
+        "decode_workers": args.decode_workers,
+        "inference_size": args.inference_size,
+        "full_resolution_frames": args.full_resolution_frames,
+        "instrumentation": not args.no_instrumentation,
+        "run_history": args.run_history
+    })
+
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(
@@ -177,8 +737,8 @@ if __name__ == "__main__":
     parser.add_argument(
         "--video_path", #whenever calling main.py use "--videopath#path"
         type=str,
-        required=True,
-        help="Path to the input video file (e.g., /app/input/sample.mp4)."
+        default=None,
+        help="Path to the input video file (e.g., /app/input/sample.mp4). Required unless --daemon is given."
     )
     parser.add_argument(
         "--output_dir",
@@ -187,28 +747,90 @@ if __name__ == "__main__":
         help="Base directory to save all generated outputs (frames, COCO JSON, report)."
     )
     parser.add_argument(
-        "--frame_step",
+        "--validate_only", "--validate-only",
+        action="store_true",
+        help="Only check that the video can be read and print its properties as JSON, without loading the model."
+    )
+    parser.add_argument(
+        "--metrics_port",
         type=int,
-        default=DEFAULT_FRAME_STEP,
-        help=f"Interval at which frames are extracted (default: {DEFAULT_FRAME_STEP})."
+        default=None,
+        help="Serve live Prometheus metrics (frames decoded/kept, images inferred, detections, queue depths, "
+             "frames/sec per stage) on http://127.0.0.1:<port>/metrics while the run is in progress."
     )
     parser.add_argument(
-        "--model_name",
+        "--metrics_textfile",
         type=str,
-        default=DEFAULT_MODEL_NAME,
-        help=f"Name or path of the object detection model (default: {DEFAULT_MODEL_NAME})."
+        default=None,
+        help="Rewrite the live metrics to this file (e.g. a node_exporter textfile-collector .prom file)."
+    )
+    parser.add_argument(
+        "--metrics_interval",
+        type=float,
+        default=DEFAULT_METRICS_INTERVAL,
+        help=f"Seconds between live metrics updates (default: {DEFAULT_METRICS_INTERVAL})."
+    )
+    parser.add_argument(
+        "--daemon",
+        action="store_true",
+        help="Load the model once and run the jobs queued in --spool_dir back to back until SIGTERM/SIGINT; each "
+             "job's outputs go to <output_dir>/<job id> unless the job names its own output directory."
+    )
+    parser.add_argument(
+        "--spool_dir",
+        type=str,
+        default="spool",
+        help="Spool directory of --daemon: jobs in incoming/, results in results/ (default: spool)."
     )
+    parser.add_argument(
+        "--poll_interval",
+        type=float,
+        default=DEFAULT_SPOOL_POLL_INTERVAL,
+        help=f"Seconds between looks for new jobs when the spool is empty (default: {DEFAULT_SPOOL_POLL_INTERVAL})."
+    )
+    parser.add_argument(
+        "--exit_when_idle",
+        action="store_true",
+        help="With --daemon, exit once no job is left instead of waiting for more."
+    )
+    add_pipeline_arguments(parser)
 
     args = parser.parse_args()
+    if args.video_path is None and not args.daemon:
+        parser.error("--video_path is required unless --daemon is given")
+    if args.daemon and args.validate_only:
+        parser.error("--validate_only checks one --video_path, it can't be combined with --daemon")
+
+    if args.validate_only:
+        probe = probe_video_input(args.video_path)
+        if probe is None:
+            raise SystemExit(1)
+        probe.release()
+        print(json.dumps({"video_path": args.video_path, **probe.as_dict()}))
+        raise SystemExit(0)
 
     # Create the output directory if it doesn't exist
     os.makedirs(args.output_dir, exist_ok=True)
 
-    #running "runpipeline function"
+    exporter = None
+    if args.metrics_port is not None or args.metrics_textfile:
+        LIVE.register("pretag_run_info", "gauge", "Input and output of the run (always 1).", lambda: 1,
+                      video=args.video_path or args.spool_dir, output_dir=args.output_dir)
+        exporter = MetricsExporter(port=args.metrics_port, textfile=args.metrics_textfile,
+                                   interval=args.metrics_interval).start()
 
-    run_pipeline(
-        video_path=args.video_path,
-        output_base_dir=args.output_dir,
-        frame_step=args.frame_step,
-        model_name=args.model_name
-    )
\ No newline at end of file
+    #running "runpipeline function"
+    try:
+        if args.daemon:
+            from pipeline_daemon import PipelineDaemon # imports this module, keep it out of the import-time graph
+            PipelineDaemon(args.spool_dir, args.output_dir, pipeline_config_from_args(args),
+                           poll_interval=args.poll_interval).serve(exit_when_idle=args.exit_when_idle)
+        else:
+            run_pipeline(
+                video_path=args.video_path,
+                output_base_dir=args.output_dir,
+                config=pipeline_config_from_args(args)
+            )
+    finally:
+        if exporter is not None:
+            exporter.stop()
\ No newline at end of file
@@ -0,0 +1,295 @@
+# src/metrics_exporter.py
+import itertools
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar, Token
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Any, Iterator, List, Optional, Tuple
+
+from config import DEFAULT_METRICS_INTERVAL
+
+# Set up basic logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# stage label of pretag_stage_fps -> counter its rate is computed from
+RATE_COUNTERS = {
+    "decode": "pretag_frames_decoded_total",
+    "keep": "pretag_frames_kept_total",
+    "inference": "pretag_images_inferred_total",
+}
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_labels(labels: Tuple[Tuple[str, str], ...]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels) + "}"
+
+
+# Run the live metrics registered in this context belong to, see start_run()
+_RUN: ContextVar[Optional[str]] = ContextVar("pretag_run", default=None)
+_run_numbers = itertools.count(1)
+
+
+def start_run(run_id: Optional[str] = None) -> Token:
+    """
+    Labels the live metrics the stages register from now on with run=<run_id>; pass the returned token to end_run().
+
+    Without a run_id the enclosing run is kept (a run started by a daemon job), or a new "run-<n>"
+    id is made. Threads don't inherit it: start them with contextvars.copy_context().run.
+    """
+    return _RUN.set(run_id or _RUN.get() or f"run-{next(_run_numbers)}")
+
+
+def end_run(token: Token):
+    _RUN.reset(token)
+
+
+@contextmanager
+def live_run(run_id: Optional[str] = None) -> Iterator[str]:
+    """start_run() / end_run() around a block, yields the run id."""
+    token = start_run(run_id)
+    try:
+        yield _RUN.get()
+    finally:
+        end_run(token)
+
+
+def current_run() -> str:
+    """The id of the enclosing run, or a new one for a stage used on its own."""
+    return _RUN.get() or f"run-{next(_run_numbers)}"
+
+
+def _without_run(labels: Tuple[Tuple[str, str], ...]) -> Tuple[Tuple[str, str], ...]:
+    return tuple((key, value) for key, value in labels if key != "run")
+
+
+class LiveMetrics:
+    """
+    Registry of the pipeline's live counters and gauges, in Prometheus terms.
+
+    The hot loops don't push anything: a stage registers a callable reading a value it already
+    maintains (a counters dict, CocoBuilder.images_processed, a queue's qsize()) and the values
+    are only read when the metrics are rendered. Stages register through a RunMetrics scope, so
+    their sources carry a run label and are unregistered when the stage ends; concurrent runs
+    don't replace each other's sources.
+
+    Counters are process-lifetime totals: a counter series is exported without the run label, as
+    the sum of the live runs' sources and what the finished runs counted, so it never goes back.
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, kind: str, help_text: str, source: Callable[[], float], **labels):
+        """Adds a metric (kind "counter" or "gauge") whose current value is source()."""
+        with self._lock:
+            metric = self._metrics.setdefault(name, {"kind": kind, "help": help_text, "sources": {}, "retired": {}})
+            metric["sources"][tuple(sorted(labels.items()))] = source
+
+    def unregister(self, name: str, **labels):
+        """Removes one source; a counter's last value is kept in the process-lifetime total."""
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            metric = self._metrics.get(name)
+            source = metric["sources"].pop(key, None) if metric is not None else None
+            if source is None or metric["kind"] != "counter":
+                return
+            retired = metric["retired"]
+            series = _without_run(key)
+            retired[series] = retired.get(series, 0.0) + (_read(source) or 0.0)
+
+    def scope(self, run_id: Optional[str] = None) -> "RunMetrics":
+        """A RunMetrics registering into this registry for run_id (default: the current run)."""
+        return RunMetrics(self, run_id)
+
+    def value(self, name: str, **labels) -> Optional[float]:
+        """The value of one series: a counter's process-lifetime total, a gauge's current value (labels include run)."""
+        key = tuple(sorted(labels.items()))
+        for series_labels, value in self._samples(name):
+            if series_labels == key:
+                return value
+        return None
+
+    def _samples(self, name: str) -> List[Tuple[Tuple[Tuple[str, str], ...], float]]:
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                return []
+            kind, sources, retired = metric["kind"], list(metric["sources"].items()), dict(metric["retired"])
+        samples = [(labels, _read(source)) for labels, source in sources]
+        samples = [(labels, value) for labels, value in samples if value is not None]
+        if kind != "counter":
+            return samples
+        totals: Dict[Tuple[Tuple[str, str], ...], float] = dict(retired)
+        for labels, value in samples:
+            series = _without_run(labels)
+            totals[series] = totals.get(series, 0.0) + value
+        return list(totals.items())
+
+    def render(self) -> str:
+        """The current values in the Prometheus text exposition format."""
+        with self._lock:
+            metrics = [(name, metric["kind"], metric["help"]) for name, metric in self._metrics.items()]
+        lines: List[str] = []
+        for name, kind, help_text in metrics:
+            samples = self._samples(name)
+            if not samples:
+                continue
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            lines += [f"{name}{_format_labels(labels)} {value:g}" for labels, value in samples]
+        return "\n".join(lines) + "\n"
+
+
+class RunMetrics:
+    """
+    The live metric sources one stage of a run registers, all labelled run=<run_id>.
+
+    close() (from the stage's finally) unregisters them, so a finished or failed run leaves
+    nothing behind in the process-wide registry.
+    """
+
+    def __init__(self, registry: LiveMetrics, run_id: Optional[str] = None):
+        self.registry = registry
+        self.run_id = run_id or current_run()
+        self._registered: List[Tuple[str, Dict[str, str]]] = []
+
+    def register(self, name: str, kind: str, help_text: str, source: Callable[[], float], **labels):
+        labels["run"] = self.run_id
+        self.registry.register(name, kind, help_text, source, **labels)
+        self._registered.append((name, labels))
+
+    def close(self):
+        for name, labels in self._registered:
+            self.registry.unregister(name, **labels)
+        self._registered = []
+
+
+def _read(source: Callable[[], float]) -> Optional[float]:
+    try:
+        return float(source())
+    except Exception: # a source whose stage is gone (closed queue, ...) is skipped
+        return None
+
+
+# Process-wide registry the pipeline stages register into
+LIVE = LiveMetrics()
+
+
+class MetricsExporter:
+    """
+    Publishes a LiveMetrics registry while a run is in progress.
+
+    Serves it on http://<host>:<port>/metrics, and/or rewrites a node_exporter textfile-collector
+    file (atomically, via a temporary file) every interval seconds. A sampler thread also turns
+    the frame/image counters into per-stage frames/sec gauges (pretag_stage_fps) and tracks when
+    any of them last moved (pretag_last_progress_timestamp_seconds), so a stuck run stands out.
+    """
+
+    def __init__(self, registry: LiveMetrics = LIVE, port: Optional[int] = None, textfile: Optional[str] = None,
+                 interval: float = DEFAULT_METRICS_INTERVAL, host: str = "127.0.0.1"):
+        self.registry = registry
+        self.textfile = textfile
+        self.interval = interval
+        self.port = port
+        self.host = host
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._previous: Dict[str, Tuple[float, float]] = {} # counter -> (time, value) at the last sample
+        self._fps: Dict[str, float] = {}
+        self._started = self._last_progress = time.time()
+
+    def start(self) -> "MetricsExporter":
+        self._started = self._last_progress = time.time()
+        self.registry.register("pretag_exporter_start_time_seconds", "gauge",
+                               "Unix time the metrics exporter was started.", lambda: self._started)
+        self.registry.register("pretag_last_progress_timestamp_seconds", "gauge",
+                               "Unix time a frame or image counter last increased.", lambda: self._last_progress)
+        for stage in RATE_COUNTERS:
+            self.registry.register("pretag_stage_fps", "gauge", "Frames (or images) per second over the last interval.",
+                                   lambda stage=stage: self._fps.get(stage, 0.0), stage=stage)
+
+        if self.port is not None:
+            registry = self.registry
+
+            class Handler(BaseHTTPRequestHandler):
+                def do_GET(self):
+                    if self.path.split("?")[0] not in ("/metrics", "/"):
+                        self.send_error(404)
+                        return
+                    body = registry.render().encode()
+                    self.send_response(200)
+                    self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+
+                def log_message(self, format, *args):
+                    pass # scrapes would flood the pipeline log
+
+            self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+            self._server.daemon_threads = True
+            self.port = self._server.server_address[1] # the one picked if port was 0
+            self._threads.append(threading.Thread(target=self._server.serve_forever, name="metrics-http", daemon=True))
+            logging.info(f"Serving live metrics on http://{self.host}:{self.port}/metrics")
+        if self.textfile is not None:
+            logging.info(f"Writing live metrics to {self.textfile} every {self.interval:g} s")
+        self._threads.append(threading.Thread(target=self._sample_loop, name="metrics-sampler", daemon=True))
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def _sample_loop(self):
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def sample(self):
+        """Updates the frames/sec gauges and, in textfile mode, rewrites the file."""
+        now = time.time()
+        for stage, counter in RATE_COUNTERS.items():
+            value = self.registry.value(counter)
+            if value is None:
+                continue
+            previous_time, previous_value = self._previous.get(counter, (self._started, 0.0))
+            if value != previous_value:
+                self._last_progress = now
+            elapsed = now - previous_time
+            self._fps[stage] = (value - previous_value) / elapsed if elapsed > 0 else 0.0
+            self._previous[counter] = (now, value)
+        if self.textfile is not None:
+            self.write_textfile()
+
+    def write_textfile(self):
+        tmp_path = f"{self.textfile}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'w') as f:
+                f.write(self.registry.render())
+            os.replace(tmp_path, self.textfile)
+        except OSError as e:
+            logging.warning(f"Could not write metrics textfile {self.textfile}: {e}")
+
+    def stop(self):
+        """Stops serving; the textfile is written a last time with the final values."""
+        self._stop.set()
+        self.sample()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+        for thread in self._threads:
+            thread.join()
+
+    def __enter__(self) -> "MetricsExporter":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
@@ -1,20 +1,80 @@
 # src/object_detector.py
 import os
-import json
 import logging
-from ultralytics import YOLO
+import cv2
+import numpy as np
 from tqdm import tqdm
 from collections import defaultdict
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Iterable, Iterator, Optional, Tuple, TYPE_CHECKING
 
 # Set up basic logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+from coco_writer import StreamingCocoWriter
+from detection_cache import DetectionCache
+from run_manifest import DetectionJournal
+from instrumentation import TIMINGS
+from metrics_exporter import LIVE
+from inference_backends import OnnxDetector, backend_model_path
+from frame_extractor import fit_inference_size, frame_sort_key
+from frame_store import PackedFrameStore, is_packed_store
+from box_tracker import TrackingModel
+from config import (DEFAULT_BATCH_SIZE, DEFAULT_COCO_COMPACT, DEFAULT_BACKEND, DEFAULT_KEYFRAME_INTERVAL,
+                    DEFAULT_MIN_TRACK_CONFIDENCE)
+
+if TYPE_CHECKING:
+    from ultralytics import YOLO
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp', '.npy') # .npy = raw frames saved by frame_writer
+
+
+def load_model(model_name: str, backend: str = DEFAULT_BACKEND, threads: Optional[int] = None) -> "YOLO":
+    """
+    Loads the YOLO model once so callers can reuse it across calls.
+
+    ultralytics (and torch with it) is only imported here, so importing this module, --help and
+    input validation don't pay the seconds of import time.
+
+    Args:
+        model_name (str): Name or path of the weights, or of an exported .onnx model.
+        backend (str): "torch" runs ultralytics' PyTorch model; "onnx" and "onnx-int8" run an ONNX export
+                       (dynamically INT8-quantized for "onnx-int8") on ONNX Runtime, see
+                       inference_backends. A .onnx model_name always runs on ONNX Runtime.
+        threads (Optional[int]): ONNX Runtime intra-op threads, its default if None (torch threads are
+                                 set by the caller with torch.set_num_threads).
+
+    Returns:
+        The model, or an inference_backends.OnnxDetector that is called the same way.
+    """
+    if backend == "torch" and model_name.lower().endswith(".onnx"):
+        backend = "onnx"
+    logging.info(f"Loading YOLO model: {model_name} ({backend} backend)")
+    try:
+        with TIMINGS.timer("model_load"):
+            if backend != "torch":
+                return OnnxDetector.load(backend_model_path(model_name, backend), threads=threads)
+            from ultralytics import YOLO
+            return YOLO(model_name)
+    except Exception as e:
+        logging.error(f"Failed to load YOLO model {model_name}: {e}")
+        raise
+
+
 def pretag_images_and_generate_coco(
     image_dir: str,
     output_coco_path: str,
     #model_name: str = 'yolov8n.pt'
-    model_name: str
+    model_name: str,
+    model: Optional["YOLO"] = None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    compact: bool = DEFAULT_COCO_COMPACT,
+    cache: Optional[DetectionCache] = None,
+    journal: Optional[DetectionJournal] = None,
+    backend: str = DEFAULT_BACKEND,
+    inference_size: Optional[int] = None,
+    original_size: Optional[Tuple[int, int]] = None,
+    keyframe_interval: int = DEFAULT_KEYFRAME_INTERVAL,
+    min_track_confidence: float = DEFAULT_MIN_TRACK_CONFIDENCE
 ) -> Dict[str, Any]:
 
 
@@ -22,142 +82,494 @@ def pretag_images_and_generate_coco(
     function - performs object detection on images and generates COCO-format annotations.
 
     paramters arguments:
-        image_dir (str): Directory containing the images to be processed.
+        image_dir (str): Directory containing the images to be processed, or a packed frame store
+                         (frame_store.PackedFrameStore), whose frames are read straight from its shards.
         output_coco_path (str): Full path where the COCO JSON file will be saved.
         model_name (str): Name or path of the YOLO model to use (e.g., 'yolov8n.pt').
+        model (Optional[YOLO]): Already loaded model, loaded from model_name if not given.
+        batch_size (int): Number of images sent through the model in one forward pass.
+        compact (bool): Write the COCO JSON without indentation.
+        cache (Optional[DetectionCache]): Detection cache to answer already seen frames from.
+        journal (Optional[DetectionJournal]): Checkpoint journal, resumes after its committed frames.
+        backend (str): Inference backend used if model isn't given (see load_model).
+        inference_size (Optional[int]): Downscale every image to this long side before detection
+                                        (frame_extractor.fit_inference_size); boxes are mapped back to
+                                        original_size, or to the size of the first image if not given.
+        original_size (Optional[Tuple[int, int]]): (width, height) the COCO output is written in when the
+                                                   images on disk were already downscaled (see CocoBuilder).
+        keyframe_interval, min_track_confidence: Keyframe detection with box propagation (see
+                                                 pretag_frames_and_generate_coco).
 
     Returns:
-        Dict[str, Any]: A dictionary containing COCO-format annotations and detection metrics.
+        Dict[str, Any]: A dictionary containing the detection metrics; the COCO data is only written to output_coco_path.
     """
     if not os.path.exists(image_dir):
         logging.error(f"Image directory not found: {image_dir}")
         raise FileNotFoundError(f"Image directory not found: {image_dir}")
 
-    logging.info(f"Loading YOLO model: {model_name}")
-    try:
-        model = YOLO(model_name)
-    except Exception as e:
-        logging.error(f"Failed to load YOLO model {model_name}: {e}")
-        raise
+    if model is None:
+        model = load_model(model_name, backend)
+
+    if is_packed_store(image_dir):
+        return _pretag_packed_store(image_dir, output_coco_path, model_name, model, batch_size, compact, cache,
+                                    journal, inference_size, original_size, keyframe_interval, min_track_confidence)
 
-    image_files = sorted([f for f in os.listdir(image_dir) if f.lower().endswith(('.jpg', '.jpeg', '.png'))])
+    image_files = sorted([f for f in os.listdir(image_dir) if f.lower().endswith(IMAGE_EXTENSIONS)], key=frame_sort_key)
     if not image_files:
         logging.warning(f"No image files found in '{image_dir}'. Skipping detection.")
-        return {
-            "coco_data": {
-                "images": [],
-                "annotations": [],
-                "categories": []
-            },
-            "metrics": {
-                "images_processed": 0,
-                "total_detections": 0,
-                "detections_per_frame_avg": 0,
-                "class_distribution": {}
+        return _empty_result()
+
+    logging.info(f"Starting pre-tagging of {len(image_files)} images...")
+    if inference_size and original_size is None:
+        first_image = _frame_source(os.path.join(image_dir, image_files[0]), read=True)
+        if first_image is not None:
+            original_size = (first_image.shape[1], first_image.shape[0])
+    frames = ((image_file, _frame_source(os.path.join(image_dir, image_file), inference_size))
+              for image_file in image_files)
+    return pretag_frames_and_generate_coco(frames, output_coco_path, model_name, model=model,
+                                           total=len(image_files), batch_size=batch_size, compact=compact,
+                                           cache=cache, journal=journal, original_size=original_size,
+                                           keyframe_interval=keyframe_interval,
+                                           min_track_confidence=min_track_confidence)
+
+
+def _pretag_packed_store(store_dir: str, output_coco_path: str, model_name: str, model: Optional["YOLO"],
+                         batch_size: int, compact: bool, cache: Optional[DetectionCache],
+                         journal: Optional[DetectionJournal], inference_size: Optional[int],
+                         original_size: Optional[Tuple[int, int]], keyframe_interval: int,
+                         min_track_confidence: float) -> Dict[str, Any]:
+    """pretag_images_and_generate_coco for a packed frame store: frames are decoded from the shards in stored order."""
+    with PackedFrameStore(store_dir) as store:
+        if not len(store):
+            logging.warning(f"No frames in the frame store '{store_dir}'. Skipping detection.")
+            return _empty_result()
+        logging.info(f"Starting pre-tagging of {len(store)} frames from the frame store '{store_dir}'...")
+        first_frame = store[0] if inference_size and original_size is None else None
+        if first_frame is not None:
+            original_size = (first_frame.shape[1], first_frame.shape[0])
+        frames = ((name, fit_inference_size(frame, inference_size) if frame is not None else None)
+                  for name, frame in store) # an undecodable frame is reported by predict_batch
+        return pretag_frames_and_generate_coco(frames, output_coco_path, model_name, model=model, total=len(store),
+                                               batch_size=batch_size, compact=compact, cache=cache, journal=journal,
+                                               original_size=original_size, keyframe_interval=keyframe_interval,
+                                               min_track_confidence=min_track_confidence)
+
+
+def pretag_frames_and_generate_coco(
+    frames: Iterable[Tuple[str, Any]],
+    output_coco_path: str,
+    model_name: str,
+    model: Optional["YOLO"] = None,
+    total: Optional[int] = None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    compact: bool = DEFAULT_COCO_COMPACT,
+    cache: Optional[DetectionCache] = None,
+    journal: Optional[DetectionJournal] = None,
+    backend: str = DEFAULT_BACKEND,
+    original_size: Optional[Tuple[int, int]] = None,
+    keyframe_interval: int = DEFAULT_KEYFRAME_INTERVAL,
+    min_track_confidence: float = DEFAULT_MIN_TRACK_CONFIDENCE
+) -> Dict[str, Any]:
+    """
+    function - performs object detection on frames as they arrive and generates COCO-format annotations.
+
+    Used directly for in-memory streaming from frame_extractor.iter_frames (no JPEG round-trip),
+    and by pretag_images_and_generate_coco for frames already saved on disk.
+
+    paramters arguments:
+        frames (Iterable[Tuple[str, Any]]): (file_name, source) pairs. file_name is what goes into the
+            COCO "images" entry, source is either an image path or a BGR np.ndarray.
+        output_coco_path (str): Full path where the COCO JSON file will be saved.
+        model_name (str): Name or path of the YOLO model to use (e.g., 'yolov8n.pt').
+        model (Optional[YOLO]): Already loaded model, loaded from model_name if not given.
+        total (Optional[int]): Number of frames, only used for the progress bar.
+        batch_size (int): Number of frames sent through the model in one forward pass. Frames are
+            only batched with neighbours of the same shape so letterboxing (and therefore the
+            COCO output) is the same as with batch_size=1. A failing batch is retried image by image.
+        compact (bool): Write the COCO JSON without indentation.
+        cache (Optional[DetectionCache]): Detection cache; frames whose pixels were already
+            detected with the same weights and settings skip the model. Adds cache_hits,
+            cache_misses and cache_hit_ratio to the metrics.
+        journal (Optional[DetectionJournal]): Checkpoint journal of a resumable run. Frames it has
+            committed are restored from it and skipped (they must come first in frames, in the
+            same order); every new frame is appended to it.
+        backend (str): Inference backend used if model isn't given (see load_model).
+        original_size (Optional[Tuple[int, int]]): (width, height) of the source video when the frames
+            were downscaled for detection; the COCO images keep this size and boxes are scaled up to it.
+        keyframe_interval (int): Run the model on every keyframe_interval-th frame only and track its
+            boxes through the frames in between (box_tracker.TrackingModel); frames must then be in
+            video order. Annotations and images get "propagated" (and annotations a "track_id"), and
+            frames_inferred, frames_propagated, inference_ratio and early_redetections are added to
+            the metrics. 1 runs the model on every frame.
+        min_track_confidence (float): Run the model before the next keyframe as soon as a tracked
+            box's confidence drops below this.
+
+    Returns:
+        Dict[str, Any]: A dictionary containing the detection metrics. Images and annotations are
+                        streamed to output_coco_path as they are detected, so memory use does not
+                        grow with the number of frames.
+    """
+    if model is None:
+        model = load_model(model_name, backend)
+
+    if batch_size < 1:
+        raise ValueError(f"batch_size must be >= 1, got {batch_size}")
+
+    if cache is not None:
+        model = cache.wrap(model, model_name)
+        cache_start = cache.counters()
+    if keyframe_interval > 1:
+        model = TrackingModel(model, keyframe_interval, min_track_confidence) # outside the cache: it picks the keyframes
+
+    coco_builder = CocoBuilder(model.names, output_coco_path, compact=compact, journal=journal,
+                               original_size=original_size)
+    try:
+        committed = coco_builder.replay_journal()
+        if isinstance(model, TrackingModel):
+            model.next_track_id = coco_builder.max_track_id + 1 # restored tracks keep their ids
+        frames = skip_committed(frames, committed)
+        frames = tqdm(frames, total=total - len(committed) if total is not None else None, desc="Pre-tagging Images")
+        for image_file, results in _predict_frames(model, frames, batch_size):
+            coco_builder.add(image_file, results)
+    except BaseException:
+        coco_builder.abort()
+        raise
+
+    result = coco_builder.save(batch_size)
+    if cache is not None:
+        result["metrics"].update(cache.metrics(since=cache_start))
+    if isinstance(model, TrackingModel) and coco_builder.images_processed:
+        result["metrics"].update(early_redetections=model.early_redetections, keyframe_interval=keyframe_interval)
+    return result
+
+
+class CocoBuilder:
+    """
+    Streams COCO images/annotations to disk and accumulates the detection metrics one frame at a time.
+
+    Frames must be added in output order: image, annotation and category ids are handed out
+    sequentially as they are added. Only the category map and the metric counters are kept in
+    memory; images and annotations go straight to a coco_writer.StreamingCocoWriter.
+
+    With original_size = (width, height), frames were detected downscaled: every image entry gets
+    the original size and boxes (and their areas) are scaled from the detected frame's orig_shape
+    back to original-resolution pixels. Journal records keep the detected size, so a replayed frame
+    is scaled exactly once as well.
+
+    Results with track_ids (box_tracker.TrackingModel) mark their image and annotations as
+    "propagated" or not and give every annotation its "track_id"; the metrics then count the
+    frames that needed a real inference.
+    """
+
+    def __init__(self, names: Dict[int, str], output_coco_path: str, compact: bool = DEFAULT_COCO_COMPACT,
+                 journal: Optional[DetectionJournal] = None, original_size: Optional[Tuple[int, int]] = None):
+        self.names = names
+        self.journal = journal
+        self.original_size = original_size
+        self.output_coco_path = output_coco_path
+        self.writer = StreamingCocoWriter(output_coco_path, compact=compact)
+        self.categories: List[Dict[str, Any]] = []
+        self.category_map: Dict[str, int] = {}
+        self.next_image_id, self.next_ann_id, self.next_category_id = 1, 1, 1
+
+        self.total_detections = 0
+        self.class_distribution = defaultdict(int)
+        self.images_processed = 0
+        self.frames_tracked = 0 # frames with box_tracker results
+        self.frames_propagated = 0
+        self.max_track_id = 0
+        self.live = LIVE.scope() # unregistered by save() / abort()
+        self.live.register("pretag_images_inferred_total", "counter", "Frames with detections added to the COCO output.",
+                           lambda: self.images_processed)
+        self.live.register("pretag_detections_total", "counter", "Boxes added to the COCO output.",
+                           lambda: self.total_detections)
+
+    def add(self, image_file: str, results: Optional[Any]):
+        """Adds one frame's ultralytics Results; None means the frame failed and only counts as processed."""
+        self._add(image_file, results)
+        if self.journal is not None:
+            self.journal.append(image_file, results)
+
+    def replay_journal(self) -> List[str]:
+        """Re-adds the frames committed to the journal by an interrupted run and returns their file names."""
+        if self.journal is None:
+            return []
+        committed = []
+        for record in self.journal.committed_records():
+            self._add(record["file_name"], self.journal.to_results(record))
+            committed.append(record["file_name"])
+        self.journal.records_replayed = len(committed)
+        if committed:
+            logging.info(f"Restored {len(committed)} already detected frames from {self.journal.path}")
+        return committed
+
+    def _add(self, image_file: str, results: Optional[Any]):
+        self.images_processed += 1
+        if results is None:
+            return # Skip to next image on error
+
+        height, width = results.orig_shape
+        track_ids = getattr(results, 'track_ids', None)
+        propagated = bool(results.propagated) if track_ids is not None else None
+        if track_ids is not None:
+            self.frames_tracked += 1
+            self.frames_propagated += propagated
+            if len(track_ids):
+                self.max_track_id = max(self.max_track_id, int(np.max(track_ids)))
+        scale = None
+        if self.original_size is not None and (width, height) != tuple(self.original_size):
+            scale = np.array([self.original_size[0] / width, self.original_size[1] / height] * 2)
+            width, height = self.original_size
+
+        with TIMINGS.timer("serialize"):
+            image = {
+                "id": self.next_image_id,
+                "file_name": image_file,
+                "height": height,
+                "width": width
             }
+            if propagated is not None:
+                image["propagated"] = propagated
+            self.writer.add_image(image)
+
+        with TIMINGS.timer("postprocess"):
+            boxes = _boxes_array(results.boxes.data)
+            if len(boxes):
+                # Per-class bookkeeping once per distinct class, in order of first appearance
+                cls_ids = boxes[:, 5].astype(np.int64)
+                unique_cls, first_idx, inverse, counts = np.unique(cls_ids, return_index=True, return_inverse=True,
+                                                                   return_counts=True)
+                class_category_ids = np.empty(len(unique_cls), dtype=np.int64)
+                for i in np.argsort(first_idx, kind='stable'):
+                    label = self.names[int(unique_cls[i])]
+                    if label not in self.category_map:
+                        self._add_category(label)
+                    class_category_ids[i] = self.category_map[label]
+                    self.class_distribution[label] += int(counts[i])
+
+                bboxes = boxes[:, :4].copy()
+                bboxes[:, 2:] -= boxes[:, :2] # COCO bbox is [x, y, width, height]
+                if scale is not None:
+                    bboxes *= scale # back to original-resolution pixels
+        if len(boxes):
+            with TIMINGS.timer("serialize"):
+                self.writer.add_annotations(
+                    image_id=self.next_image_id,
+                    first_id=self.next_ann_id,
+                    category_ids=class_category_ids[inverse.reshape(-1)],
+                    bboxes=bboxes,
+                    areas=bboxes[:, 2] * bboxes[:, 3],
+                    confidences=boxes[:, 4],
+                    track_ids=track_ids,
+                    propagated=propagated
+                )
+            self.next_ann_id += len(boxes)
+            self.total_detections += len(boxes)
+
+        self.next_image_id += 1
+
+    def _add_category(self, name: str):
+        self.category_map[name] = self.next_category_id
+        self.categories.append({
+            "id": self.next_category_id,
+            "name": name
+        })
+        self.next_category_id += 1
+
+    def save(self, batch_size: int) -> Dict[str, Any]:
+        """Finishes the COCO JSON file (categories last) and returns {"metrics": ...}."""
+        self.live.close() # every frame is added, the counts go into the process totals
+        images_processed = self.images_processed
+        if images_processed == 0:
+            logging.warning("No frames received. Skipping detection.")
+            self.abort()
+            return _empty_result()
+
+        # Ensure categories are added even if no detections, for consistency in COCO file structure
+        if not self.categories and self.names:
+            for cls_id, name in self.names.items():
+                if name not in self.category_map:
+                    self._add_category(name)
+
+        logging.info(f"Pre-tagging complete. Saving annotations to '{self.output_coco_path}'")
+        try:
+            with TIMINGS.timer("coco_finalize"):
+                self.writer.close(self.categories)
+        except IOError as e:
+            logging.error(f"Failed to save COCO output to {self.output_coco_path}: {e}")
+            raise
+
+        logging.info(f"COCO-format annotations saved to {self.output_coco_path}")
+
+        # Calculate final metrics
+        detections_per_frame_avg = self.total_detections / images_processed if images_processed > 0 else 0
+
+        metrics = {
+            "images_processed": images_processed,
+            "total_detections": self.total_detections,
+            "detections_per_frame_avg": detections_per_frame_avg,
+            "class_distribution": dict(self.class_distribution), # Convert defaultdict to dict for output
+            "batch_size": batch_size
         }
+        if self.frames_tracked:
+            frames_inferred = images_processed - self.frames_propagated
+            metrics.update({
+                "frames_inferred": frames_inferred,
+                "frames_propagated": self.frames_propagated,
+                "inference_ratio": frames_inferred / images_processed
+            })
 
-    coco_output: Dict[str, Any] = {
-        "images": [],
-        "annotations": [],
-        "categories": []
-    }
-    category_map: Dict[str, int] = {}
-    next_image_id, next_ann_id, next_category_id = 1, 1, 1
+        if self.journal is not None:
+            self.journal.finish(metrics)
 
-    total_detections = 0
-    detections_per_frame_counts = []
-    class_distribution = defaultdict(int)
+        return {
+            "metrics": metrics
+        }
+
+    def abort(self):
+        """Drops the partially written COCO file, for error paths. Committed journal entries are kept."""
+        self.live.close()
+        self.writer.abort()
+        if self.journal is not None:
+            self.journal.close()
+
+
+def skip_committed(frames: Iterable[Tuple[str, Any]], committed: List[str]) -> Iterator[Tuple[str, Any]]:
+    """
+    Drops the frames whose detections were restored from a journal and yields the rest.
+
+    Raises:
+        ValueError: If the frames don't start with the committed file names, i.e. the journal
+                    belongs to a different set of frames.
+    """
+    frames = iter(frames)
+    for expected in committed:
+        image_file, _ = next(frames, (None, None))
+        if image_file != expected:
+            raise ValueError(f"Journal does not match the frames: expected {expected}, got {image_file}")
+    yield from frames
 
-    logging.info(f"Starting pre-tagging of {len(image_files)} images...")
 
-    for image_file in tqdm(image_files, desc="Pre-tagging Images"):
-        img_path = os.path.join(image_dir, image_file)
-        
-        current_frame_detections = 0
+def _boxes_array(data: Any) -> np.ndarray:
+    """
+    Results.boxes.data (torch tensor or array of [x1, y1, x2, y2, conf, cls] rows) as an (N, 6) float64 array.
+
+    float64 keeps the arithmetic identical to the Python floats .tolist() used to give.
+    """
+    if hasattr(data, 'cpu'):
+        data = data.cpu().numpy()
+    return np.asarray(data, dtype=np.float64).reshape(-1, 6)
+
+
+def _frame_source(path: str, inference_size: Optional[int] = None, read: bool = False) -> Any:
+    """
+    What to hand to the model for a saved frame: the path, or the array for raw .npy frames YOLO can't read.
+
+    With inference_size (or read=True) the image is read here and downscaled to inference_size, so
+    full-resolution frames on disk are detected at the same size as in-memory ones; None if unreadable.
+    """
+    if path.lower().endswith('.npy'):
         try:
-            results = model(img_path, verbose=False)[0] # verbose=False to reduce console output
+            return fit_inference_size(np.load(path), inference_size)
         except Exception as e:
-            logging.error(f"Error processing image {image_file}: {e}")
-            continue # Skip to next image on error
+            logging.error(f"Could not load raw frame {path}: {e}")
+            return None
+    if not (inference_size or read):
+        return path
+    with TIMINGS.timer("image_read"):
+        image = cv2.imread(path)
+    return fit_inference_size(image, inference_size) if image is not None else None
 
-        height, width = results.orig_shape
 
-        coco_output["images"].append({
-            "id": next_image_id,
-            "file_name": image_file,
-            "height": height,
-            "width": width
-        })
+def _predict_frames(model: "YOLO", frames: Iterable[Tuple[str, Any]],
+                    batch_size: int) -> Iterator[Tuple[str, Optional[Any]]]:
+    """Yields (file_name, Results or None on error) for every frame, in input order, batching the forward passes."""
+    for batch in iter_batches(frames, batch_size):
+        for (image_file, _), results in zip(batch, predict_batch(model, batch)):
+            yield image_file, results
 
-        for det in results.boxes.data.tolist():
-            x1, y1, x2, y2, conf, cls_id = det
-            cls_id = int(cls_id)
-            label = model.names[cls_id]
-
-            if label not in category_map:
-                category_map[label] = next_category_id
-                coco_output["categories"].append({
-                    "id": next_category_id,
-                    "name": label
-                })
-                next_category_id += 1
-
-            bbox_width = x2 - x1
-            bbox_height = y2 - y1
-            coco_output["annotations"].append({
-                "id": next_ann_id,
-                "image_id": next_image_id,
-                "category_id": category_map[label],
-                "bbox": [x1, y1, bbox_width, bbox_height], # COCO bbox is [x, y, width, height]
-                "area": bbox_width * bbox_height,
-                "iscrowd": 0, # Assuming individual objects
-                "segmentation": [], # Not generating segmentation in this basic pipeline
-                "confidence": float(conf) # Added confidence for potential reporting
-            })
-            next_ann_id += 1
-            total_detections += 1
-            current_frame_detections += 1
-            class_distribution[label] += 1
-        
-        detections_per_frame_counts.append(current_frame_detections)
-        next_image_id += 1
-
-    # Ensure categories are added even if no detections, for consistency in COCO file structure
-    if not coco_output["categories"] and model.names:
-        for cls_id, name in model.names.items():
-            if name not in category_map:
-                category_map[name] = next_category_id
-                coco_output["categories"].append({
-                    "id": next_category_id,
-                    "name": name
-                })
-                next_category_id += 1
-
-    logging.info(f"Pre-tagging complete. Saving annotations to '{output_coco_path}'")
-    try:
-        with open(output_coco_path, 'w') as f:
-            json.dump(coco_output, f, indent=2)
-    except IOError as e:
-        logging.error(f"Failed to save COCO output to {output_coco_path}: {e}")
-        raise
 
-    logging.info(f"COCO-format annotations saved to {output_coco_path}")
+def iter_batches(frames: Iterable[Tuple[str, Any]], batch_size: int) -> Iterator[List[Tuple[str, Any]]]:
+    """
+    Groups (file_name, source) pairs into lists of up to batch_size same-shape images.
 
-    # Calculate final metrics
-    images_processed = len(image_files)
-    detections_per_frame_avg = sum(detections_per_frame_counts) / images_processed if images_processed > 0 else 0
+    With batch_size > 1 image paths are read here (cv2.imread, like ultralytics does) so the model
+    gets a list of arrays it can stack into one tensor; an unreadable file is passed on as None and
+    reported by predict_batch. With batch_size=1 sources are passed through untouched.
+    """
+    batch: List[Tuple[str, Any]] = []
+    batch_shape = None
+    for file_name, source in frames:
+        if batch_size == 1:
+            yield [(file_name, source)]
+            continue
+        if isinstance(source, str):
+            with TIMINGS.timer("image_read"):
+                image = cv2.imread(source)
+        else:
+            image = source
+        shape = image.shape if image is not None else None
+        if batch and (shape != batch_shape or len(batch) == batch_size):
+            yield batch
+            batch = []
+        batch.append((file_name, image))
+        batch_shape = shape
+    if batch:
+        yield batch
 
-    metrics = {
-        "images_processed": images_processed,
-        "total_detections": total_detections,
-        "detections_per_frame_avg": detections_per_frame_avg,
-        "class_distribution": dict(class_distribution) # Convert defaultdict to dict for output
-    }
 
+def predict_batch(model: "YOLO", batch: List[Tuple[str, Any]]) -> List[Optional[Any]]:
+    """
+    Runs one forward pass over the batch, returning one ultralytics Results (or None on error) per image.
+
+    If the batched call fails, every image is retried on its own so one bad frame only costs itself.
+    """
+    sources = [source for _, source in batch]
+    if len(batch) > 1 and all(source is not None for source in sources):
+        try:
+            with TIMINGS.timer("inference"):
+                results = model(sources, verbose=False) # verbose=False to reduce console output
+            _record_speed(results)
+            return results
+        except Exception as e:
+            logging.warning(f"Batch of {len(batch)} images failed ({e}), retrying them one by one.")
+
+    results = []
+    for image_file, source in batch:
+        try:
+            if source is None:
+                raise ValueError("could not read image")
+            with TIMINGS.timer("inference"):
+                frame_results = model(source, verbose=False)[0] # verbose=False to reduce console output
+            _record_speed([frame_results])
+            results.append(frame_results)
+        except Exception as e:
+            logging.error(f"Error processing image {image_file}: {e}")
+            results.append(None)
+    return results
+
+
+def _record_speed(results: List[Any]):
+    """Records ultralytics' own per-image split of a forward pass (Results.speed, in ms) as yolo_* timings."""
+    if not TIMINGS.enabled:
+        return
+    for frame_results in results:
+        speed = getattr(frame_results, 'speed', None)
+        if not isinstance(speed, dict):
+            continue # cached or stub results
+        for phase, ms in speed.items():
+            if ms is not None:
+                TIMINGS.record(f"yolo_{phase}", ms / 1000)
+
+
+def _empty_result() -> Dict[str, Any]:
     return {
-        "coco_data": coco_output,
-        "metrics": metrics
+        "metrics": {
+            "images_processed": 0,
+            "total_detections": 0,
+            "detections_per_frame_avg": 0,
+            "class_distribution": {}
+        }
     }
 
 if __name__ == "__main__":
@@ -0,0 +1,219 @@
+# src/parallel_decode.py
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any, List, Optional, Tuple
+
+import cv2
+
+from frame_extractor import extract_frames, fit_inference_size, frame_file_name, landed_on_frame
+from frame_writer import FrameWriter
+from video_probe import VideoProbe
+from instrumentation import TIMINGS
+from config import DEFAULT_FRAME_FORMAT, DEFAULT_ENCODE_THREADS, DEFAULT_DECODE_WORKERS, DEFAULT_INFERENCE_SIZE
+
+# Set up basic logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+def keyframe_positions(video_path: str) -> Optional[List[int]]:
+    """
+    Frame indices of all keyframes, read from the packet headers without decoding (see
+    frame_extractor.probe_gop_size). None if the OpenCV build/backend can't report keyframes.
+    """
+    if not hasattr(cv2, "CAP_PROP_LRF_HAS_KEY_FRAME"):
+        return None
+    cap = cv2.VideoCapture(video_path, cv2.CAP_FFMPEG)
+    try:
+        if not cap.isOpened() or not cap.set(cv2.CAP_PROP_FORMAT, -1):
+            return None
+        keyframes, packet_idx = [], 0
+        while cap.grab():
+            if cap.get(cv2.CAP_PROP_LRF_HAS_KEY_FRAME):
+                keyframes.append(packet_idx)
+            packet_idx += 1
+    finally:
+        cap.release()
+    return keyframes or None
+
+
+def split_segments(total_frames: int, segments: int, keyframes: Optional[List[int]] = None) -> List[Tuple[int, int]]:
+    """
+    Splits [0, total_frames) into up to `segments` contiguous [start, end) ranges.
+
+    Boundaries are moved to the nearest keyframe so every worker can start decoding right at its
+    first frame instead of decoding forward from an earlier keyframe. Ranges that collapse onto
+    the same keyframe are merged.
+    """
+    bounds = {0, total_frames}
+    for i in range(1, segments):
+        target = total_frames * i // segments
+        if keyframes:
+            target = min(keyframes, key=lambda k: abs(k - target))
+        if 0 < target < total_frames:
+            bounds.add(target)
+    bounds = sorted(bounds)
+    return list(zip(bounds, bounds[1:]))
+
+
+def _decode_segment(video_path: str, start: int, end: int, last: bool, frame_step: int, output_dir: str,
+                    frame_format: str, frame_quality: Optional[int], encode_threads: int,
+                    instrument: bool, save_size: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Worker: decodes frames [start, end) with its own capture and saves every frame_step-th one.
+
+    Frames are named from their global index (frame k * frame_step -> frame_file_name(k)), which
+    is what the sequential loop produces as long as no frame fails to decode. "consistent" is
+    False whenever that assumption breaks (the seek didn't land on start, checked by the decoded
+    frame's timestamp as CAP_PROP_POS_FRAMES just echoes the request, or a failed read was
+    followed by a good one); the caller then redoes the extraction sequentially. The operation
+    timings of the worker are sent back in "timings" for the caller to merge. Frames are saved
+    downscaled to save_size (fit_inference_size) when it is set.
+    """
+    TIMINGS.enabled = instrument
+    TIMINGS.reset() # pool processes can run more than one segment
+    counters = {"frames_read": 0, "frames_dropped": 0, "frames_retrieved": 0}
+    written: List[str] = []
+    result = {"start": start, "end": end, "consistent": True, "written": written, "write_metrics": {}}
+    cap = cv2.VideoCapture(video_path)
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    writer = FrameWriter(output_dir, frame_format, frame_quality, encode_threads)
+    try:
+        if start > 0:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+        for frame_idx in range(start, end):
+            with TIMINGS.timer("decode"):
+                success = cap.grab()
+            if not success:
+                counters["frames_dropped"] += 1
+                continue
+            if counters["frames_dropped"]:
+                result["consistent"] = False # a good frame after a bad one: sequential indices would shift
+                return result
+            if frame_idx == start and start > 0 and not landed_on_frame(cap, start, fps):
+                logging.warning(f"Seek to frame {start} landed at {cap.get(cv2.CAP_PROP_POS_MSEC):.1f} ms "
+                                f"instead of {start * 1000.0 / fps if fps > 0 else 0.0:.1f} ms.")
+                result["consistent"] = False
+                return result
+            counters["frames_read"] += 1
+            if frame_idx % frame_step == 0:
+                with TIMINGS.timer("retrieve"):
+                    success, frame = cap.retrieve()
+                if not success:
+                    result["consistent"] = False
+                    return result
+                counters["frames_retrieved"] += 1
+                file_name = frame_file_name(frame_idx // frame_step, frame_format)
+                writer.submit(file_name, fit_inference_size(frame, save_size))
+                written.append(file_name)
+        if counters["frames_dropped"] and not last:
+            result["consistent"] = False # the next segment's frames would shift in the sequential loop
+        result["write_metrics"] = writer.close()
+    finally:
+        cap.release()
+        writer.shutdown()
+        result.update(counters, timings=TIMINGS.export())
+    return result
+
+
+def extract_frames_parallel(video_path: str, output_dir: str, frame_step: int = 30,
+                            workers: int = DEFAULT_DECODE_WORKERS, frame_format: str = DEFAULT_FRAME_FORMAT,
+                            frame_quality: Optional[int] = None,
+                            encode_threads: int = DEFAULT_ENCODE_THREADS,
+                            probe: Optional[VideoProbe] = None,
+                            inference_size: Optional[int] = DEFAULT_INFERENCE_SIZE,
+                            full_resolution_frames: bool = False) -> Dict[str, Any]:
+    """
+    Extracts frames like frame_extractor.extract_frames, decoding keyframe-aligned segments in parallel processes.
+
+    The video is split into `workers` ranges starting at keyframes; each worker process opens its
+    own capture, seeks to its range and saves the kept frames under their global names, so the
+    frames/ directory is identical to the sequential path. Counters are summed across segments.
+    If the frame count is unknown, or a segment can't guarantee sequential-identical indices
+    (inaccurate seek, a failed read in the middle of the video), the frames written so far are
+    removed and the extraction is redone sequentially.
+
+    Args:
+        video_path (str): Path to the input video file.
+        output_dir (str): Folder where extracted frames will be saved.
+        frame_step (int): Interval at which frames are extracted.
+        workers (int): Decode processes.
+        frame_format (str): Saved frame format (see frame_writer.FRAME_FORMATS).
+        frame_quality (Optional[int]): JPEG/WebP quality or PNG compression level.
+        encode_threads (int): Encode threads per worker.
+        probe (Optional[VideoProbe]): Already opened probe of video_path, for the frame count.
+        inference_size (Optional[int]): Save the frames downscaled to this long side (see extract_frames).
+        full_resolution_frames (bool): Save them at the source resolution anyway.
+
+    Returns:
+        Dict[str, Any]: The extract_frames metrics plus decode_workers (processes actually used).
+    """
+    if not os.path.exists(video_path):
+        logging.error(f"Video file not found: {video_path}")
+        raise FileNotFoundError(f"Video file not found: {video_path}")
+
+    probe = probe or VideoProbe.open(video_path)
+    total_frames_in_video = probe.frame_count
+
+    segments = []
+    if workers > 1 and total_frames_in_video > 0:
+        segments = split_segments(total_frames_in_video, workers, keyframe_positions(video_path))
+    if len(segments) < 2:
+        logging.info("Video can't be split into segments, extracting sequentially.")
+        return {**extract_frames(video_path, output_dir, frame_step, "grab", frame_format, frame_quality,
+                                 encode_threads, probe=probe, inference_size=inference_size,
+                                 full_resolution_frames=full_resolution_frames), "decode_workers": 1}
+
+    probe.release() # the workers open their own captures
+    logging.info(f"Decoding {len(segments)} segments {segments} with {len(segments)} processes...")
+    os.makedirs(output_dir, exist_ok=True)
+    # spawn: forking a process that already has decoder/OpenMP thread pools is not safe
+    with ProcessPoolExecutor(max_workers=len(segments), mp_context=multiprocessing.get_context("spawn")) as pool:
+        futures = [pool.submit(_decode_segment, video_path, start, end, i == len(segments) - 1, frame_step,
+                               output_dir, frame_format, frame_quality, encode_threads, TIMINGS.enabled,
+                               None if full_resolution_frames else inference_size)
+                   for i, (start, end) in enumerate(segments)]
+        results = [future.result() for future in futures]
+
+    if not all(result["consistent"] for result in results):
+        bad = [(r["start"], r["end"]) for r in results if not r["consistent"]]
+        logging.warning(f"Segments {bad} could not be decoded with sequential frame indices "
+                        f"(inaccurate seek or unreadable frames), extracting sequentially instead.")
+        for result in results:
+            for file_name in result["written"]:
+                path = os.path.join(output_dir, file_name)
+                if os.path.exists(path):
+                    os.remove(path)
+        return {**extract_frames(video_path, output_dir, frame_step, "grab", frame_format, frame_quality,
+                                 encode_threads, probe=probe, inference_size=inference_size,
+                                 full_resolution_frames=full_resolution_frames), "decode_workers": 1}
+
+    for result in results:
+        TIMINGS.merge(result["timings"])
+    frames_extracted = sum(len(result["written"]) for result in results)
+    frames_dropped = sum(result["frames_dropped"] for result in results)
+    write_metrics = [result["write_metrics"] for result in results]
+    encode_s = sum(m["encode_s"] for m in write_metrics)
+    frames_written = sum(m["frames_written"] for m in write_metrics)
+    logging.info(f"Finished frame extraction.")
+    logging.info(f"Saved {frames_extracted} frames to {output_dir}/")
+    logging.info(f"Dropped {frames_dropped} frames.")
+    resolution_metrics = {"inference_size": inference_size,
+                          "saved_resolution": "full" if full_resolution_frames else "inference"} if inference_size else {}
+    return {
+        "total_frames_in_video": total_frames_in_video,
+        "frames_extracted": frames_extracted,
+        "frames_dropped": frames_dropped,
+        "frame_drop_ratio": frames_dropped / total_frames_in_video,
+        "sampling_mode": "grab",
+        "frames_retrieved": sum(result["frames_retrieved"] for result in results),
+        "frame_format": frame_format,
+        "encode_threads": encode_threads,
+        "frames_written": frames_written,
+        "bytes_written": sum(m["bytes_written"] for m in write_metrics),
+        "encode_s": encode_s,
+        "encode_fps": frames_written / encode_s if encode_s > 0 else 0.0,
+        "decode_workers": len(segments),
+        **resolution_metrics
+    }
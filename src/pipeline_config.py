@@ -0,0 +1,168 @@
+# src/pipeline_config.py
+from dataclasses import dataclass, asdict, fields, replace
+from typing import Dict, Any, Optional
+
+from config import (
+    DEFAULT_MODEL_NAME,
+    DEFAULT_BACKEND,
+    DEFAULT_FRAME_STEP,
+    DEFAULT_SAMPLING_MODE,
+    DEFAULT_SCENE_THRESHOLD,
+    DEFAULT_SCENE_MIN_INTERVAL,
+    DEFAULT_SCENE_MAX_INTERVAL,
+    DEFAULT_DECODE_WORKERS,
+    DEFAULT_INFERENCE_SIZE,
+    DEFAULT_FRAME_FORMAT,
+    DEFAULT_FRAME_STORE,
+    DEFAULT_ENCODE_THREADS,
+    DEFAULT_KEYFRAME_INTERVAL,
+    DEFAULT_MIN_TRACK_CONFIDENCE,
+    DEFAULT_COCO_COMPACT,
+    DEFAULT_CACHE_MAX_MB,
+    DEFAULT_INFERENCE_WORKERS,
+    DEFAULT_QUEUE_SIZE,
+    DEFAULT_RESOURCE_PROFILES_PATH,
+    DEFAULT_INSTRUMENTATION
+)
+
+
+@dataclass(frozen=True)
+class PipelineConfig:
+    """
+    The settings of one pipeline run, handed as a whole to run_pipeline, run_overlapped and iter_frames.
+
+    Built from the command line by main_pipeline.pipeline_config_from_args; a daemon job, a batch
+    worker or a test changes a few of them with replace(). It is frozen, so a run adjusting its
+    settings (e.g. a resource plan's pool sizes) works on its own copy. Objects that belong to one
+    run (the loaded model, the video probe, the detection cache and journal) are passed separately.
+
+    Attributes:
+        model_name (str): Name or path of the object detection model.
+        backend (str): What runs the model if no loaded model is given: "torch" (ultralytics/PyTorch),
+                       "onnx" (an ONNX export on ONNX Runtime) or "onnx-int8" (the same, INT8-quantized),
+                       see object_detector.load_model.
+        frame_step (int): Interval for frame extraction.
+        sampling_mode (str): How skipped frames are stepped over (see frame_extractor.SAMPLING_MODES).
+        scene_threshold (float): sampling_mode="scene": share of the frame that must change to keep a frame.
+        scene_min_interval (int): sampling_mode="scene": frames between two compared frames.
+        scene_max_interval (int): sampling_mode="scene": a frame is kept at least this often.
+        decode_workers (int): Processes decoding keyframe-aligned segments of the video in parallel when
+                              extracting to disk (see parallel_decode.extract_frames_parallel). Not used
+                              when streaming or with sampling_mode="scene", which need one sequential pass.
+        inference_size (Optional[int]): Downscale kept frames once at decode time so their long side is at
+                                        most this many pixels and run detection at that size (YOLO
+                                        letterboxes to its input size anyway). Boxes are mapped back to
+                                        source-resolution coordinates and the COCO images keep the source
+                                        width/height. None keeps the source resolution.
+        full_resolution_frames (bool): With inference_size, still save the frames in <output_base_dir>/frames
+                                       at the source resolution (e.g. for labelers); when they are read back
+                                       for detection they are downscaled then.
+        stream_frames (bool): Hand decoded frames to the detector in memory instead of going through
+                              JPEG files on disk. Extraction and detection then run interleaved.
+        save_frames (bool): Whether frames are written to <output_base_dir>/frames. Only optional when
+                            streaming, so save_frames=False implies stream_frames=True.
+        frame_format (str): Format of the saved frames: 'jpg', 'png', 'webp' or 'npy' (raw).
+        frame_store (str): How frames are saved in frames/: 'files' (one image per frame) or 'tar'
+                           (a few large tar shards plus an offset index, read directly by the detector;
+                           see frame_store.PackedFrameWriter).
+        frame_quality (Optional[int]): JPEG/WebP quality or PNG compression level, format default if None.
+        encode_threads (int): Threads encoding and writing saved frames off the decode loop.
+        batch_size (Optional[int]): Number of frames per detection forward pass. None is DEFAULT_BATCH_SIZE,
+                                    or the calibrated batch size with resources="tune".
+        keyframe_interval (int): Run the detector on every Nth sampled frame only and propagate its boxes
+                                 to the frames in between with an optical-flow tracker (see
+                                 box_tracker.TrackingModel). Propagated annotations are marked
+                                 "propagated" in the COCO output and the report shows the share of
+                                 frames that needed a real inference. 1 detects every frame.
+        min_track_confidence (float): Re-detect before the next keyframe once a tracked box's confidence
+                                      drops below this.
+        compact_coco (bool): Write detections.json without indentation.
+        detection_cache (Optional[str]): Path of a SQLite detection cache shared across runs (and
+                                         batch workers), None to always run the model.
+        cache_max_mb (float): Size limit of the detection cache.
+        overlapped (bool): Run decoding and detection concurrently (decode thread -> bounded queue ->
+                           inference workers -> writer, see pipeline_executor.run_overlapped).
+        inference_workers (int): Inference threads in overlapped mode.
+        queue_size (int): Max decoded frames waiting for inference in overlapped mode.
+        resources (Optional[str]): Let the resource governor set OpenCV and torch thread counts, CPU
+                                   affinity and the encode/decode/inference pool sizes (overriding
+                                   encode_threads, decode_workers and inference_workers; see
+                                   resource_governor.plan_resources): "auto" splits the CPUs with fixed
+                                   rules, "tune" uses the plan calibrated on this video size, model and
+                                   CPU count in resource_profiles (measuring it first on this video if
+                                   there is none) and also sets batch_size if it isn't given. None
+                                   leaves every library at its default. The process-wide settings
+                                   (affinity, OpenCV and torch threads) are restored when the run ends.
+        cpu_set (Optional[str]): CPUs the run is pinned to and plans with, e.g. "0-7" for one of several
+                                 pipelines on a box (implies resources="auto" if resources isn't set).
+        resource_profiles (str): JSON file the calibrated plans of resources="tune" are kept in.
+        resume (bool): Continue an interrupted run in output_base_dir: completed stages are skipped
+                       and detection restarts after the last checkpointed frame (see
+                       run_manifest.RunManifest). Only done when the video, frame_step, frame
+                       format and model are the same as in that run.
+        instrumentation (bool): Time every decode, encode, disk write, inference, postprocess and
+                                serialization step (instrumentation.TIMINGS) and add count, total and
+                                p50/p95/p99 latency per operation to the metrics, report and CSV.
+        run_history (Optional[str]): Path of a SQLite run-history store (see run_history.RunHistory) the
+                                     run is appended to, for trend reports across runs (reporter.py
+                                     --run_history). Can be shared by any number of runs and batch workers.
+    """
+    model_name: str = DEFAULT_MODEL_NAME
+    backend: str = DEFAULT_BACKEND
+    # frame extraction
+    frame_step: int = DEFAULT_FRAME_STEP
+    sampling_mode: str = DEFAULT_SAMPLING_MODE
+    scene_threshold: float = DEFAULT_SCENE_THRESHOLD
+    scene_min_interval: int = DEFAULT_SCENE_MIN_INTERVAL
+    scene_max_interval: int = DEFAULT_SCENE_MAX_INTERVAL
+    decode_workers: int = DEFAULT_DECODE_WORKERS
+    inference_size: Optional[int] = DEFAULT_INFERENCE_SIZE
+    full_resolution_frames: bool = False
+    # saved frames
+    stream_frames: bool = False
+    save_frames: bool = True
+    frame_format: str = DEFAULT_FRAME_FORMAT
+    frame_store: str = DEFAULT_FRAME_STORE
+    frame_quality: Optional[int] = None
+    encode_threads: int = DEFAULT_ENCODE_THREADS
+    # detection
+    batch_size: Optional[int] = None
+    keyframe_interval: int = DEFAULT_KEYFRAME_INTERVAL
+    min_track_confidence: float = DEFAULT_MIN_TRACK_CONFIDENCE
+    compact_coco: bool = DEFAULT_COCO_COMPACT
+    detection_cache: Optional[str] = None
+    cache_max_mb: float = DEFAULT_CACHE_MAX_MB
+    # execution
+    overlapped: bool = False
+    inference_workers: int = DEFAULT_INFERENCE_WORKERS
+    queue_size: int = DEFAULT_QUEUE_SIZE
+    resources: Optional[str] = None
+    cpu_set: Optional[str] = None
+    resource_profiles: str = DEFAULT_RESOURCE_PROFILES_PATH
+    # bookkeeping
+    resume: bool = False
+    instrumentation: bool = DEFAULT_INSTRUMENTATION
+    run_history: Optional[str] = None
+
+    def replace(self, **changes) -> "PipelineConfig":
+        """
+        A copy with some settings changed.
+
+        Raises:
+            TypeError: If a name isn't a pipeline setting.
+        """
+        unknown = set(changes) - {field.name for field in fields(self)}
+        if unknown:
+            raise TypeError(f"Unknown pipeline settings {sorted(unknown)}")
+        return replace(self, **changes) if changes else self
+
+    def as_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+    @property
+    def scene_settings(self) -> Optional[Dict[str, Any]]:
+        """The "scene" sampling settings, None for fixed-step sampling."""
+        if self.sampling_mode != "scene":
+            return None
+        return {"scene_threshold": self.scene_threshold, "scene_min_interval": self.scene_min_interval,
+                "scene_max_interval": self.scene_max_interval}
@@ -0,0 +1,223 @@
+# src/pipeline_daemon.py
+import json
+import logging
+import os
+import signal
+import threading
+import time
+import uuid
+from typing import Dict, Any, List, Optional
+
+from main_pipeline import run_pipeline
+from pipeline_config import PipelineConfig
+from object_detector import load_model
+from instrumentation import OperationTimings
+from metrics_exporter import live_run
+from run_manifest import _write_json_atomic
+from config import DEFAULT_SPOOL_POLL_INTERVAL, DEFAULT_DAEMON_STATS_PATH
+
+# Set up basic logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+SPOOL_DIRS = ("incoming", "processing", "results", "tmp")
+
+
+def submit_job(spool_dir: str, video_path: str, output_dir: Optional[str] = None, job_id: Optional[str] = None,
+               **params) -> str:
+    """
+    Queues a job for a PipelineDaemon watching spool_dir and returns its job id.
+
+    The job file is written to <spool_dir>/tmp and renamed into incoming/, so the daemon never
+    sees a half-written job. Any other writer must do the same (or write a dotfile / *.tmp and
+    rename it).
+
+    Args:
+        spool_dir (str): The daemon's spool directory.
+        video_path (str): Video to pre-tag.
+        output_dir (Optional[str]): Output directory of the run, <daemon output root>/<job id> if None.
+        job_id (Optional[str]): Name of the job (and of its result file), a new unique id if None.
+        **params: PipelineConfig settings overriding the daemon's (frame_step, batch_size, ...).
+    """
+    job_id = job_id or f"{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+    for name in SPOOL_DIRS:
+        os.makedirs(os.path.join(spool_dir, name), exist_ok=True)
+    job = {"video_path": video_path, "output_dir": output_dir, "params": params}
+    tmp_path = os.path.join(spool_dir, "tmp", f"{job_id}.json")
+    _write_json_atomic(tmp_path, job)
+    os.replace(tmp_path, os.path.join(spool_dir, "incoming", f"{job_id}.json"))
+    return job_id
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class PipelineDaemon:
+    """
+    Long-running worker that loads the model once and runs queued pipeline jobs back to back.
+
+    Jobs are JSON files in <spool_dir>/incoming/ ({"video_path", "output_dir", "params"}, see
+    submit_job), taken oldest first. A job is claimed by renaming it into processing/ under this
+    process's pid, so several daemons can share a spool without running a job twice; jobs left in
+    processing/ by a daemon that died are put back into incoming/ on start. Each job's result
+    ({"status", "error", timings, "metrics"}) is written atomically to results/<job id>.json, and
+    the latency percentiles of all jobs so far to daemon_stats.json. stop() (SIGTERM/SIGINT in
+    serve()) lets the job in progress finish and leaves queued jobs for the next start.
+    """
+
+    def __init__(self, spool_dir: str, output_root: str, config: PipelineConfig, model=None,
+                 poll_interval: float = DEFAULT_SPOOL_POLL_INTERVAL):
+        self.spool_dir = spool_dir
+        self.output_root = output_root
+        self.config = config
+        self.model = model
+        self.poll_interval = poll_interval
+        self.latencies = OperationTimings()
+        self.jobs_ok, self.jobs_failed = 0, 0
+        self.model_load_s = 0.0
+        self.started_at = time.time()
+        self._stop = threading.Event()
+        self.dirs = {name: os.path.join(spool_dir, name) for name in SPOOL_DIRS}
+        for path in self.dirs.values():
+            os.makedirs(path, exist_ok=True)
+
+    def stop(self):
+        """Asks the daemon to exit once the job in progress is done."""
+        self._stop.set()
+
+    def load(self):
+        """Loads the model once (unless one was given), before the first job."""
+        if self.model is None:
+            start = time.perf_counter()
+            self.model = load_model(self.config.model_name, self.config.backend)
+            self.model_load_s = time.perf_counter() - start
+            logging.info(f"Model loaded in {self.model_load_s:.2f} seconds, waiting for jobs in {self.dirs['incoming']}")
+
+    def recover(self) -> List[str]:
+        """Puts jobs claimed by daemons that are no longer running back into incoming/."""
+        requeued = []
+        for name in sorted(os.listdir(self.dirs["processing"])):
+            pid, _, job_name = name.partition("-")
+            if pid.isdigit() and int(pid) != os.getpid() and _pid_alive(int(pid)):
+                continue
+            os.replace(os.path.join(self.dirs["processing"], name), os.path.join(self.dirs["incoming"], job_name))
+            requeued.append(job_name)
+        if requeued:
+            logging.warning(f"Re-queued {len(requeued)} unfinished job(s): {requeued}")
+        return requeued
+
+    def claim_next(self) -> Optional[str]:
+        """Moves the oldest waiting job into processing/ and returns its new path, None if there is none."""
+        incoming = self.dirs["incoming"]
+        candidates = []
+        for name in os.listdir(incoming):
+            if name.startswith('.') or not name.endswith(".json"):
+                continue # dotfiles / *.tmp: still being written
+            try:
+                candidates.append((os.path.getmtime(os.path.join(incoming, name)), name))
+            except FileNotFoundError:
+                continue # claimed by another daemon meanwhile
+        for _, name in sorted(candidates):
+            claimed = os.path.join(self.dirs["processing"], f"{os.getpid()}-{name}")
+            try:
+                os.rename(os.path.join(incoming, name), claimed)
+                return claimed
+            except FileNotFoundError:
+                continue
+        return None
+
+    def process(self, claimed_path: str) -> Dict[str, Any]:
+        """Runs one claimed job and writes its result; never raises for a failing job."""
+        job_id = os.path.basename(claimed_path).partition("-")[2][:-len(".json")]
+        started_at = time.time()
+        queued_at = os.path.getmtime(claimed_path) # rename keeps the mtime of the submitted file
+        result = {"job_id": job_id, "status": "failed", "error": None, "video_path": None, "output_dir": None,
+                  "queued_at": queued_at, "started_at": started_at, "metrics": None}
+        try:
+            with open(claimed_path) as f:
+                job = json.load(f)
+            params = job.get("params") or {}
+            config = self.config.replace(**params) # rejects unknown settings
+            for key in ("model_name", "backend"):
+                if getattr(config, key) != getattr(self.config, key):
+                    raise ValueError(f"{key} {params[key]!r} differs from the daemon's loaded model "
+                                     f"({getattr(self.config, key)!r})")
+            result["video_path"] = job["video_path"]
+            result["output_dir"] = job.get("output_dir") or os.path.join(self.output_root, job_id)
+            logging.info(f"Job {job_id}: {result['video_path']} -> {result['output_dir']}")
+            with live_run(job_id): # the job's live metrics are labelled run=<job_id>
+                metrics = run_pipeline(result["video_path"], result["output_dir"], config, model=self.model)
+            if metrics is None:
+                raise RuntimeError("pipeline aborted, see the daemon log")
+            result.update(status="ok", metrics=metrics)
+        except Exception as e:
+            result["error"] = str(e)
+            logging.error(f"Job {job_id} failed: {e}")
+
+        finished_at = time.time()
+        result.update(finished_at=finished_at, queue_wait_s=started_at - queued_at, run_s=finished_at - started_at,
+                      latency_s=finished_at - queued_at)
+        self.latencies.record("queue_wait", result["queue_wait_s"])
+        self.latencies.record("run", result["run_s"])
+        self.latencies.record("latency", result["latency_s"])
+        if result["status"] == "ok":
+            self.jobs_ok += 1
+        else:
+            self.jobs_failed += 1
+        _write_json_atomic(os.path.join(self.dirs["results"], f"{job_id}.json"), result)
+        os.remove(claimed_path)
+        _write_json_atomic(os.path.join(self.spool_dir, DEFAULT_DAEMON_STATS_PATH), self.stats())
+        logging.info(f"Job {job_id} {result['status']} in {result['run_s']:.2f} seconds "
+                     f"({result['queue_wait_s']:.2f} seconds queued)")
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        """Job counts and the queue wait / run / end-to-end latency percentiles of every job so far."""
+        return {
+            "pid": os.getpid(),
+            "started_at": self.started_at,
+            "uptime_s": time.time() - self.started_at,
+            "model_load_s": self.model_load_s,
+            "jobs_ok": self.jobs_ok,
+            "jobs_failed": self.jobs_failed,
+            "job_timings": self.latencies.summary()
+        }
+
+    def run(self, exit_when_idle: bool = False) -> Dict[str, Any]:
+        """
+        Processes jobs until stop() is called (or, with exit_when_idle, until incoming/ is empty).
+
+        Returns:
+            Dict[str, Any]: The final stats().
+        """
+        self.load()
+        self.recover()
+        while not self._stop.is_set():
+            claimed = self.claim_next()
+            if claimed is not None:
+                self.process(claimed)
+            elif exit_when_idle:
+                break
+            else:
+                self._stop.wait(self.poll_interval)
+        logging.info(f"Daemon stopped after {self.jobs_ok + self.jobs_failed} job(s).")
+        return self.stats()
+
+    def serve(self, exit_when_idle: bool = False) -> Dict[str, Any]:
+        """run() with SIGTERM/SIGINT mapped to stop(), for the main thread of the daemon process."""
+        def handle(signum, frame):
+            logging.info(f"Received signal {signum}, stopping after the job in progress.")
+            self.stop()
+
+        previous = {sig: signal.signal(sig, handle) for sig in (signal.SIGTERM, signal.SIGINT)}
+        try:
+            return self.run(exit_when_idle)
+        finally:
+            for sig, handler in previous.items():
+                signal.signal(sig, handler)
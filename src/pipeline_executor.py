@@ -0,0 +1,435 @@
+# src/pipeline_executor.py
+import contextvars
+import logging
+import queue
+import threading
+import time
+from typing import Dict, Any, List, Optional, Tuple
+
+from frame_extractor import iter_frames, frame_file_name
+from video_probe import VideoProbe
+from object_detector import (CocoBuilder, load_model, iter_batches, predict_batch, skip_committed,
+                             pretag_frames_and_generate_coco)
+from box_tracker import TrackingModel
+from detection_cache import DetectionCache
+from run_manifest import DetectionJournal
+from metrics_exporter import LIVE
+from pipeline_config import PipelineConfig
+from config import DEFAULT_BATCH_SIZE
+
+# Set up basic logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+_SENTINEL = object() # end-of-stream marker passed down the queues
+_POLL_S = 0.1 # how often blocked queue operations re-check the stop flag
+
+
+class _StageStats:
+    """Busy/idle time of one pipeline stage (summed over its threads) and the number of batches it handled."""
+
+    def __init__(self, threads: int = 1):
+        self.threads = threads
+        self.busy_s = 0.0
+        self.idle_s = 0.0
+        self.batches = 0
+        self.lock = threading.Lock()
+
+    def add(self, busy_s: float = 0.0, idle_s: float = 0.0, batches: int = 0):
+        with self.lock:
+            self.busy_s += busy_s
+            self.idle_s += idle_s
+            self.batches += batches
+
+    def as_dict(self) -> Dict[str, Any]:
+        total = self.busy_s + self.idle_s
+        return {
+            "threads": self.threads,
+            "busy_s": self.busy_s,
+            "idle_s": self.idle_s,
+            "utilization": self.busy_s / total if total > 0 else 0.0,
+            "batches": self.batches
+        }
+
+
+class _QueueStats:
+    """Depth of a bounded queue, sampled every time an item goes in or out."""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.samples = 0
+        self.depth_sum = 0
+        self.max_depth = 0
+        self.lock = threading.Lock()
+
+    def sample(self, q: queue.Queue):
+        depth = q.qsize()
+        with self.lock:
+            self.samples += 1
+            self.depth_sum += depth
+            self.max_depth = max(self.max_depth, depth)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "capacity": self.capacity,
+            "max_depth": self.max_depth,
+            "mean_depth": self.depth_sum / self.samples if self.samples else 0.0
+        }
+
+
+class _ReorderWindow:
+    """
+    Bounds how far ahead of the writer the inference workers may get.
+
+    Results are written in batch order, so with several workers one slow batch makes every later
+    result wait in the writer's reorder buffer. A worker only starts on batch seq once
+    seq < next_seq + size (next_seq: the first batch not written yet), so at most size batches are
+    ever buffered. The batch at next_seq itself is never held back, so this can't deadlock.
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self.next_seq = 0
+        self.max_depth = 0
+        self.condition = threading.Condition()
+
+    def wait_for(self, seq: int, stop: threading.Event) -> float:
+        """Blocks until batch seq may be started (or stop is set). Returns the time spent waiting."""
+        start_time = time.perf_counter()
+        with self.condition:
+            while seq >= self.next_seq + self.size and not stop.is_set():
+                self.condition.wait(timeout=_POLL_S)
+        return time.perf_counter() - start_time
+
+    def advance(self, next_seq: int, depth: int):
+        """Called by the writer: batches before next_seq are written; depth batches were buffered at the peak."""
+        with self.condition:
+            self.next_seq = next_seq
+            self.max_depth = max(self.max_depth, depth)
+            self.condition.notify_all()
+
+
+def _put(q: queue.Queue, item: Any, stop: threading.Event) -> float:
+    """Blocking put that gives up once stop is set. Returns the time spent waiting for space."""
+    start_time = time.perf_counter()
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=_POLL_S)
+            break
+        except queue.Full:
+            continue
+    return time.perf_counter() - start_time
+
+
+def _get(q: queue.Queue, stop: threading.Event):
+    """Blocking get that returns _SENTINEL once stop is set. Returns (item, time spent waiting)."""
+    start_time = time.perf_counter()
+    while not stop.is_set():
+        try:
+            return q.get(timeout=_POLL_S), time.perf_counter() - start_time
+        except queue.Empty:
+            continue
+    return _SENTINEL, time.perf_counter() - start_time
+
+
+def _timed(iterable, stage_times: dict, key: str):
+    """Re-yields items from iterable while adding the time spent producing them to stage_times[key]."""
+    stage_times[key] = 0.0
+    iterator = iter(iterable)
+    while True:
+        start_time = time.time()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            stage_times[key] += time.time() - start_time
+            return
+        stage_times[key] += time.time() - start_time
+        yield item
+
+
+def run_streamed(video_path: str, frames_output_dir: Optional[str], coco_output_path: str,
+                 config: Optional[PipelineConfig] = None, model=None,
+                 cache: Optional[DetectionCache] = None,
+                 journal: Optional[DetectionJournal] = None,
+                 probe: Optional[VideoProbe] = None,
+                 original_size: Optional[Tuple[int, int]] = None,
+                 stop: Optional[threading.Event] = None,
+                 **settings) -> Dict[str, Any]:
+    """
+    Runs frame extraction and object detection interleaved in the calling thread.
+
+    Frames go straight from frame_extractor.iter_frames to the detector as arrays; the frames saved
+    to frames_output_dir (if any) are only a side output, under the same file names. This is the
+    streamed mode of main_pipeline.run_pipeline, and what async_pipeline.run_pipeline_async runs
+    for each job with a model backed by its InferencePool.
+
+    Uses the frame settings of iter_frames and config's model_name, backend, batch_size,
+    compact_coco, keyframe_interval and min_track_confidence.
+
+    Args:
+        video_path (str): Path to the input video file.
+        frames_output_dir (Optional[str]): Where to also save the frames, None to keep them in memory only.
+        coco_output_path (str): Full path where the COCO JSON file will be saved.
+        config (Optional[PipelineConfig]): Settings of the run, PipelineConfig() if None.
+        model: Already loaded model (or anything called like one), loaded from config if None.
+        cache (Optional[DetectionCache]): Detection cache.
+        journal (Optional[DetectionJournal]): Checkpoint journal; committed frames are restored from it.
+        probe (Optional[VideoProbe]): Already opened probe of video_path to decode with.
+        original_size (Optional[Tuple[int, int]]): (width, height) of the video the COCO output is written
+                                                   in when the frames are downscaled (see CocoBuilder).
+        stop (Optional[threading.Event]): Set from another thread to stop before the next frame.
+        **settings: Settings changed from config, e.g. frame_step=10.
+
+    Returns:
+        Dict[str, Any]: "frame_extraction_metrics", "detection_result" (as returned by
+                        pretag_frames_and_generate_coco) and "pipeline_stage_times".
+
+    Raises:
+        RuntimeError: If stop was set. The partial COCO file is removed and the decoder closed,
+                      as when a stage fails.
+    """
+    config = (config or PipelineConfig()).replace(**settings)
+    stage_times: Dict[str, float] = {}
+    frame_metrics: Dict[str, Any] = {}
+    start_time = time.time()
+    frames = iter_frames(video_path, config, output_dir=frames_output_dir, metrics=frame_metrics, probe=probe)
+
+    def named_frames():
+        for saved_idx, (_, _, frame) in enumerate(_timed(frames, stage_times, 'frame_extraction_s')):
+            if stop is not None and stop.is_set():
+                raise RuntimeError(f"Pre-tagging of {video_path} was stopped")
+            yield frame_file_name(saved_idx, config.frame_format), frame
+
+    try:
+        detection_result = pretag_frames_and_generate_coco(named_frames(), coco_output_path, config.model_name,
+                                                           model=model, batch_size=config.batch_size or DEFAULT_BATCH_SIZE,
+                                                           compact=config.compact_coco, cache=cache, journal=journal,
+                                                           backend=config.backend, original_size=original_size,
+                                                           keyframe_interval=config.keyframe_interval,
+                                                           min_track_confidence=config.min_track_confidence)
+    finally:
+        frames.close() # releases the capture when detection stopped early
+    # Time spent inside the decoder generator is extraction, the rest is detection
+    stage_times['object_detection_s'] = time.time() - start_time - stage_times.get('frame_extraction_s', 0.0)
+    return {
+        "frame_extraction_metrics": frame_metrics,
+        "detection_result": detection_result,
+        "pipeline_stage_times": stage_times
+    }
+
+
+def run_overlapped(video_path: str, frames_output_dir: Optional[str], coco_output_path: str,
+                   config: Optional[PipelineConfig] = None, model=None,
+                   cache: Optional[DetectionCache] = None,
+                   journal: Optional[DetectionJournal] = None,
+                   probe: Optional[VideoProbe] = None,
+                   original_size: Optional[Tuple[int, int]] = None,
+                   **settings) -> Dict[str, Any]:
+    """
+    Runs frame extraction and object detection concurrently instead of one after the other.
+
+    A decode thread pulls frames from frame_extractor.iter_frames, groups them into batches and
+    puts them on a bounded queue; inference worker threads drain it, each with its own model
+    (ultralytics models aren't safe to share between threads); the calling thread is the writer
+    stage that puts results back in frame order and streams them into the COCO file. Because the frame
+    queue is bounded, a slow detector blocks the decoder instead of piling frames up in memory; and
+    because the reorder buffer is bounded too (at least one batch per worker, otherwise the frame
+    queue's capacity), one slow batch holds the other workers back instead of their results piling up.
+
+    Besides the frame settings of iter_frames, uses config's model_name, backend, batch_size,
+    inference_workers (number of inference threads), queue_size (maximum number of decoded frames
+    waiting for inference), compact_coco, keyframe_interval and min_track_confidence (the tracker
+    needs the frames in order, so only with one inference worker).
+
+    Args:
+        video_path (str): Path to the input video file.
+        frames_output_dir (Optional[str]): Where to also save the frames, None to keep them in memory only.
+        coco_output_path (str): Full path where the COCO JSON file will be saved.
+        config (Optional[PipelineConfig]): Settings of the run, PipelineConfig() if None.
+        model: Already loaded model, used by the first worker.
+        cache (Optional[DetectionCache]): Detection cache shared by the inference workers.
+        journal (Optional[DetectionJournal]): Checkpoint journal; committed frames are restored
+                                              from it and not sent to the inference workers.
+        probe (Optional[VideoProbe]): Already opened probe of video_path for the decode thread to reuse.
+        original_size (Optional[Tuple[int, int]]): (width, height) of the video the COCO output is written
+                                                   in when the frames are downscaled (see CocoBuilder).
+        **settings: Settings changed from config, e.g. inference_workers=2.
+
+    Returns:
+        Dict[str, Any]: "frame_extraction_metrics", "detection_result" (as returned by
+                        pretag_frames_and_generate_coco), "pipeline_stage_times" and
+                        "pipeline_stage_stats" (busy/idle per stage and queue depths).
+
+    Raises:
+        RuntimeError: If the decode or an inference thread failed, naming the stage.
+    """
+    config = (config or PipelineConfig()).replace(**settings)
+    model_name, backend = config.model_name, config.backend
+    batch_size = config.batch_size or DEFAULT_BATCH_SIZE
+    inference_workers, queue_size = config.inference_workers, config.queue_size
+    keyframe_interval = config.keyframe_interval
+    if batch_size < 1 or inference_workers < 1 or queue_size < 1:
+        raise ValueError("batch_size, inference_workers and queue_size must all be >= 1")
+    if keyframe_interval > 1 and inference_workers > 1:
+        raise ValueError("keyframe_interval > 1 tracks boxes from frame to frame and needs inference_workers=1")
+
+    models = [model if model is not None else load_model(model_name, backend)]
+    models += [load_model(model_name, backend) for _ in range(inference_workers - 1)]
+    if cache is not None:
+        models = [cache.wrap(worker_model, model_name) for worker_model in models]
+        cache_start = cache.counters()
+    if keyframe_interval > 1:
+        models = [TrackingModel(models[0], keyframe_interval, config.min_track_confidence)]
+
+    # queue_size is in frames, the queue holds batches
+    frame_queue: queue.Queue = queue.Queue(maxsize=max(1, queue_size // batch_size))
+    result_queue: queue.Queue = queue.Queue(maxsize=max(1, queue_size // batch_size))
+    stop = threading.Event()
+    errors: List[tuple] = []
+
+    frame_metrics: Dict[str, Any] = {}
+    decode_stats, inference_stats, writer_stats = _StageStats(), _StageStats(inference_workers), _StageStats()
+    frame_queue_stats = _QueueStats(frame_queue.maxsize)
+    reorder_window = _ReorderWindow(max(frame_queue.maxsize, inference_workers))
+    stage_times: Dict[str, float] = {}
+    inference_window = [None, None] # first batch picked up, last batch finished
+
+    def decode():
+        start_time = time.perf_counter()
+        frames = None
+        try:
+            frames = iter_frames(video_path, config, output_dir=frames_output_dir, metrics=frame_metrics, probe=probe)
+            named_frames = ((frame_file_name(saved_idx, config.frame_format), frame)
+                            for saved_idx, (_, _, frame) in enumerate(frames))
+            named_frames = skip_committed(named_frames, committed) # still decoded, not re-detected
+            batches = iter_batches(named_frames, batch_size)
+            seq = 0
+            while not stop.is_set():
+                busy_start = time.perf_counter()
+                batch = next(batches, None)
+                busy_s = time.perf_counter() - busy_start
+                if batch is None:
+                    decode_stats.add(busy_s=busy_s)
+                    break
+                idle_s = _put(frame_queue, (seq, batch), stop)
+                frame_queue_stats.sample(frame_queue)
+                decode_stats.add(busy_s=busy_s, idle_s=idle_s, batches=1)
+                seq += 1
+        except Exception as e:
+            logging.error(f"Frame extraction failed in the decode thread: {e}")
+            errors.append(("Frame extraction", e))
+            stop.set()
+        finally:
+            if frames is not None:
+                frames.close() # releases the capture if we stopped early
+            stage_times['frame_extraction_s'] = time.perf_counter() - start_time
+            for _ in range(inference_workers):
+                _put(frame_queue, _SENTINEL, stop)
+
+    def infer(worker_model):
+        try:
+            while True:
+                item, idle_s = _get(frame_queue, stop)
+                if item is _SENTINEL:
+                    inference_stats.add(idle_s=idle_s)
+                    break
+                frame_queue_stats.sample(frame_queue)
+                seq, batch = item
+                idle_s += reorder_window.wait_for(seq, stop)
+                busy_start = time.perf_counter()
+                if inference_window[0] is None:
+                    inference_window[0] = busy_start
+                results = predict_batch(worker_model, batch)
+                inference_window[1] = time.perf_counter()
+                idle_s += _put(result_queue, (seq, [image_file for image_file, _ in batch], results), stop)
+                inference_stats.add(busy_s=inference_window[1] - busy_start, idle_s=idle_s, batches=1)
+        except Exception as e:
+            logging.error(f"Object detection failed in an inference thread: {e}")
+            errors.append(("Object detection", e))
+            stop.set()
+        finally:
+            _put(result_queue, _SENTINEL, stop)
+
+    coco_builder = CocoBuilder(models[0].names, coco_output_path, compact=config.compact_coco, journal=journal,
+                               original_size=original_size) # opens the output file
+    try:
+        committed = coco_builder.replay_journal()
+        if keyframe_interval > 1:
+            models[0].next_track_id = coco_builder.max_track_id + 1 # restored tracks keep their ids
+    except BaseException:
+        coco_builder.abort()
+        raise
+
+    start_time = time.perf_counter()
+    # in the caller's context, so the stages' live metrics carry the run's label and their timings go to its run
+    threads = [threading.Thread(target=contextvars.copy_context().run, args=(decode,), name="decode", daemon=True)]
+    threads += [threading.Thread(target=contextvars.copy_context().run, args=(infer, worker_model),
+                                 name=f"inference-{i}", daemon=True)
+                for i, worker_model in enumerate(models)]
+    for thread in threads:
+        thread.start()
+
+    # Writer stage: results can come back out of order when there are several workers
+    pending: Dict[int, tuple] = {}
+    live = LIVE.scope()
+    live.register("pretag_queue_depth", "gauge", "Items waiting in a pipeline queue.",
+                  lambda: frame_queue.qsize() * batch_size, queue="frames")
+    live.register("pretag_queue_depth", "gauge", "Items waiting in a pipeline queue.",
+                  lambda: sum(len(image_files) for image_files, _ in list(pending.values())), queue="reorder")
+    next_seq, finished_workers = 0, 0
+    try:
+        while finished_workers < inference_workers:
+            item, idle_s = _get(result_queue, stop)
+            if item is _SENTINEL:
+                writer_stats.add(idle_s=idle_s)
+                if stop.is_set():
+                    break # a stage failed, the error is raised below
+                finished_workers += 1
+                continue
+            busy_start = time.perf_counter()
+            seq, image_files, results = item
+            pending[seq] = (image_files, results)
+            depth = len(pending)
+            while next_seq in pending:
+                for image_file, frame_results in zip(*pending.pop(next_seq)):
+                    coco_builder.add(image_file, frame_results)
+                next_seq += 1
+            reorder_window.advance(next_seq, depth)
+            writer_stats.add(busy_s=time.perf_counter() - busy_start, idle_s=idle_s, batches=1)
+    except BaseException:
+        stop.set()
+        coco_builder.abort()
+        raise
+    finally:
+        for thread in threads:
+            thread.join()
+        live.close()
+    if errors:
+        coco_builder.abort()
+        stage, error = errors[0]
+        raise RuntimeError(f"{stage} failed: {error}") from error
+
+    busy_start = time.perf_counter()
+    detection_result = coco_builder.save(batch_size)
+    if cache is not None:
+        detection_result["metrics"].update(cache.metrics(since=cache_start))
+    if keyframe_interval > 1 and coco_builder.images_processed:
+        detection_result["metrics"].update(early_redetections=models[0].early_redetections,
+                                           keyframe_interval=keyframe_interval)
+    writer_stats.add(busy_s=time.perf_counter() - busy_start)
+
+    stage_times['object_detection_s'] = (inference_window[1] - inference_window[0]
+                                         if inference_window[0] is not None else 0.0)
+    stage_times['overlapped_total_s'] = time.perf_counter() - start_time
+
+    return {
+        "frame_extraction_metrics": frame_metrics,
+        "detection_result": detection_result,
+        "pipeline_stage_times": stage_times,
+        "pipeline_stage_stats": {
+            "decode": decode_stats.as_dict(),
+            "inference": inference_stats.as_dict(),
+            "writer": writer_stats.as_dict(),
+            "frame_queue": frame_queue_stats.as_dict(),
+            "reorder_buffer": {"capacity": reorder_window.size, "max_depth": reorder_window.max_depth}
+        }
+    }
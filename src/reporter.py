@@ -1,6 +1,11 @@
 # src/reporter.py
+import argparse
 import os
-from typing import Dict, Any
+import time
+from typing import Dict, Any, Optional, TYPE_CHECKING
+
+if TYPE_CHECKING: # only needed for trend reports, imported there (the tests import reporter before src/ is on the path)
+    from run_history import RunHistory
 
 def generate_markdown_report(metrics: Dict[str, Any], output_path: str):
     """
@@ -21,6 +26,62 @@ def generate_markdown_report(metrics: Dict[str, Any], output_path: str):
         report_content += "No pipeline stage timing data available.\n"
     report_content += "\n"
 
+    if metrics.get("operation_timings"):
+        report_content += "## Operation Latencies\n"
+        report_content += "| Operation | Count | Total (s) | p50 (ms) | p95 (ms) | p99 (ms) | Max (ms) |\n"
+        report_content += "|---|---|---|---|---|---|---|\n"
+        for operation, stats in metrics["operation_timings"].items():
+            report_content += (f"| {operation} | {stats['count']} | {stats['total_s']:.3f} | {stats['p50_ms']:.2f} "
+                               f"| {stats['p95_ms']:.2f} | {stats['p99_ms']:.2f} | {stats['max_ms']:.2f} |\n")
+        report_content += "\n"
+
+    if metrics.get("pipeline_stage_stats"):
+        report_content += "## Pipelined Execution\n"
+        report_content += "| Stage | Threads | Busy (s) | Idle (s) | Utilization | Batches |\n"
+        report_content += "|---|---|---|---|---|---|\n"
+        for stage, stats in metrics["pipeline_stage_stats"].items():
+            if "busy_s" in stats:
+                report_content += (f"| {stage.title()} | {stats['threads']} | {stats['busy_s']:.2f} | {stats['idle_s']:.2f} "
+                                   f"| {stats['utilization']:.0%} | {stats['batches']} |\n")
+        queue_stats = metrics["pipeline_stage_stats"].get("frame_queue")
+        if queue_stats:
+            report_content += (f"\n- **Frame Queue Depth:** max {queue_stats['max_depth']} / mean {queue_stats['mean_depth']:.1f} "
+                               f"(capacity {queue_stats['capacity']} batches)\n")
+        reorder_stats = metrics["pipeline_stage_stats"].get("reorder_buffer")
+        if reorder_stats:
+            report_content += (f"- **Reorder Buffer Depth:** max {reorder_stats['max_depth']} "
+                               f"(capacity {reorder_stats['capacity']} batches)\n")
+        report_content += "\n"
+
+    if metrics.get("resume_metrics"):
+        resume_metrics = metrics["resume_metrics"]
+        report_content += "## Resumed Run\n"
+        report_content += f"- **Frame Extraction:** {'reused from the previous run' if resume_metrics.get('frame_extraction_reused') else 'redone'}\n"
+        report_content += (f"- **Detections Restored from Checkpoint:** {resume_metrics.get('frames_restored', 0)} frames "
+                           f"({resume_metrics.get('detection_reuse_ratio', 0.0):.2%} of the images processed)\n\n")
+
+    if metrics.get("resource_plan"):
+        plan = metrics["resource_plan"]
+        report_content += "## CPU Resources\n"
+        report_content += (f"- **Plan:** {plan['source']}, {len(plan['cpus'])} CPU(s)"
+                           f"{' pinned' if plan['pin'] else ''}\n")
+        report_content += (f"- **Threads:** {plan['torch_threads']} torch, {plan['opencv_threads']} OpenCV, "
+                           f"{plan['encode_threads']} encode\n")
+        report_content += (f"- **Pools:** {plan['decode_workers']} decode worker(s), "
+                           f"{plan['inference_workers']} inference worker(s)"
+                           + (f", batch size {plan['batch_size']}" if plan.get('batch_size') else "") + "\n")
+        if plan.get("calibration_s") is not None:
+            report_content += f"- **Calibration:** {plan['calibration_s']:.2f} seconds\n"
+        report_content += "\n"
+
+    if metrics.get("video_metrics"):
+        video_metrics = metrics["video_metrics"]
+        report_content += "## Input Video\n"
+        report_content += (f"- **Resolution:** {video_metrics['width']}x{video_metrics['height']} "
+                           f"@ {video_metrics['fps']:.2f} fps ({video_metrics['codec']})\n")
+        report_content += (f"- **Length:** {video_metrics['frame_count']} frames "
+                           f"({video_metrics.get('duration_s', 0.0):.1f} seconds)\n\n")
+
     report_content += "## Dataset Statistics\n"
     
     # Frame Extraction Metrics
@@ -31,6 +92,34 @@ def generate_markdown_report(metrics: Dict[str, Any], output_path: str):
         report_content += f"- **Frames Extracted:** {fe_metrics.get('frames_extracted', 'N/A')}\n"
         report_content += f"- **Frames Dropped:** {fe_metrics.get('frames_dropped', 'N/A')}\n"
         report_content += f"- **Frame Drop Ratio:** {fe_metrics.get('frame_drop_ratio', 0.0):.2%}\n"
+        if "sampling_mode" in fe_metrics:
+            report_content += f"- **Sampling Mode:** {fe_metrics['sampling_mode']}\n"
+            report_content += f"- **Frames Retrieved:** {fe_metrics.get('frames_retrieved', 'N/A')}\n"
+        if fe_metrics.get("frames_skipped_unchecked"):
+            report_content += (f"- **Frames Seeked Over:** {fe_metrics['frames_skipped_unchecked']} "
+                               f"(not decoded, drops among them are not counted)\n")
+        if fe_metrics.get("decode_workers", 1) > 1:
+            report_content += f"- **Decode Workers:** {fe_metrics['decode_workers']} (keyframe-aligned segments)\n"
+        if "inferences_saved" in fe_metrics:
+            report_content += (f"- **Scene Sampling:** threshold {fe_metrics['scene_threshold']}, interval "
+                               f"{fe_metrics['scene_min_interval']}-{fe_metrics['scene_max_interval']} frames "
+                               f"({fe_metrics.get('scene_forced_keeps', 0)} frames kept by the max interval)\n")
+            report_content += (f"- **Inferences Saved vs Fixed Step:** {fe_metrics['inferences_saved']} of "
+                               f"{fe_metrics['fixed_step_frames']} ({fe_metrics.get('inferences_saved_ratio', 0.0):.2%})\n")
+        if fe_metrics.get("inference_size"):
+            sizes = ""
+            if fe_metrics.get("source_frame_size") and fe_metrics.get("inference_frame_size"):
+                sizes = (f", {'x'.join(map(str, fe_metrics['source_frame_size']))} -> "
+                         f"{'x'.join(map(str, fe_metrics['inference_frame_size']))}")
+            report_content += (f"- **Inference Size:** {fe_metrics['inference_size']} px long side{sizes} "
+                               f"(frames saved at {fe_metrics.get('saved_resolution', 'inference')} resolution)\n")
+        if "frames_written" in fe_metrics:
+            report_content += f"- **Frame Format:** {fe_metrics.get('frame_format', 'N/A')}\n"
+            if fe_metrics.get("frame_store") == "tar":
+                report_content += f"- **Frame Store:** tar ({fe_metrics['frame_shards']} shard(s))\n"
+            report_content += f"- **Bytes Written:** {fe_metrics['bytes_written'] / 1e6:.2f} MB ({fe_metrics['frames_written']} frames)\n"
+            report_content += (f"- **Encode Throughput:** {fe_metrics.get('encode_fps', 0.0):.1f} frames/s per thread "
+                               f"({fe_metrics.get('encode_threads', 'N/A')} threads)\n")
     else:
         report_content += "No frame extraction metrics available.\n"
     report_content += "\n"
@@ -42,6 +131,17 @@ def generate_markdown_report(metrics: Dict[str, Any], output_path: str):
         report_content += f"- **Images Processed:** {od_metrics.get('images_processed', 'N/A')}\n"
         report_content += f"- **Total Detections:** {od_metrics.get('total_detections', 'N/A')}\n"
         report_content += f"- **Average Detections per Frame:** {od_metrics.get('detections_per_frame_avg', 0.0):.2f}\n"
+        if "cache_hits" in od_metrics:
+            report_content += (f"- **Detection Cache:** {od_metrics['cache_hits']} hits, {od_metrics.get('cache_misses', 0)} misses "
+                               f"({od_metrics.get('cache_hit_ratio', 0.0):.2%} hit ratio)\n")
+        if "frames_inferred" in od_metrics:
+            report_content += (f"- **Frames Inferred:** {od_metrics['frames_inferred']} of {od_metrics.get('images_processed', 0)} "
+                               f"({od_metrics.get('inference_ratio', 0.0):.2%}), {od_metrics.get('frames_propagated', 0)} "
+                               f"propagated by the tracker")
+            if "keyframe_interval" in od_metrics:
+                report_content += (f" (keyframe every {od_metrics['keyframe_interval']} frames, "
+                                   f"{od_metrics.get('early_redetections', 0)} early re-detections)")
+            report_content += "\n"
 
         report_content += "\n#### Class Distribution\n"
         class_dist = od_metrics.get('class_distribution', {})
@@ -65,7 +165,144 @@ def generate_markdown_report(metrics: Dict[str, Any], output_path: str):
         print(f"Error saving report to {output_path}: {e}")
         raise
 
+def generate_batch_report(summary: Dict[str, Any], output_path: str):
+    """
+    Generates a Markdown report for a multi-video batch run (see batch_pipeline.run_batch).
+
+    Args:
+        summary (Dict[str, Any]): Batch summary with per-video "videos" rows and aggregated "totals".
+        output_path (str): The full path where the Markdown report will be saved.
+    """
+    totals = summary.get("totals", {})
+    report_content = "# MLOps Batch Pipeline Report\n\n"
+    report_content += "This report aggregates the pre-tagging runs of every video in the batch.\n\n"
+
+    report_content += "## Totals\n"
+    report_content += f"- **Videos:** {totals.get('videos', 0)} ({totals.get('videos_succeeded', 0)} succeeded, {totals.get('videos_failed', 0)} failed)\n"
+    report_content += f"- **Workers:** {totals.get('workers', 'N/A')}\n"
+    report_content += f"- **Model:** {totals.get('model_name', 'N/A')}\n"
+    report_content += f"- **Wall Time:** {totals.get('wall_s', 0.0):.2f} seconds\n"
+    report_content += f"- **Images Processed:** {totals.get('images_processed', 0)}\n"
+    report_content += f"- **Throughput:** {totals.get('images_per_s', 0.0):.2f} images/s, {totals.get('videos_per_hour', 0.0):.1f} videos/hour\n\n"
+
+    report_content += "## Per-Video Results\n"
+    report_content += "| Video | Status | Frames in Video | Images | Detections | Wall (s) | Images/s |\n"
+    report_content += "|---|---|---|---|---|---|---|\n"
+    for row in summary.get("videos", []):
+        metrics = row.get("metrics") or {}
+        fe_metrics = metrics.get("frame_extraction_metrics", {})
+        od_metrics = metrics.get("object_detection_metrics", {})
+        status = row["status"] if not row.get("error") else f"{row['status']}: {row['error']}"
+        report_content += (f"| {os.path.basename(row['video_path'])} | {status} "
+                           f"| {fe_metrics.get('total_frames_in_video', 'N/A')} | {od_metrics.get('images_processed', 'N/A')} "
+                           f"| {od_metrics.get('total_detections', 'N/A')} | {row.get('wall_s', 0.0):.2f} "
+                           f"| {row.get('images_per_s', 0.0):.2f} |\n")
+    report_content += "\n"
+
+    # Save the report
+    try:
+        with open(output_path, 'w') as f:
+            f.write(report_content)
+        print(f"Report saved to: {output_path}")
+    except IOError as e:
+        print(f"Error saving report to {output_path}: {e}")
+        raise
+
+def generate_trend_report(history: "RunHistory", output_path: str, bucket: str = "day",
+                          model_name: Optional[str] = None, window: int = 50, tolerance: float = 0.10,
+                          recent_days: float = 7, baseline_days: float = 30, drift_threshold: float = 0.05):
+    """
+    Generates a Markdown report of the trends across the runs in a run-history store.
+
+    Args:
+        history (RunHistory): The store the runs were recorded in (run_pipeline's run_history).
+        output_path (str): The full path where the Markdown report will be saved.
+        bucket (str): Throughput is averaged per 'day', 'week' or 'month'.
+        model_name (Optional[str]): Only report the runs of this model (regressions always cover every model).
+        window (int): Runs per window when comparing a model's latest runs with the ones before.
+        tolerance (float): Relative slowdown of a model that counts as a regression.
+        recent_days (float): Class drift: the recent window, compared with the baseline_days before it.
+        baseline_days (float): Class drift: length of the baseline window.
+        drift_threshold (float): Class drift: change of a class's share of the detections that gets flagged.
+    """
+    first, last = history.time_range()
+    report_content = "# MLOps Pipeline Trend Report\n\n"
+    if first is None:
+        report_content += "No runs recorded yet.\n"
+    else:
+        report_content += (f"Trends across {history.run_count(model_name)} runs"
+                           f"{f' of {model_name}' if model_name else ''}, from {time.strftime('%Y-%m-%d', time.gmtime(first))} "
+                           f"to {time.strftime('%Y-%m-%d', time.gmtime(last))} (UTC).\n\n")
+
+        report_content += f"## Throughput per {bucket.title()}\n"
+        report_content += f"| {bucket.title()} | Runs | Images/s | Video Frames/s | Wall (s) |\n"
+        report_content += "|---|---|---|---|---|\n"
+        for row in history.throughput_over_time(bucket, model_name):
+            report_content += (f"| {row['period']} | {row['runs']} | {row['images_per_s']:.2f} | {row['frames_per_s']:.1f} "
+                               f"| {row['wall_s']:.2f} |\n")
+        report_content += "\n"
+
+        report_content += "## Regressions by Model\n"
+        regressions = history.model_regressions(window, tolerance)
+        if regressions:
+            report_content += (f"Median images/s of each model's latest {window} runs vs the {window} before "
+                               f"(flagged below -{tolerance:.0%}).\n\n")
+            report_content += "| Model | Runs | Before (images/s) | Latest (images/s) | Change | Regressed |\n"
+            report_content += "|---|---|---|---|---|---|\n"
+            for row in regressions:
+                report_content += (f"| {row['model_name']} | {row['runs']} | {row['baseline_images_per_s']:.2f} "
+                                   f"| {row['recent_images_per_s']:.2f} | {row['change']:+.1%} "
+                                   f"| {'**yes**' if row['regressed'] else 'no'} |\n")
+        else:
+            report_content += f"No model has the {2 * window} runs needed for a comparison.\n"
+        report_content += "\n"
+
+        drift = history.class_drift(recent_days, baseline_days, model_name)
+        report_content += "## Class Distribution Drift\n"
+        report_content += (f"- **Recent:** last {recent_days:g} days, {drift['recent_detections']} detections\n"
+                           f"- **Baseline:** the {baseline_days:g} days before, {drift['baseline_detections']} detections\n")
+        if drift["recent_detections"] and drift["baseline_detections"]:
+            report_content += f"- **Total Variation Distance:** {drift['total_variation']:.3f}\n\n"
+            report_content += "| Class | Baseline Share | Recent Share | Shift |\n"
+            report_content += "|---|---|---|---|\n"
+            for row in drift["classes"]:
+                flag = " **drift**" if abs(row["shift"]) >= drift_threshold else ""
+                report_content += (f"| {row['class_name']} | {row['baseline_share']:.2%} | {row['recent_share']:.2%} "
+                                   f"| {row['shift']:+.2%}{flag} |\n")
+        else:
+            report_content += "\nNot enough detections in both windows to compare.\n"
+        report_content += "\n"
+
+    # Save the report
+    try:
+        with open(output_path, 'w') as f:
+            f.write(report_content)
+        print(f"Report saved to: {output_path}")
+    except IOError as e:
+        print(f"Error saving report to {output_path}: {e}")
+        raise
+
 if __name__ == "__main__":
+    from run_history import RunHistory, TREND_BUCKETS
+
+    parser = argparse.ArgumentParser(description="Generate pipeline reports.")
+    parser.add_argument("--run_history", type=str, default=None,
+                        help="Run-history store (main_pipeline.py --run_history) to generate a trend report from.")
+    parser.add_argument("--output", type=str, default="trend_report.md", help="Path of the trend report.")
+    parser.add_argument("--bucket", choices=tuple(TREND_BUCKETS), default="day", help="Throughput is averaged per bucket.")
+    parser.add_argument("--model_name", type=str, default=None, help="Only report the runs of this model.")
+    parser.add_argument("--window", type=int, default=50, help="Runs per window of the per-model regression check.")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="Relative slowdown flagged as a regression.")
+    parser.add_argument("--recent_days", type=float, default=7, help="Class drift: recent window in days.")
+    parser.add_argument("--baseline_days", type=float, default=30, help="Class drift: baseline window before it.")
+    args = parser.parse_args()
+
+    if args.run_history:
+        with RunHistory(args.run_history) as history:
+            generate_trend_report(history, args.output, args.bucket, args.model_name, args.window, args.tolerance,
+                                  args.recent_days, args.baseline_days)
+        raise SystemExit(0)
+
     # sample to test report.py --> needs to passed as an argument
     sample_metrics = {
                         'frame_extraction_metrics': {
@@ -0,0 +1,338 @@
+# src/resource_governor.py
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+from itertools import islice
+from typing import Dict, Any, List, Optional, Sequence, Tuple
+
+import cv2
+
+from frame_extractor import iter_frames
+from frame_writer import FrameWriter
+from object_detector import load_model, iter_batches, predict_batch
+from video_probe import VideoProbe
+from instrumentation import TIMINGS
+from run_manifest import _write_json_atomic
+from config import (
+    DEFAULT_ENCODE_THREADS,
+    DEFAULT_DECODE_WORKERS,
+    DEFAULT_INFERENCE_WORKERS,
+    DEFAULT_BATCH_SIZE,
+    DEFAULT_FRAME_FORMAT,
+    DEFAULT_CALIBRATION_FRAMES,
+    DEFAULT_RESOURCE_PROFILES_PATH
+)
+
+# Set up basic logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# "auto" -> split this process's CPUs between the thread pools with fixed rules (plan_resources)
+# "tune" -> use the plan measured for this video size / model / CPU budget, calibrating it first if there is none
+RESOURCE_MODES = ("auto", "tune")
+
+_CALIBRATION_BATCH_SIZES = (1, 4, 8)
+
+
+def parse_cpu_set(spec: str) -> List[int]:
+    """'0-3,8,10-11' -> [0, 1, 2, 3, 8, 10, 11] (the taskset -c syntax)."""
+    cpus = set()
+    try:
+        for part in spec.split(','):
+            first, _, last = part.strip().partition('-')
+            cpus.update(range(int(first), int(last or first) + 1))
+    except ValueError:
+        raise ValueError(f"Expected a CPU list like 0-3,8, got '{spec}'")
+    if not cpus:
+        raise ValueError(f"Empty CPU list '{spec}'")
+    return sorted(cpus)
+
+
+def available_cpus() -> List[int]:
+    """CPUs this process may run on (its affinity mask, e.g. a container's cpuset), all of them if unknown."""
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+class ResourcePlan:
+    """
+    How one pipeline process uses its CPUs: the cores it is pinned to and the size of every thread pool.
+
+    torch_threads are torch's intra-op threads per inference worker (ONNX Runtime threads for the
+    ONNX backends), opencv_threads OpenCV's internal parallel_for threads (resize, colour
+    conversion, ...); encode_threads, decode_workers and inference_workers replace the run_pipeline
+    arguments of the same name, batch_size is used when the run didn't ask for one. source is "auto" (plan_resources), "tuned" (measured
+    now by calibrate) or "profile" (measured by an earlier run).
+    """
+
+    def __init__(self, cpus: Sequence[int], torch_threads: int, opencv_threads: int, encode_threads: int,
+                 decode_workers: int, inference_workers: int, batch_size: Optional[int] = None,
+                 pin: bool = False, source: str = "auto"):
+        self.cpus = list(cpus)
+        self.torch_threads = torch_threads
+        self.opencv_threads = opencv_threads
+        self.encode_threads = encode_threads
+        self.decode_workers = decode_workers
+        self.inference_workers = inference_workers
+        self.batch_size = batch_size
+        self.pin = pin
+        self.source = source
+
+    def as_dict(self) -> Dict[str, Any]:
+        return dict(vars(self))
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ResourcePlan":
+        return cls(**data)
+
+
+def plan_resources(cpus: Optional[Sequence[int]] = None, processes: int = 1, process_index: int = 0,
+                   overlapped: bool = False, inference_workers: int = DEFAULT_INFERENCE_WORKERS,
+                   encode_threads: int = DEFAULT_ENCODE_THREADS, decode_workers: int = DEFAULT_DECODE_WORKERS,
+                   pin: bool = False) -> ResourcePlan:
+    """
+    Splits CPUs between processes, then between the thread pools of one process, so nothing oversubscribes.
+
+    Every library defaults to "all cores": N pipelines on one box would each start N torch threads,
+    N OpenCV threads and their own pools. Here the cpus are cut into processes contiguous slices
+    and process_index gets one; within it encode and decode pools get at most a quarter / half of
+    the cores (never more than asked for), OpenCV a quarter (the pools already run frames in
+    parallel), and torch the cores left for inference: all of them when the stages run one after
+    the other, the rest after encode and the decode thread in overlapped mode, split between the
+    inference workers. With more processes than cpus, every CPU gets a process of its own and the
+    others share those slices round-robin (process_index wraps), so no slice is empty.
+
+    Args:
+        cpus (Optional[Sequence[int]]): CPUs to share, available_cpus() if None.
+        processes (int): Number of pipeline processes sharing cpus (batch workers, services on one box).
+        process_index (int): Which of them this plan is for.
+        overlapped (bool): Whether decode, encode and inference run concurrently.
+        inference_workers, encode_threads, decode_workers (int): Requested pool sizes, capped to the slice.
+        pin (bool): Pin the process to its slice when the plan is applied.
+    """
+    cpus = sorted(cpus) if cpus is not None else available_cpus()
+    processes = max(1, min(processes, len(cpus)))
+    process_index %= processes # more processes than CPUs: the extra ones share a slice
+    share, extra = divmod(len(cpus), processes)
+    start = process_index * share + min(process_index, extra)
+    mine = cpus[start:start + share + (process_index < extra)]
+    n = len(mine)
+
+    encode_threads = max(1, min(encode_threads, n // 4))
+    decode_workers = max(1, min(decode_workers, n // 2))
+    inference_workers = max(1, min(inference_workers, n))
+    opencv_threads = max(1, n // 4)
+    inference_cores = max(1, n - encode_threads - 1) if overlapped else n
+    torch_threads = max(1, inference_cores // inference_workers)
+    return ResourcePlan(mine, torch_threads, opencv_threads, encode_threads, decode_workers, inference_workers,
+                        pin=pin)
+
+
+def apply_resource_plan(plan: ResourcePlan, backend: str = "torch") -> Dict[str, Any]:
+    """
+    Makes the process follow plan: CPU affinity (if plan.pin), OpenCV threads and torch threads.
+
+    These are process-wide: a process running one pipeline after another (daemon, service) must
+    hand the returned settings to restore_resource_settings() when the run is over. torch is
+    imported here for the torch backend, as loading the model would import it anyway. ONNX
+    Runtime's threads are set when its session is created (object_detector.load_model's threads).
+
+    Returns:
+        Dict[str, Any]: The settings before the plan was applied (see current_resource_settings).
+    """
+    previous = current_resource_settings(backend)
+    if plan.pin and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, plan.cpus)
+    cv2.setNumThreads(plan.opencv_threads)
+    if backend == "torch" or "torch" in sys.modules:
+        import torch
+        torch.set_num_threads(plan.torch_threads)
+    logging.info(f"Resource plan ({plan.source}): {len(plan.cpus)} CPU(s){' pinned' if plan.pin else ''}, "
+                 f"{plan.torch_threads} torch / {plan.opencv_threads} OpenCV thread(s), "
+                 f"{plan.encode_threads} encode thread(s), {plan.decode_workers} decode worker(s), "
+                 f"{plan.inference_workers} inference worker(s)"
+                 + (f", batch size {plan.batch_size}" if plan.batch_size else ""))
+    return previous
+
+
+def current_resource_settings(backend: str = "torch") -> Dict[str, Any]:
+    """The process-wide settings apply_resource_plan changes: CPU affinity, OpenCV threads and torch threads."""
+    settings = {"cpus": available_cpus() if hasattr(os, "sched_getaffinity") else None,
+                "opencv_threads": cv2.getNumThreads(), "torch_threads": None}
+    if backend == "torch" or "torch" in sys.modules:
+        import torch
+        settings["torch_threads"] = torch.get_num_threads()
+    return settings
+
+
+def restore_resource_settings(settings: Dict[str, Any]):
+    """Puts back the settings returned by apply_resource_plan / current_resource_settings."""
+    if settings["cpus"] is not None:
+        os.sched_setaffinity(0, settings["cpus"])
+    cv2.setNumThreads(settings["opencv_threads"])
+    if settings["torch_threads"] is not None:
+        import torch
+        torch.set_num_threads(settings["torch_threads"])
+
+
+def profile_key(probe: VideoProbe, model_name: str, backend: str, inference_size: Optional[int], cpus: int) -> str:
+    """What a tuned plan depends on: frame size, model, backend and how many CPUs the process has."""
+    return f"{os.path.basename(model_name)}|{backend}|{probe.width}x{probe.height}|{inference_size or 'source'}|{cpus}cpu"
+
+
+def load_profile(path: str, key: str) -> Optional[ResourcePlan]:
+    """The plan stored under key in the profiles file, None if there is none."""
+    if not path or not os.path.exists(path):
+        return None
+    with open(path) as f:
+        entry = json.load(f).get(key)
+    if entry is None:
+        return None
+    plan = ResourcePlan.from_dict(entry["plan"])
+    plan.source = "profile"
+    return plan
+
+
+def save_profile(path: str, key: str, plan: ResourcePlan, measurements: Dict[str, Any]):
+    profiles = {}
+    if os.path.exists(path):
+        with open(path) as f:
+            profiles = json.load(f)
+    profiles[key] = {"plan": plan.as_dict(), "measured_at": time.time(), **measurements}
+    _write_json_atomic(path, profiles)
+
+
+def _candidates(n: int) -> List[int]:
+    """n, n/2, n/4, ... down to 1."""
+    values = []
+    while n >= 1:
+        values.append(n)
+        n //= 2
+    return values
+
+
+def calibrate(video_path: str, model, base: ResourcePlan, frame_step: int = 1,
+              inference_size: Optional[int] = None, frame_format: str = DEFAULT_FRAME_FORMAT,
+              frames: int = DEFAULT_CALIBRATION_FRAMES, backend: str = "torch") -> Dict[str, Any]:
+    """
+    Measures a short run on the actual video and model and returns the best plan with the measurements.
+
+    The first frames (sampled with frame_step) are decoded once. Then, within base's CPUs:
+    OpenCV threads are chosen by the decode + resize rate of the frames, encode threads by the
+    rate of saving them, and torch threads x batch size by detection throughput (after one
+    warm-up batch per setting). Every candidate thread count is n, n/2, n/4, ... of base's CPUs.
+    For the ONNX backends the model's threads were fixed when it was loaded; only the batch size
+    is tuned there.
+
+    Returns:
+        Dict[str, Any]: {"plan": the best ResourcePlan (source "tuned"), "images_per_s": its detection
+                         throughput, "decode_fps", "encode_fps", "trials": every measured setting}.
+    """
+    n = len(base.cpus)
+    trials = []
+
+    def decode(limit: int) -> list:
+        return [frame for _, _, frame in islice(iter_frames(video_path, frame_step=frame_step, sampling_mode="grab",
+                                                            inference_size=inference_size), limit)]
+
+    best_opencv, decode_fps = base.opencv_threads, 0.0
+    for threads in _candidates(n):
+        cv2.setNumThreads(threads)
+        start = time.perf_counter()
+        sample = decode(frames)
+        fps = len(sample) / (time.perf_counter() - start)
+        trials.append({"stage": "decode", "opencv_threads": threads, "fps": fps})
+        if fps > decode_fps:
+            best_opencv, decode_fps = threads, fps
+    cv2.setNumThreads(best_opencv)
+    if not sample:
+        raise ValueError(f"No frames to calibrate on in {video_path}")
+
+    best_encode, encode_fps = base.encode_threads, 0.0
+    with tempfile.TemporaryDirectory() as scratch:
+        for threads in _candidates(max(1, n // 2)):
+            writer = FrameWriter(scratch, frame_format, encode_threads=threads)
+            start = time.perf_counter()
+            for i, frame in enumerate(sample):
+                writer.submit(f"calibration_{i}.img", frame)
+            writer.close()
+            fps = len(sample) / (time.perf_counter() - start)
+            trials.append({"stage": "encode", "encode_threads": threads, "fps": fps})
+            if fps > encode_fps:
+                best_encode, encode_fps = threads, fps
+
+    best_torch, best_batch, images_per_s = base.torch_threads, base.batch_size or DEFAULT_BATCH_SIZE, 0.0
+    named = [(f"calibration_{i}", frame) for i, frame in enumerate(sample)]
+    # ONNX Runtime fixes its thread count when the session is created, only the batch size can be tuned
+    for threads in _candidates(n) if backend == "torch" else [base.torch_threads]:
+        if backend == "torch":
+            import torch
+            torch.set_num_threads(threads)
+        for batch_size in _CALIBRATION_BATCH_SIZES:
+            batches = list(iter_batches(named, batch_size))
+            predict_batch(model, batches[0]) # warm-up
+            start = time.perf_counter()
+            for batch in batches:
+                predict_batch(model, batch)
+            rate = len(sample) / (time.perf_counter() - start)
+            trials.append({"stage": "inference", "torch_threads": threads, "batch_size": batch_size,
+                           "images_per_s": rate})
+            if rate > images_per_s:
+                best_torch, best_batch, images_per_s = threads, batch_size, rate
+    TIMINGS.reset() # calibration samples aren't part of the run
+
+    plan = ResourcePlan(base.cpus, best_torch, best_opencv, best_encode, base.decode_workers, base.inference_workers,
+                        batch_size=best_batch, pin=base.pin, source="tuned")
+    logging.info(f"Calibrated on {len(sample)} frames: {images_per_s:.1f} images/s with {best_torch} torch thread(s) "
+                 f"at batch size {best_batch}, decode {decode_fps:.1f} fps, encode {encode_fps:.1f} fps.")
+    return {"plan": plan, "images_per_s": images_per_s, "decode_fps": decode_fps, "encode_fps": encode_fps,
+            "trials": trials}
+
+
+def resolve_resource_plan(mode: str, probe: VideoProbe, video_path: str, model, model_name: str, backend: str,
+                          cpu_set: Optional[str] = None, overlapped: bool = False,
+                          inference_workers: int = DEFAULT_INFERENCE_WORKERS,
+                          encode_threads: int = DEFAULT_ENCODE_THREADS, decode_workers: int = DEFAULT_DECODE_WORKERS,
+                          frame_step: int = 1, inference_size: Optional[int] = None,
+                          frame_format: str = DEFAULT_FRAME_FORMAT,
+                          profiles_path: str = DEFAULT_RESOURCE_PROFILES_PATH) -> Tuple[ResourcePlan, Any]:
+    """
+    The plan one pipeline run follows (see main_pipeline.run_pipeline's resources argument).
+
+    mode "auto" returns plan_resources' split of cpu_set (or this process's CPUs). mode "tune"
+    looks the video size / model / backend / CPU count up in profiles_path and, if it was never
+    measured, calibrates on the video (loading the model if it isn't given) and stores the result.
+
+    Returns:
+        Tuple[ResourcePlan, Any]: The plan and the model (loaded here for a calibration, else the one given).
+    """
+    if mode not in RESOURCE_MODES:
+        raise ValueError(f"Unknown resources mode '{mode}', expected one of {RESOURCE_MODES}")
+    cpus = parse_cpu_set(cpu_set) if cpu_set else None
+    plan = plan_resources(cpus, overlapped=overlapped, inference_workers=inference_workers,
+                          encode_threads=encode_threads, decode_workers=decode_workers, pin=cpus is not None)
+    if mode == "auto":
+        return plan, model
+
+    key = profile_key(probe, model_name, backend, inference_size, len(plan.cpus))
+    stored = load_profile(profiles_path, key)
+    if stored is not None:
+        # measured for the same number of CPUs, but maybe others: keep this run's cores and pinning
+        stored.cpus, stored.pin = plan.cpus, plan.pin
+        stored.decode_workers = min(stored.decode_workers, plan.decode_workers)
+        stored.inference_workers = min(stored.inference_workers, plan.inference_workers)
+        logging.info(f"Using the resource plan calibrated for {key} from {profiles_path}")
+        return stored, model
+
+    logging.info(f"No resource plan calibrated for {key} yet, calibrating on {video_path}...")
+    apply_resource_plan(plan, backend) # pinning and the base thread counts also apply while measuring
+    if model is None:
+        model = load_model(model_name, backend, threads=plan.torch_threads)
+    calibration = calibrate(video_path, model, plan, frame_step, inference_size, frame_format, backend=backend)
+    tuned = calibration.pop("plan")
+    save_profile(profiles_path, key, tuned, calibration)
+    logging.info(f"Resource plan stored as {key} in {profiles_path}")
+    return tuned, model
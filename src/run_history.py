@@ -0,0 +1,243 @@
+# src/run_history.py
+import json
+import logging
+import os
+import sqlite3
+import statistics
+import time
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+
+# Set up basic logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# bucket of throughput_over_time -> strftime format of the bucket label
+TREND_BUCKETS = {"day": "%Y-%m-%d", "week": "%Y-W%W", "month": "%Y-%m"}
+
+_SCHEMA = (
+    # The numbers the trend queries need are real columns (covered by the indexes below, so they
+    # never read metrics_json); the full metrics of the run are kept as JSON next to them.
+    "CREATE TABLE IF NOT EXISTS runs ("
+    "run_id INTEGER PRIMARY KEY, started_at REAL NOT NULL, video_path TEXT, model_name TEXT, mode TEXT, "
+    "frame_step INTEGER, sampling_mode TEXT, batch_size INTEGER, total_frames INTEGER, frames_extracted INTEGER, "
+    "images_processed INTEGER, total_detections INTEGER, wall_s REAL, frames_per_s REAL, images_per_s REAL, "
+    "metrics_json TEXT)",
+    "CREATE INDEX IF NOT EXISTS runs_by_time ON runs (started_at, model_name, images_per_s, frames_per_s, wall_s)",
+    "CREATE INDEX IF NOT EXISTS runs_by_model ON runs (model_name, started_at, images_per_s, frames_per_s, wall_s)",
+    # pipeline stages (frame_extraction_s, ...) have seconds only, operations also count and percentiles
+    "CREATE TABLE IF NOT EXISTS stage_timings ("
+    "run_id INTEGER NOT NULL, stage TEXT NOT NULL, seconds REAL, count INTEGER, p50_ms REAL, p95_ms REAL, "
+    "p99_ms REAL, PRIMARY KEY (run_id, stage)) WITHOUT ROWID",
+    "CREATE INDEX IF NOT EXISTS stage_timings_by_stage ON stage_timings (stage, run_id, seconds)",
+    "CREATE TABLE IF NOT EXISTS class_counts ("
+    "run_id INTEGER NOT NULL, class_name TEXT NOT NULL, count INTEGER NOT NULL, "
+    "PRIMARY KEY (run_id, class_name)) WITHOUT ROWID",
+)
+
+
+def _run_row(video_path: str, metrics: Dict[str, Any], params: Dict[str, Any], started_at: float) -> Tuple:
+    fe_metrics = metrics.get("frame_extraction_metrics", {})
+    od_metrics = metrics.get("object_detection_metrics", {})
+    wall_s = params.get("wall_s")
+    if wall_s is None:
+        wall_s = sum(metrics.get("pipeline_stage_times", {}).values())
+    total_frames = fe_metrics.get("total_frames_in_video", 0)
+    images = od_metrics.get("images_processed", 0)
+    return (started_at, video_path, params.get("model_name"), params.get("mode"), params.get("frame_step"),
+            params.get("sampling_mode"), params.get("batch_size"), total_frames, fe_metrics.get("frames_extracted", 0),
+            images, od_metrics.get("total_detections", 0), wall_s,
+            total_frames / wall_s if wall_s > 0 else 0.0, images / wall_s if wall_s > 0 else 0.0,
+            json.dumps(metrics, default=str))
+
+
+class RunHistory:
+    """
+    SQLite store with one row per pipeline run, for trends across many runs.
+
+    Unlike the per-output-directory CSV log, the schema doesn't change when metrics are added:
+    runs has fixed, indexed columns for the headline numbers (plus the complete metrics as JSON),
+    stage_timings one row per pipeline stage / timed operation, and class_counts one row per
+    detected class. Several runs (batch workers) can append to the same file concurrently (WAL
+    journal, busy timeout). The trend queries only touch indexes, so they stay fast with
+    hundreds of thousands of runs.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=60)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self._conn:
+            for statement in _SCHEMA:
+                self._conn.execute(statement)
+
+    def record(self, video_path: str, metrics: Dict[str, Any], params: Dict[str, Any],
+               started_at: Optional[float] = None) -> int:
+        """
+        Appends a run and returns its run_id.
+
+        Args:
+            video_path (str): Input video of the run.
+            metrics (Dict[str, Any]): The metrics run_pipeline collected (all_metrics).
+            params (Dict[str, Any]): model_name, mode, frame_step, sampling_mode, batch_size and
+                                     wall_s (the sum of the stage times if missing).
+            started_at (Optional[float]): Unix time the run started, now if None.
+
+        Returns:
+            int: The run_id of the new row.
+        """
+        return self.record_many([(video_path, metrics, params, started_at)])[0]
+
+    def record_many(self, runs: Iterable[Tuple[str, Dict[str, Any], Dict[str, Any], Optional[float]]]) -> List[int]:
+        """Appends (video_path, metrics, params, started_at) runs in one transaction, see record()."""
+        run_ids = []
+        with self._conn:
+            for video_path, metrics, params, started_at in runs:
+                row = _run_row(video_path, metrics, params, started_at if started_at is not None else time.time())
+                cursor = self._conn.execute(
+                    "INSERT INTO runs (started_at, video_path, model_name, mode, frame_step, sampling_mode, batch_size, "
+                    "total_frames, frames_extracted, images_processed, total_detections, wall_s, frames_per_s, "
+                    "images_per_s, metrics_json) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", row)
+                run_id = cursor.lastrowid
+                stages = [(run_id, stage, seconds, None, None, None, None)
+                          for stage, seconds in metrics.get("pipeline_stage_times", {}).items()]
+                stages += [(run_id, operation, stats["total_s"], stats["count"], stats["p50_ms"], stats["p95_ms"],
+                            stats["p99_ms"])
+                           for operation, stats in metrics.get("operation_timings", {}).items()]
+                self._conn.executemany("INSERT INTO stage_timings VALUES (?, ?, ?, ?, ?, ?, ?)", stages)
+                class_distribution = metrics.get("object_detection_metrics", {}).get("class_distribution", {})
+                self._conn.executemany("INSERT INTO class_counts VALUES (?, ?, ?)",
+                                       [(run_id, cls, count) for cls, count in class_distribution.items()])
+                run_ids.append(run_id)
+        return run_ids
+
+    def run_count(self, model_name: Optional[str] = None) -> int:
+        if model_name is None:
+            return self._conn.execute("SELECT COUNT(*) FROM runs").fetchone()[0]
+        return self._conn.execute("SELECT COUNT(*) FROM runs WHERE model_name = ?", (model_name,)).fetchone()[0]
+
+    def time_range(self) -> Tuple[Optional[float], Optional[float]]:
+        """(first, last) started_at of the stored runs."""
+        return self._conn.execute("SELECT MIN(started_at), MAX(started_at) FROM runs").fetchone()
+
+    def throughput_over_time(self, bucket: str = "day", model_name: Optional[str] = None,
+                             since: Optional[float] = None, until: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        Throughput per day/week/month (in UTC): runs, mean images/s and video frames/s, mean wall time.
+
+        Args:
+            bucket (str): 'day', 'week' or 'month'.
+            model_name (Optional[str]): Only runs of this model.
+            since, until (Optional[float]): Unix time range of the runs (inclusive, exclusive).
+
+        Returns:
+            List[Dict[str, Any]]: One row per bucket, oldest first.
+        """
+        if bucket not in TREND_BUCKETS:
+            raise ValueError(f"Unknown trend bucket '{bucket}', expected one of {list(TREND_BUCKETS)}")
+        where, args = self._filters(model_name, since, until)
+        rows = self._conn.execute(
+            f"SELECT strftime('{TREND_BUCKETS[bucket]}', started_at, 'unixepoch') AS period, COUNT(*), "
+            f"AVG(images_per_s), AVG(frames_per_s), AVG(wall_s) FROM runs {where} "
+            f"GROUP BY period ORDER BY period", args).fetchall()
+        return [{"period": period, "runs": runs, "images_per_s": images_per_s, "frames_per_s": frames_per_s,
+                 "wall_s": wall_s} for period, runs, images_per_s, frames_per_s, wall_s in rows]
+
+    def model_regressions(self, window: int = 50, tolerance: float = 0.10) -> List[Dict[str, Any]]:
+        """
+        Compares each model's median images/s over its latest window runs with the window runs before.
+
+        Args:
+            window (int): Runs per compared window; models with fewer than 2 * window runs are skipped.
+            tolerance (float): Relative slowdown above which a model is flagged as regressed.
+
+        Returns:
+            List[Dict[str, Any]]: Per model: runs, baseline and recent median images/s, relative
+                                  change and whether it regressed; worst change first.
+        """
+        counts = self._conn.execute("SELECT model_name, COUNT(*) FROM runs GROUP BY model_name").fetchall()
+        results = []
+        for model_name, runs in counts:
+            values = [row[0] for row in self._conn.execute(
+                "SELECT images_per_s FROM runs WHERE model_name IS ? "
+                "ORDER BY started_at DESC LIMIT ?", (model_name, 2 * window))]
+            if len(values) < 2 * window:
+                continue
+            recent, baseline = statistics.median(values[:window]), statistics.median(values[window:])
+            change = (recent - baseline) / baseline if baseline else 0.0
+            results.append({"model_name": model_name, "runs": runs,
+                            "baseline_images_per_s": baseline, "recent_images_per_s": recent, "change": change,
+                            "regressed": -change > tolerance})
+        return sorted(results, key=lambda row: row["change"])
+
+    def class_totals(self, model_name: Optional[str] = None, since: Optional[float] = None,
+                     until: Optional[float] = None) -> Dict[str, int]:
+        """Detections per class over the runs in [since, until)."""
+        where, args = self._filters(model_name, since, until)
+        rows = self._conn.execute(
+            f"SELECT c.class_name, SUM(c.count) FROM (SELECT run_id FROM runs {where}) AS r "
+            f"JOIN class_counts AS c ON c.run_id = r.run_id GROUP BY c.class_name", args).fetchall()
+        return dict(rows)
+
+    def class_drift(self, recent_days: float = 7, baseline_days: float = 30, model_name: Optional[str] = None,
+                    now: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Compares the class distribution of the last recent_days with the baseline_days before them.
+
+        Args:
+            recent_days (float): Length of the recent window.
+            baseline_days (float): Length of the baseline window right before it.
+            model_name (Optional[str]): Only runs of this model.
+            now (Optional[float]): End of the recent window, the latest run if None.
+
+        Returns:
+            Dict[str, Any]: The window bounds, "total_variation" (0 = same distribution, 1 = disjoint)
+                            and per class the detection share in both windows, largest shift first.
+        """
+        if now is None:
+            now = (self.time_range()[1] or time.time()) + 1e-3
+        recent_start = now - recent_days * 86400
+        baseline_start = recent_start - baseline_days * 86400
+        recent = self.class_totals(model_name, recent_start, now)
+        baseline = self.class_totals(model_name, baseline_start, recent_start)
+        recent_total, baseline_total = sum(recent.values()), sum(baseline.values())
+        classes = []
+        for cls in set(recent) | set(baseline):
+            recent_share = recent.get(cls, 0) / recent_total if recent_total else 0.0
+            baseline_share = baseline.get(cls, 0) / baseline_total if baseline_total else 0.0
+            classes.append({"class_name": cls, "baseline_share": baseline_share, "recent_share": recent_share,
+                            "shift": recent_share - baseline_share})
+        classes.sort(key=lambda row: abs(row["shift"]), reverse=True)
+        return {
+            "baseline_start": baseline_start,
+            "recent_start": recent_start,
+            "end": now,
+            "baseline_detections": baseline_total,
+            "recent_detections": recent_total,
+            "total_variation": 0.5 * sum(abs(row["shift"]) for row in classes),
+            "classes": classes
+        }
+
+    @staticmethod
+    def _filters(model_name: Optional[str], since: Optional[float], until: Optional[float]) -> Tuple[str, list]:
+        clauses, args = [], []
+        if since is not None:
+            clauses.append("started_at >= ?")
+            args.append(since)
+        if until is not None:
+            clauses.append("started_at < ?")
+            args.append(until)
+        if model_name is not None:
+            clauses.append("model_name = ?")
+            args.append(model_name)
+        return ("WHERE " + " AND ".join(clauses)) if clauses else "", args
+
+    def close(self):
+        self._conn.close()
+
+    def __enter__(self) -> "RunHistory":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
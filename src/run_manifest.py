@@ -0,0 +1,179 @@
+# src/run_manifest.py
+import hashlib
+import json
+import logging
+import os
+from itertools import islice
+from typing import Dict, Any, Iterator, Optional
+
+import numpy as np
+
+from detection_cache import CachedResults
+from config import DEFAULT_CHECKPOINT_EVERY
+
+# Set up basic logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+_SAMPLE_BYTES = 1 << 20 # hashed from the start and the end of a file
+
+
+def file_fingerprint(path: str) -> Dict[str, Any]:
+    """
+    Cheap identity of a (possibly multi-GB) file: its size plus a hash of the first and last MB.
+
+    The modification time is left out on purpose so a copied or re-mounted video still matches.
+    """
+    size = os.path.getsize(path)
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        h.update(f.read(_SAMPLE_BYTES))
+        if size > _SAMPLE_BYTES:
+            f.seek(max(_SAMPLE_BYTES, size - _SAMPLE_BYTES))
+            h.update(f.read(_SAMPLE_BYTES))
+    return {"size": size, "hash": h.hexdigest()}
+
+
+def _write_json_atomic(path: str, data: Dict[str, Any]):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class RunManifest:
+    """
+    Records what a run in an output directory has already done, so a restarted run can skip it.
+
+    The manifest holds the run parameters (video fingerprint, frame_step, frame format, model) and
+    per-stage progress ("status", the stage metrics once complete, detection checkpoints). It is
+    only reused when resuming with identical parameters; otherwise the run starts from scratch.
+    """
+
+    def __init__(self, path: str, params: Dict[str, Any], stages: Optional[Dict[str, Any]] = None,
+                 resumed: bool = False):
+        self.path = path
+        self.params = params
+        self.stages: Dict[str, Dict[str, Any]] = stages or {}
+        self.resumed = resumed
+
+    @classmethod
+    def open(cls, path: str, params: Dict[str, Any], resume: bool) -> "RunManifest":
+        """Loads the manifest at path if resume is set and it was written with the same params, else starts a new one."""
+        if resume and os.path.exists(path):
+            try:
+                with open(path) as f:
+                    saved = json.load(f)
+            except (IOError, ValueError) as e:
+                logging.warning(f"Ignoring unreadable run manifest {path}: {e}")
+                saved = None
+            if saved and saved.get("params") == params:
+                logging.info(f"Resuming from run manifest {path}")
+                return cls(path, params, saved.get("stages"), resumed=True)
+            if saved:
+                logging.warning(f"Run manifest {path} was written with different parameters, starting from scratch.")
+        manifest = cls(path, params)
+        manifest.save()
+        return manifest
+
+    def stage(self, name: str) -> Dict[str, Any]:
+        return self.stages.setdefault(name, {"status": "pending"})
+
+    def is_complete(self, name: str) -> bool:
+        return self.stage(name).get("status") == "complete"
+
+    def update(self, name: str, **fields):
+        """Updates a stage's entry and persists the manifest."""
+        self.stage(name).update(fields)
+        self.save()
+
+    def save(self):
+        _write_json_atomic(self.path, {"params": self.params, "stages": self.stages})
+
+
+class DetectionJournal:
+    """
+    Append-only JSONL log of per-frame detections, checkpointed through the RunManifest.
+
+    Every commit_every frames the journal is flushed and fsync'ed and its length is recorded in the
+    "object_detection" stage of the manifest. On resume the journal is cut back to the last
+    committed length (dropping anything written after it) and the committed frames are replayed,
+    so the rebuilt COCO output is identical to an uninterrupted run.
+    """
+
+    STAGE = "object_detection"
+
+    def __init__(self, path: str, manifest: RunManifest, commit_every: int = DEFAULT_CHECKPOINT_EVERY):
+        self.path = path
+        self.manifest = manifest
+        self.commit_every = max(1, commit_every)
+        stage = manifest.stage(self.STAGE)
+        resuming = stage.get("status") == "in_progress" and os.path.exists(path)
+        self.committed_frames = stage.get("frames_committed", 0) if resuming else 0
+        committed_bytes = stage.get("journal_bytes", 0) if resuming else 0
+        self.records_replayed = 0
+
+        self._file = open(path, 'a+' if resuming else 'w+')
+        self._file.truncate(committed_bytes)
+        self._file.seek(committed_bytes)
+        self._pending = 0
+        manifest.update(self.STAGE, status="in_progress", frames_committed=self.committed_frames,
+                        journal_bytes=committed_bytes)
+
+    def committed_records(self) -> Iterator[Dict[str, Any]]:
+        """
+        Yields the frames committed by an earlier, interrupted run, in order.
+
+        The journal is read line by line (a long video's journal needn't fit in memory); it must be
+        consumed before the next append.
+        """
+        self._file.seek(0)
+        for line in islice(self._file, self.committed_frames):
+            yield json.loads(line)
+        self._file.seek(0, os.SEEK_END)
+
+    @staticmethod
+    def to_results(record: Dict[str, Any]) -> Optional[CachedResults]:
+        """Rebuilds what CocoBuilder.add needs from a journal record, None for a frame that failed."""
+        if record.get("failed"):
+            return None
+        boxes = np.array(record["boxes"], dtype=np.float32).reshape(-1, 6)
+        track_ids = np.array(record["track_ids"], dtype=np.int64) if "track_ids" in record else None
+        return CachedResults((record["height"], record["width"]), boxes, track_ids, record.get("propagated"))
+
+    def append(self, image_file: str, results: Optional[Any]):
+        if results is None:
+            record = {"file_name": image_file, "failed": True}
+        else:
+            data = results.boxes.data
+            data = data.cpu().numpy() if hasattr(data, 'cpu') else np.asarray(data)
+            height, width = results.orig_shape
+            record = {"file_name": image_file, "height": int(height), "width": int(width),
+                      "boxes": np.asarray(data, dtype=np.float32).reshape(-1, 6).tolist()}
+            if getattr(results, 'track_ids', None) is not None: # box_tracker.TrackingModel results
+                record.update(track_ids=np.asarray(results.track_ids).tolist(), propagated=bool(results.propagated))
+        self._file.write(json.dumps(record, separators=(',', ':')) + "\n")
+        self._pending += 1
+        if self._pending >= self.commit_every:
+            self.commit()
+
+    def commit(self):
+        """Makes every appended frame durable and records it in the manifest."""
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self.committed_frames += self._pending
+        self._pending = 0
+        self.manifest.update(self.STAGE, frames_committed=self.committed_frames, journal_bytes=self._file.tell())
+
+    def close(self):
+        """Closes the file, keeping it (and the last commit) for a later resume."""
+        if not self._file.closed:
+            self._file.close()
+
+    def finish(self, metrics: Dict[str, Any]):
+        """Marks detection complete (the COCO file is written) and removes the journal."""
+        self.close()
+        self.manifest.stages[self.STAGE] = {"status": "complete", "metrics": metrics}
+        self.manifest.save()
+        os.remove(self.path)
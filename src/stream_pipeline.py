@@ -0,0 +1,341 @@
+# src/stream_pipeline.py
+import argparse
+import collections
+import json
+import logging
+import os
+import signal
+import threading
+import time
+from typing import Dict, Any, Optional, Tuple
+
+from frame_extractor import frame_file_name
+from frame_sources import BUFFER_POLICIES, FrameRingBuffer, buffered_frames, open_frame_source, parse_frame_size
+from frame_writer import FRAME_FORMATS
+from frame_store import FRAME_STORES, open_frame_writer
+from object_detector import CocoBuilder, iter_batches, load_model, predict_batch
+from instrumentation import OperationTimings, use_timings
+from inference_backends import BACKENDS
+from metrics_exporter import live_run
+from run_manifest import _write_json_atomic
+from config import (
+    DEFAULT_FRAME_OUTPUT_DIR,
+    DEFAULT_COCO_OUTPUT_PATH,
+    DEFAULT_FRAME_STEP,
+    DEFAULT_FRAME_FORMAT,
+    DEFAULT_ENCODE_THREADS,
+    DEFAULT_FRAME_STORE,
+    DEFAULT_INFERENCE_SIZE,
+    DEFAULT_MODEL_NAME,
+    DEFAULT_BATCH_SIZE,
+    DEFAULT_BACKEND,
+    DEFAULT_COCO_COMPACT,
+    DEFAULT_STREAM_BUFFER_SIZE,
+    DEFAULT_STREAM_BUFFER_POLICY,
+    DEFAULT_SHARD_FRAMES,
+    DEFAULT_SHARD_SECONDS,
+    DEFAULT_SHARD_INDEX_PATH,
+    DEFAULT_STREAM_SUMMARY_PATH
+)
+
+# Set up basic logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+def shard_dir_name(shard: int) -> str:
+    return f"shard_{shard:06d}"
+
+
+class ShardedCocoOutput:
+    """
+    Rolls the detections of an endless stream into self-contained COCO shards of bounded size.
+
+    Shard n is <output_dir>/shard_<n>/ with its own detections.json (and frames/ when frames are
+    saved, named frame_file_name(i) from 0 in every shard), i.e. the layout of a regular run. A
+    shard is closed once it holds shard_frames frames or spans shard_seconds of stream time,
+    whichever comes first. Every closed shard is appended to shards.jsonl (with its frame range,
+    timestamps, counts and operation latencies) and stream_summary.json is rewritten with the
+    running totals, so both can be read while the stream goes on. Only the current shard's
+    CocoBuilder and the totals are kept in memory, and timings (the run's OperationTimings, see
+    run_stream) is reset per shard.
+    """
+
+    def __init__(self, output_dir: str, names: Dict[int, str], batch_size: int,
+                 shard_frames: Optional[int] = DEFAULT_SHARD_FRAMES,
+                 shard_seconds: Optional[float] = DEFAULT_SHARD_SECONDS,
+                 compact: bool = DEFAULT_COCO_COMPACT,
+                 original_size: Optional[Tuple[int, int]] = None,
+                 save_frames: bool = True,
+                 frame_format: str = DEFAULT_FRAME_FORMAT,
+                 frame_quality: Optional[int] = None,
+                 encode_threads: int = DEFAULT_ENCODE_THREADS,
+                 frame_store: str = DEFAULT_FRAME_STORE,
+                 timings: Optional[OperationTimings] = None):
+        if not shard_frames and not shard_seconds:
+            raise ValueError("Need shard_frames or shard_seconds, a single shard would grow without bound")
+        if frame_format not in FRAME_FORMATS:
+            raise ValueError(f"Unknown frame format '{frame_format}', expected one of {tuple(FRAME_FORMATS)}")
+        if frame_store not in FRAME_STORES:
+            raise ValueError(f"Unknown frame store '{frame_store}', expected one of {FRAME_STORES}")
+        os.makedirs(output_dir, exist_ok=True)
+        self.output_dir = output_dir
+        self.names = names
+        self.batch_size = batch_size
+        self.shard_frames = shard_frames
+        self.shard_seconds = shard_seconds
+        self.compact = compact
+        self.original_size = original_size
+        self.save_frames = save_frames
+        self.frame_format = frame_format
+        self.frame_quality = frame_quality
+        self.encode_threads = encode_threads
+        self.frame_store = frame_store
+        self.timings = timings if timings is not None else OperationTimings()
+        self.index_path = os.path.join(output_dir, DEFAULT_SHARD_INDEX_PATH)
+
+        self.shards_written = 0
+        self.images_processed = 0
+        self.total_detections = 0
+        self.class_distribution = collections.Counter()
+        self._builder: Optional[CocoBuilder] = None
+        self._writer = None # frame writer of the current shard (frame_store.open_frame_writer)
+        self._shard: Dict[str, Any] = {}
+
+    def _shard_full(self, timestamp: float) -> bool:
+        if self.shard_frames and self._shard["frames"] >= self.shard_frames:
+            return True
+        return bool(self.shard_seconds) and timestamp - self._shard["start_s"] >= self.shard_seconds
+
+    def _open(self, frame_idx: int, timestamp: float):
+        shard = self.shards_written + 1
+        shard_dir = os.path.join(self.output_dir, shard_dir_name(shard))
+        os.makedirs(shard_dir, exist_ok=True)
+        self._builder = CocoBuilder(self.names, os.path.join(shard_dir, DEFAULT_COCO_OUTPUT_PATH),
+                                    compact=self.compact, original_size=self.original_size)
+        if self.save_frames:
+            self._writer = open_frame_writer(os.path.join(shard_dir, DEFAULT_FRAME_OUTPUT_DIR), self.frame_store,
+                                             self.frame_format, self.frame_quality, self.encode_threads)
+        self._shard = {"shard": shard, "first_frame": frame_idx, "last_frame": frame_idx, "start_s": timestamp,
+                       "end_s": timestamp, "opened_at": time.time(), "frames": 0}
+
+    def add(self, frame_idx: int, timestamp: float, frame, results: Optional[Any]):
+        """Adds one detected frame (results None: detection failed), first closing the current shard if it is full."""
+        if self._builder is not None and self._shard_full(timestamp):
+            self.roll()
+        if self._builder is None:
+            self._open(frame_idx, timestamp)
+        file_name = frame_file_name(self._shard["frames"], self.frame_format)
+        if self._writer is not None:
+            self._writer.submit(file_name, frame)
+        self._builder.add(file_name, results)
+        self._shard.update(frames=self._shard["frames"] + 1, last_frame=frame_idx, end_s=timestamp)
+
+    def roll(self) -> Optional[Dict[str, Any]]:
+        """Closes the current shard, if any, and returns its shards.jsonl entry."""
+        if self._builder is None:
+            return None
+        builder, writer, self._builder, self._writer = self._builder, self._writer, None, None
+        metrics = builder.save(self.batch_size)["metrics"]
+        write_metrics = writer.close() if writer is not None else {}
+        shard_dir = shard_dir_name(self._shard["shard"])
+        entry = {
+            **{key: value for key, value in self._shard.items() if key != "frames"},
+            "closed_at": time.time(),
+            "coco": os.path.join(shard_dir, DEFAULT_COCO_OUTPUT_PATH),
+            "frames_dir": os.path.join(shard_dir, DEFAULT_FRAME_OUTPUT_DIR) if writer is not None else None,
+            "images": metrics["images_processed"],
+            "detections": metrics["total_detections"],
+            "class_distribution": metrics["class_distribution"],
+            "bytes_written": write_metrics.get("bytes_written", 0),
+            "operation_timings": self.timings.summary()
+        }
+        self.timings.reset() # every sample is kept, reset so an endless stream doesn't grow it
+        with open(self.index_path, 'a') as f:
+            f.write(json.dumps(entry) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self.shards_written += 1
+        self.images_processed += entry["images"]
+        self.total_detections += entry["detections"]
+        self.class_distribution.update(entry["class_distribution"])
+        logging.info(f"Closed {shard_dir}: frames {entry['first_frame']}-{entry['last_frame']}, "
+                     f"{entry['detections']} detections")
+        return entry
+
+    def abort(self):
+        """Drops the unfinished shard's COCO file, for error paths. Closed shards are kept."""
+        if self._builder is not None:
+            self._builder.abort()
+            self._builder = None
+        if self._writer is not None:
+            self._writer.shutdown()
+            self._writer = None
+
+
+def run_stream(source: str, output_dir: str,
+               model_name: str = DEFAULT_MODEL_NAME,
+               model=None,
+               backend: str = DEFAULT_BACKEND,
+               frame_step: int = DEFAULT_FRAME_STEP,
+               batch_size: int = DEFAULT_BATCH_SIZE,
+               raw_size: Optional[Tuple[int, int]] = None,
+               fps: Optional[float] = None,
+               buffer_size: int = DEFAULT_STREAM_BUFFER_SIZE,
+               buffer_policy: str = DEFAULT_STREAM_BUFFER_POLICY,
+               shard_frames: Optional[int] = DEFAULT_SHARD_FRAMES,
+               shard_seconds: Optional[float] = DEFAULT_SHARD_SECONDS,
+               inference_size: Optional[int] = DEFAULT_INFERENCE_SIZE,
+               save_frames: bool = True,
+               frame_format: str = DEFAULT_FRAME_FORMAT,
+               frame_quality: Optional[int] = None,
+               encode_threads: int = DEFAULT_ENCODE_THREADS,
+               frame_store: str = DEFAULT_FRAME_STORE,
+               compact_coco: bool = DEFAULT_COCO_COMPACT,
+               max_frames: Optional[int] = None,
+               stop_event: Optional[threading.Event] = None) -> Dict[str, Any]:
+    """
+    Pre-tags a possibly endless input (stream URL, named pipe, raw frames on stdin, or a file) in constant memory.
+
+    Frames are read on a background thread into a FrameRingBuffer of buffer_size frames
+    (buffer_policy "drop" discards the oldest frame when detection falls behind, "block" slows the
+    reader down), detected in batches, and written to rolling COCO shards (ShardedCocoOutput).
+    Unlike run_pipeline there is no frame-count validation: the run ends when the input ends,
+    after max_frames frames, or when stop_event is set, and the last shard is closed either way.
+
+    Args:
+        source (str): See frame_sources.open_frame_source ('-' is stdin).
+        output_dir (str): Shards, shards.jsonl and stream_summary.json go here.
+        raw_size (Optional[Tuple[int, int]]): (width, height) when the input is raw bgr24 frames.
+        fps (Optional[float]): Frame rate of raw input, used for timestamps and shard_seconds.
+        shard_frames / shard_seconds: Close a shard after this many kept frames / seconds of stream time.
+        Other arguments as in run_pipeline.
+
+    Returns:
+        Dict[str, Any]: The final stream summary (also in stream_summary.json).
+    """
+    if batch_size < 1:
+        raise ValueError(f"batch_size must be >= 1, got {batch_size}")
+    buffer = FrameRingBuffer(buffer_size, buffer_policy)
+    if model is None:
+        model = load_model(model_name, backend)
+    timings = OperationTimings() # this run's samples only, reset per shard
+    # checks the shard and frame settings before the source is opened (a named pipe waits for a writer)
+    output = ShardedCocoOutput(output_dir, model.names, batch_size, shard_frames, shard_seconds, compact=compact_coco,
+                               save_frames=save_frames, frame_format=frame_format, frame_quality=frame_quality,
+                               encode_threads=encode_threads, frame_store=frame_store, timings=timings)
+    frame_source = open_frame_source(source, raw_size, fps)
+
+    start_time = time.time()
+    counters: Dict[str, int] = {}
+    summary_path = os.path.join(output_dir, DEFAULT_STREAM_SUMMARY_PATH)
+
+    def summary(status: str) -> Dict[str, Any]:
+        wall_s = time.time() - start_time
+        return {
+            "status": status,
+            **frame_source.describe(),
+            "frame_step": frame_step,
+            "buffer_size": buffer_size,
+            "buffer_policy": buffer_policy,
+            **counters,
+            "shards": output.shards_written,
+            "images_processed": output.images_processed,
+            "total_detections": output.total_detections,
+            "class_distribution": dict(output.class_distribution),
+            "wall_s": wall_s,
+            "images_per_s": output.images_processed / wall_s if wall_s > 0 else 0.0
+        }
+
+    logging.info(f"Pre-tagging stream '{frame_source.name}' into {output_dir} "
+                 f"(buffer {buffer_size} frames, policy '{buffer_policy}')")
+    pending = collections.deque() # (frame_idx, timestamp) of the frames handed to iter_batches, in order
+
+    def frames():
+        for frame_idx, timestamp, frame in buffered_frames(frame_source, frame_step, buffer, inference_size,
+                                                           stop_event, max_frames, counters):
+            if inference_size and output.original_size is None:
+                output.original_size = (frame_source.width, frame_source.height) # COCO keeps the source resolution
+            pending.append((frame_idx, timestamp))
+            yield str(frame_idx), frame
+
+    try:
+        # the buffer's and the shards' live metrics share a run label
+        with live_run(), use_timings(timings):
+            for batch in iter_batches(frames(), batch_size):
+                for (_, frame), results in zip(batch, predict_batch(model, batch)):
+                    frame_idx, timestamp = pending.popleft()
+                    shards_before = output.shards_written
+                    output.add(frame_idx, timestamp, frame, results)
+                    if output.shards_written != shards_before:
+                        _write_json_atomic(summary_path, summary("running"))
+            output.roll()
+    except BaseException:
+        output.abort()
+        frame_source.close() # buffered_frames closes it, unless the stream failed before it was started
+        _write_json_atomic(summary_path, summary("failed"))
+        raise
+
+    result = summary("finished")
+    _write_json_atomic(summary_path, result)
+    logging.info(f"Stream finished: {result['frames_read']} frames read, {result['images_processed']} detected, "
+                 f"{result['buffer_drops']} dropped by the buffer, {result['shards']} shard(s).")
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Pre-tag a live stream, named pipe or raw frames on stdin into rolling COCO shards."
+    )
+    parser.add_argument("--source", type=str, required=True,
+                        help="Stream URL (rtsp://, http://, ...), video file, named pipe, or '-' for stdin.")
+    parser.add_argument("--output_dir", type=str, default="output",
+                        help="Directory for the shards, shards.jsonl and stream_summary.json.")
+    parser.add_argument("--raw_size", type=parse_frame_size, default=None,
+                        help="WIDTHxHEIGHT of raw bgr24 frames (required for '-'; with a pipe, read it as raw frames), "
+                             "e.g. from `ffmpeg -i <feed> -f rawvideo -pix_fmt bgr24 -`.")
+    parser.add_argument("--fps", type=float, default=None,
+                        help="Frame rate of raw input (timestamps and --shard_seconds use wall-clock time without it).")
+    parser.add_argument("--frame_step", type=int, default=DEFAULT_FRAME_STEP,
+                        help=f"Keep every Nth frame read (default: {DEFAULT_FRAME_STEP}).")
+    parser.add_argument("--model_name", type=str, default=DEFAULT_MODEL_NAME,
+                        help=f"YOLO model to use (default: {DEFAULT_MODEL_NAME}).")
+    parser.add_argument("--backend", type=str, choices=BACKENDS, default=DEFAULT_BACKEND,
+                        help=f"Inference backend (default: {DEFAULT_BACKEND}).")
+    parser.add_argument("--batch_size", type=int, default=DEFAULT_BATCH_SIZE,
+                        help=f"Frames per forward pass (default: {DEFAULT_BATCH_SIZE}).")
+    parser.add_argument("--buffer_size", type=int, default=DEFAULT_STREAM_BUFFER_SIZE,
+                        help=f"Frames held between the reader and the detector (default: {DEFAULT_STREAM_BUFFER_SIZE}).")
+    parser.add_argument("--buffer_policy", choices=BUFFER_POLICIES, default=DEFAULT_STREAM_BUFFER_POLICY,
+                        help="When the buffer is full: 'drop' the oldest frame (live feeds) or 'block' the reader "
+                             f"(lossless, for pipes and files) (default: {DEFAULT_STREAM_BUFFER_POLICY}).")
+    parser.add_argument("--shard_frames", type=int, default=DEFAULT_SHARD_FRAMES,
+                        help=f"Frames per COCO shard, 0 = no limit (default: {DEFAULT_SHARD_FRAMES}).")
+    parser.add_argument("--shard_seconds", type=float, default=DEFAULT_SHARD_SECONDS,
+                        help=f"Stream seconds per COCO shard, 0 = no limit (default: {DEFAULT_SHARD_SECONDS}).")
+    parser.add_argument("--inference_size", type=int, default=DEFAULT_INFERENCE_SIZE,
+                        help="Downscale kept frames so their long side is at most this many pixels before buffering.")
+    parser.add_argument("--no_save_frames", action="store_true", help="Only write the COCO shards, not the frames.")
+    parser.add_argument("--frame_format", choices=list(FRAME_FORMATS), default=DEFAULT_FRAME_FORMAT,
+                        help=f"Format of the saved frames (default: {DEFAULT_FRAME_FORMAT}).")
+    parser.add_argument("--frame_store", choices=FRAME_STORES, default=DEFAULT_FRAME_STORE,
+                        help=f"Store each shard's frames as files or as packed tar shards (default: {DEFAULT_FRAME_STORE}).")
+    parser.add_argument("--compact_coco", action="store_true", help="Write the COCO shards without indentation.")
+    parser.add_argument("--max_frames", type=int, default=None, help="Stop after reading this many frames.")
+    args = parser.parse_args()
+
+    stop = threading.Event()
+
+    def handle(signum, frame):
+        logging.info(f"Received signal {signum}, closing the stream after the frames already buffered.")
+        stop.set()
+
+    signal.signal(signal.SIGTERM, handle)
+    signal.signal(signal.SIGINT, handle)
+    result = run_stream(args.source, args.output_dir, model_name=args.model_name, backend=args.backend,
+                        frame_step=args.frame_step, batch_size=args.batch_size, raw_size=args.raw_size, fps=args.fps,
+                        buffer_size=args.buffer_size, buffer_policy=args.buffer_policy,
+                        shard_frames=args.shard_frames or None, shard_seconds=args.shard_seconds or None,
+                        inference_size=args.inference_size, save_frames=not args.no_save_frames,
+                        frame_format=args.frame_format, frame_store=args.frame_store, compact_coco=args.compact_coco, max_frames=args.max_frames,
+                        stop_event=stop)
+    print(json.dumps(result))
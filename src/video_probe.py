@@ -0,0 +1,83 @@
+# src/video_probe.py
+import logging
+import os
+from typing import Dict, Any, Optional
+
+import cv2
+
+# Set up basic logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+def _fourcc_to_str(fourcc: float) -> str:
+    code = int(fourcc)
+    chars = "".join(chr((code >> 8 * i) & 0xFF) for i in range(4))
+    return chars.strip("\x00 ") or "unknown"
+
+
+class VideoProbe:
+    """
+    Properties of an input video (frame count, fps, resolution, codec), read with a single open.
+
+    The capture used for probing is kept open and handed to the first stage that decodes the
+    video (see capture()), so validation and extraction don't open and parse the container twice.
+    """
+
+    def __init__(self, path: str, frame_count: int, fps: float, width: int, height: int, codec: str,
+                 capture: Optional[cv2.VideoCapture] = None):
+        self.path = path
+        self.frame_count = frame_count
+        self.fps = fps
+        self.width = width
+        self.height = height
+        self.codec = codec
+        self._capture = capture
+
+    @classmethod
+    def open(cls, video_path: str) -> "VideoProbe":
+        """
+        Opens the video and reads its properties.
+
+        Raises:
+            FileNotFoundError: If the file does not exist.
+            IOError: If OpenCV can't open it.
+        """
+        if not os.path.exists(video_path):
+            raise FileNotFoundError(f"Video file not found: {video_path}")
+        cap = cv2.VideoCapture(video_path)
+        if not cap.isOpened():
+            cap.release()
+            raise IOError(f"Could not open video file: {video_path}")
+        return cls(video_path, int(cap.get(cv2.CAP_PROP_FRAME_COUNT)), cap.get(cv2.CAP_PROP_FPS),
+                   int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+                   _fourcc_to_str(cap.get(cv2.CAP_PROP_FOURCC)), cap)
+
+    @property
+    def duration_s(self) -> float:
+        return self.frame_count / self.fps if self.fps > 0 else 0.0
+
+    def capture(self) -> cv2.VideoCapture:
+        """
+        A capture positioned at the first frame: the probing one the first time (ownership passes
+        to the caller, who releases it), a freshly opened one afterwards.
+        """
+        cap, self._capture = self._capture, None
+        if cap is None:
+            cap = cv2.VideoCapture(self.path)
+        return cap
+
+    def release(self):
+        """Releases the probing capture if no stage took it."""
+        if self._capture is not None:
+            self._capture.release()
+            self._capture = None
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "frame_count": self.frame_count,
+            "fps": self.fps,
+            "width": self.width,
+            "height": self.height,
+            "codec": self.codec,
+            "duration_s": self.duration_s
+        }
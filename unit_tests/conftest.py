@@ -0,0 +1,39 @@
+import os
+import sys
+
+import cv2
+import numpy as np
+import pytest
+
+# The src modules import each other by bare name (they are run as `python src/main_pipeline.py`),
+# so src/ has to be importable on its own as well as through the `src.` package path.
+SRC_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir, "src"))
+if os.path.isdir(SRC_DIR) and SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
+
+# One stub detector for the tests and the benchmarks: deterministic boxes derived from the pixels
+from benchmarks.stub_detector import StubDetector  # noqa: E402
+
+
+def write_synthetic_video(path, num_frames=90, fps=30, size=(320, 240)):
+    """Writes a small mp4 with a moving square and the frame number burnt in."""
+    width, height = size
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+    for i in range(num_frames):
+        frame = np.zeros((height, width, 3), dtype=np.uint8)
+        x = (i * 5) % (width - 40)
+        cv2.rectangle(frame, (x, 80), (x + 40, 120), (0, 255, 0), -1)
+        cv2.putText(frame, str(i), (10, 40), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
+        writer.write(frame)
+    writer.release()
+    return path
+
+
+@pytest.fixture
+def synthetic_video(tmp_path):
+    return write_synthetic_video(str(tmp_path / "synthetic.mp4"))
+
+
+@pytest.fixture
+def stub_model():
+    return StubDetector()
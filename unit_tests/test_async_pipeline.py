@@ -0,0 +1,97 @@
+import asyncio
+import json
+import os
+import threading
+import time
+
+import pytest
+
+from unit_tests.conftest import StubDetector, write_synthetic_video
+from src.async_pipeline import InferencePool, run_many_async, run_pipeline_async
+from src.main_pipeline import run_pipeline
+from src.instrumentation import TIMINGS
+
+
+class _CountingStub(StubDetector):
+    """StubDetector that takes latency_s per call and records how many calls overlapped, across all copies."""
+    lock = threading.Lock()
+    active = 0
+    max_active = 0
+
+    def __init__(self, latency_s=0.0):
+        super().__init__()
+        self.latency_s = latency_s
+
+    def __call__(self, source, verbose=False, **kwargs):
+        with _CountingStub.lock:
+            _CountingStub.active += 1
+            _CountingStub.max_active = max(_CountingStub.max_active, _CountingStub.active)
+        try:
+            time.sleep(self.latency_s)
+            return super().__call__(source, verbose=verbose, **kwargs)
+        finally:
+            with _CountingStub.lock:
+                _CountingStub.active -= 1
+
+
+def _load(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def test_concurrent_jobs_match_sync_pipeline(tmp_path):
+    videos = [write_synthetic_video(str(tmp_path / f"video_{i}.mp4"), num_frames=60 + 30 * i) for i in range(3)]
+    missing = str(tmp_path / "missing.mp4")
+    _CountingStub.max_active = 0
+    pool = InferencePool([_CountingStub(0.005), _CountingStub(0.005)])
+    process_samples = TIMINGS.current().export()
+
+    async def serve():
+        ticks = 0
+        async def ticker(): # the loop must stay responsive while the jobs run
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.001)
+                ticks += 1
+        ticking = asyncio.ensure_future(ticker())
+        results = await run_many_async(videos + [missing], str(tmp_path / "async"), pool, frame_step=10, batch_size=2)
+        ticking.cancel()
+        return results, ticks
+
+    results, ticks = asyncio.run(serve())
+    pool.close()
+
+    assert [result["status"] for result in results] == ["ok", "ok", "ok", "failed"]
+    assert "failed validation" in results[3]["error"] and results[3]["metrics"] is None
+    assert _CountingStub.max_active == pool.max_in_flight == 2 # never more than the pool size
+    assert ticks > 10
+    assert TIMINGS.current().export() == process_samples # the jobs only record into their own timings
+    for i, (video, result) in enumerate(zip(videos, results)):
+        assert result["metrics"]["operation_timings"]["decode"]["count"] == 60 + 30 * i
+        expected = run_pipeline(video, str(tmp_path / "sync" / os.path.basename(video)), frame_step=10,
+                                model_name="stub", model=StubDetector(), stream_frames=True, batch_size=2)
+        assert _load(result["outputs"]["coco"]) == _load(tmp_path / "sync" / os.path.basename(video) / "detections.json")
+        assert result["metrics"]["object_detection_metrics"] == expected["object_detection_metrics"]
+        assert os.path.exists(result["outputs"]["report"]) and len(os.listdir(result["outputs"]["frames_dir"])) > 0
+
+
+def test_cancelled_job_cleans_up(tmp_path):
+    video = write_synthetic_video(str(tmp_path / "long.mp4"), num_frames=300)
+    pool = InferencePool([_CountingStub(0.02)])
+
+    async def cancel_one():
+        job = asyncio.ensure_future(run_pipeline_async(video, str(tmp_path / "cancelled"), pool, frame_step=2,
+                                                       batch_size=2))
+        await asyncio.sleep(0.2)
+        job.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await job
+        # the pool's model is free again for the next job
+        return await run_pipeline_async(video, str(tmp_path / "next"), pool, frame_step=100, report=False)
+
+    result = asyncio.run(cancel_one())
+    pool.close()
+
+    output = os.listdir(tmp_path / "cancelled")
+    assert "detections.json" not in output and not any(f.endswith(".partial") for f in output)
+    assert result["status"] == "ok" and result["metrics"]["object_detection_metrics"]["images_processed"] == 3
@@ -0,0 +1,45 @@
+import os
+
+from src.batch_pipeline import discover_videos, video_output_dirs
+from src.reporter import generate_batch_report
+
+
+def test_discover_videos_from_dir_glob_and_manifest(tmp_path):
+    for name in ("b.mp4", "a.MOV", "notes.txt"):
+        (tmp_path / name).write_bytes(b"")
+    (tmp_path / "manifest.txt").write_text("# cameras\nb.mp4\n\n/abs/c.mp4\nb.mp4\n")
+
+    assert discover_videos(str(tmp_path)) == [str(tmp_path / "a.MOV"), str(tmp_path / "b.mp4")]
+    assert discover_videos(str(tmp_path / "*.mp4")) == [str(tmp_path / "b.mp4")]
+    # a video listed twice is processed once
+    assert discover_videos(str(tmp_path / "manifest.txt")) == [str(tmp_path / "b.mp4"), "/abs/c.mp4"]
+
+
+def test_video_output_dirs_keep_single_video_layout(tmp_path):
+    dirs = video_output_dirs(["cam1/clip.mp4", "cam2/clip.mp4", "cam2/other.avi", "cam1/clip.mp4"], "out")
+    assert dirs == {
+        "cam1/clip.mp4": os.path.join("out", "clip"),
+        "cam2/clip.mp4": os.path.join("out", "clip_2"),
+        "cam2/other.avi": os.path.join("out", "other"),
+    }
+
+
+def test_generate_batch_report(tmp_path):
+    summary = {
+        "videos": [
+            {"video_path": "in/a.mp4", "status": "ok", "error": None, "wall_s": 2.0, "images_per_s": 5.0,
+             "metrics": {"frame_extraction_metrics": {"total_frames_in_video": 300},
+                         "object_detection_metrics": {"images_processed": 10, "total_detections": 4}}},
+            {"video_path": "in/b.mp4", "status": "failed", "error": "could not open", "wall_s": 0.1,
+             "images_per_s": 0.0, "metrics": None},
+        ],
+        "totals": {"videos": 2, "videos_succeeded": 1, "videos_failed": 1, "workers": 2, "model_name": "yolov8n.pt",
+                   "wall_s": 2.5, "images_processed": 10, "images_per_s": 4.0, "videos_per_hour": 2880.0},
+    }
+    output_path = str(tmp_path / "batch_report.md")
+    generate_batch_report(summary, output_path)
+    with open(output_path) as f:
+        content = f.read()
+    assert "| a.mp4 | ok | 300 | 10 | 4 | 2.00 | 5.00 |" in content
+    assert "failed: could not open" in content
+    assert "4.00 images/s" in content
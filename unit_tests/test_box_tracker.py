@@ -0,0 +1,94 @@
+import json
+
+import cv2
+import numpy as np
+import pytest
+
+from src.box_tracker import TrackingModel, propagate_boxes
+from src.main_pipeline import run_pipeline
+
+
+class _SquareDetector:
+    """Finds the green square of the synthetic videos, so tracked boxes can be checked against real positions."""
+    names = {0: "square"}
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, source, verbose=False, **kwargs):
+        sources = source if isinstance(source, list) else [source]
+        self.calls += len(sources)
+        return [self._detect(cv2.imread(s) if isinstance(s, str) else s) for s in sources]
+
+    @staticmethod
+    def square_box(image):
+        ys, xs = np.nonzero((image[:, :, 1] > 128) & (image[:, :, 2] < 100))
+        return [xs.min() - 4.0, ys.min() - 4.0, xs.max() + 5.0, ys.max() + 5.0] if len(xs) else None
+
+    def _detect(self, image):
+        from types import SimpleNamespace
+        box = self.square_box(image)
+        data = np.array([box + [0.9, 0]] if box else [], dtype=np.float32).reshape(-1, 6)
+        return SimpleNamespace(orig_shape=image.shape[:2], boxes=SimpleNamespace(data=data))
+
+
+def _square_video(path, positions, size=(320, 240)):
+    width, height = size
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), 30, (width, height))
+    for x, y in positions:
+        frame = np.zeros((height, width, 3), dtype=np.uint8)
+        cv2.rectangle(frame, (x, y), (x + 40, y + 40), (0, 255, 0), -1)
+        writer.write(frame)
+    writer.release()
+    return path
+
+
+def test_propagate_boxes_follows_motion():
+    rng = np.random.default_rng(0)
+    prev = np.zeros((240, 320), dtype=np.uint8)
+    prev[100:140, 50:90] = rng.integers(0, 255, size=(40, 40))
+    gray = np.roll(prev, (3, 6), axis=(0, 1)) # 6 px right, 3 px down
+
+    boxes, confidence = propagate_boxes(prev, gray, np.array([[50.0, 100.0, 90.0, 140.0], [200.0, 20.0, 240.0, 60.0]]))
+    np.testing.assert_allclose(boxes[0], [56, 103, 96, 143], atol=0.5)
+    assert confidence[0] > 0.8
+    assert confidence[1] == 0.0 # nothing to track on a flat background
+
+
+def test_keyframe_detection_propagates_boxes(tmp_path):
+    positions = [(10 + 4 * i, 60 + 2 * i) for i in range(32)] + [(250, 20 + i) for i in range(8)] # jump between keyframes
+    video = _square_video(str(tmp_path / "square.mp4"), positions)
+    detector = _SquareDetector()
+
+    metrics = run_pipeline(video, str(tmp_path / "out"), frame_step=1, model_name="square", model=detector,
+                           stream_frames=True, save_frames=False, batch_size=4, keyframe_interval=5)
+    od_metrics = metrics["object_detection_metrics"]
+
+    assert od_metrics["images_processed"] == 40
+    assert od_metrics["frames_inferred"] == detector.calls < 40
+    assert od_metrics["frames_propagated"] == 40 - detector.calls
+    assert od_metrics["inference_ratio"] == pytest.approx(detector.calls / 40)
+    assert od_metrics["early_redetections"] >= 1 # the jump loses the track before the next keyframe
+
+    with open(tmp_path / "out" / "detections.json") as f:
+        coco = json.load(f)
+    images = {image["id"]: image for image in coco["images"]}
+    assert sum(image["propagated"] for image in images.values()) == od_metrics["frames_propagated"]
+    for annotation in coco["annotations"]:
+        frame_idx = annotation["image_id"] - 1
+        assert annotation["propagated"] == images[annotation["image_id"]]["propagated"]
+        assert annotation["track_id"] == (1 if frame_idx < 32 else 2)
+        x, y = positions[frame_idx]
+        np.testing.assert_allclose(annotation["bbox"], [x - 4, y - 4, 49, 49], atol=2.5)
+    with open(tmp_path / "out" / "pipeline_report.md") as f:
+        assert f"- **Frames Inferred:** {detector.calls} of 40" in f.read()
+
+
+def test_tracking_model_every_frame_with_interval_one():
+    detector = _SquareDetector()
+    model = TrackingModel(detector, keyframe_interval=1)
+    frame = np.zeros((120, 160, 3), dtype=np.uint8)
+    cv2.rectangle(frame, (20, 20), (60, 60), (0, 255, 0), -1)
+    results = model([frame, frame, frame])
+    assert detector.calls == 3 and not any(r.propagated for r in results)
+    assert [r.track_ids.tolist() for r in results] == [[1], [1], [1]]
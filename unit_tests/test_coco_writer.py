@@ -0,0 +1,64 @@
+import json
+import os
+
+import pytest
+
+from src.coco_writer import StreamingCocoWriter
+
+COCO = {
+    "images": [{"id": 1, "file_name": "frame_00000.jpg", "height": 240, "width": 320},
+               {"id": 2, "file_name": "frame_00001.jpg", "height": 240, "width": 320}],
+    "annotations": [{"id": 1, "image_id": 2, "category_id": 1, "bbox": [1.5, 2.0, 10.25, 20.0], "area": 205.0,
+                     "iscrowd": 0, "segmentation": [], "confidence": 0.875}],
+    "categories": [{"id": 1, "name": "person"}, {"id": 2, "name": "car"}]
+}
+
+
+def _write(path, coco, compact=False):
+    writer = StreamingCocoWriter(str(path), compact=compact)
+    # interleaved like the detector produces them
+    writer.add_image(coco["images"][0])
+    writer.add_image(coco["images"][1])
+    for annotation in coco["annotations"]:
+        writer.add_annotation(annotation)
+    writer.close(coco["categories"])
+
+
+@pytest.mark.parametrize("coco", [COCO, {"images": [], "annotations": [], "categories": COCO["categories"]}])
+def test_indented_output_matches_json_dump(tmp_path, coco):
+    path = tmp_path / "detections.json"
+    writer = StreamingCocoWriter(str(path))
+    for image in coco["images"]:
+        writer.add_image(image)
+    for annotation in coco["annotations"]:
+        writer.add_annotation(annotation)
+    writer.close(coco["categories"])
+
+    assert path.read_text() == json.dumps(coco, indent=2)
+    assert sorted(os.listdir(tmp_path)) == ["detections.json"]
+
+
+def test_compact_output_is_smaller_and_equal(tmp_path):
+    _write(tmp_path / "indented.json", COCO)
+    _write(tmp_path / "compact.json", COCO, compact=True)
+
+    assert json.loads((tmp_path / "compact.json").read_text()) == COCO
+    assert "\n" not in (tmp_path / "compact.json").read_text()
+    assert os.path.getsize(tmp_path / "compact.json") < os.path.getsize(tmp_path / "indented.json")
+
+
+def test_abort_leaves_no_files(tmp_path):
+    writer = StreamingCocoWriter(str(tmp_path / "detections.json"))
+    writer.add_image(COCO["images"][0])
+    writer.abort()
+    assert os.listdir(tmp_path) == []
+
+
+def test_pycocotools_can_load_output(tmp_path):
+    coco_api = pytest.importorskip("pycocotools.coco")
+    _write(tmp_path / "compact.json", COCO, compact=True)
+
+    coco = coco_api.COCO(str(tmp_path / "compact.json"))
+    assert coco.getImgIds() == [1, 2]
+    assert coco.getAnnIds(imgIds=[2]) == [1]
+    assert coco.loadCats(coco.getCatIds())[0]["name"] == "person"
@@ -0,0 +1,80 @@
+import json
+import multiprocessing
+from types import SimpleNamespace
+
+import numpy as np
+
+from src.detection_cache import DetectionCache
+from src.frame_extractor import iter_frames, frame_file_name
+from src.object_detector import pretag_frames_and_generate_coco
+
+
+def _frames(video, frame_step):
+    return ((frame_file_name(i), frame) for i, (_, _, frame) in enumerate(iter_frames(video, frame_step=frame_step)))
+
+
+def _results(n, seed):
+    data = np.random.default_rng(seed).uniform(0, 100, size=(n, 6)).astype(np.float32)
+    return SimpleNamespace(orig_shape=(240, 320), boxes=SimpleNamespace(data=data))
+
+
+def test_rerun_with_other_frame_step_hits_cache(synthetic_video, tmp_path, stub_model):
+    cache = DetectionCache(str(tmp_path / "cache.sqlite"))
+    uncached = pretag_frames_and_generate_coco(_frames(synthetic_video, 20), str(tmp_path / "plain.json"), "stub",
+                                               model=stub_model)
+    first = pretag_frames_and_generate_coco(_frames(synthetic_video, 10), str(tmp_path / "a.json"), "stub",
+                                            model=stub_model, cache=cache)
+    calls = stub_model.calls
+    # every 20th frame is also a 10th frame, so nothing new has to go through the model
+    second = pretag_frames_and_generate_coco(_frames(synthetic_video, 20), str(tmp_path / "b.json"), "stub",
+                                             model=stub_model, cache=cache, batch_size=1)
+
+    assert (first["metrics"]["cache_hits"], first["metrics"]["cache_misses"]) == (0, 9)
+    assert (second["metrics"]["cache_hits"], second["metrics"]["cache_misses"]) == (5, 0)
+    assert stub_model.calls == calls
+    with open(tmp_path / "b.json") as f_cached, open(tmp_path / "plain.json") as f_plain:
+        assert json.load(f_cached) == json.load(f_plain)
+    assert second["metrics"]["class_distribution"] == uncached["metrics"]["class_distribution"]
+
+
+def test_cached_detections_are_exact(tmp_path):
+    cache = DetectionCache(str(tmp_path / "cache.sqlite"))
+    results = _results(7, 0)
+    cache.put_many([("k", results)])
+    hit = cache.get_many(["k", "other"])
+
+    assert list(hit) == ["k"]
+    assert hit["k"].orig_shape == (240, 320)
+    assert np.array_equal(hit["k"].boxes.data, results.boxes.data)
+
+
+def test_lru_eviction_keeps_recently_used(tmp_path):
+    cache = DetectionCache(str(tmp_path / "cache.sqlite"), max_mb=64 * 1024 / 1024 / 1024) # 64 KiB
+    cache.put_many([(f"old{i}", _results(100, i)) for i in range(10)]) # 2.4 KB each
+    cache.put_many([(f"new{i}", _results(100, i)) for i in range(20)])
+    cache.get_many(["old0"])
+    cache.evict() # 72 KB -> evicts the 6 least recently used to get under 90%
+
+    assert "old0" in cache.get_many(["old0"])
+    assert not cache.get_many([f"old{i}" for i in range(1, 7)])
+    assert len(cache.get_many([f"old{i}" for i in range(7, 10)] + [f"new{i}" for i in range(20)])) == 23
+
+
+def _put_from_process(path, worker):
+    cache = DetectionCache(path)
+    for i in range(20):
+        cache.put_many([(f"{worker}-{i}", _results(5, i))])
+        cache.get_many([f"{1 - worker}-{i}"])
+
+
+def test_concurrent_processes_share_cache(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    ctx = multiprocessing.get_context("spawn")
+    processes = [ctx.Process(target=_put_from_process, args=(path, worker)) for worker in (0, 1)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(60)
+
+    assert [process.exitcode for process in processes] == [0, 0]
+    assert len(DetectionCache(path).get_many([f"{w}-{i}" for w in (0, 1) for i in range(20)])) == 40
@@ -23,8 +23,80 @@ def test_extract_frames():
     assert metrics["frames_extracted"] == len(jpgs)
 
 
+@pytest.mark.parametrize("sampling_mode", ["grab", "seek", "auto"])
+def test_sampling_modes_match_read(synthetic_video, tmp_path, sampling_mode):
+    import cv2
+    import numpy as np
 
+    reference_dir = tmp_path / "read"
+    sampled_dir = tmp_path / sampling_mode
+    reference = extract_frames(synthetic_video, str(reference_dir), frame_step=20, sampling_mode="read")
+    sampled = extract_frames(synthetic_video, str(sampled_dir), frame_step=20, sampling_mode=sampling_mode)
 
+    for key in ("total_frames_in_video", "frames_extracted", "frames_dropped", "frame_drop_ratio"):
+        assert sampled[key] == reference[key]
+    assert sampled["frames_retrieved"] == sampled["frames_extracted"]
+    if sampled["sampling_mode"] == "seek":
+        # kept frames 0, 20, ..., 80: the 19 frames before each of the last four were never decoded
+        assert sampled["frames_skipped_unchecked"] == 4 * 19
+    assert sorted(os.listdir(sampled_dir)) == sorted(os.listdir(reference_dir))
+    for name in os.listdir(reference_dir):
+        assert np.array_equal(cv2.imread(str(reference_dir / name)), cv2.imread(str(sampled_dir / name)))
 
 
+def test_landed_on_frame_checks_the_decoded_timestamp(synthetic_video):
+    import cv2
+    from src.frame_extractor import landed_on_frame
 
+    cap = cv2.VideoCapture(synthetic_video)
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    cap.set(cv2.CAP_PROP_POS_FRAMES, 20)
+    assert cap.read()[0]
+    assert landed_on_frame(cap, 20, fps)
+    assert not landed_on_frame(cap, 21, fps) and not landed_on_frame(cap, 19, fps)
+    cap.release()
+
+
+def _write_static_then_moving_video(path):
+    """240 frames of a static textured background with a large block moving across it in frames 90-149."""
+    import cv2
+    import numpy as np
+
+    background = cv2.GaussianBlur(np.random.default_rng(0).integers(0, 255, (240, 320, 3), dtype=np.uint8), (21, 21), 0)
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), 30, (320, 240))
+    for i in range(240):
+        frame = background.copy()
+        if 90 <= i < 150:
+            x = (i - 90) * 4
+            cv2.rectangle(frame, (x, 60), (x + 80, 180), (0, 0, 255), -1)
+        writer.write(frame)
+    writer.release()
+    return path
+
+
+def test_scene_sampling_keeps_only_changes(tmp_path):
+    from src.frame_extractor import iter_frames
+
+    video = _write_static_then_moving_video(str(tmp_path / "scene.mp4"))
+    metrics = {}
+    kept = [idx for idx, _, _ in iter_frames(video, frame_step=10, sampling_mode="scene", metrics=metrics,
+                                             output_dir=str(tmp_path / "frames"), scene_max_interval=60)]
+
+    # static: first frame + one every max interval; moving: every min interval (5); 150 = block gone
+    assert kept == [0, 60] + list(range(90, 151, 5)) + [210]
+    assert metrics["frames_extracted"] == len(kept) == len(os.listdir(tmp_path / "frames"))
+    assert metrics["fixed_step_frames"] == 24
+    assert metrics["inferences_saved"] == 24 - len(kept)
+    assert metrics["scene_forced_keeps"] == 2
+    assert metrics["frames_dropped"] == 0 and metrics["total_frames_in_video"] == 240
+
+
+def test_fit_inference_size():
+    import numpy as np
+    from src.frame_extractor import fit_inference_size
+
+    frame = np.zeros((2160, 3840, 3), dtype=np.uint8)
+    assert fit_inference_size(frame, 640).shape == (360, 640, 3)
+    assert fit_inference_size(frame.transpose(1, 0, 2), 640).shape == (640, 360, 3)
+    assert fit_inference_size(frame, 4096) is frame # never upscaled
+    assert fit_inference_size(frame, None) is frame
@@ -0,0 +1,67 @@
+import filecmp
+import json
+import os
+import tarfile
+
+import numpy as np
+
+from src.frame_extractor import frame_sort_key
+from src.frame_store import PackedFrameStore, PackedFrameWriter, export_frames, is_packed_store
+from src.main_pipeline import run_pipeline
+
+
+def _frames(count):
+    rng = np.random.default_rng(0)
+    return [rng.integers(0, 256, size=(24, 32, 3), dtype=np.uint8) for _ in range(count)]
+
+
+def test_packed_store_random_access_and_index_rebuild(tmp_path):
+    store_dir = str(tmp_path / "frames")
+    frames = _frames(12)
+    writer = PackedFrameWriter(store_dir, "npy", encode_threads=3, shard_mb=0.01) # ~4 frames per shard
+    for i, frame in enumerate(frames):
+        writer.submit(f"frame_{i:05d}.npy", frame)
+    metrics = writer.close()
+    assert metrics["frames_written"] == 12 and metrics["frame_shards"] > 1
+    assert is_packed_store(store_dir)
+
+    with PackedFrameStore(store_dir) as store:
+        assert len(store) == 12 and store.names == [f"frame_{i:05d}.npy" for i in range(12)]
+        for position in (11, 0, 7, store.index_of("frame_00003.npy")): # any order
+            np.testing.assert_array_equal(store[position], frames[position])
+        assert [name for name, _ in store] == store.names
+
+    # Shards are plain tar files, in submit order
+    with tarfile.open(os.path.join(store_dir, "frames_000000.tar")) as tar:
+        assert tar.getnames()[0] == "frame_00000.npy"
+
+    # Without the index (interrupted run) it is rebuilt from the tar headers
+    os.remove(os.path.join(store_dir, "index.json"))
+    with PackedFrameStore(store_dir) as store:
+        assert len(store) == 12 and store.frame_format == "npy"
+        np.testing.assert_array_equal(store[9], frames[9])
+
+
+def test_tar_frame_store_matches_frame_files(tmp_path, synthetic_video, stub_model):
+    files_dir, tar_dir = str(tmp_path / "files"), str(tmp_path / "tar")
+    run_pipeline(synthetic_video, files_dir, frame_step=10, model_name="stub", model=stub_model)
+    metrics = run_pipeline(synthetic_video, tar_dir, frame_step=10, model_name="stub", model=stub_model,
+                           frame_store="tar")
+
+    assert metrics["frame_extraction_metrics"]["frame_store"] == "tar"
+    assert sorted(os.listdir(os.path.join(tar_dir, "frames"))) == ["frames_000000.tar", "index.json"]
+    # The detector read the packed frames directly, with the same result as from the files
+    with open(os.path.join(files_dir, "detections.json")) as f, open(os.path.join(tar_dir, "detections.json")) as g:
+        assert json.load(f) == json.load(g)
+
+    exported = str(tmp_path / "exported")
+    assert export_frames(os.path.join(tar_dir, "frames"), exported) == 9
+    match, mismatch, errors = filecmp.cmpfiles(os.path.join(files_dir, "frames"), exported,
+                                               sorted(os.listdir(exported)), shallow=False)
+    assert len(match) == 9 and not mismatch and not errors
+
+
+def test_frame_sort_key_past_five_digits():
+    names = ["frame_100000.jpg", "frame_99999.jpg", "frame_10001.jpg", "frame_00002.jpg"]
+    assert sorted(names, key=frame_sort_key) == \
+        ["frame_00002.jpg", "frame_10001.jpg", "frame_99999.jpg", "frame_100000.jpg"]
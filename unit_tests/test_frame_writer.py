@@ -0,0 +1,40 @@
+import os
+
+import cv2
+import numpy as np
+import pytest
+
+from src.frame_writer import FrameWriter, FRAME_FORMATS
+
+
+@pytest.mark.parametrize("frame_format", list(FRAME_FORMATS))
+def test_frame_writer_formats(tmp_path, frame_format):
+    rng = np.random.default_rng(0)
+    frames = [rng.integers(0, 255, (48, 64, 3), dtype=np.uint8) for _ in range(6)]
+
+    writer = FrameWriter(str(tmp_path), frame_format, encode_threads=3, max_pending=2)
+    for i, frame in enumerate(frames):
+        writer.submit(f"frame_{i:05d}{FRAME_FORMATS[frame_format][0]}", frame)
+    metrics = writer.close()
+
+    files = sorted(os.listdir(tmp_path))
+    assert len(files) == metrics["frames_written"] == 6
+    assert metrics["bytes_written"] == sum(os.path.getsize(tmp_path / f) for f in files)
+    assert metrics["frame_format"] == frame_format
+    first = str(tmp_path / files[0])
+    decoded = np.load(first) if frame_format == "npy" else cv2.imread(first)
+    assert decoded.shape == frames[0].shape
+    if frame_format in ("png", "npy"): # lossless
+        assert np.array_equal(decoded, frames[0])
+
+
+def test_frame_writer_reports_write_errors(tmp_path):
+    writer = FrameWriter(str(tmp_path), "jpg")
+    writer.submit("missing_dir/frame_00000.jpg", np.zeros((8, 8, 3), dtype=np.uint8))
+    with pytest.raises(IOError):
+        writer.close()
+
+
+def test_frame_writer_rejects_bad_quality(tmp_path):
+    with pytest.raises(ValueError):
+        FrameWriter(str(tmp_path), "png", quality=50)
@@ -0,0 +1,89 @@
+import json
+from types import SimpleNamespace
+
+import cv2
+import numpy as np
+import pytest
+
+from src.frame_extractor import iter_frames
+from src.inference_backends import OnnxDetector, letterbox, nms
+from src.object_detector import pretag_images_and_generate_coco
+
+
+class _TorchSession:
+    """Stands in for an onnxruntime.InferenceSession of a dynamic export by running the PyTorch module itself."""
+
+    def __init__(self, module):
+        self.module = module
+
+    def get_inputs(self):
+        return [SimpleNamespace(name="images", shape=["batch", 3, "height", "width"])]
+
+    def run(self, output_names, feed):
+        import torch
+        with torch.no_grad():
+            output = self.module(torch.from_numpy(feed["images"]))
+        return [(output[0] if isinstance(output, (tuple, list)) else output).numpy()]
+
+
+def _random_yolo():
+    """yolov8n with random weights (no download); class biases raised so there is something to detect."""
+    torch = pytest.importorskip("torch")
+    from ultralytics import YOLO
+    yolo = YOLO("yolov8n.yaml")
+    torch.manual_seed(0)
+    for branch in yolo.model.model[-1].cv3:
+        torch.nn.init.normal_(branch[-1].bias, -2, 1.5)
+    return yolo
+
+
+def test_letterbox_and_nms():
+    image = np.full((240, 320, 3), 255, dtype=np.uint8)
+    padded = letterbox(image, (640, 640))
+    assert padded.shape == (640, 640, 3)
+    assert (padded[:80] == 114).all() and (padded[80:560] == 255).all() and (padded[560:] == 114).all()
+    assert letterbox(image, (640, 640), auto=True).shape == (480, 640, 3)
+
+    boxes = np.array([[0, 0, 10, 10], [1, 1, 11, 11], [20, 20, 30, 30], [0, 0, 10, 9]], dtype=np.float32)
+    scores = np.array([0.5, 0.9, 0.3, 0.4], dtype=np.float32)
+    # same as torchvision.ops.nms
+    assert nms(boxes, scores, 0.7).tolist() == [1, 0, 2]
+    assert nms(boxes, scores, 0.5).tolist() == [1, 2]
+    assert nms(boxes, scores, 0.9).tolist() == [1, 0, 3, 2]
+
+
+def test_onnx_detector_matches_ultralytics(synthetic_video):
+    yolo = _random_yolo()
+    detector = OnnxDetector(_TorchSession(yolo.model.eval()), yolo.names)
+    frames = [frame for _, _, frame in iter_frames(synthetic_video, frame_step=30)]
+
+    expected = yolo(frames, verbose=False)
+    results = detector(frames)
+
+    assert len(results) == len(frames)
+    assert sum(len(r.boxes.data) for r in results) > 0
+    for mine, theirs in zip(results, expected):
+        assert mine.orig_shape == tuple(theirs.orig_shape)
+        np.testing.assert_allclose(mine.boxes.data, theirs.boxes.data.numpy(), atol=1e-3)
+        assert set(mine.speed) == {"preprocess", "inference", "postprocess"}
+
+
+def test_onnx_int8_backend_runs_the_pipeline(tmp_path, synthetic_video):
+    pytest.importorskip("onnxruntime")
+    pytest.importorskip("onnx")
+    yolo = _random_yolo()
+    weights = str(tmp_path / "random.pt")
+    yolo.save(weights)
+    frames_dir = tmp_path / "frames"
+    frames_dir.mkdir()
+    for i, (_, _, frame) in enumerate(iter_frames(synthetic_video, frame_step=30)):
+        cv2.imwrite(str(frames_dir / f"frame_{i:05d}.jpg"), frame)
+
+    for backend in ("onnx", "onnx-int8"):
+        output = tmp_path / f"{backend}.json"
+        metrics = pretag_images_and_generate_coco(str(frames_dir), str(output), weights, batch_size=2,
+                                                  backend=backend)["metrics"]
+        assert metrics["images_processed"] == 3
+        with open(output) as f:
+            assert len(json.load(f)["annotations"]) == metrics["total_detections"]
+    assert (tmp_path / "random.onnx").exists() and (tmp_path / "random.int8.onnx").exists()
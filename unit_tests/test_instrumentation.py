@@ -0,0 +1,59 @@
+import csv
+import os
+import threading
+
+import pytest
+
+from src.instrumentation import OperationTimings
+from src.main_pipeline import run_pipeline
+
+
+def test_summary_percentiles():
+    timings = OperationTimings()
+    for ms in range(1, 101):
+        timings.record("op", ms / 1000)
+    summary = timings.summary()["op"]
+
+    assert summary["count"] == 100
+    assert summary["total_s"] == pytest.approx(5.05)
+    assert summary["p50_ms"] == pytest.approx(50.5)
+    assert summary["p95_ms"] == pytest.approx(95.05)
+    assert summary["p99_ms"] == pytest.approx(99.01)
+    assert summary["max_ms"] == pytest.approx(100)
+
+
+def test_disabled_records_nothing_and_threads_are_safe():
+    timings = OperationTimings(enabled=False)
+    with timings.timer("op"):
+        pass
+    timings.record("op", 1.0)
+    assert timings.summary() == {}
+
+    timings.enabled = True
+    threads = [threading.Thread(target=lambda: [timings.record("op", 0.001) for _ in range(1000)]) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    timings.merge({"op": [0.001] * 10, "other": [0.5]})
+    assert timings.summary()["op"]["count"] == 4010
+    assert timings.summary()["other"]["count"] == 1
+
+
+def test_pipeline_reports_operation_latencies(synthetic_video, tmp_path, stub_model):
+    output_dir = str(tmp_path / "out")
+    metrics = run_pipeline(synthetic_video, output_dir, frame_step=10, model_name="stub", model=stub_model)
+
+    operations = metrics["operation_timings"]
+    assert {"decode", "retrieve", "encode", "disk_write", "image_read", "inference", "postprocess", "serialize",
+            "coco_finalize"} <= set(operations)
+    assert operations["decode"]["count"] == 90 and operations["encode"]["count"] == 9
+    with open(os.path.join(output_dir, "pipeline_report.md")) as f:
+        assert "## Operation Latencies" in f.read()
+    with open(os.path.join(output_dir, "pipeline_metrics_log.csv")) as f:
+        row = next(csv.DictReader(f))
+    assert float(row["op_inference_p95_ms"]) >= float(row["op_inference_p50_ms"])
+
+    disabled = run_pipeline(synthetic_video, str(tmp_path / "off"), frame_step=10, model_name="stub",
+                            model=stub_model, instrumentation=False)
+    assert "operation_timings" not in disabled
@@ -0,0 +1,93 @@
+import re
+import urllib.request
+
+from src.frame_extractor import iter_frames, frame_file_name, LIVE # the registry the pipeline modules use
+from src.metrics_exporter import LiveMetrics, MetricsExporter, live_run
+from src.object_detector import pretag_frames_and_generate_coco
+
+
+def _value(text, name, labels=""):
+    match = re.search(rf"^{re.escape(name + labels)} (\S+)$", text, re.MULTILINE)
+    return float(match.group(1)) if match else None
+
+
+def test_render_prometheus_text():
+    registry = LiveMetrics()
+    counters = {"n": 0}
+    registry.register("frames_total", "counter", "Frames.", lambda: counters["n"])
+    registry.register("depth", "gauge", "Depth.", lambda: 3, queue='a"b')
+    registry.register("broken", "gauge", "Gone.", lambda: 1 / 0)
+    counters["n"] = 42
+
+    text = registry.render()
+    assert "# TYPE frames_total counter\nframes_total 42\n" in text
+    assert 'depth{queue="a\\"b"} 3' in text
+    assert "broken" not in text
+
+
+def test_runs_get_their_own_sources_and_counters_never_go_back():
+    registry = LiveMetrics()
+    with live_run("a"):
+        first = registry.scope()
+    with live_run("b"):
+        second = registry.scope()
+    counts = {"a": 5, "b": 7}
+    for scope in (first, second):
+        scope.register("frames_total", "counter", "Frames.", lambda run=scope.run_id: counts[run])
+        scope.register("depth", "gauge", "Depth.", lambda run=scope.run_id: len(run), queue="q")
+
+    text = registry.render()
+    assert "frames_total 12\n" in text # one process-lifetime series, whatever the runs
+    assert 'depth{queue="q",run="a"} 1' in text and 'depth{queue="q",run="b"} 1' in text
+
+    first.close()
+    counts["a"] = 0 # a finished run's source is no longer read
+    assert registry.value("frames_total") == 12
+    assert registry.value("depth", queue="q", run="a") is None and "run=\"a\"" not in registry.render()
+    second.close()
+    with live_run("c"):
+        third = registry.scope()
+    third.register("frames_total", "counter", "Frames.", lambda: 1)
+    assert registry.value("frames_total") == 13
+    third.close()
+    assert "depth" not in registry.render()
+
+
+def test_live_values_during_a_run(synthetic_video, tmp_path, stub_model):
+    before = {name: LIVE.value(name) or 0.0 for name in
+              ("pretag_frames_decoded_total", "pretag_frames_kept_total", "pretag_images_inferred_total",
+               "pretag_detections_total")}
+    exporter = MetricsExporter(LIVE, port=0, textfile=str(tmp_path / "pretag.prom"), interval=60).start()
+    scrapes = []
+
+    def frames():
+        for i, (_, _, frame) in enumerate(iter_frames(synthetic_video, frame_step=5)):
+            if i == 10:
+                exporter.sample()
+                with urllib.request.urlopen(f"http://127.0.0.1:{exporter.port}/metrics", timeout=5) as response:
+                    scrapes.append(response.read().decode())
+            yield frame_file_name(i), frame
+
+    try:
+        result = pretag_frames_and_generate_coco(frames(), str(tmp_path / "out.json"), "stub", model=stub_model,
+                                                 batch_size=1)
+    finally:
+        exporter.stop()
+
+    # the _total counters are process-lifetime: compare with what earlier runs in this process counted
+    mid_run = scrapes[0]
+    # the frame being handed over counts as kept
+    assert _value(mid_run, "pretag_frames_kept_total") - before["pretag_frames_kept_total"] == 11
+    assert _value(mid_run, "pretag_frames_decoded_total") - before["pretag_frames_decoded_total"] >= 51
+    assert _value(mid_run, "pretag_images_inferred_total") - before["pretag_images_inferred_total"] == 10
+    assert _value(mid_run, "pretag_stage_fps", '{stage="decode"}') > 0
+    assert re.search(r'^pretag_video_frames\{run="run-\d+"\} 90$', mid_run, re.MULTILINE)
+    with open(tmp_path / "pretag.prom") as f:
+        final = f.read()
+    assert _value(final, "pretag_frames_decoded_total") - before["pretag_frames_decoded_total"] == 90
+    assert _value(final, "pretag_images_inferred_total") - before["pretag_images_inferred_total"] \
+        == result["metrics"]["images_processed"] == 18
+    assert _value(final, "pretag_detections_total") - before["pretag_detections_total"] \
+        == result["metrics"]["total_detections"]
+    assert LIVE.value("pretag_frames_kept_total") - before["pretag_frames_kept_total"] == 18
+    assert "pretag_video_frames" not in final # the run's sources are gone once it finished
@@ -1,4 +1,5 @@
 import os
+import json
 import shutil
 import numpy as np
 import cv2
@@ -16,4 +17,106 @@ def test_pretag_images_and_generate_coco():
     metrics = result["metrics"]
     assert "images_processed" in metrics
     assert os.path.exists(COCO_PATH)
-    assert metrics["images_processed"] == 3
\ No newline at end of file
+    assert metrics["images_processed"] == 3
+
+def _load(path):
+    with open(path) as f:
+        return json.load(f)
+
+def test_streamed_frames_match_saved_frames(synthetic_video, tmp_path, stub_model):
+    from src.frame_extractor import extract_frames, iter_frames, frame_file_name
+    from src.object_detector import pretag_frames_and_generate_coco
+
+    frames_dir = str(tmp_path / "frames")
+    extract_frames(synthetic_video, frames_dir, frame_step=10)
+    from_disk = pretag_images_and_generate_coco(frames_dir, str(tmp_path / "disk.json"), "stub", model=stub_model)
+
+    frames = ((frame_file_name(i), frame) for i, (_, _, frame) in enumerate(iter_frames(synthetic_video, frame_step=10)))
+    streamed = pretag_frames_and_generate_coco(frames, str(tmp_path / "stream.json"), "stub", model=stub_model)
+
+    assert _load(tmp_path / "stream.json")["images"] == _load(tmp_path / "disk.json")["images"]
+    assert streamed["metrics"]["images_processed"] == from_disk["metrics"]["images_processed"] == 9
+
+
+@pytest.mark.parametrize("batch_size", [2, 4, 16])
+def test_batched_output_matches_batch_size_one(synthetic_video, tmp_path, stub_model, batch_size):
+    from src.frame_extractor import extract_frames
+
+    frames_dir = str(tmp_path / "frames")
+    extract_frames(synthetic_video, frames_dir, frame_step=10)
+    # A corrupt frame must only cost itself, not the rest of its batch
+    with open(os.path.join(frames_dir, "frame_00003.jpg"), "wb") as f:
+        f.write(b"not a jpeg")
+
+    single = pretag_images_and_generate_coco(frames_dir, str(tmp_path / "bs1.json"), "stub", model=stub_model, batch_size=1)
+    calls_single = stub_model.calls
+    batched = pretag_images_and_generate_coco(frames_dir, str(tmp_path / "bsN.json"), "stub", model=stub_model,
+                                              batch_size=batch_size)
+
+    assert _load(tmp_path / "bsN.json") == _load(tmp_path / "bs1.json")
+    assert {k: v for k, v in batched["metrics"].items() if k != "batch_size"} == \
+           {k: v for k, v in single["metrics"].items() if k != "batch_size"}
+    assert len(_load(tmp_path / "bs1.json")["images"]) == 8
+    assert stub_model.calls - calls_single < calls_single
+
+
+def test_vectorized_annotations_match_per_box_loop(tmp_path):
+    from collections import defaultdict
+    from types import SimpleNamespace
+    from src.object_detector import CocoBuilder
+
+    names = {0: "person", 1: "car", 2: "dog", 3: "cat"}
+    rng = np.random.default_rng(0)
+    frames = []
+    for n in [0, 1, 7, 40, 3]:
+        xy = rng.uniform(0, 600, size=(n, 2))
+        data = np.hstack([xy, xy + rng.uniform(1, 200, size=(n, 2)), rng.uniform(0, 1, size=(n, 1)),
+                          rng.integers(0, 4, size=(n, 1))]).astype(np.float32)
+        frames.append(SimpleNamespace(orig_shape=(480, 640), boxes=SimpleNamespace(data=data)))
+
+    builder = CocoBuilder(names, str(tmp_path / "coco.json"))
+    for i, results in enumerate(frames):
+        builder.add(f"frame_{i:05d}.jpg", results)
+    metrics = builder.save(batch_size=1)["metrics"]
+
+    # The per-detection loop the builder used to run
+    annotations, category_map, class_distribution = [], {}, defaultdict(int)
+    for image_id, results in enumerate(frames, start=1):
+        for x1, y1, x2, y2, conf, cls_id in results.boxes.data.tolist():
+            label = names[int(cls_id)]
+            category_map.setdefault(label, len(category_map) + 1)
+            annotations.append({"id": len(annotations) + 1, "image_id": image_id, "category_id": category_map[label],
+                                "bbox": [x1, y1, x2 - x1, y2 - y1], "area": (x2 - x1) * (y2 - y1), "iscrowd": 0,
+                                "segmentation": [], "confidence": float(conf)})
+            class_distribution[label] += 1
+
+    assert _load(tmp_path / "coco.json")["annotations"] == annotations
+    assert list(metrics["class_distribution"].items()) == list(class_distribution.items())
+    assert metrics["total_detections"] == 51
+
+
+@pytest.mark.parametrize("full_resolution_frames", [False, True])
+def test_inference_size_maps_boxes_to_source_resolution(synthetic_video, tmp_path, stub_model, full_resolution_frames):
+    from src.frame_extractor import fit_inference_size
+    from src.main_pipeline import run_pipeline
+
+    output_dir = tmp_path / "out"
+    metrics = run_pipeline(synthetic_video, str(output_dir), frame_step=30, model_name="stub", model=stub_model,
+                           inference_size=160, full_resolution_frames=full_resolution_frames)
+    assert metrics["frame_extraction_metrics"]["inference_size"] == 160
+
+    coco = _load(output_dir / "detections.json")
+    assert len(coco["images"]) == 3 and len(coco["annotations"]) > 0
+    categories = {category["id"]: category["name"] for category in coco["categories"]}
+    for image in coco["images"]:
+        assert (image["width"], image["height"]) == (320, 240) # the source video, not the detected frame
+        saved = cv2.imread(str(output_dir / "frames" / image["file_name"]))
+        assert saved.shape[:2] == ((240, 320) if full_resolution_frames else (120, 160))
+        # detected at 160x120, boxes scaled 2x back to 320x240
+        expected = stub_model._predict(fit_inference_size(saved, 160)).boxes.data.astype(np.float64)
+        annotations = [a for a in coco["annotations"] if a["image_id"] == image["id"]]
+        assert len(annotations) == len(expected)
+        for annotation, (x1, y1, x2, y2, _, cls_id) in zip(annotations, expected):
+            assert annotation["bbox"] == pytest.approx([2 * x1, 2 * y1, 2 * (x2 - x1), 2 * (y2 - y1)])
+            assert annotation["area"] == pytest.approx(4 * (x2 - x1) * (y2 - y1))
+            assert categories[annotation["category_id"]] == stub_model.names[int(cls_id)]
@@ -0,0 +1,33 @@
+import os
+
+import cv2
+import numpy as np
+
+from src.frame_extractor import extract_frames
+from src.parallel_decode import extract_frames_parallel, keyframe_positions, split_segments
+
+
+def test_segments_start_on_keyframes(synthetic_video):
+    keyframes = keyframe_positions(synthetic_video)
+    segments = split_segments(90, 4, keyframes)
+
+    assert keyframes[0] == 0 and len(keyframes) > 4
+    assert segments[0][0] == 0 and segments[-1][1] == 90
+    assert all(a[1] == b[0] for a, b in zip(segments, segments[1:]))
+    assert all(start in keyframes for start, _ in segments)
+    assert split_segments(90, 8, [0, 60]) == [(0, 60), (60, 90)] # boundaries collapsing on a keyframe merge
+
+
+def test_parallel_decode_matches_sequential(synthetic_video, tmp_path):
+    reference_dir, parallel_dir = tmp_path / "sequential", tmp_path / "parallel"
+    # frame_step 7 doesn't line up with the GOP, so kept frames fall mid-segment
+    reference = extract_frames(synthetic_video, str(reference_dir), frame_step=7, sampling_mode="grab")
+    parallel = extract_frames_parallel(synthetic_video, str(parallel_dir), frame_step=7, workers=3)
+
+    assert parallel["decode_workers"] == 3
+    for key in ("total_frames_in_video", "frames_extracted", "frames_dropped", "frame_drop_ratio",
+                "frames_retrieved", "frames_written"):
+        assert parallel[key] == reference[key]
+    assert sorted(os.listdir(parallel_dir)) == sorted(os.listdir(reference_dir))
+    for name in os.listdir(reference_dir):
+        assert np.array_equal(cv2.imread(str(reference_dir / name)), cv2.imread(str(parallel_dir / name)))
@@ -0,0 +1,108 @@
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+from unit_tests.conftest import StubDetector
+from src.pipeline_config import PipelineConfig
+from src.pipeline_daemon import PipelineDaemon, submit_job
+
+
+class _SlowStub(StubDetector):
+    def __call__(self, source, verbose=False, **kwargs):
+        time.sleep(0.05)
+        return super().__call__(source, verbose=verbose, **kwargs)
+
+
+def _load(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def test_daemon_runs_jobs_with_one_model_and_writes_results(tmp_path, synthetic_video, stub_model):
+    spool, output_root = str(tmp_path / "spool"), str(tmp_path / "output")
+    submit_job(spool, synthetic_video, job_id="good", frame_step=5)
+    submit_job(spool, str(tmp_path / "missing.mp4"), job_id="missing")
+    submit_job(spool, synthetic_video, job_id="bad_param", not_an_option=1)
+    submit_job(spool, synthetic_video, job_id="other_model", model_name="yolov8x.pt")
+    # Left in processing/ by a daemon that was killed: must be run again.
+    dead = subprocess.Popen([sys.executable, "-c", "pass"])
+    dead.wait()
+    requeued_id = submit_job(spool, synthetic_video, job_id="requeued", frame_step=10)
+    os.replace(os.path.join(spool, "incoming", f"{requeued_id}.json"),
+               os.path.join(spool, "processing", f"{dead.pid}-{requeued_id}.json"))
+
+    daemon = PipelineDaemon(spool, output_root, PipelineConfig(), model=stub_model)
+    stats = daemon.run(exit_when_idle=True)
+
+    results = {name: _load(os.path.join(spool, "results", f"{name}.json"))
+               for name in ("good", "missing", "bad_param", "other_model", "requeued")}
+    assert results["good"]["status"] == "ok" and results["requeued"]["status"] == "ok"
+    assert results["good"]["output_dir"] == os.path.join(output_root, "good")
+    assert os.path.exists(os.path.join(output_root, "good", "detections.json"))
+    assert results["good"]["metrics"]["object_detection_metrics"]["images_processed"] == 18
+    assert results["good"]["latency_s"] >= results["good"]["run_s"] > 0
+    assert results["missing"]["status"] == "failed" and "aborted" in results["missing"]["error"]
+    assert "not_an_option" in results["bad_param"]["error"]
+    assert "model_name" in results["other_model"]["error"]
+
+    assert os.listdir(os.path.join(spool, "incoming")) == [] and os.listdir(os.path.join(spool, "processing")) == []
+    assert stats["jobs_ok"] == 2 and stats["jobs_failed"] == 3
+    assert stats["job_timings"]["latency"]["count"] == 5
+    assert _load(os.path.join(spool, "daemon_stats.json"))["jobs_ok"] == 2
+
+
+def test_daemon_stop_finishes_the_job_in_progress(tmp_path, synthetic_video):
+    spool = str(tmp_path / "spool")
+    daemon = PipelineDaemon(spool, str(tmp_path / "output"), PipelineConfig(batch_size=1), model=_SlowStub(),
+                            poll_interval=0.05)
+    thread = threading.Thread(target=daemon.run)
+    thread.start()
+    submit_job(spool, synthetic_video, job_id="first", frame_step=2)
+    while not os.listdir(os.path.join(spool, "processing")):
+        time.sleep(0.01)
+    submit_job(spool, synthetic_video, job_id="second", frame_step=2)
+    daemon.stop()
+    thread.join(timeout=60)
+
+    assert not thread.is_alive()
+    assert _load(os.path.join(spool, "results", "first.json"))["status"] == "ok"
+    assert os.listdir(os.path.join(spool, "results")) == ["first.json"]
+    assert os.listdir(os.path.join(spool, "incoming")) == ["second.json"]
+
+
+@pytest.mark.parametrize("stream_frames", [False, True])
+def test_failed_run_releases_capture_cache_and_journal(tmp_path, synthetic_video, monkeypatch, stream_frames):
+    import src.main_pipeline as main_pipeline
+
+    closed = []
+    for owner, method in ((main_pipeline.VideoProbe, "release"), (main_pipeline.DetectionCache, "close"),
+                          (main_pipeline.DetectionJournal, "close")):
+        original = getattr(owner, method)
+        monkeypatch.setattr(owner, method, lambda self, _original=original, _owner=owner:
+                            (closed.append(_owner.__name__), _original(self))[1])
+
+    class _Failing(StubDetector):
+        @property
+        def names(self): # the detection stage fails as a whole, not frame by frame
+            raise RuntimeError("model file is corrupt")
+
+        @names.setter
+        def names(self, value):
+            pass
+
+    metrics = main_pipeline.run_pipeline(synthetic_video, str(tmp_path / "out"), frame_step=10, model_name="stub",
+                                         model=_Failing(), stream_frames=stream_frames,
+                                         detection_cache=str(tmp_path / "cache.sqlite"))
+    assert metrics is None # the job fails, as before
+    assert {"VideoProbe", "DetectionCache", "DetectionJournal"} <= set(closed)
+
+
+def test_daemon_cli_rejects_validate_only():
+    main = os.path.join(os.path.dirname(__file__), os.pardir, "src", "main_pipeline.py")
+    completed = subprocess.run([sys.executable, main, "--daemon", "--validate_only"], capture_output=True, text=True)
+    assert completed.returncode == 2 and "--validate_only" in completed.stderr
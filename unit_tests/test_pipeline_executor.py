@@ -0,0 +1,65 @@
+import json
+
+import pytest
+
+from src.frame_extractor import extract_frames, iter_frames, frame_file_name
+from src.object_detector import pretag_frames_and_generate_coco
+from src.pipeline_executor import run_overlapped
+
+
+def test_overlapped_matches_sequential(synthetic_video, tmp_path, stub_model):
+    sequential_frames = extract_frames(synthetic_video, str(tmp_path / "frames"), frame_step=5)
+    frames = ((frame_file_name(i), frame) for i, (_, _, frame) in enumerate(iter_frames(synthetic_video, frame_step=5)))
+    sequential = pretag_frames_and_generate_coco(frames, str(tmp_path / "seq.json"), "stub", model=stub_model)
+
+    # queue of 2 frames with batches of 2 -> one batch in flight, the decoder has to wait on the detector
+    result = run_overlapped(synthetic_video, str(tmp_path / "overlapped_frames"), str(tmp_path / "ovl.json"),
+                            frame_step=5, model_name="stub", sampling_mode="auto", batch_size=2,
+                            queue_size=2, model=stub_model)
+
+    timing_keys = {"encode_s", "encode_fps"}
+    assert {k: v for k, v in result["frame_extraction_metrics"].items() if k not in timing_keys} == \
+           {k: v for k, v in sequential_frames.items() if k not in timing_keys}
+    with open(tmp_path / "ovl.json") as f_ovl, open(tmp_path / "seq.json") as f_seq:
+        assert json.load(f_ovl) == json.load(f_seq)
+    assert {k: v for k, v in result["detection_result"]["metrics"].items() if k != "batch_size"} == \
+           {k: v for k, v in sequential["metrics"].items() if k != "batch_size"}
+    stats = result["pipeline_stage_stats"]
+    assert stats["frame_queue"]["capacity"] == 1
+    assert stats["frame_queue"]["max_depth"] <= 1
+    assert stats["inference"]["batches"] == 9 # 18 frames in batches of 2
+    assert set(result["pipeline_stage_times"]) == {"frame_extraction_s", "object_detection_s", "overlapped_total_s"}
+
+
+def test_overlapped_reports_failing_stage(tmp_path, stub_model):
+    with pytest.raises(RuntimeError, match="Frame extraction failed"):
+        run_overlapped(str(tmp_path / "missing.mp4"), None, str(tmp_path / "ovl.json"), frame_step=5,
+                       model_name="stub", sampling_mode="auto", model=stub_model)
+    assert not list(tmp_path.iterdir()) # no half-written COCO file left behind
+
+
+def test_reorder_buffer_is_bounded_behind_a_slow_batch(synthetic_video, tmp_path, monkeypatch):
+    import threading
+    import time
+
+    import src.pipeline_executor as pipeline_executor
+    from unit_tests.conftest import StubDetector
+
+    first_call = threading.Lock()
+
+    class _SlowFirstBatch(StubDetector):
+        def __call__(self, source, verbose=False, **kwargs):
+            if first_call.acquire(blocking=False): # batch 0 takes long, the other workers run ahead
+                time.sleep(0.5)
+            return super().__call__(source, verbose=verbose, **kwargs)
+
+    monkeypatch.setattr(pipeline_executor, "load_model", lambda model_name, backend: _SlowFirstBatch())
+    result = run_overlapped(synthetic_video, None, str(tmp_path / "ovl.json"), frame_step=5, model_name="stub",
+                            sampling_mode="auto", batch_size=2, inference_workers=3, queue_size=2,
+                            model=_SlowFirstBatch())
+
+    reorder = result["pipeline_stage_stats"]["reorder_buffer"]
+    assert reorder["capacity"] == 3 # one batch per worker
+    assert reorder["max_depth"] <= 3 # not the 8 later batches
+    with open(tmp_path / "ovl.json") as f:
+        assert [image["file_name"] for image in json.load(f)["images"]] == [frame_file_name(i) for i in range(18)]
@@ -0,0 +1,70 @@
+import json
+
+import cv2
+import pytest
+
+from src.main_pipeline import run_pipeline
+from src.resource_governor import parse_cpu_set, plan_resources
+
+
+@pytest.fixture
+def restore_threads():
+    threads = cv2.getNumThreads()
+    yield
+    cv2.setNumThreads(threads)
+
+
+def test_plan_splits_cpus_without_oversubscribing():
+    assert parse_cpu_set("0-3,8, 10-11") == [0, 1, 2, 3, 8, 10, 11]
+    with pytest.raises(ValueError):
+        parse_cpu_set("0-x")
+
+    cpus = list(range(32))
+    plans = [plan_resources(cpus, processes=3, process_index=i, encode_threads=4) for i in range(3)]
+    assert [plan.cpus for plan in plans] == [cpus[0:11], cpus[11:22], cpus[22:32]]
+    for plan in plans:
+        assert plan.torch_threads == len(plan.cpus) # sequential stages: inference gets the whole slice
+        assert plan.encode_threads <= len(plan.cpus) // 4 and plan.opencv_threads == len(plan.cpus) // 4
+
+    overlapped = plan_resources(cpus[:16], overlapped=True, inference_workers=2, encode_threads=2, decode_workers=8)
+    # 16 cores - 2 encode - 1 decode, split between 2 inference workers; pools never grow past the request
+    assert (overlapped.torch_threads, overlapped.encode_threads, overlapped.decode_workers) == (6, 2, 8)
+    # more workers than CPUs (e.g. --workers 8 --cpu_set 0-3): the extra ones share a CPU, none is left without
+    assert [plan_resources(cpus[:4], processes=8, process_index=i, pin=True).cpus for i in range(8)] == \
+        [[0], [1], [2], [3], [0], [1], [2], [3]]
+    assert plan_resources([0], overlapped=True, inference_workers=4).as_dict() == {
+        "cpus": [0], "torch_threads": 1, "opencv_threads": 1, "encode_threads": 1, "decode_workers": 1,
+        "inference_workers": 1, "batch_size": None, "pin": False, "source": "auto"}
+
+
+def test_tune_calibrates_once_and_reuses_the_profile(tmp_path, synthetic_video, stub_model, restore_threads):
+    profiles = str(tmp_path / "profiles.json")
+    cv2.setNumThreads(3)
+    first = run_pipeline(synthetic_video, str(tmp_path / "first"), frame_step=10, model_name="stub", model=stub_model,
+                         resources="tune", resource_profiles=profiles)
+    plan = first["resource_plan"]
+    assert plan["source"] == "tuned" and plan["calibration_s"] > 0
+    assert cv2.getNumThreads() == 3 # a later run in this process doesn't inherit the plan
+    assert first["object_detection_metrics"]["batch_size"] == plan["batch_size"]
+
+    with open(profiles) as f:
+        stored = json.load(f)
+    [(key, entry)] = stored.items()
+    assert key.startswith("stub|torch|320x240|source|")
+    assert entry["plan"]["batch_size"] == plan["batch_size"] and entry["images_per_s"] > 0
+    assert {trial["stage"] for trial in entry["trials"]} == {"decode", "encode", "inference"}
+
+    second = run_pipeline(synthetic_video, str(tmp_path / "second"), frame_step=10, model_name="stub",
+                          model=stub_model, resources="tune", resource_profiles=profiles)
+    assert second["resource_plan"]["source"] == "profile" and second["resource_plan"]["calibration_s"] is None
+    assert second["resource_plan"]["batch_size"] == plan["batch_size"]
+    # calibration isn't part of the run: same detections and operation counts as the reused plan
+    assert first["object_detection_metrics"]["images_processed"] == \
+        second["object_detection_metrics"]["images_processed"] == 9
+    assert first["operation_timings"]["inference"]["count"] == second["operation_timings"]["inference"]["count"]
+    with open(str(tmp_path / "second" / "pipeline_report.md")) as f:
+        assert "## CPU Resources" in f.read()
+
+    explicit = run_pipeline(synthetic_video, str(tmp_path / "explicit"), frame_step=10, model_name="stub",
+                            model=stub_model, resources="tune", resource_profiles=profiles, batch_size=3)
+    assert explicit["object_detection_metrics"]["batch_size"] == 3 # an explicit batch size wins over the profile
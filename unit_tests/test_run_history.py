@@ -0,0 +1,80 @@
+import pytest
+
+from src.main_pipeline import run_pipeline
+from src.reporter import generate_trend_report
+from src.run_history import RunHistory
+
+DAY = 86400.0
+START = 1767225600.0 # 2026-01-01 00:00 UTC
+
+
+def _metrics(images, wall_s, classes):
+    return {
+        "frame_extraction_metrics": {"total_frames_in_video": images * 10, "frames_extracted": images},
+        "object_detection_metrics": {"images_processed": images, "total_detections": sum(classes.values()),
+                                     "class_distribution": classes},
+        "pipeline_stage_times": {"frame_extraction_s": wall_s / 4, "object_detection_s": wall_s * 3 / 4},
+        "operation_timings": {"inference": {"count": images, "total_s": wall_s / 2, "p50_ms": 1.0, "p95_ms": 2.0,
+                                            "p99_ms": 3.0, "mean_ms": 1.2, "max_ms": 4.0}}
+    }
+
+
+def test_pipeline_runs_are_recorded(synthetic_video, tmp_path, stub_model):
+    history_path = str(tmp_path / "history" / "runs.sqlite")
+    for frame_step in (10, 30):
+        metrics = run_pipeline(synthetic_video, str(tmp_path / f"out_{frame_step}"), frame_step=frame_step,
+                               model_name="stub", model=stub_model, run_history=history_path)
+
+    with RunHistory(history_path) as history:
+        assert history.run_count() == 2 and history.run_count("stub") == 2
+        conn = history._conn
+        model_name, frame_step, mode, images, detections = conn.execute(
+            "SELECT model_name, frame_step, mode, images_processed, total_detections FROM runs "
+            "ORDER BY run_id DESC LIMIT 1").fetchone()
+        assert (model_name, frame_step, mode) == ("stub", 30, "sequential")
+        assert images == metrics["object_detection_metrics"]["images_processed"] == 3
+        assert detections == metrics["object_detection_metrics"]["total_detections"]
+        stages = dict(conn.execute("SELECT stage, count FROM stage_timings WHERE run_id = 2"))
+        assert stages["frame_extraction_s"] is None
+        assert stages["inference"] == metrics["operation_timings"]["inference"]["count"]
+        class_counts = dict(conn.execute("SELECT class_name, count FROM class_counts WHERE run_id = 2"))
+        assert class_counts == metrics["object_detection_metrics"]["class_distribution"]
+
+
+def test_trend_queries(tmp_path):
+    runs = []
+    for day in range(40):
+        for model_name, images_per_s in (("fast", 20.0), ("slow", 10.0)):
+            if model_name == "slow" and day >= 35:
+                images_per_s = 7.0 # slow got 30% slower in its last 10 runs
+            classes = {"person": 8, "car": 2} if day < 33 else {"person": 2, "car": 8}
+            runs.append((f"{day}.mp4", _metrics(100, 100 / images_per_s, classes),
+                         {"model_name": model_name, "wall_s": 100 / images_per_s}, START + day * DAY + 3600))
+
+    with RunHistory(str(tmp_path / "runs.sqlite")) as history:
+        history.record_many(runs)
+
+        days = history.throughput_over_time("day")
+        assert len(days) == 40 and days[0]["period"] == "2026-01-01" and days[0]["runs"] == 2
+        assert days[0]["images_per_s"] == pytest.approx(15.0) and days[-1]["images_per_s"] == pytest.approx(13.5)
+        months = history.throughput_over_time("month", "fast")
+        assert [(row["period"], row["runs"]) for row in months] == [("2026-01", 31), ("2026-02", 9)]
+        assert months[0]["frames_per_s"] == pytest.approx(200.0)
+
+        regressions = {row["model_name"]: row for row in history.model_regressions(window=5)}
+        assert regressions["slow"]["regressed"] and regressions["slow"]["change"] == pytest.approx(-0.3)
+        assert not regressions["fast"]["regressed"] and regressions["fast"]["runs"] == 40
+        assert history.model_regressions(window=30) == []
+
+        drift = history.class_drift(recent_days=7, baseline_days=7)
+        shares = {row["class_name"]: row for row in drift["classes"]}
+        assert shares["person"]["baseline_share"] == pytest.approx(0.8)
+        assert shares["person"]["recent_share"] == pytest.approx(0.2)
+        assert drift["total_variation"] == pytest.approx(0.6)
+
+        report_path = tmp_path / "trend_report.md"
+        generate_trend_report(history, str(report_path), bucket="week", window=5, recent_days=7, baseline_days=7)
+    report = report_path.read_text()
+    assert "## Throughput per Week" in report
+    assert "| slow | 40 | 10.00 | 7.00 | -30.0% | **yes** |" in report
+    assert "| person | 80.00% | 20.00% | -60.00% **drift** |" in report
@@ -0,0 +1,90 @@
+import json
+import os
+
+import pytest
+
+from src.frame_extractor import iter_frames, frame_file_name
+from src.main_pipeline import run_pipeline
+from src.object_detector import pretag_frames_and_generate_coco
+from src.run_manifest import RunManifest, DetectionJournal
+
+
+def _frames(video, crash_after=None):
+    for i, (_, _, frame) in enumerate(iter_frames(video, frame_step=5)):
+        if i == crash_after:
+            raise RuntimeError("simulated crash")
+        yield frame_file_name(i), frame
+
+
+def _load(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def test_interrupted_detection_resumes_from_last_commit(synthetic_video, tmp_path, stub_model):
+    expected = pretag_frames_and_generate_coco(_frames(synthetic_video), str(tmp_path / "expected.json"), "stub",
+                                               model=stub_model, batch_size=2)
+
+    params = {"frame_step": 5}
+    out, journal_path = str(tmp_path / "detections.json"), str(tmp_path / "journal.jsonl")
+    manifest = RunManifest.open(str(tmp_path / "manifest.json"), params, resume=False)
+    with pytest.raises(RuntimeError, match="simulated crash"):
+        pretag_frames_and_generate_coco(_frames(synthetic_video, crash_after=7), out, "stub", model=stub_model,
+                                        batch_size=2, journal=DetectionJournal(journal_path, manifest, commit_every=3))
+    assert not os.path.exists(out)
+    assert manifest.stage("object_detection")["frames_committed"] == 6
+
+    calls = stub_model.calls
+    manifest = RunManifest.open(str(tmp_path / "manifest.json"), params, resume=True)
+    journal = DetectionJournal(journal_path, manifest, commit_every=3)
+    resumed = pretag_frames_and_generate_coco(_frames(synthetic_video), out, "stub", model=stub_model, batch_size=1,
+                                              journal=journal)
+
+    assert manifest.resumed and journal.records_replayed == 6
+    assert stub_model.calls - calls == 18 - 6
+    assert _load(out) == _load(tmp_path / "expected.json")
+    assert {k: v for k, v in resumed["metrics"].items() if k != "batch_size"} == \
+           {k: v for k, v in expected["metrics"].items() if k != "batch_size"}
+    assert manifest.is_complete("object_detection") and not os.path.exists(journal_path)
+
+
+def test_manifest_with_other_params_is_not_resumed(tmp_path):
+    path = str(tmp_path / "manifest.json")
+    RunManifest.open(path, {"frame_step": 5}, resume=False).update("frame_extraction", status="complete")
+
+    assert RunManifest.open(path, {"frame_step": 5}, resume=True).is_complete("frame_extraction")
+    assert not RunManifest.open(path, {"frame_step": 10}, resume=True).is_complete("frame_extraction")
+
+
+def test_finished_run_is_reused_on_resume(synthetic_video, tmp_path, stub_model):
+    output_dir = str(tmp_path / "out")
+    first = run_pipeline(synthetic_video, output_dir, frame_step=10, model_name="stub", model=stub_model)
+    calls = stub_model.calls
+    second = run_pipeline(synthetic_video, output_dir, frame_step=10, model_name="stub", model=stub_model, resume=True)
+
+    assert stub_model.calls == calls
+    assert second["resume_metrics"]["frame_extraction_reused"]
+    assert second["resume_metrics"]["detection_reuse_ratio"] == 1.0
+    assert second["object_detection_metrics"] == first["object_detection_metrics"]
+    with open(os.path.join(output_dir, "pipeline_report.md")) as f:
+        assert "## Resumed Run" in f.read()
+
+
+def test_overlapped_run_resumes_from_journal(synthetic_video, tmp_path, stub_model):
+    from src.pipeline_executor import run_overlapped
+
+    pretag_frames_and_generate_coco(_frames(synthetic_video), str(tmp_path / "expected.json"), "stub", model=stub_model)
+    manifest = RunManifest.open(str(tmp_path / "manifest.json"), {}, resume=False)
+    journal_path = str(tmp_path / "journal.jsonl")
+    with pytest.raises(RuntimeError):
+        pretag_frames_and_generate_coco(_frames(synthetic_video, crash_after=11), str(tmp_path / "ovl.json"), "stub",
+                                        model=stub_model, batch_size=1,
+                                        journal=DetectionJournal(journal_path, manifest, commit_every=5))
+
+    journal = DetectionJournal(journal_path, RunManifest.open(str(tmp_path / "manifest.json"), {}, resume=True))
+    result = run_overlapped(synthetic_video, None, str(tmp_path / "ovl.json"), frame_step=5, model_name="stub",
+                            sampling_mode="auto", batch_size=4, model=stub_model, journal=journal)
+
+    assert journal.records_replayed == 10
+    assert result["pipeline_stage_stats"]["inference"]["batches"] == 2 # the 8 frames left, in batches of 4
+    assert _load(tmp_path / "ovl.json") == _load(tmp_path / "expected.json")
@@ -0,0 +1,139 @@
+import json
+import os
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from src.frame_sources import FrameRingBuffer, open_frame_source
+from src.stream_pipeline import run_stream
+from src.instrumentation import TIMINGS
+
+WIDTH, HEIGHT = 64, 48
+
+
+def _frame(i):
+    frame = np.zeros((HEIGHT, WIDTH, 3), dtype=np.uint8)
+    frame[:, :, 1] = (i * 37) % 256
+    frame[10:20, i % 40:i % 40 + 10] = 255
+    return frame
+
+
+def _feed_pipe(path, count, extra=b""):
+    """Writes count raw bgr24 frames (plus extra bytes) into the named pipe path from a thread."""
+    def write():
+        try:
+            with open(path, 'wb') as f:
+                for i in range(count):
+                    f.write(_frame(i).tobytes())
+                f.write(extra)
+        except BrokenPipeError:
+            pass # the reader stopped early
+
+    thread = threading.Thread(target=write)
+    thread.start()
+    return thread
+
+
+def _read_lines(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+
+def test_ring_buffer_policies():
+    drop = FrameRingBuffer(2, "drop")
+    for i in range(5):
+        drop.put(i)
+    drop.close()
+    assert (drop.get(), drop.get(), drop.get()) == (3, 4, None)
+    assert drop.dropped == 3 and drop.max_depth == 2
+
+    block = FrameRingBuffer(1, "block")
+    block.put(0)
+    writer = threading.Thread(target=block.put, args=(1,))
+    writer.start()
+    time.sleep(0.05)
+    assert writer.is_alive() # waits for room instead of dropping
+    assert block.get() == 0
+    writer.join(timeout=5)
+    assert block.get() == 1 and block.dropped == 0
+
+    with pytest.raises(ValueError):
+        FrameRingBuffer(1, "newest")
+    with pytest.raises(ValueError):
+        open_frame_source("-")
+
+
+@pytest.mark.skipif(not hasattr(os, "mkfifo"), reason="needs named pipes")
+def test_stream_from_named_pipe_rolls_shards(tmp_path, stub_model):
+    fifo = str(tmp_path / "feed.pipe")
+    os.mkfifo(fifo)
+    # 10 whole frames, then a truncated one the source must drop
+    writer = _feed_pipe(fifo, 10, extra=b"\0" * (WIDTH * HEIGHT))
+    output_dir = str(tmp_path / "stream")
+    TIMINGS.record("other_run", 0.1) # someone else's sample in the process-wide timings
+    summary = run_stream(fifo, output_dir, model=stub_model, raw_size=(WIDTH, HEIGHT), frame_step=1, batch_size=3,
+                         buffer_size=4, buffer_policy="block", shard_frames=4, shard_seconds=None)
+    writer.join(timeout=5)
+
+    assert summary["status"] == "finished"
+    assert summary["frames_read"] == 10 and summary["images_processed"] == 10 and summary["buffer_drops"] == 0
+    assert summary["buffer_max_depth"] <= 4
+    shards = _read_lines(os.path.join(output_dir, "shards.jsonl"))
+    assert [(s["shard"], s["first_frame"], s["last_frame"], s["images"]) for s in shards] == \
+        [(1, 0, 3, 4), (2, 4, 7, 4), (3, 8, 9, 2)]
+    assert summary["shards"] == 3 and summary["total_detections"] == sum(s["detections"] for s in shards)
+    # timings are the run's own and reset per shard
+    assert sum(s["operation_timings"]["inference"]["count"] for s in shards) == 4 # 10 frames in batches of 3
+    assert "other_run" in TIMINGS.summary()
+
+    # Every shard is a complete COCO file of its own, with its own frames
+    for shard in shards:
+        with open(os.path.join(output_dir, shard["coco"])) as f:
+            coco = json.load(f)
+        assert [image["file_name"] for image in coco["images"]] == \
+            [f"frame_{i:05d}.jpg" for i in range(shard["images"])]
+        assert sorted(os.listdir(os.path.join(output_dir, shard["frames_dir"]))) == \
+            [image["file_name"] for image in coco["images"]]
+        assert len(coco["annotations"]) == shard["detections"]
+    with open(os.path.join(output_dir, "stream_summary.json")) as f:
+        assert json.load(f) == json.loads(json.dumps(summary))
+
+
+@pytest.mark.skipif(not hasattr(os, "mkfifo"), reason="needs named pipes")
+def test_stream_shards_by_stream_time_and_stops_on_event(tmp_path, stub_model):
+    fifo = str(tmp_path / "feed.pipe")
+    os.mkfifo(fifo)
+    writer = _feed_pipe(fifo, 12)
+    output_dir = str(tmp_path / "stream")
+    # 4 fps with frame_step 2: kept frames are 0.5 s apart, so 1 s shards hold 2 of them
+    summary = run_stream(fifo, output_dir, model=stub_model, raw_size=(WIDTH, HEIGHT), fps=4, frame_step=2,
+                         batch_size=1, buffer_policy="block", shard_frames=None, shard_seconds=1.0,
+                         save_frames=False, max_frames=9)
+    writer.join(timeout=5)
+
+    shards = _read_lines(os.path.join(output_dir, "shards.jsonl"))
+    assert [(s["first_frame"], s["last_frame"]) for s in shards] == [(0, 2), (4, 6), (8, 8)]
+    assert [s["start_s"] for s in shards] == [0.0, 1.0, 2.0]
+    assert all(s["frames_dir"] is None for s in shards)
+    assert summary["frames_read"] == 9 and summary["images_processed"] == 5
+
+    stop = threading.Event()
+    stop.set()
+    writer = _feed_pipe(fifo, 3)
+    stopped = run_stream(fifo, str(tmp_path / "stopped"), model=stub_model, raw_size=(WIDTH, HEIGHT),
+                         frame_step=1, stop_event=stop)
+    writer.join(timeout=5)
+    assert stopped["status"] == "finished" and stopped["images_processed"] == 0 and stopped["shards"] == 0
+
+
+@pytest.mark.skipif(not hasattr(os, "mkfifo"), reason="needs named pipes")
+def test_stream_rejects_bad_settings_before_opening_the_source(tmp_path, stub_model):
+    fifo = str(tmp_path / "feed.pipe")
+    os.mkfifo(fifo) # no writer: opening it would block
+    with pytest.raises(ValueError, match="frame format"):
+        run_stream(fifo, str(tmp_path / "stream"), model=stub_model, raw_size=(WIDTH, HEIGHT), frame_format="gif")
+    with pytest.raises(ValueError, match="shard"):
+        run_stream(fifo, str(tmp_path / "stream"), model=stub_model, raw_size=(WIDTH, HEIGHT), shard_frames=None,
+                   shard_seconds=None)
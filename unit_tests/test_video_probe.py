@@ -0,0 +1,34 @@
+import json
+import os
+import subprocess
+import sys
+
+from src.frame_extractor import extract_frames
+from src.video_probe import VideoProbe
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "src")
+
+
+def test_probe_reads_properties_once_and_hands_over_capture(synthetic_video, tmp_path):
+    probe = VideoProbe.open(synthetic_video)
+    cap = probe._capture
+
+    assert (probe.frame_count, probe.fps, probe.width, probe.height) == (90, 30.0, 320, 240)
+    assert probe.duration_s == 3.0 and probe.codec != "unknown"
+    with_probe = extract_frames(synthetic_video, str(tmp_path / "a"), frame_step=10, probe=probe)
+    without = extract_frames(synthetic_video, str(tmp_path / "b"), frame_step=10)
+
+    assert probe._capture is None and not cap.isOpened() # taken and released by the extractor
+    assert with_probe == {**without, "encode_s": with_probe["encode_s"], "encode_fps": with_probe["encode_fps"]}
+
+
+def test_validate_only_skips_model_imports(synthetic_video):
+    code = ("import sys, runpy; sys.argv = ['main_pipeline.py', '--video_path', sys.argv[1], '--validate-only']\n"
+            "try:\n    runpy.run_path('main_pipeline.py', run_name='__main__')\n"
+            "except SystemExit as e:\n    assert e.code == 0, e.code\n"
+            "assert not {'ultralytics', 'torch'} & set(sys.modules), 'heavy imports loaded'")
+    result = subprocess.run([sys.executable, "-c", code, synthetic_video], cwd=SRC_DIR, capture_output=True,
+                            text=True, timeout=60)
+
+    assert result.returncode == 0, result.stderr
+    assert json.loads(result.stdout.strip().splitlines()[-1])["frame_count"] == 90